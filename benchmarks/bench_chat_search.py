@@ -0,0 +1,128 @@
+"""Compare FTS5 chat search with the legacy linear file scan.
+
+用法::
+
+    python benchmarks/bench_chat_search.py --messages 50000 --sessions 500
+
+脚本在临时 ``DATA_DIR`` 下生成合成会话（中英文混排），依次测量：
+首次启动的 FTS 回填耗时、``search_messages``（FTS5）与 ``_scan_messages``
+（逐文件子串扫描）在若干关键词上的延迟，结果以 JSON 打印到 stdout。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+_WORDS = [
+    "部署", "脚本", "模型", "天气", "提醒", "订阅", "权限", "日志", "数据库", "缓存",
+    "deploy", "release", "pipeline", "token", "latency", "python", "docker",
+    "kubernetes", "feed", "summary", "error", "retry", "websocket", "quota",
+]
+_QUERIES = ["部署脚本", "模型", "kubernetes", "latency quota", "不存在的关键词"]
+
+
+def _message(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 40)))
+
+
+def _build_corpus(messages: int, sessions: int, seed: int) -> None:
+    from core import chat_session_log
+    from core.state_store import _chat_root
+
+    rng = random.Random(seed)
+    root = _chat_root("bench-user")
+    per_session = max(1, messages // max(1, sessions))
+    start_day = date(2025, 1, 1)
+    for index in range(sessions):
+        day = (start_day + timedelta(days=index // 5)).isoformat()
+        session_id = f"bench-{index:05d}"
+        rows = [
+            {"role": "user" if n % 2 == 0 else "model", "content": _message(rng)}
+            for n in range(per_session)
+        ]
+        path = root / day / f"{session_id}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            chat_session_log.render_session(day, session_id, rows),
+            encoding="utf-8",
+        )
+
+
+async def _time_async(fn, repeat: int) -> dict[str, float]:
+    samples: list[float] = []
+    hits = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+        hits = len(rows)
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "hits": hits,
+    }
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    from core import state_store
+
+    _build_corpus(args.messages, args.sessions, args.seed)
+
+    started = time.perf_counter()
+    await state_store.get_latest_session_id("bench-user")
+    backfill_ms = (time.perf_counter() - started) * 1000
+
+    results: dict[str, dict] = {}
+    for query in _QUERIES:
+        results[query] = {
+            "fts": await _time_async(
+                lambda: state_store.search_messages(
+                    "bench-user", query, limit=args.limit
+                ),
+                args.repeat,
+            ),
+            "linear_scan": await _time_async(
+                lambda: state_store._scan_messages(
+                    "bench-user", query, limit=args.limit
+                ),
+                args.repeat,
+            ),
+        }
+    return {
+        "messages": args.messages,
+        "sessions": args.sessions,
+        "limit": args.limit,
+        "backfill_ms": round(backfill_ms, 3),
+        "queries": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50_000)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="ikaros-bench-search-") as tmp:
+        os.environ["DATA_DIR"] = tmp
+        payload = asyncio.run(_run(args))
+    print(json.dumps(payload, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
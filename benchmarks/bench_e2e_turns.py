@@ -0,0 +1,479 @@
+"""End-to-end chat-turn benchmark against a local fake OpenAI-compatible server.
+
+用法::
+
+    python benchmarks/bench_e2e_turns.py --driver orchestrator --turns 1000 \\
+        --tool-ratio 0.3 --output bench-e2e.json
+    python benchmarks/bench_e2e_turns.py --driver ai_service --turns 200 \\
+        --compare bench-e2e.json
+
+每一轮按 web 渠道的真实路径走一遍：``enqueue_inbound_event`` ->
+``claim_inbound_events`` -> ``state_store.save_message`` ->
+``get_session_messages`` -> ``AgentOrchestrator.handle_message``（或直接
+``AiService.generate_response_stream``，工具走真实的 ``PrimitiveRuntime``）->
+``append_outbound_event`` -> ``ack_inbound_event``。模型请求全部打到
+``fake_openai_server.py`` 子进程上，按 ``--tool-ratio`` 比例插入一次 ``read``
+工具调用。
+
+输出 JSON：轮次延迟 p50/p95/p99、首个 chunk 延迟、事件循环阻塞时间、每轮写入
+``DATA_DIR`` 的字节数、RSS 增长；``--compare`` 会附上与旧结果的差值，方便在两个
+commit 之间比较回归。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "src"))
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(BENCH_DIR))
+
+from fake_openai_server import add_stub_arguments, stub_options_from_args  # noqa: E402
+
+BENCH_USER_ID = "90001"
+BENCH_MODEL_KEY = "stub/bench-chat"
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return round(ordered[min(rank, len(ordered)) - 1], 2)
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+
+    return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+
+
+def _io_write_bytes() -> int | None:
+    """Bytes this process caused to be sent to storage (``/proc/self/io``)."""
+    try:
+        with open("/proc/self/io", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("write_bytes:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _dir_size(root: Path) -> int:
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.stat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            timeout=10,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+class LoopLagMonitor:
+    """Sample event-loop lag: how late a ``sleep(interval)`` wakes up."""
+
+    def __init__(self, interval_ms: float = 5.0, threshold_ms: float = 2.0) -> None:
+        self.interval = interval_ms / 1000.0
+        self.threshold_ms = threshold_ms
+        self.blocked_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.stalls = 0
+        self._task: asyncio.Task[None] | None = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = (loop.time() - expected) * 1000.0
+            if lag_ms > self.threshold_ms:
+                self.blocked_ms += lag_ms
+                self.stalls += 1
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class _BenchContext:
+    """Minimal UnifiedContext stand-in collecting replies in memory."""
+
+    def __init__(self, user_id: str) -> None:
+        self.message = SimpleNamespace(
+            user=SimpleNamespace(id=user_id),
+            platform="web",
+            chat=SimpleNamespace(id=f"web-{user_id}"),
+        )
+        self.user_data: dict[str, Any] = {}
+        self.replies: list[str] = []
+
+    async def reply(self, text, **kwargs):
+        _ = kwargs
+        self.replies.append(str(text))
+        return None
+
+    async def reply_document(self, document, filename=None, caption=None, **kwargs):
+        _ = (document, filename, kwargs)
+        self.replies.append(str(caption or ""))
+        return None
+
+
+def _start_stub(args: argparse.Namespace) -> tuple[subprocess.Popen, int]:
+    command = [
+        sys.executable,
+        str(BENCH_DIR / "fake_openai_server.py"),
+        "--port",
+        "0",
+        "--first-token-ms",
+        str(args.first_token_ms),
+        "--chunk-ms",
+        str(args.chunk_ms),
+        "--chunks",
+        str(args.chunks),
+        "--error-rate",
+        str(args.error_rate),
+        "--seed",
+        str(args.seed),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline() if process.stdout else ""
+    if not line.startswith("LISTENING "):
+        process.kill()
+        raise RuntimeError(f"fake server failed to start: {line!r}")
+    return process, int(line.split()[1])
+
+
+def _write_models_config(path: Path, port: int) -> None:
+    provider, model_id = BENCH_MODEL_KEY.split("/", 1)
+    path.write_text(
+        json.dumps(
+            {
+                "model": {"primary": BENCH_MODEL_KEY, "routing": BENCH_MODEL_KEY},
+                "models": {
+                    "primary": {BENCH_MODEL_KEY: {}},
+                    "routing": {BENCH_MODEL_KEY: {}},
+                },
+                "providers": {
+                    provider: {
+                        "baseUrl": f"http://127.0.0.1:{port}/v1",
+                        "apiKey": "bench-key",
+                        "api": "openai-completions",
+                        "models": [
+                            {
+                                "id": model_id,
+                                "name": model_id,
+                                "input": ["text"],
+                                "contextWindow": 128000,
+                                "maxTokens": 8192,
+                            }
+                        ],
+                    }
+                },
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+
+
+def _turn_text(index: int, tool_ratio: float, read_path: Path) -> str:
+    # 用确定性的间隔决定哪些轮次带工具调用，便于不同 commit 之间对比。
+    if tool_ratio > 0 and int((index + 1) * tool_ratio) > int(index * tool_ratio):
+        return f"第 {index} 轮：请看一下这个文件 [bench:read {read_path}]"
+    return f"第 {index} 轮：随便聊聊，今天进展如何？"
+
+
+def _build_turn_driver(driver: str, workspace: Path):
+    from core.primitive_runtime import PrimitiveRuntime
+    from core.tool_registry import tool_registry
+
+    if driver == "orchestrator":
+        from core.agent_orchestrator import AgentOrchestrator
+
+        orchestrator = AgentOrchestrator()
+
+        async def _run(ctx: _BenchContext, history: list[dict[str, Any]]):
+            async for chunk in orchestrator.handle_message(ctx, history):
+                yield chunk
+
+        return _run
+
+    from services.ai_service import AiService
+
+    service = AiService()
+    runtime = PrimitiveRuntime(workspace_root=str(workspace))
+    tools = tool_registry.get_core_tools()
+
+    async def _execute(name: str, args: dict[str, Any]) -> dict[str, Any]:
+        method = getattr(runtime, name, None)
+        if method is None:
+            return {"ok": False, "error_code": "unknown_tool", "message": name}
+        return await method(**args)
+
+    async def _run(ctx: _BenchContext, history: list[dict[str, Any]]):
+        _ = ctx
+        async for chunk in service.generate_response_stream(
+            message_history=history,
+            tools=tools,
+            tool_executor=_execute,
+            system_instruction="You are a benchmark assistant.",
+        ):
+            yield chunk
+
+    return _run
+
+
+async def _run_benchmark(args: argparse.Namespace, data_dir: Path, workspace: Path) -> dict:
+    from core import state_store
+    from web_channel import store as web_store
+
+    read_path = workspace / "notes.txt"
+    read_path.write_text(
+        "\n".join(f"line {index}: benchmark fixture" for index in range(400)),
+        encoding="utf-8",
+    )
+    run_turn = _build_turn_driver(args.driver, workspace)
+    session_id = f"bench-{int(time.time())}"
+    ctx = _BenchContext(BENCH_USER_ID)
+
+    turn_ms: list[float] = []
+    first_chunk_ms: list[float] = []
+    failures = 0
+    rss_samples: list[dict[str, int]] = []
+
+    async def _one_turn(index: int) -> None:
+        nonlocal failures
+        text = _turn_text(index, args.tool_ratio, read_path)
+        started = time.perf_counter()
+        await web_store.enqueue_inbound_event(
+            {"owner_user_id": BENCH_USER_ID, "session_id": session_id, "text": text}
+        )
+        claimed = await web_store.claim_inbound_events(limit=20)
+        await state_store.save_message(BENCH_USER_ID, "user", text, session_id)
+        history = await state_store.get_session_messages(
+            BENCH_USER_ID, session_id, limit=args.history
+        )
+        ctx.replies.clear()
+        chunks: list[str] = []
+        first_chunk: float | None = None
+        try:
+            async for chunk in run_turn(ctx, history):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter()
+                chunks.append(str(chunk))
+        except Exception:
+            failures += 1
+        reply = "".join(chunks) or "\n".join(ctx.replies)
+        await state_store.save_message(BENCH_USER_ID, "model", reply, session_id)
+        await web_store.append_outbound_event(
+            owner_user_id=BENCH_USER_ID,
+            session_id=session_id,
+            event_type="message",
+            payload={"text": reply},
+        )
+        for row in claimed:
+            await web_store.ack_inbound_event(str(row.get("id") or ""))
+        finished = time.perf_counter()
+        if not reply:
+            failures += 1
+        if index >= args.warmup:
+            turn_ms.append((finished - started) * 1000.0)
+            if first_chunk is not None:
+                first_chunk_ms.append((first_chunk - started) * 1000.0)
+
+    for index in range(args.warmup):
+        await _one_turn(index)
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    rss_start = _rss_bytes()
+    io_start = _io_write_bytes()
+    size_start = _dir_size(data_dir)
+    started = time.perf_counter()
+    for index in range(args.warmup, args.warmup + args.turns):
+        await _one_turn(index)
+        measured = index - args.warmup + 1
+        if measured % max(1, args.rss_every) == 0:
+            rss_samples.append({"turn": measured, "rss_bytes": _rss_bytes()})
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+
+    from core.llm_usage_store import llm_usage_store
+
+    llm_usage_store.flush()
+    rss_end = _rss_bytes()
+    io_end = _io_write_bytes()
+    size_end = _dir_size(data_dir)
+    turns = max(1, args.turns)
+    return {
+        "turns": args.turns,
+        "failed_turns": failures,
+        "seconds": round(elapsed, 3),
+        "turns_per_sec": round(args.turns / elapsed, 2) if elapsed else 0.0,
+        "turn_latency_ms": {
+            "p50": _percentile(turn_ms, 50),
+            "p95": _percentile(turn_ms, 95),
+            "p99": _percentile(turn_ms, 99),
+            "max": round(max(turn_ms), 2) if turn_ms else 0.0,
+        },
+        "first_chunk_ms": {
+            "p50": _percentile(first_chunk_ms, 50),
+            "p95": _percentile(first_chunk_ms, 95),
+            "p99": _percentile(first_chunk_ms, 99),
+        },
+        "event_loop": {
+            "blocked_ms_total": round(monitor.blocked_ms, 2),
+            "blocked_ms_per_turn": round(monitor.blocked_ms / turns, 3),
+            "max_lag_ms": round(monitor.max_lag_ms, 2),
+            "stalls": monitor.stalls,
+        },
+        "data_dir": {
+            "growth_bytes_per_turn": round((size_end - size_start) / turns, 1),
+            "io_write_bytes_per_turn": (
+                round((io_end - io_start) / turns, 1)
+                if io_start is not None and io_end is not None
+                else None
+            ),
+        },
+        "rss": {
+            "start_bytes": rss_start,
+            "end_bytes": rss_end,
+            "growth_bytes": rss_end - rss_start,
+            "samples": rss_samples,
+        },
+    }
+
+
+_COMPARE_KEYS = (
+    ("turn_latency_ms", "p50"),
+    ("turn_latency_ms", "p95"),
+    ("turn_latency_ms", "p99"),
+    ("first_chunk_ms", "p50"),
+    ("event_loop", "blocked_ms_per_turn"),
+    ("data_dir", "growth_bytes_per_turn"),
+    ("data_dir", "io_write_bytes_per_turn"),
+    ("rss", "growth_bytes"),
+)
+
+
+def _compare(current: dict, baseline: dict) -> dict[str, dict[str, Any]]:
+    output: dict[str, dict[str, Any]] = {}
+    for section, key in _COMPARE_KEYS:
+        new = (current.get(section) or {}).get(key)
+        old = (baseline.get(section) or {}).get(key)
+        if not isinstance(new, (int, float)) or not isinstance(old, (int, float)):
+            continue
+        output[f"{section}.{key}"] = {
+            "baseline": old,
+            "current": new,
+            "delta_pct": round((new - old) / old * 100.0, 1) if old else None,
+        }
+    return output
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--driver", choices=["orchestrator", "ai_service"], default="orchestrator")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--history", type=int, default=20)
+    parser.add_argument("--tool-ratio", type=float, default=0.3)
+    parser.add_argument("--rss-every", type=int, default=100)
+    parser.add_argument("--output", default="")
+    parser.add_argument("--compare", default="")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    args.turns = max(1, args.turns)
+    args.warmup = max(0, args.warmup)
+    stub_options = stub_options_from_args(args)
+
+    scratch = Path(tempfile.mkdtemp(prefix="ikaros-bench-e2e-"))
+    data_dir = scratch / "data"
+    workspace = scratch / "workspace"
+    data_dir.mkdir()
+    workspace.mkdir()
+    models_path = scratch / "models.json"
+
+    stub, port = _start_stub(args)
+    try:
+        _write_models_config(models_path, port)
+        # 必须在导入 core.* 之前设置：配置模块在导入时读取这些路径。
+        os.environ["DATA_DIR"] = str(data_dir)
+        os.environ["MODELS_CONFIG_PATH"] = str(models_path)
+        os.environ.setdefault("LLM_API_KEY", "bench-key")
+        results = asyncio.run(_run_benchmark(args, data_dir, workspace))
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    report: dict[str, Any] = {
+        "meta": {
+            "benchmark": "e2e_turns",
+            "driver": args.driver,
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "tool_ratio": args.tool_ratio,
+            "history": args.history,
+            "stub": stub_options.__dict__,
+        },
+        "results": results,
+    }
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        report["compare"] = {
+            "baseline_commit": (baseline.get("meta") or {}).get("commit", ""),
+            "metrics": _compare(results, baseline.get("results") or {}),
+        }
+    rendered = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(rendered + "\n", encoding="utf-8")
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
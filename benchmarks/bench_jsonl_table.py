@@ -0,0 +1,122 @@
+"""Append throughput of ``JsonlTable`` with 1/4/16 concurrent producer processes.
+
+用法::
+
+    python benchmarks/bench_jsonl_table.py --rows 500 --producers 1 4 16
+
+``segmented`` 是当前的 O_APPEND 分段实现；``legacy`` 复刻旧实现
+（``FileLock`` 轮询 + 读全表再整体重写）作为对照。结果以 JSON 打印。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+async def _legacy_append(path: Path, row: dict) -> None:
+    from shared.queue.jsonl_queue import FileLock
+
+    lock_path = path.with_suffix(path.suffix + ".legacy-lock")
+    async with FileLock(lock_path, timeout_sec=600):
+        rows = []
+        if path.exists():
+            rows = [
+                json.loads(line)
+                for line in path.read_text(encoding="utf-8").splitlines()
+                if line.strip()
+            ]
+        rows.append(row)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(
+            "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in rows),
+            encoding="utf-8",
+        )
+        tmp.replace(path)
+
+
+def _producer(engine: str, path: str, worker: int, rows: int, ready, start) -> None:
+    from shared.queue.jsonl_queue import JsonlTable
+
+    payload = {"type": "delta", "payload": {"text": "x" * 160}}
+
+    async def _run() -> None:
+        table = JsonlTable(path)
+        ready.wait()
+        start.wait()
+        for index in range(rows):
+            row = {"worker": worker, "index": index, **payload}
+            if engine == "legacy":
+                await _legacy_append(Path(path), row)
+            else:
+                await table.append(row)
+        if engine != "legacy":
+            await table.flush()
+
+    asyncio.run(_run())
+
+
+def _measure(engine: str, producers: int, rows: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="ikaros-bench-jsonl-") as tmp:
+        path = str(Path(tmp) / "events.jsonl")
+        ready = context.Barrier(producers + 1)
+        start = context.Event()
+        workers = [
+            context.Process(
+                target=_producer,
+                args=(engine, path, worker, rows, ready, start),
+            )
+            for worker in range(producers)
+        ]
+        for process in workers:
+            process.start()
+        ready.wait()
+        started = time.perf_counter()
+        start.set()
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - started
+        written = sum(
+            1
+            for line in Path(path).read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        )
+    total = producers * rows
+    return {
+        "engine": engine,
+        "producers": producers,
+        "rows": total,
+        "rows_written": written,
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(total / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500, help="rows per producer")
+    parser.add_argument("--producers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument(
+        "--engines", nargs="+", default=["segmented", "legacy"]
+    )
+    args = parser.parse_args()
+
+    results = [
+        _measure(engine, producers, args.rows)
+        for engine in args.engines
+        for producers in args.producers
+    ]
+    print(json.dumps({"results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Per-call overhead of ``LlmUsageStore.record_event``: batched vs per-call UPSERT.
+
+用法::
+
+    python benchmarks/bench_llm_usage_store.py --calls 2000 --sessions 4
+
+``batched`` 是当前实现（内存累加 + 后台线程批量写入）；``legacy`` 复刻旧实现
+（每次调用新开连接、执行一条 UPSERT 并提交）。两者都在临时 ``DATA_DIR`` 下
+运行，最后核对落库的 ``requests`` 总数，结果以 JSON 打印。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+def _legacy_record(store, db_path: Path, session_id: str) -> None:
+    from core import llm_usage_store as module
+
+    ts = module._now_iso()
+    values = (
+        ts[:10],
+        session_id,
+        "demo/text",
+        1, 1, 0, 1, 0, 0, 120, 30, 150, 0, 0, 0, 0,
+        ts,
+        ts,
+    )
+    with store._lock:
+        with sqlite3.connect(str(db_path), timeout=30) as conn:
+            conn.execute(module._USAGE_UPSERT_SQL, values)
+
+
+def _measure(engine: str, calls: int, sessions: int) -> dict:
+    from core import llm_usage_store as module
+
+    with tempfile.TemporaryDirectory(prefix="ikaros-bench-usage-") as tmp:
+        db_path = Path(tmp) / "bot_data.db"
+        store = module.LlmUsageStore()
+        store.db_path = db_path
+        store._ensure_db()
+        response = SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30, total_tokens=150)
+        )
+        samples: list[float] = []
+        started = time.perf_counter()
+        for index in range(calls):
+            session_id = f"session-{index % sessions}"
+            call_started = time.perf_counter()
+            if engine == "legacy":
+                _legacy_record(store, db_path, session_id)
+            else:
+                module.set_current_llm_usage_session_id(session_id)
+                store.record_event(
+                    operation="chat.completions.create",
+                    default_model_key="demo/text",
+                    request_kwargs={"model": "text"},
+                    response=response,
+                    success=True,
+                )
+            samples.append((time.perf_counter() - call_started) * 1_000_000)
+        store.close()
+        elapsed = time.perf_counter() - started
+        with sqlite3.connect(str(db_path)) as conn:
+            persisted = conn.execute(
+                f"SELECT COALESCE(SUM(requests), 0) FROM {module._USAGE_TABLE}"
+            ).fetchone()[0]
+    samples.sort()
+    return {
+        "engine": engine,
+        "calls": calls,
+        "persisted_requests": int(persisted),
+        "seconds": round(elapsed, 4),
+        "per_call_us_median": round(statistics.median(samples), 1),
+        "per_call_us_p99": round(samples[int(len(samples) * 0.99) - 1], 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--engines", nargs="+", default=["batched", "legacy"])
+    args = parser.parse_args()
+
+    os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="ikaros-bench-data-")
+    results = [
+        _measure(engine, max(1, args.calls), max(1, args.sessions))
+        for engine in args.engines
+    ]
+    print(json.dumps({"results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
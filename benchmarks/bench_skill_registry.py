@@ -0,0 +1,198 @@
+"""Startup and per-turn overhead of the skill registry.
+
+用法::
+
+    python benchmarks/bench_skill_registry.py --synthetic 60 --output bench-registry.json
+
+在临时目录里复制仓库的 builtin/learned 技能，并额外生成 ``--synthetic`` 个
+learned 技能（复制已有 SKILL.md 改名），然后测量：
+
+- ``cold_scan``：没有持久化索引时的 ``scan_skills``（逐个解析 SKILL.md）；
+- ``warm_scan``：新进程从 ``skill_index.json`` 恢复后的 ``scan_skills``；
+- ``refresh_noop``：树没变化时每次 ``refresh_if_changed`` 的开销，对比旧的
+  递归 ``glob("**/SKILL.md")`` 指纹；
+- ``refresh_one_edit``：改动一个 SKILL.md 后的 ``refresh_if_changed``；
+- ``extension_imports``：启动时 ``register_extensions`` 会导入的脚本数与耗时，
+  对比导入全部脚本。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "src"))
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return round(ordered[min(rank, len(ordered)) - 1], 3)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=False,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _summary(samples: list[float]) -> dict[str, float]:
+    return {
+        "p50_ms": _percentile(samples, 50),
+        "p95_ms": _percentile(samples, 95),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+    }
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> list[float]:
+    samples: list[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+
+def _glob_fingerprint(root: Path) -> tuple[tuple[str, int], ...]:
+    # 旧实现：每次 refresh 都递归 glob 整棵技能树。
+    rows = []
+    for path in root.glob("**/SKILL.md"):
+        rows.append((str(path.relative_to(root)), int(path.stat().st_mtime_ns)))
+    rows.sort()
+    return tuple(rows)
+
+
+def _build_tree(target: Path, synthetic: int) -> int:
+    source_root = REPO_ROOT / "extension" / "skills"
+    for source in ("builtin", "learned"):
+        if (source_root / source).is_dir():
+            shutil.copytree(
+                source_root / source,
+                target / source,
+                ignore=shutil.ignore_patterns("__pycache__", "node_modules", ".venv"),
+            )
+    templates = sorted((target / "builtin").glob("*/SKILL.md"))
+    for idx in range(synthetic):
+        template = templates[idx % len(templates)]
+        name = f"synthetic_{idx:03d}"
+        skill_dir = target / "learned" / name
+        skill_dir.mkdir(parents=True)
+        text = template.read_text(encoding="utf-8")
+        text = text.replace(f"name: {template.parent.name}", f"name: {name}", 1)
+        (skill_dir / "SKILL.md").write_text(text, encoding="utf-8")
+    return len(list(target.glob("*/*/SKILL.md")))
+
+
+def _run(args: argparse.Namespace) -> dict[str, Any]:
+    from extension.skills.registry import SkillRegistry
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench-skill-registry-"))
+    try:
+        root = workdir / "skills"
+        skill_count = _build_tree(root, args.synthetic)
+        index_path = workdir / "skill_index.json"
+
+        def _cold() -> None:
+            index_path.unlink(missing_ok=True)
+            SkillRegistry(skills_dir=str(root), index_path=index_path).scan_skills()
+
+        cold = _timed(_cold, args.repeat)
+
+        def _warm() -> None:
+            SkillRegistry(skills_dir=str(root), index_path=index_path).scan_skills()
+
+        warm = _timed(_warm, args.repeat)
+
+        registry = SkillRegistry(skills_dir=str(root), index_path=index_path)
+        registry.scan_skills()
+        refresh_noop = _timed(registry.refresh_if_changed, args.turns)
+        glob_noop = _timed(lambda: _glob_fingerprint(root), args.turns)
+
+        edited = root / "learned" / "synthetic_000" / "SKILL.md"
+        if not edited.exists():
+            edited = next(root.glob("*/*/SKILL.md"))
+        one_edit: list[float] = []
+        reparsed: set[int] = set()
+        for idx in range(args.repeat):
+            with edited.open("a", encoding="utf-8") as handle:
+                handle.write(f"\n<!-- bench edit {idx} -->\n")
+            one_edit.extend(_timed(registry.refresh_if_changed, 1))
+            reparsed.add(int(registry.last_scan_stats.get("reparsed", 0)))
+
+        deferred_scripts = 0
+        all_scripts = 0
+        started = time.perf_counter()
+        for name, info in registry.get_skill_index().items():
+            all_scripts += len(info.get("scripts") or [])
+            deferred_scripts += len(registry._load_skill_python_modules(name, info))
+        deferred_ms = (time.perf_counter() - started) * 1000.0
+
+        return {
+            "skills": skill_count,
+            "cold_scan": _summary(cold),
+            "warm_scan": _summary(warm),
+            "refresh_noop": _summary(refresh_noop),
+            "glob_fingerprint_noop": _summary(glob_noop),
+            "refresh_one_edit": {**_summary(one_edit), "reparsed": sorted(reparsed)},
+            "extension_imports": {
+                "imported_scripts": deferred_scripts,
+                "total_scripts": all_scripts,
+                "elapsed_ms": round(deferred_ms, 2),
+            },
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=200, help="refresh_if_changed calls")
+    parser.add_argument("--synthetic", type=int, default=40, help="Extra learned skills")
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+    args.repeat = max(1, args.repeat)
+    args.turns = max(1, args.turns)
+
+    results = _run(args)
+    report = {
+        "meta": {
+            "benchmark": "skill_registry",
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "repeat": args.repeat,
+            "turns": args.turns,
+            "synthetic": args.synthetic,
+        },
+        "results": results,
+    }
+    rendered = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(rendered + "\n", encoding="utf-8")
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
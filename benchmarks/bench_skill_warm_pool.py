@@ -0,0 +1,175 @@
+"""Cold vs warm latency of every builtin skill CLI.
+
+用法::
+
+    python benchmarks/bench_skill_warm_pool.py --repeat 5 --output bench-skills.json
+
+对 ``extension/skills/builtin/*/scripts/execute.py`` 逐个执行
+``python scripts/execute.py --help``（只测解释器启动 + 导入 + argparse，不触发网络），
+分别走冷启动子进程和 ``core.skill_warm_pool`` 的 forkserver，记录每个 skill 的
+p50/max 延迟与退出码。两条路径的 stdout 会逐字比较，``same_output`` 为 false 时
+说明 warm 路径改变了 CLI 的输出契约。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return round(ordered[min(rank, len(ordered)) - 1], 2)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=False,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _skill_dirs(only: list[str]) -> list[Path]:
+    root = REPO_ROOT / "extension" / "skills" / "builtin"
+    found = [
+        path.parent.parent
+        for path in sorted(root.glob("*/scripts/execute.py"))
+        if not only or path.parent.parent.name in only
+    ]
+    return found
+
+
+async def _cold(skill_dir: Path, argv: list[str]) -> tuple[float, int, bytes]:
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "scripts/execute.py",
+        *argv,
+        cwd=skill_dir,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await process.communicate()
+    return (time.perf_counter() - started) * 1000.0, int(process.returncode or 0), stdout
+
+
+async def _warm(pool, skill_dir: Path, argv: list[str]) -> tuple[float, int, bytes]:
+    from core.skill_warm_pool import WarmRoute
+
+    route = WarmRoute(
+        script=str(skill_dir / "scripts" / "execute.py"),
+        argv=["scripts/execute.py", *argv],
+        cwd=str(skill_dir),
+    )
+    started = time.perf_counter()
+    process = await pool.spawn(route)
+    stdout, _ = await asyncio.gather(process.stdout.read(), process.stderr.read())
+    code = await process.wait()
+    return (time.perf_counter() - started) * 1000.0, code, stdout
+
+
+async def _run(args: argparse.Namespace) -> dict[str, Any]:
+    from core.skill_warm_pool import SkillWarmPool
+
+    pool = SkillWarmPool(enabled=True)
+    started = time.perf_counter()
+    await pool.start()
+    startup_ms = (time.perf_counter() - started) * 1000.0
+    if not pool.ready:
+        raise SystemExit("skill warm pool failed to start")
+
+    rows: dict[str, Any] = {}
+    try:
+        for skill_dir in _skill_dirs(args.skill):
+            cold_ms: list[float] = []
+            warm_ms: list[float] = []
+            cold_codes: set[int] = set()
+            warm_codes: set[int] = set()
+            same_output = True
+            for _ in range(args.repeat):
+                cold_elapsed, cold_code, cold_out = await _cold(skill_dir, args.argv)
+                warm_elapsed, warm_code, warm_out = await _warm(pool, skill_dir, args.argv)
+                cold_ms.append(cold_elapsed)
+                warm_ms.append(warm_elapsed)
+                cold_codes.add(cold_code)
+                warm_codes.add(warm_code)
+                same_output = same_output and cold_out == warm_out
+            cold_p50 = _percentile(cold_ms, 50)
+            warm_p50 = _percentile(warm_ms, 50)
+            rows[skill_dir.name] = {
+                "cold_p50_ms": cold_p50,
+                "cold_max_ms": round(max(cold_ms), 2),
+                "warm_p50_ms": warm_p50,
+                "warm_max_ms": round(max(warm_ms), 2),
+                "speedup": round(cold_p50 / warm_p50, 2) if warm_p50 else 0.0,
+                "exit_codes": {"cold": sorted(cold_codes), "warm": sorted(warm_codes)},
+                "same_output": same_output,
+            }
+            print(
+                f"{skill_dir.name:<22} cold p50={cold_p50:>8.1f}ms "
+                f"warm p50={warm_p50:>7.1f}ms exit={sorted(cold_codes)}/{sorted(warm_codes)}"
+                f"{'' if same_output else '  OUTPUT DIFFERS'}",
+                flush=True,
+            )
+    finally:
+        await pool.close()
+    return {"pool_startup_ms": round(startup_ms, 2), "skills": rows}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skill", action="append", default=[], help="Only these skills")
+    parser.add_argument(
+        "--argv",
+        nargs="*",
+        default=["--help"],
+        help="Arguments passed to every execute.py (default: --help)",
+    )
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+    args.repeat = max(1, args.repeat)
+
+    results = asyncio.run(_run(args))
+    report = {
+        "meta": {
+            "benchmark": "skill_warm_pool",
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "repeat": args.repeat,
+            "argv": args.argv,
+            "preload": os.getenv("SKILL_WARM_POOL_PRELOAD", ""),
+        },
+        "results": results,
+    }
+    rendered = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(rendered + "\n", encoding="utf-8")
+    print(rendered)
+
+
+if __name__ == "__main__":
+    main()
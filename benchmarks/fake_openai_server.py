@@ -0,0 +1,309 @@
+"""Local OpenAI-compatible ``/v1/chat/completions`` stub for offline benchmarks.
+
+用法::
+
+    python benchmarks/fake_openai_server.py --port 0 --first-token-ms 40 --chunks 8
+
+启动后向 stdout 打印一行 ``LISTENING <port>``。行为：
+
+- 流式（``stream=true``）按 SSE 输出 ``--chunks`` 个文本 chunk，首个 chunk 前等待
+  ``--first-token-ms``，之后每个 chunk 间隔 ``--chunk-ms``；非流式返回完整 JSON。
+- 请求带 ``tools`` 且最后一条 user 消息含 ``[bench:read <path>]`` 标记、
+  并且还没有 tool 结果时，返回一次 ``read`` 的 tool_call。
+- 意图路由请求（提示词里出现 ``request_mode``）返回固定的 chat 路由 JSON。
+- ``--error-rate`` 按比例返回 HTTP 500，用于故障转移/熔断场景。
+
+只依赖标准库，自己实现最小的 HTTP/1.1 keep-alive，方便在任何环境里起一个子进程。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+_READ_MARKER_RE = re.compile(r"\[bench:read\s+([^\]\s]+)\]")
+_ROUTE_REPLY = {
+    "request_mode": "chat",
+    "task_tracking": False,
+    "candidate_skills": [],
+    "reason": "benchmark",
+    "confidence": 0.9,
+}
+
+
+@dataclass
+class StubOptions:
+    first_token_ms: float = 30.0
+    chunk_ms: float = 2.0
+    chunks: int = 8
+    chunk_text: str = "基准测试回复片段。"
+    error_rate: float = 0.0
+    seed: int = 7
+
+
+def _message_text(message: dict[str, Any]) -> str:
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            str(part.get("text") or "") for part in content if isinstance(part, dict)
+        )
+    return ""
+
+
+def _plan_reply(payload: dict[str, Any]) -> dict[str, Any]:
+    """Decide what the stub answers: ``{"text": ...}`` or ``{"tool_call": ...}``."""
+    messages = [item for item in payload.get("messages") or [] if isinstance(item, dict)]
+    if any("request_mode" in _message_text(item) for item in messages[:2]):
+        return {"text": json.dumps(_ROUTE_REPLY)}
+
+    if payload.get("tools") and messages and messages[-1].get("role") != "tool":
+        last_user = next(
+            (item for item in reversed(messages) if item.get("role") == "user"), None
+        )
+        match = _READ_MARKER_RE.search(_message_text(last_user or {}))
+        if match:
+            return {
+                "tool_call": {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "name": "read",
+                    "arguments": json.dumps({"path": match.group(1), "max_lines": 50}),
+                }
+            }
+    return {"text": ""}
+
+
+def _usage(payload: dict[str, Any], completion_chars: int) -> dict[str, int]:
+    prompt_chars = sum(
+        len(_message_text(item))
+        for item in payload.get("messages") or []
+        if isinstance(item, dict)
+    )
+    prompt_tokens = max(1, prompt_chars // 4)
+    completion_tokens = max(1, completion_chars // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+class FakeOpenAIServer:
+    def __init__(self, options: StubOptions) -> None:
+        self.options = options
+        self._random = random.Random(options.seed)
+        self.requests = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers: dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                body = await reader.readexactly(length) if length else b""
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                await self._dispatch(method, path, body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(
+        self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter
+    ) -> None:
+        if method != "POST" or not path.rstrip("/").endswith("/chat/completions"):
+            await self._send_json(writer, 404, {"error": {"message": "not found"}})
+            return
+        self.requests += 1
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            await self._send_json(writer, 400, {"error": {"message": "bad json"}})
+            return
+        if self.options.error_rate and self._random.random() < self.options.error_rate:
+            await self._send_json(
+                writer,
+                500,
+                {"error": {"message": "injected failure", "type": "server_error"}},
+            )
+            return
+
+        plan = _plan_reply(payload)
+        if payload.get("stream"):
+            await self._stream(writer, payload, plan)
+        else:
+            await asyncio.sleep(self.options.first_token_ms / 1000.0)
+            await self._send_json(writer, 200, self._completion(payload, plan))
+
+    def _text_pieces(self, plan: dict[str, Any]) -> list[str]:
+        if plan.get("text"):
+            return [plan["text"]]
+        return [self.options.chunk_text] * max(1, self.options.chunks)
+
+    def _completion(self, payload: dict[str, Any], plan: dict[str, Any]) -> dict[str, Any]:
+        message: dict[str, Any] = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+        completion_chars = 0
+        if plan.get("tool_call"):
+            call = plan["tool_call"]
+            message["tool_calls"] = [
+                {
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": call["arguments"]},
+                }
+            ]
+            finish_reason = "tool_calls"
+            completion_chars = len(call["arguments"])
+        else:
+            message["content"] = "".join(self._text_pieces(plan))
+            completion_chars = len(message["content"])
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:16]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": str(payload.get("model") or "stub"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": _usage(payload, completion_chars),
+        }
+
+    async def _stream(
+        self, writer: asyncio.StreamWriter, payload: dict[str, Any], plan: dict[str, Any]
+    ) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:16]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": str(payload.get("model") or "stub"),
+        }
+        await asyncio.sleep(self.options.first_token_ms / 1000.0)
+
+        if plan.get("tool_call"):
+            call = plan["tool_call"]
+            deltas = [
+                {
+                    "role": "assistant",
+                    "tool_calls": [
+                        {
+                            "index": 0,
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": call["arguments"]},
+                        }
+                    ],
+                }
+            ]
+            finish_reason = "tool_calls"
+            completion_chars = len(call["arguments"])
+        else:
+            pieces = self._text_pieces(plan)
+            deltas = [{"role": "assistant", "content": piece} for piece in pieces]
+            finish_reason = "stop"
+            completion_chars = sum(len(piece) for piece in pieces)
+
+        for index, delta in enumerate(deltas):
+            if index and self.options.chunk_ms:
+                await asyncio.sleep(self.options.chunk_ms / 1000.0)
+            await self._write_event(
+                writer,
+                {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]},
+            )
+        await self._write_event(
+            writer,
+            {
+                **base,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+                "usage": _usage(payload, completion_chars),
+            },
+        )
+        await self._write_chunk(writer, b"data: [DONE]\n\n")
+        await self._write_chunk(writer, b"")
+
+    async def _write_event(self, writer: asyncio.StreamWriter, data: dict[str, Any]) -> None:
+        encoded = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        await self._write_chunk(writer, b"data: " + encoded + b"\n\n")
+
+    @staticmethod
+    async def _write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, data: dict[str, Any]) -> None:
+        encoded = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}.get(status, "Error")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(encoded)}\r\n\r\n".encode("latin-1")
+            + encoded
+        )
+        await writer.drain()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--first-token-ms", type=float, default=StubOptions.first_token_ms)
+    parser.add_argument("--chunk-ms", type=float, default=StubOptions.chunk_ms)
+    parser.add_argument("--chunks", type=int, default=StubOptions.chunks)
+    parser.add_argument("--error-rate", type=float, default=StubOptions.error_rate)
+    parser.add_argument("--seed", type=int, default=StubOptions.seed)
+
+
+def stub_options_from_args(args: argparse.Namespace) -> StubOptions:
+    return StubOptions(
+        first_token_ms=max(0.0, float(args.first_token_ms)),
+        chunk_ms=max(0.0, float(args.chunk_ms)),
+        chunks=max(1, int(args.chunks)),
+        error_rate=min(1.0, max(0.0, float(args.error_rate))),
+        seed=int(args.seed),
+    )
+
+
+async def _serve(host: str, port: int, options: StubOptions) -> None:
+    server = FakeOpenAIServer(options)
+    listener = await asyncio.start_server(server.handle, host, port)
+    bound_port = listener.sockets[0].getsockname()[1]
+    print(f"LISTENING {bound_port}", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port, stub_options_from_args(args)))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
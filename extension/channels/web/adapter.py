@@ -25,11 +25,14 @@ from web_channel.store import (
     load_file_bytes,
     register_artifact_file,
     upsert_session_message,
+    watch_inbound_events,
 )
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_POLL_INTERVAL_SEC = 1.0
+# 有入队唤醒时，超时只用来兜底漏掉的通知（如其它进程写入但 socket 不通）。
+WATCH_SAFETY_TIMEOUT_SEC = 30.0
 
 
 class WebUnifiedContext(UnifiedContext):
@@ -129,11 +132,28 @@ class WebAdapter(BotAdapter):
         self._poll_task = None
 
     async def _poll_loop(self) -> None:
+        try:
+            async with watch_inbound_events() as watcher:
+                await self._consume_inbound(watcher)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # 通知 socket 不可用时退回定时轮询。
+            logger.exception("Web adapter inbox watcher failed, falling back to polling")
+            await self._consume_inbound(None)
+
+    async def _consume_inbound(self, watcher: Any) -> None:
+        """先清唤醒信号再 claim；队列为空时等待入队唤醒，超时兜底再查一次。"""
         while not self._stop_event.is_set():
             try:
+                if watcher is not None:
+                    watcher.clear()
                 claimed = await claim_inbound_events(limit=20)
                 if not claimed:
-                    await asyncio.sleep(self.poll_interval_sec)
+                    if watcher is not None:
+                        await watcher.wait(timeout=WATCH_SAFETY_TIMEOUT_SEC)
+                    else:
+                        await asyncio.sleep(self.poll_interval_sec)
                     continue
                 for event in claimed:
                     await self._process_event(event)
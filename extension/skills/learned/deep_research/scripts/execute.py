@@ -29,8 +29,15 @@ from core.config import get_client_for_model
 from core.model_config import resolve_models_config_path, select_model_for_role
 from services.openai_adapter import generate_text
 from services.web_summary_service import fetch_webpage_content
+from extension.skills.learned.deep_research.scripts.synthesis import (
+    first_finding,
+    map_sources,
+    plan_budget,
+    reduce_notes,
+)
 
 logger = logging.getLogger(__name__)
+MAX_SOURCES = 50
 _WEB_SEARCH_EXECUTE_MODULE = None
 
 
@@ -91,7 +98,7 @@ async def execute(ctx: UnifiedContext, params: dict, runtime=None):
         yield {"text": "❌ 请提供研究主题 (topic)", "ui": {}}
         return
 
-    depth = min(max(1, int(depth)), 10)  # 限制 1-5
+    depth = min(max(1, int(depth)), MAX_SOURCES)
 
     yield f"🧐 正在对 「{topic}」 进行深度研究 (深度: {depth})...\n此过程包含：搜索 -> 爬取网页 -> 深度阅读 -> 综合报告，可能需要 30-60 秒，请耐心等待。"
 
@@ -121,49 +128,92 @@ async def execute(ctx: UnifiedContext, params: dict, runtime=None):
         yield {"text": "❌ 未找到相关搜索结果，研究终止。", "ui": {}}
         return
 
-    # 2. Crawl Phase
-    yield f"🕷️ 正在爬取 {len(search_results)} 个网页..."
+    try:
+        model_to_use = select_model_for_role("primary")
+        if not model_to_use:
+            raise RuntimeError(
+                f"No text model configured in {resolve_models_config_path()}"
+            )
+        async_client = get_client_for_model(model_to_use, is_async=True)
+        if async_client is None:
+            raise RuntimeError("OpenAI async client is not initialized")
+    except Exception as e:
+        logger.error(f"Synthesis failed: {e}")
+        yield {"text": f"❌ 报告生成阶段失败: {e}", "ui": {}}
+        return
+
+    async def _llm(prompt: str) -> str:
+        return str(
+            await generate_text(
+                async_client=async_client,
+                model=model_to_use,
+                contents=prompt,
+            )
+            or ""
+        )
 
-    async def process_url(item):
-        url = item.get("url")
+    budget = plan_budget(model_to_use)
+
+    # 2. Crawl + Map Phase：每个网页抓完就切块提炼要点，边完成边推送。
+    yield f"🕷️ 正在爬取并阅读 {len(search_results)} 个网页..."
+
+    source_notes = []
+    done = 0
+    async for item, notes in map_sources(
+        search_results,
+        fetch=fetch_webpage_content,
+        topic=topic,
+        llm=_llm,
+        budget=budget,
+    ):
+        done += 1
         title = item.get("title", "No Title")
-        try:
-            content = await fetch_webpage_content(url)
-            if content:
-                return {"title": title, "url": url, "content": content}
-        except Exception as e:
-            logger.error(f"Crawl failed for {url}: {e}")
-        return None
-
-    crawled_results = await asyncio.gather(
-        *(process_url(item) for item in search_results)
-    )
-    valid_data = [item for item in crawled_results if item]
+        if notes is None:
+            yield f"⚠️ [{done}/{len(search_results)}] 无法读取：{title}"
+            continue
+        if not notes.notes:
+            yield f"📄 [{done}/{len(search_results)}] {title}：未发现相关内容"
+            continue
+        source_notes.append(notes)
+        yield f"📄 [{done}/{len(search_results)}] {title}：{first_finding(notes)}"
     logger.info(
-        "[deep_research] crawled %s/%s usable pages",
-        len(valid_data),
+        "[deep_research] mapped %s/%s usable pages",
+        len(source_notes),
         len(search_results),
     )
 
-    if not valid_data:
+    if not source_notes:
         yield {
             "text": "❌ 无法读取任何网页内容（可能是因为反爬虫或网络问题），研究终止。",
             "ui": {},
         }
         return
 
-    # 3. Synthesis Phase
-    yield f"🧠 已获取 {len(valid_data)} 份资料，正在综合分析并撰写报告..."
+    # 3. Reduce + Report Phase
+    yield f"🧠 已获取 {len(source_notes)} 份资料，正在合并要点并撰写报告..."
 
-    # Construct Context
-    context_text = f"Research Topic: {topic}\n\nSources Data:\n"
-    for i, data in enumerate(valid_data, 1):
-        context_text += f"\n--- Source {i}: {data['title']} ---\nURL: {data['url']}\nContent:\n{data['content'][:15000]}\n"  # Limit per page to avoid insanity
+    try:
+        merged_notes, levels = await reduce_notes(
+            source_notes,
+            topic=topic,
+            llm=_llm,
+            target_tokens=budget.reduce_target_tokens,
+        )
+        logger.info(
+            "[deep_research] reduced %s sources in %s level(s)",
+            len(source_notes),
+            levels,
+        )
+        sources_text = "\n".join(
+            f"[S{item.index}] {item.title} - {item.url}"
+            for item in sorted(source_notes, key=lambda item: item.index)
+        )
 
-    prompt = f"""
+        prompt = f"""
     You are a Deep Research Analyst. Your task is to write a comprehensive Deep Dive Report on the topic: "{topic}".
     
-    Based ONLY on the provided source materials below, write a detailed, structured, and professional report.
+    Based ONLY on the research notes below, write a detailed, structured, and professional report.
+    Each note is tagged with [S#] pointing to the source list; cite sources with these tags.
     
     Report Structure:
     1. **Executive Summary**: High-level overview of key findings.
@@ -176,25 +226,14 @@ async def execute(ctx: UnifiedContext, params: dict, runtime=None):
     Title the report "Deep Research: {topic}".
     Output ONLY the Markdown content, do NOT wrap it in code fences.
     
-    Source Material:
-    {context_text}
+    Sources:
+    {sources_text}
+    
+    Research Notes:
+    {merged_notes}
     """
 
-    try:
-        model_to_use = select_model_for_role("primary")
-        if not model_to_use:
-            raise RuntimeError(
-                f"No text model configured in {resolve_models_config_path()}"
-            )
-        async_client = get_client_for_model(model_to_use, is_async=True)
-        if async_client is None:
-            raise RuntimeError("OpenAI async client is not initialized")
-        report_md = await generate_text(
-            async_client=async_client,
-            model=model_to_use,
-            contents=prompt,
-        )
-        report_md = str(report_md or "")
+        report_md = await _llm(prompt)
 
         # Strip markdown code fences if AI wrapped them
         import re
@@ -203,14 +242,14 @@ async def execute(ctx: UnifiedContext, params: dict, runtime=None):
         report_md = re.sub(r"\s*```$", "", report_md)
 
         yield {
-            "text": f"🔇🔇🔇【深度研究报告】\n\nSuccess: Deep research report generated for '{topic}' based on {len(valid_data)} sources.",
+            "text": f"🔇🔇🔇【深度研究报告】\n\nSuccess: Deep research report generated for '{topic}' based on {len(source_notes)} sources.",
             "files": {"deep_research_report.md": report_md.encode("utf-8")},
             "ui": {},
         }
         logger.info(
             "[deep_research] report generated for topic=%r with %s sources",
             topic,
-            len(valid_data),
+            len(source_notes),
         )
         return
 
@@ -230,7 +269,7 @@ def _build_parser() -> argparse.ArgumentParser:
         "--depth",
         type=int,
         default=5,
-        help="Research depth/page count, default 5",
+        help=f"Research depth/page count (1-{MAX_SOURCES}), default 5",
     )
     parser.add_argument(
         "--language",
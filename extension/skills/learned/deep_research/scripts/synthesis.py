@@ -0,0 +1,316 @@
+"""Streaming map-reduce synthesis for deep_research.
+
+原先把全部网页（每页截到 15000 字符）拼进一个 prompt 做一次大调用：慢、容易
+贴着上下文窗口上限，而且要等所有网页都抓完才能开始。这里拆成三段：
+
+- map：每个网页抓完立即按段落切块（``chunk_text``），在
+  ``DEEP_RESEARCH_MAP_CONCURRENCY`` 的并发上限内逐块提炼与主题相关的要点；
+  ``map_sources`` 按完成顺序逐个产出，调用方可以边抓边向用户推送阶段性发现；
+- reduce：``reduce_notes`` 把各来源的要点按 token 预算分批合并，超出预算时逐层
+  再合并，直到能放进最终报告的 prompt；要点始终带 ``[S#]`` 来源标记；
+- 预算：``plan_budget`` 按目标模型的 ``contextWindow`` / ``maxTokens`` 推算切块
+  大小和 reduce 目标，来源数增加时只会多几轮合并，不会撑爆上下文窗口。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from core.context_budget import (
+    CONTEXT_BUDGET_OUTPUT_RESERVE_TOKENS,
+    CONTEXT_BUDGET_SAFETY_RATIO,
+    resolve_model_limits,
+)
+from core.token_estimator import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+DEEP_RESEARCH_CRAWL_CONCURRENCY = max(1, _env_int("DEEP_RESEARCH_CRAWL_CONCURRENCY", 6))
+DEEP_RESEARCH_MAP_CONCURRENCY = max(1, _env_int("DEEP_RESEARCH_MAP_CONCURRENCY", 4))
+DEEP_RESEARCH_CHUNK_TOKENS = max(500, _env_int("DEEP_RESEARCH_CHUNK_TOKENS", 6000))
+DEEP_RESEARCH_MAX_CHUNKS_PER_SOURCE = max(
+    1, _env_int("DEEP_RESEARCH_MAX_CHUNKS_PER_SOURCE", 4)
+)
+DEEP_RESEARCH_REDUCE_TARGET_TOKENS = max(
+    1000, _env_int("DEEP_RESEARCH_REDUCE_TARGET_TOKENS", 24000)
+)
+
+# 最终报告 prompt 里除要点以外的部分（说明 + 来源列表）预留的 token。
+_REPORT_PROMPT_OVERHEAD_TOKENS = 2000
+_FALLBACK_EXCERPT_CHARS = 1500
+_MAX_REDUCE_LEVELS = 4
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_NO_FINDINGS = "NONE"
+
+LLMCall = Callable[[str], Awaitable[str]]
+
+
+@dataclass
+class SynthesisBudget:
+    chunk_tokens: int
+    reduce_target_tokens: int
+
+
+@dataclass
+class SourceNotes:
+    index: int
+    title: str
+    url: str
+    notes: str
+    chunks: int = 0
+    elapsed_ms: float = 0.0
+
+    def render(self) -> str:
+        return f"[S{self.index}] {self.title}\n{self.notes}"
+
+
+def plan_budget(model_key: str) -> SynthesisBudget:
+    context_window, max_tokens = resolve_model_limits(model_key)
+    reserve = min(max_tokens, CONTEXT_BUDGET_OUTPUT_RESERVE_TOKENS)
+    input_budget = max(
+        2000, int(context_window * CONTEXT_BUDGET_SAFETY_RATIO) - reserve
+    )
+    usable = max(1000, input_budget - _REPORT_PROMPT_OVERHEAD_TOKENS)
+    return SynthesisBudget(
+        chunk_tokens=min(DEEP_RESEARCH_CHUNK_TOKENS, max(500, usable // 2)),
+        reduce_target_tokens=min(DEEP_RESEARCH_REDUCE_TARGET_TOKENS, usable),
+    )
+
+
+def _split_by_tokens(text: str, max_tokens: int) -> List[str]:
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return [text]
+    step = max(1, int(len(text) * max_tokens / tokens))
+    return [text[idx : idx + step] for idx in range(0, len(text), step)]
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """按段落切块，每块不超过 ``max_tokens``；超长段落按字符比例硬切。"""
+    text = str(text or "").strip()
+    if not text:
+        return []
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = estimate_tokens(paragraph)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        if tokens > max_tokens:
+            chunks.extend(_split_by_tokens(paragraph, max_tokens))
+            continue
+        current.append(paragraph)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _map_prompt(topic: str, title: str, chunk: str, part: int, parts: int) -> str:
+    return (
+        f'You are extracting research notes for the topic: "{topic}".\n'
+        f"Source: {title} (part {part}/{parts})\n\n"
+        "List the facts, figures, dates, claims and opinions in the text below that are "
+        "relevant to the topic, as concise Markdown bullet points. Keep concrete numbers "
+        "and names. Do not add information that is not in the text. "
+        f"If nothing is relevant, output exactly {_NO_FINDINGS}.\n\n"
+        f"Text:\n{chunk}"
+    )
+
+
+def _reduce_prompt(topic: str, blocks: List[str], limit_chars: int) -> str:
+    joined = "\n\n".join(blocks)
+    return (
+        f'You are consolidating research notes for the topic: "{topic}".\n\n'
+        "Merge the notes below into one deduplicated set of Markdown bullet points, "
+        "grouped by theme. Keep every concrete fact, number and date, and keep points "
+        "where sources disagree. Every bullet must keep the [S#] tags of the sources "
+        f"it came from. Keep the result under about {limit_chars} characters.\n\n"
+        f"Notes:\n{joined}"
+    )
+
+
+async def _summarize_source(
+    index: int,
+    item: Dict[str, Any],
+    content: str,
+    *,
+    topic: str,
+    llm: LLMCall,
+    budget: SynthesisBudget,
+    map_slots: asyncio.Semaphore,
+) -> SourceNotes:
+    started = time.perf_counter()
+    title = str(item.get("title") or "No Title")
+    chunks = chunk_text(content, budget.chunk_tokens)[:DEEP_RESEARCH_MAX_CHUNKS_PER_SOURCE]
+
+    async def _map_chunk(part: int, chunk: str) -> str | None:
+        async with map_slots:
+            try:
+                return str(
+                    await llm(_map_prompt(topic, title, chunk, part, len(chunks))) or ""
+                ).strip()
+            except Exception as exc:
+                logger.warning("[deep_research] map failed for %s: %s", item.get("url"), exc)
+                return None
+
+    results = await asyncio.gather(
+        *(_map_chunk(part, chunk) for part, chunk in enumerate(chunks, 1))
+    )
+    findings = [
+        text for text in results if text and text.strip().upper() != _NO_FINDINGS
+    ]
+    if all(text is None for text in results):
+        # 模型调用全部失败时保留一段原文摘录，让该来源仍能参与合并。
+        findings = [content.strip()[:_FALLBACK_EXCERPT_CHARS]]
+    return SourceNotes(
+        index=index,
+        title=title,
+        url=str(item.get("url") or ""),
+        notes="\n".join(findings),
+        chunks=len(chunks),
+        elapsed_ms=round((time.perf_counter() - started) * 1000.0, 1),
+    )
+
+
+async def map_sources(
+    items: List[Dict[str, Any]],
+    *,
+    fetch: Callable[[str], Awaitable[str | None]],
+    topic: str,
+    llm: LLMCall,
+    budget: SynthesisBudget,
+) -> AsyncIterator[Tuple[Dict[str, Any], SourceNotes | None]]:
+    """抓取并提炼每个来源，按完成顺序产出 ``(item, notes)``；抓取失败时 notes 为 None。"""
+    crawl_slots = asyncio.Semaphore(DEEP_RESEARCH_CRAWL_CONCURRENCY)
+    map_slots = asyncio.Semaphore(DEEP_RESEARCH_MAP_CONCURRENCY)
+
+    async def _process(index: int, item: Dict[str, Any]):
+        url = str(item.get("url") or "")
+        async with crawl_slots:
+            try:
+                content = await fetch(url)
+            except Exception as exc:
+                logger.error("Crawl failed for %s: %s", url, exc)
+                content = None
+        if not content:
+            return item, None
+        notes = await _summarize_source(
+            index,
+            item,
+            content,
+            topic=topic,
+            llm=llm,
+            budget=budget,
+            map_slots=map_slots,
+        )
+        return item, notes
+
+    tasks = [
+        asyncio.create_task(_process(index, item))
+        for index, item in enumerate(items, 1)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _pack(blocks: List[str], target_tokens: int) -> List[List[str]]:
+    batches: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for block in blocks:
+        tokens = estimate_tokens(block)
+        if current and current_tokens + tokens > target_tokens:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _truncate_blocks(blocks: List[str], target_tokens: int) -> List[str]:
+    total = sum(estimate_tokens(block) for block in blocks)
+    if total <= target_tokens:
+        return blocks
+    ratio = target_tokens / total
+    return [block[: max(1, int(len(block) * ratio))] for block in blocks]
+
+
+async def reduce_notes(
+    notes: List[SourceNotes],
+    *,
+    topic: str,
+    llm: LLMCall,
+    target_tokens: int,
+    concurrency: int = DEEP_RESEARCH_MAP_CONCURRENCY,
+) -> Tuple[str, int]:
+    """把各来源要点合并到 ``target_tokens`` 以内，返回 ``(合并结果, 合并层数)``。"""
+    blocks = [item.render() for item in sorted(notes, key=lambda item: item.index)]
+    slots = asyncio.Semaphore(max(1, concurrency))
+    levels = 0
+
+    while levels < _MAX_REDUCE_LEVELS:
+        total = sum(estimate_tokens(block) for block in blocks)
+        if total <= target_tokens:
+            break
+        batches = _pack(blocks, target_tokens)
+        # 每批的输出份额按批数均分，下一层才放得进目标预算。
+        limit_chars = max(800, (target_tokens // len(batches)) * 3)
+
+        async def _merge(batch: List[str]) -> str:
+            if len(batch) == 1 and estimate_tokens(batch[0]) * 3 <= limit_chars:
+                return batch[0]
+            async with slots:
+                try:
+                    merged = str(
+                        await llm(_reduce_prompt(topic, batch, limit_chars)) or ""
+                    ).strip()
+                except Exception as exc:
+                    logger.warning("[deep_research] reduce failed: %s", exc)
+                    merged = ""
+            return merged or "\n\n".join(_truncate_blocks(batch, limit_chars // 3))
+
+        merged_blocks = list(await asyncio.gather(*(_merge(batch) for batch in batches)))
+        levels += 1
+        if sum(estimate_tokens(block) for block in merged_blocks) >= total:
+            # 合并没有带来收缩时直接按比例截断，避免无限循环。
+            blocks = _truncate_blocks(merged_blocks, target_tokens)
+            break
+        blocks = merged_blocks
+
+    return "\n\n".join(_truncate_blocks(blocks, target_tokens)), levels
+
+
+def first_finding(notes: SourceNotes, *, max_chars: int = 160) -> str:
+    for line in notes.notes.splitlines():
+        line = line.strip().lstrip("-*• ").strip()
+        if line:
+            return line if len(line) <= max_chars else line[:max_chars] + "..."
+    return ""
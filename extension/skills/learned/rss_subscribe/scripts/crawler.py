@@ -0,0 +1,441 @@
+"""Concurrent fetch / parse / summarize stages for RSS subscriptions.
+
+``crawl_feeds`` 共享一个 ``httpx.AsyncClient``，在全局与按 host 的信号量下并发
+拉取所有 feed，并按 ``rss_feed_state`` 表中的 ETag / Last-Modified 发条件请求；
+响应交给有界线程池里的 ``feedparser.parse``，条目归一成可 JSON 序列化的 dict
+（hash、链接、正文）后连同校验头写回状态表。之后收到 304 时直接复用缓存的
+条目；投递进度仍由订阅行的 ``last_entry_hash`` 决定，所以投递失败不会因为
+304 丢更新。
+
+``summarize_entries`` 把所有 feed 的新条目汇总后，在有界并发下生成摘要。
+每轮的抓取耗时、304 比例与摘要耗时记录在 ``CrawlStats``。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Awaitable, Callable, Iterator
+from urllib.parse import urlsplit
+
+import feedparser
+import httpx
+
+from core.app_paths import data_dir
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+RSS_FETCH_CONCURRENCY = max(1, _env_int("RSS_FETCH_CONCURRENCY", 16))
+RSS_FETCH_PER_HOST = max(1, _env_int("RSS_FETCH_PER_HOST", 2))
+RSS_PARSE_WORKERS = max(1, _env_int("RSS_PARSE_WORKERS", 4))
+RSS_SUMMARY_CONCURRENCY = max(1, _env_int("RSS_SUMMARY_CONCURRENCY", 4))
+FETCH_TIMEOUT_SEC = 20.0
+MAX_CACHED_ENTRIES = 30
+
+_STATE_TABLE = "rss_feed_state"
+_parse_executor: ThreadPoolExecutor | None = None
+
+
+def _get_parse_executor() -> ThreadPoolExecutor:
+    global _parse_executor
+    if _parse_executor is None:
+        _parse_executor = ThreadPoolExecutor(
+            max_workers=RSS_PARSE_WORKERS, thread_name_prefix="rss-parse"
+        )
+    return _parse_executor
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return round(ordered[min(rank, len(ordered)) - 1], 1)
+
+
+# ---------------------------------------------------------------------------
+# Feed state
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class FeedState:
+    feed_url: str
+    etag: str = ""
+    last_modified: str = ""
+    feed_title: str = ""
+    entries: list[dict[str, str]] = field(default_factory=list)
+    last_status: int = 0
+    last_fetch_ms: float = 0.0
+    checked_at: str = ""
+
+
+class FeedStateStore:
+    """Per-feed conditional GET state and cached entries in ``bot_data.db``."""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._ready_dbs: set[str] = set()
+
+    def _db_path(self) -> Path:
+        return (data_dir() / "bot_data.db").resolve()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db_path = self._db_path()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            self._ensure_db(conn, str(db_path))
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_db(self, conn: sqlite3.Connection, key: str) -> None:
+        if key in self._ready_dbs:
+            return
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {_STATE_TABLE} (
+                feed_url TEXT PRIMARY KEY,
+                etag TEXT NOT NULL DEFAULT '',
+                last_modified TEXT NOT NULL DEFAULT '',
+                feed_title TEXT NOT NULL DEFAULT '',
+                entries_json TEXT NOT NULL DEFAULT '[]',
+                last_status INTEGER NOT NULL DEFAULT 0,
+                last_fetch_ms REAL NOT NULL DEFAULT 0,
+                checked_at TEXT NOT NULL DEFAULT ''
+            )
+            """
+        )
+        conn.commit()
+        self._ready_dbs.add(key)
+
+    def load_many(self, feed_urls: list[str]) -> dict[str, FeedState]:
+        if not feed_urls:
+            return {}
+        states: dict[str, FeedState] = {}
+        with self._connect() as conn:
+            for offset in range(0, len(feed_urls), 500):
+                chunk = feed_urls[offset : offset + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                rows = conn.execute(
+                    f"SELECT * FROM {_STATE_TABLE} WHERE feed_url IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for row in rows:
+                    try:
+                        entries = json.loads(row["entries_json"] or "[]")
+                    except ValueError:
+                        entries = []
+                    states[str(row["feed_url"])] = FeedState(
+                        feed_url=str(row["feed_url"]),
+                        etag=str(row["etag"] or ""),
+                        last_modified=str(row["last_modified"] or ""),
+                        feed_title=str(row["feed_title"] or ""),
+                        entries=list(entries) if isinstance(entries, list) else [],
+                        last_status=int(row["last_status"] or 0),
+                        last_fetch_ms=float(row["last_fetch_ms"] or 0.0),
+                        checked_at=str(row["checked_at"] or ""),
+                    )
+        return states
+
+    def save_many(self, states: list[FeedState]) -> None:
+        if not states:
+            return
+        rows = [
+            (
+                state.feed_url,
+                state.etag,
+                state.last_modified,
+                state.feed_title,
+                json.dumps(state.entries, ensure_ascii=False),
+                int(state.last_status),
+                float(state.last_fetch_ms),
+                state.checked_at,
+            )
+            for state in states
+        ]
+        with self._lock:
+            with self._connect() as conn:
+                conn.executemany(
+                    f"""
+                    INSERT INTO {_STATE_TABLE} (
+                        feed_url, etag, last_modified, feed_title, entries_json,
+                        last_status, last_fetch_ms, checked_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(feed_url) DO UPDATE SET
+                        etag = excluded.etag,
+                        last_modified = excluded.last_modified,
+                        feed_title = excluded.feed_title,
+                        entries_json = excluded.entries_json,
+                        last_status = excluded.last_status,
+                        last_fetch_ms = excluded.last_fetch_ms,
+                        checked_at = excluded.checked_at
+                    """,
+                    rows,
+                )
+
+
+feed_state_store = FeedStateStore()
+
+
+# ---------------------------------------------------------------------------
+# Stats
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class CrawlStats:
+    feeds: int = 0
+    fetched: int = 0
+    not_modified: int = 0
+    errors: int = 0
+    parse_errors: int = 0
+    new_entries: int = 0
+    summaries: int = 0
+    fetch_ms: list[float] = field(default_factory=list)
+    summary_ms: list[float] = field(default_factory=list)
+    total_ms: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        payload = asdict(self)
+        payload.pop("fetch_ms")
+        payload.pop("summary_ms")
+        requests = self.fetched + self.not_modified
+        payload.update(
+            {
+                "not_modified_ratio": (
+                    round(self.not_modified / requests, 3) if requests else 0.0
+                ),
+                "fetch_p50_ms": _percentile(self.fetch_ms, 50),
+                "fetch_p95_ms": _percentile(self.fetch_ms, 95),
+                "summary_p50_ms": _percentile(self.summary_ms, 50),
+                "summary_p95_ms": _percentile(self.summary_ms, 95),
+                "total_ms": round(self.total_ms, 1),
+            }
+        )
+        return payload
+
+
+last_crawl_stats: dict[str, Any] = {}
+
+
+def record_crawl_stats(stats: CrawlStats) -> dict[str, Any]:
+    payload = stats.to_dict()
+    payload["finished_at"] = datetime.now().astimezone().isoformat(timespec="seconds")
+    last_crawl_stats.clear()
+    last_crawl_stats.update(payload)
+    logger.info(
+        "RSS crawl: feeds=%s fetched=%s 304=%s(%.0f%%) errors=%s new=%s "
+        "fetch_p50=%sms summary_p50=%sms total=%sms",
+        payload["feeds"],
+        payload["fetched"],
+        payload["not_modified"],
+        payload["not_modified_ratio"] * 100,
+        payload["errors"],
+        payload["new_entries"],
+        payload["fetch_p50_ms"],
+        payload["summary_p50_ms"],
+        payload["total_ms"],
+    )
+    return payload
+
+
+# ---------------------------------------------------------------------------
+# Fetch + parse
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class FeedResult:
+    feed_url: str
+    status: int = 0
+    feed_title: str = ""
+    entries: list[dict[str, str]] = field(default_factory=list)
+    etag: str = ""
+    last_modified: str = ""
+    error: str = ""
+
+
+def _host(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+def _parse_payload(
+    content: bytes,
+    feed_url: str,
+    normalize_entry: Callable[[Any, str], dict[str, str]],
+) -> tuple[str, list[dict[str, str]], str, str]:
+    feed = feedparser.parse(content)
+    if getattr(feed, "bozo", False) and getattr(feed, "bozo_exception", None):
+        logger.warning("Feed bozo %s: %s", feed_url, feed.bozo_exception)
+    entries = [
+        normalize_entry(entry, feed_url)
+        for entry in list(getattr(feed, "entries", None) or [])[:MAX_CACHED_ENTRIES]
+    ]
+    feed_title = str((getattr(feed, "feed", None) or {}).get("title") or "")
+    return (
+        feed_title,
+        entries,
+        str(getattr(feed, "etag", "") or ""),
+        str(getattr(feed, "modified", "") or ""),
+    )
+
+
+async def crawl_feeds(
+    feed_urls: list[str],
+    *,
+    normalize_entry: Callable[[Any, str], dict[str, str]],
+    stats: CrawlStats,
+) -> dict[str, FeedResult]:
+    """Fetch and parse every feed concurrently; returns results keyed by URL.
+
+    ``status`` 为 200 表示本轮拿到新内容，304 表示复用缓存条目，0 表示失败。
+    """
+    stats.feeds = len(feed_urls)
+    states = await asyncio.to_thread(feed_state_store.load_many, feed_urls)
+    global_limit = asyncio.Semaphore(RSS_FETCH_CONCURRENCY)
+    host_limits: dict[str, asyncio.Semaphore] = {}
+    loop = asyncio.get_running_loop()
+    results: dict[str, FeedResult] = {}
+    updated_states: list[FeedState] = []
+
+    async def _one(client: httpx.AsyncClient, url: str) -> None:
+        state = states.get(url) or FeedState(feed_url=url)
+        headers: dict[str, str] = {}
+        # 只有缓存了条目才能消化 304，否则发无条件请求。
+        if state.entries and state.etag:
+            headers["If-None-Match"] = state.etag
+        if state.entries and state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+
+        host_limit = host_limits.setdefault(
+            _host(url), asyncio.Semaphore(RSS_FETCH_PER_HOST)
+        )
+        started = time.perf_counter()
+        try:
+            async with global_limit, host_limit:
+                response = await client.get(url, headers=headers)
+            elapsed = (time.perf_counter() - started) * 1000.0
+            stats.fetch_ms.append(elapsed)
+            if response.status_code == 304 and state.entries:
+                stats.not_modified += 1
+                results[url] = FeedResult(
+                    feed_url=url,
+                    status=304,
+                    feed_title=state.feed_title,
+                    entries=state.entries,
+                    etag=state.etag,
+                    last_modified=state.last_modified,
+                )
+                state.last_status = 304
+                state.last_fetch_ms = elapsed
+                state.checked_at = datetime.now().astimezone().isoformat(
+                    timespec="seconds"
+                )
+                updated_states.append(state)
+                return
+            response.raise_for_status()
+        except Exception as exc:
+            stats.errors += 1
+            logger.error("Network error checking feed %s: %s", url, exc)
+            results[url] = FeedResult(feed_url=url, error=str(exc))
+            return
+
+        stats.fetched += 1
+        try:
+            feed_title, entries, feed_etag, feed_modified = await loop.run_in_executor(
+                _get_parse_executor(),
+                _parse_payload,
+                response.content,
+                url,
+                normalize_entry,
+            )
+        except Exception as exc:
+            stats.parse_errors += 1
+            logger.error("Failed to parse feed %s: %s", url, exc)
+            results[url] = FeedResult(feed_url=url, error=str(exc))
+            return
+
+        result = FeedResult(
+            feed_url=url,
+            status=200,
+            feed_title=feed_title,
+            entries=entries,
+            etag=str(response.headers.get("etag") or feed_etag or ""),
+            last_modified=str(
+                response.headers.get("last-modified") or feed_modified or ""
+            ),
+        )
+        results[url] = result
+        updated_states.append(
+            FeedState(
+                feed_url=url,
+                etag=result.etag,
+                last_modified=result.last_modified,
+                feed_title=feed_title,
+                entries=entries,
+                last_status=200,
+                last_fetch_ms=elapsed,
+                checked_at=datetime.now().astimezone().isoformat(timespec="seconds"),
+            )
+        )
+
+    limits = httpx.Limits(
+        max_connections=RSS_FETCH_CONCURRENCY,
+        max_keepalive_connections=RSS_FETCH_CONCURRENCY,
+    )
+    async with httpx.AsyncClient(
+        timeout=FETCH_TIMEOUT_SEC, follow_redirects=True, limits=limits
+    ) as client:
+        await asyncio.gather(*(_one(client, url) for url in feed_urls))
+
+    try:
+        await asyncio.to_thread(feed_state_store.save_many, updated_states)
+    except Exception as exc:
+        logger.error("Failed to persist RSS feed state: %s", exc)
+    return results
+
+
+async def summarize_entries(
+    jobs: list[tuple[str, str, str]],
+    summarize: Callable[[str, str, str], Awaitable[str]],
+    *,
+    stats: CrawlStats,
+) -> list[str]:
+    """Summarize ``(title, content, link)`` jobs with bounded concurrency, in order."""
+    limit = asyncio.Semaphore(RSS_SUMMARY_CONCURRENCY)
+
+    async def _one(title: str, content: str, link: str) -> str:
+        if not content:
+            return "暂无摘要"
+        async with limit:
+            started = time.perf_counter()
+            try:
+                return await summarize(title, content, link)
+            finally:
+                stats.summary_ms.append((time.perf_counter() - started) * 1000.0)
+                stats.summaries += 1
+
+    return list(await asyncio.gather(*(_one(*job) for job in jobs)))
@@ -10,6 +10,7 @@ import html
 import logging
 import re
 import sys
+import time
 from pathlib import Path
 
 REPO_ROOT = Path(__file__).resolve().parents[5]
@@ -41,7 +42,13 @@ from extension.skills.learned.rss_subscribe.scripts.store import (
     list_feed_subscriptions,
     list_subscriptions,
     set_rss_delivery_target,
-    update_feed_subscription_state,
+    update_feed_subscription_states,
+)
+from extension.skills.learned.rss_subscribe.scripts.crawler import (
+    CrawlStats,
+    crawl_feeds,
+    record_crawl_stats,
+    summarize_entries,
 )
 from core.state_paths import SINGLE_USER_SCOPE
 from stats import increment_stat
@@ -49,6 +56,8 @@ from stats import increment_stat
 logger = logging.getLogger(__name__)
 RSS_MENU_NS = "rssm"
 FEED_CHECK_INTERVAL_SEC = 30 * 60
+# 修改摘要 prompt 时同步递增，旧缓存会自然失效。
+RSS_SUMMARY_PROMPT_VERSION = "rss-entry-v1"
 _rss_check_lock = asyncio.Lock()
 
 
@@ -342,6 +351,7 @@ async def generate_entry_summary(title: str, content: str, link: str) -> str:
     from core.config import get_client_for_model
     from core.llm_usage_store import llm_usage_session
     from core.model_config import select_model_for_role
+    from core.summary_cache import summary_cache
     from services.openai_adapter import generate_text
 
     if len(content) > 2000:
@@ -357,8 +367,7 @@ async def generate_entry_summary(title: str, content: str, link: str) -> str:
         f"**内容**：{content}"
     )
 
-    try:
-        model_to_use = select_model_for_role("primary")
+    async def _generate() -> str:
         client_to_use = get_client_for_model(model_to_use, is_async=True)
         if client_to_use is None:
             raise RuntimeError("OpenAI async client is not initialized")
@@ -369,6 +378,17 @@ async def generate_entry_summary(title: str, content: str, link: str) -> str:
                 contents=prompt,
             )
         return str(summary or "").strip()
+
+    try:
+        model_to_use = select_model_for_role("primary")
+        # 同一条目常出现在多个订阅里，按内容寻址复用摘要；失败时的降级文本不入缓存。
+        return await summary_cache.get_or_compute(
+            "rss_entry",
+            f"{title}\n\n{content}",
+            model=model_to_use,
+            prompt_version=RSS_SUMMARY_PROMPT_VERSION,
+            compute=_generate,
+        )
     except Exception as exc:
         logger.error("AI summary generation failed: %s", exc)
         return content[:200] + "..." if len(content) > 200 else content
@@ -480,6 +500,59 @@ def _split_message_batches(
     return batches
 
 
+def _normalize_entry(entry: object, feed_url: str) -> dict[str, str]:
+    """Reduce a feedparser entry to the JSON-friendly fields the crawler caches."""
+    title = str(
+        getattr(entry, "get", lambda *_: "")("title", "无标题") or "无标题"
+    )
+    content_field = ""
+    if hasattr(entry, "summary"):
+        content_field = str(entry.summary or "")
+    elif hasattr(entry, "content") and entry.content:
+        content_field = str(entry.content[0].get("value", "") or "")
+    elif hasattr(entry, "description"):
+        content_field = str(entry.description or "")
+    return {
+        "hash": _get_entry_hash(entry, feed_url),
+        "legacy_id": str(getattr(entry, "id", getattr(entry, "link", None)) or ""),
+        "title": title,
+        "link": _resolve_entry_link(entry, fallback_url=feed_url),
+        "content": re.sub(r"<[^>]+>", "", content_field).strip(),
+    }
+
+
+def _select_new_entries(
+    entries: list[dict[str, str]], last_entry_hash: str
+) -> list[dict[str, str]]:
+    last_hashes = [
+        token.strip() for token in str(last_entry_hash or "").split(",") if token.strip()
+    ]
+    if not last_hashes:
+        return entries[:1]
+    selected: list[dict[str, str]] = []
+    for entry in entries:
+        entry_id = entry.get("hash") or ""
+        legacy_id = entry.get("legacy_id") or ""
+        if len(last_hashes) == 1 and (
+            entry_id in last_hashes or legacy_id in last_hashes
+        ):
+            break
+        if (entry_id and entry_id not in last_hashes) and legacy_id not in last_hashes:
+            selected.append(entry)
+        if len(selected) >= 3:
+            break
+    return selected
+
+
+def _entry_hash_marker(entries: list[dict[str, str]]) -> str:
+    current_ids: list[str] = []
+    for entry in entries[:20]:
+        for token in (entry.get("hash") or "", entry.get("legacy_id") or ""):
+            if token and token not in current_ids:
+                current_ids.append(token)
+    return ",".join(current_ids[:30])
+
+
 async def _fetch_feed_updates(
     *,
     user_id: int | str | None = None,
@@ -497,6 +570,8 @@ async def _fetch_feed_updates(
     if not subscriptions:
         return "", [], {}
 
+    started = time.perf_counter()
+    stats = CrawlStats()
     rss_delivery_target = await get_rss_delivery_target(SINGLE_USER_SCOPE)
     feed_map: dict[str, list[dict[str, object]]] = {}
     for sub in subscriptions:
@@ -504,151 +579,78 @@ async def _fetch_feed_updates(
         if url:
             feed_map.setdefault(url, []).append(sub)
 
-    user_updates: dict[tuple[str, str], list[dict[str, object]]] = {}
-    pending_updates: list[dict[str, object]] = []
-    loop = asyncio.get_running_loop()
-
-    async with httpx.AsyncClient(timeout=20.0, follow_redirects=True) as client:
-        for url, subs in feed_map.items():
-            request_headers: dict[str, str] = {}
-            first_sub = subs[0]
-            if str(first_sub.get("last_etag") or "").strip():
-                request_headers["If-None-Match"] = str(first_sub.get("last_etag") or "")
-            if str(first_sub.get("last_modified") or "").strip():
-                request_headers["If-Modified-Since"] = str(
-                    first_sub.get("last_modified") or ""
-                )
-
-            try:
-                response = await client.get(url, headers=request_headers)
-                if response.status_code == 304:
-                    continue
-                response.raise_for_status()
-            except Exception as exc:
-                logger.error("Network error checking feed %s: %s", url, exc)
-                continue
-
-            try:
-                feed = await loop.run_in_executor(None, feedparser.parse, response.content)
-            except Exception as exc:
-                logger.error("Failed to parse feed %s: %s", url, exc)
-                continue
-
-            if getattr(feed, "bozo", False) and getattr(feed, "bozo_exception", None):
-                logger.warning("Feed bozo %s: %s", url, feed.bozo_exception)
-            if not getattr(feed, "entries", None):
-                continue
+    results = await crawl_feeds(
+        list(feed_map), normalize_entry=_normalize_entry, stats=stats
+    )
 
-            current_ids: list[str] = []
-            for entry in list(feed.entries)[:20]:
-                entry_id = _get_entry_hash(entry, url)
-                legacy_id = str(getattr(entry, "id", getattr(entry, "link", None)) or "")
-                if entry_id and entry_id not in current_ids:
-                    current_ids.append(entry_id)
-                if legacy_id and legacy_id not in current_ids:
-                    current_ids.append(legacy_id)
-            new_hash_str = ",".join(current_ids[:30])
-            response_etag = str(
-                response.headers.get("etag") or getattr(feed, "etag", "") or ""
-            )
-            response_modified = str(
-                response.headers.get("last-modified")
-                or getattr(feed, "modified", "")
-                or ""
-            )
+    # 先收集所有 feed 的新条目，再统一进入有界并发的摘要阶段。
+    pending: list[tuple[dict[str, object], object, dict[str, str]]] = []
+    for url, subs in feed_map.items():
+        result = results.get(url)
+        if result is None or not result.status or not result.entries:
+            continue
+        for sub in subs:
+            for entry in _select_new_entries(
+                result.entries, str(sub.get("last_entry_hash") or "")
+            ):
+                pending.append((sub, result, entry))
+    stats.new_entries = len(pending)
+
+    summaries = await summarize_entries(
+        [
+            (entry["title"], entry["content"], entry["link"])
+            for _, _, entry in pending
+        ],
+        generate_entry_summary,
+        stats=stats,
+    )
 
-            for sub in subs:
-                last_hashes = [
-                    token.strip()
-                    for token in str(sub.get("last_entry_hash") or "").split(",")
-                    if token.strip()
-                ]
-                entries_to_push: list[object] = []
-                if not last_hashes:
-                    if feed.entries:
-                        entries_to_push.append(feed.entries[0])
-                else:
-                    for entry in feed.entries:
-                        entry_id = _get_entry_hash(entry, url)
-                        legacy_id = str(
-                            getattr(entry, "id", getattr(entry, "link", None)) or ""
-                        )
-                        if len(last_hashes) == 1 and (
-                            entry_id in last_hashes or legacy_id in last_hashes
-                        ):
-                            break
-                        if (
-                            entry_id and entry_id not in last_hashes
-                        ) and legacy_id not in last_hashes:
-                            entries_to_push.append(entry)
-                        if len(entries_to_push) >= 3:
-                            break
-
-                for latest_entry in entries_to_push:
-                    title = str(
-                        getattr(latest_entry, "get", lambda *_: "")("title", "无标题")
-                        or "无标题"
-                    )
-                    link = _resolve_entry_link(latest_entry, fallback_url=url)
-                    feed_title = str(
-                        feed.feed.get("title", sub.get("title") or "RSS 订阅")
-                    )
-
-                    content_field = ""
-                    if hasattr(latest_entry, "summary"):
-                        content_field = str(latest_entry.summary or "")
-                    elif hasattr(latest_entry, "content") and latest_entry.content:
-                        content_field = str(latest_entry.content[0].get("value", "") or "")
-                    elif hasattr(latest_entry, "description"):
-                        content_field = str(latest_entry.description or "")
-
-                    content_clean = re.sub(r"<[^>]+>", "", content_field).strip()
-                    summary = (
-                        await generate_entry_summary(title, content_clean, link)
-                        if content_clean
-                        else "暂无摘要"
-                    )
-
-                    uid = SINGLE_USER_SCOPE
-                    binding_platform = str(
-                        rss_delivery_target.get("platform")
-                        or sub.get("platform")
-                        or "telegram"
-                    )
-                    binding_chat_id = str(
-                        rss_delivery_target.get("chat_id")
-                        or sub.get("chat_id")
-                        or sub.get("platform_user_id")
-                        or ""
-                    ).strip()
-                    platform = binding_platform
-                    key = (platform, uid)
-                    user_updates.setdefault(key, []).append(
-                        {
-                            "subscription_id": int(sub.get("id") or 0),
-                            "user_id": uid,
-                            "platform": platform,
-                            "feed_title": feed_title,
-                            "title": title,
-                            "summary": summary,
-                            "link": link,
-                            "last_entry_hash": new_hash_str,
-                            "last_etag": response_etag,
-                            "last_modified": response_modified,
-                            **(
-                                {
-                                    "resource_binding": {
-                                        "platform": binding_platform,
-                                        "owner_user_id": uid,
-                                        "chat_id": binding_chat_id,
-                                    }
-                                }
-                                if binding_chat_id
-                                else {}
-                            ),
+    user_updates: dict[tuple[str, str], list[dict[str, object]]] = {}
+    pending_updates: list[dict[str, object]] = []
+    for (sub, result, entry), summary in zip(pending, summaries):
+        uid = SINGLE_USER_SCOPE
+        binding_platform = str(
+            rss_delivery_target.get("platform") or sub.get("platform") or "telegram"
+        )
+        binding_chat_id = str(
+            rss_delivery_target.get("chat_id")
+            or sub.get("chat_id")
+            or sub.get("platform_user_id")
+            or ""
+        ).strip()
+        platform = binding_platform
+        key = (platform, uid)
+        user_updates.setdefault(key, []).append(
+            {
+                "subscription_id": int(sub.get("id") or 0),
+                "user_id": uid,
+                "platform": platform,
+                "feed_title": str(
+                    result.feed_title or sub.get("title") or "RSS 订阅"
+                ),
+                "title": entry["title"],
+                "summary": summary,
+                "link": entry["link"],
+                "last_entry_hash": _entry_hash_marker(result.entries),
+                "last_etag": result.etag,
+                "last_modified": result.last_modified,
+                **(
+                    {
+                        "resource_binding": {
+                            "platform": binding_platform,
+                            "owner_user_id": uid,
+                            "chat_id": binding_chat_id,
                         }
-                    )
-                    pending_updates.append(user_updates[key][-1])
+                    }
+                    if binding_chat_id
+                    else {}
+                ),
+            }
+        )
+        pending_updates.append(user_updates[key][-1])
+
+    stats.total_ms = (time.perf_counter() - started) * 1000.0
+    record_crawl_stats(stats)
 
     formatted = ""
     if user_id is not None:
@@ -665,26 +667,27 @@ async def _fetch_feed_updates(
 
 
 async def _mark_feed_updates_as_read(pending_updates: list[dict[str, object]]) -> None:
-    seen: set[int] = set()
+    states: dict[int, dict[str, str]] = {}
     for update in pending_updates:
         sub_id = int(update.get("subscription_id") or 0)
-        if sub_id <= 0 or sub_id in seen:
+        if sub_id <= 0 or sub_id in states:
             continue
-        seen.add(sub_id)
-        try:
-            await update_feed_subscription_state(
-                SINGLE_USER_SCOPE,
-                sub_id,
-                last_entry_hash=str(update.get("last_entry_hash") or ""),
-                last_etag=str(update.get("last_etag") or ""),
-                last_modified=str(update.get("last_modified") or ""),
-            )
-        except Exception as exc:
-            logger.error(
-                "Failed to update feed subscription state for %s: %s",
-                sub_id,
-                exc,
-            )
+        states[sub_id] = {
+            "last_entry_hash": str(update.get("last_entry_hash") or ""),
+            "last_etag": str(update.get("last_etag") or ""),
+            "last_modified": str(update.get("last_modified") or ""),
+        }
+    if not states:
+        return
+    try:
+        # 一次读写订阅文件，而不是每个订阅各读写一次。
+        await update_feed_subscription_states(SINGLE_USER_SCOPE, states)
+    except Exception as exc:
+        logger.error(
+            "Failed to update feed subscription state for %s: %s",
+            sorted(states),
+            exc,
+        )
 
 
 async def _send_feed_updates(
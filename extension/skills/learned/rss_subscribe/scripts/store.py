@@ -261,6 +261,28 @@ async def update_feed_subscription_state(
     return True
 
 
+async def update_feed_subscription_states(
+    user_id: int | str,
+    states: dict[int, dict[str, str]],
+) -> int:
+    """Apply several subscriptions' feed state with one read and one write."""
+    if not states:
+        return 0
+    rows = await _read_subscription_rows(user_id)
+    updated = 0
+    for row in rows:
+        state = states.get(int(row.get("id") or 0))
+        if state is None:
+            continue
+        row["last_entry_hash"] = str(state.get("last_entry_hash") or "").strip()
+        row["last_etag"] = str(state.get("last_etag") or "").strip()
+        row["last_modified"] = str(state.get("last_modified") or "").strip()
+        updated += 1
+    if updated:
+        await _write_subscription_rows(user_id, rows)
+    return updated
+
+
 async def get_user_subscriptions(user_id: int | str) -> list[dict[str, Any]]:
     return await list_subscriptions(user_id)
 
@@ -281,5 +303,6 @@ __all__ = [
     "list_subscriptions",
     "set_rss_delivery_target",
     "update_feed_subscription_state",
+    "update_feed_subscription_states",
     "update_subscription",
 ]
@@ -1,4 +1,9 @@
-"""Skill registry backed by SKILL.md metadata."""
+"""Skill registry backed by SKILL.md metadata.
+
+解析结果按 SKILL.md 的 (mtime_ns, size) 缓存，并持久化到
+``DATA_DIR/system/skill_index.json``：进程重启或技能树变化时只重新解析改动过的
+技能。树变化检测只 stat 来源目录、技能目录和 SKILL.md，不再递归 glob。
+"""
 
 import inspect
 import json
@@ -10,10 +15,27 @@ from typing import Any, Dict, List, Optional
 
 import yaml
 
+from core.app_paths import data_dir
 from core.extension_base import SkillExtension
 
 logger = logging.getLogger(__name__)
 
+_SKILL_SOURCES = ("builtin", "learned")
+# 解析逻辑（_parse_skill 的输出结构）变化时递增，旧的持久化索引整体失效。
+_INDEX_VERSION = 1
+
+
+def skill_index_path() -> Path:
+    return (data_dir() / "system" / "skill_index.json").resolve()
+
+
+def _declares_skill_extension(script_path: Path) -> bool:
+    """Cheap text check so register_extensions only imports candidate scripts."""
+    try:
+        return "SkillExtension" in script_path.read_text(encoding="utf-8", errors="ignore")
+    except OSError:
+        return False
+
 
 def _normalize_text_list(value: Any) -> List[str]:
     if isinstance(value, str):
@@ -232,6 +254,7 @@ def _normalize_tool_exports(
                 "prompt_hint": str(item.get("prompt_hint") or "").strip(),
                 "usage_tags": _normalize_text_list(item.get("usage_tags")),
                 "policy_groups": _normalize_policy_groups(item.get("policy_groups")),
+                "read_only": _as_bool(item.get("read_only")),
             }
         )
     return exports
@@ -298,7 +321,12 @@ class SkillRegistry:
         "entrypoint",
     }
 
-    def __init__(self, skills_dir: str | None = None):
+    def __init__(
+        self,
+        skills_dir: str | None = None,
+        *,
+        index_path: str | Path | None = None,
+    ):
         if skills_dir is None:
             resolved_dir = str(Path(__file__).resolve().parent)
         else:
@@ -307,24 +335,66 @@ class SkillRegistry:
         self.skills_dir = os.path.abspath(resolved_dir)
         logger.info(f"Using skills directory: {self.skills_dir}")
 
+        self._index_path = Path(index_path) if index_path is not None else None
         self._loaded_modules: Dict[str, Any] = {}
         self._skill_index: Dict[str, Dict[str, Any]] = {}
         self._skill_aliases: Dict[str, str] = {}
-        self._tree_fingerprint: tuple[tuple[str, int], ...] = ()
-
-    def _compute_tree_fingerprint(self) -> tuple[tuple[str, int], ...]:
-        root = Path(self.skills_dir)
-        if not root.exists():
-            return ()
-
-        rows: list[tuple[str, int]] = []
-        for path in root.glob("**/SKILL.md"):
-            try:
-                rel = str(path.relative_to(root)).replace("\\", "/")
-                rows.append((rel, int(path.stat().st_mtime_ns)))
-            except Exception:
+        self._tree_fingerprint: tuple[tuple[str, int, int], ...] = ()
+        # 来源目录 -> (目录 mtime_ns, 子目录名列表)；目录 mtime 不变就不必重新 listdir。
+        self._listing_cache: Dict[str, tuple[int, List[str]]] = {}
+        # SKILL.md 路径 -> {"mtime_ns", "size", "source", "skill"}，skill 不含 scripts。
+        self._parsed_cache: Dict[str, Dict[str, Any]] = {}
+        self._parsed_cache_loaded = False
+        self.last_scan_stats: Dict[str, Any] = {}
+
+    def _resolved_index_path(self) -> Path:
+        return self._index_path if self._index_path is not None else skill_index_path()
+
+    def _list_skill_dirs(self, source: str) -> tuple[str, List[str]] | None:
+        dir_path = os.path.join(self.skills_dir, source)
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            self._listing_cache.pop(source, None)
+            return None
+        cached = self._listing_cache.get(source)
+        if cached is not None and cached[0] == mtime_ns:
+            return dir_path, cached[1]
+        try:
+            entries = sorted(
+                entry
+                for entry in os.listdir(dir_path)
+                if os.path.isdir(os.path.join(dir_path, entry))
+            )
+        except OSError:
+            return None
+        self._listing_cache[source] = (mtime_ns, entries)
+        return dir_path, entries
+
+    def _compute_tree_fingerprint(self) -> tuple[tuple[str, int, int], ...]:
+        """Stat-only fingerprint of the skill tree.
+
+        来源目录的 mtime 覆盖技能目录的增删改名；已有技能目录里新建/删除
+        SKILL.md 由技能目录自身的 mtime 覆盖；SKILL.md 的修改由它的
+        (mtime_ns, size) 覆盖。每次调用是 O(技能数) 次 stat，不做递归遍历。
+        """
+        rows: list[tuple[str, int, int]] = []
+        for source in _SKILL_SOURCES:
+            listed = self._list_skill_dirs(source)
+            if listed is None:
                 continue
-        rows.sort()
+            dir_path, entries = listed
+            rows.append((source, self._listing_cache[source][0], -1))
+            for entry in entries:
+                skill_dir = os.path.join(dir_path, entry)
+                try:
+                    stat = os.stat(os.path.join(skill_dir, "SKILL.md"))
+                    rows.append((f"{source}/{entry}", stat.st_mtime_ns, stat.st_size))
+                except OSError:
+                    try:
+                        rows.append((f"{source}/{entry}", os.stat(skill_dir).st_mtime_ns, -1))
+                    except OSError:
+                        continue
         return tuple(rows)
 
     def refresh_if_changed(self) -> Dict[str, Dict[str, Any]]:
@@ -333,25 +403,127 @@ class SkillRegistry:
             self.scan_skills()
         return self._skill_index
 
+    def _load_parsed_cache(self) -> None:
+        self._parsed_cache_loaded = True
+        path = self._resolved_index_path()
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except Exception:
+            logger.warning("Ignoring unreadable skill index %s", path, exc_info=True)
+            return
+        if (
+            not isinstance(payload, dict)
+            or payload.get("version") != _INDEX_VERSION
+            or payload.get("skills_dir") != self.skills_dir
+        ):
+            return
+        entries = payload.get("entries")
+        if isinstance(entries, dict):
+            self._parsed_cache.update(
+                {
+                    str(key): value
+                    for key, value in entries.items()
+                    if isinstance(value, dict) and isinstance(value.get("skill"), dict)
+                }
+            )
+
+    def _save_parsed_cache(self) -> None:
+        path = self._resolved_index_path()
+        entries: Dict[str, Any] = {}
+        for key, value in self._parsed_cache.items():
+            try:
+                # 只持久化能无损往返 JSON 的条目（frontmatter 里的日期等会被跳过，
+                # 下次启动照常重新解析）。
+                if json.loads(json.dumps(value, ensure_ascii=False)) == value:
+                    entries[key] = value
+            except (TypeError, ValueError):
+                continue
+        payload = {
+            "version": _INDEX_VERSION,
+            "skills_dir": self.skills_dir,
+            "entries": entries,
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_text(json.dumps(payload, ensure_ascii=False) + "\n", encoding="utf-8")
+            tmp.replace(path)
+        except Exception:
+            logger.debug("Failed to persist skill index %s", path, exc_info=True)
+
+    @staticmethod
+    def _list_scripts(skill_dir: str) -> list[str]:
+        scripts_dir = os.path.join(skill_dir, "scripts")
+        if not os.path.isdir(scripts_dir):
+            return []
+        return sorted(
+            str(path.relative_to(scripts_dir)).replace("\\", "/")
+            for path in Path(scripts_dir).rglob("*.py")
+            if "__pycache__" not in path.parts
+        )
+
+    def _cached_or_parse(
+        self,
+        skill_md_path: str,
+        skill_dir: str,
+        source: str,
+    ) -> tuple[Optional[Dict[str, Any]], bool]:
+        try:
+            stat = os.stat(skill_md_path)
+        except OSError:
+            return None, False
+        cached = self._parsed_cache.get(skill_md_path)
+        if (
+            cached is not None
+            and cached.get("mtime_ns") == stat.st_mtime_ns
+            and cached.get("size") == stat.st_size
+            and cached.get("source") == source
+        ):
+            parsed = dict(cached["skill"])
+            parsed["scripts"] = self._list_scripts(skill_dir)
+            return parsed, False
+
+        parsed = self._parse_skill(skill_md_path, skill_dir, source)
+        if not parsed:
+            self._parsed_cache.pop(skill_md_path, None)
+            return None, True
+        skill = {key: value for key, value in parsed.items() if key != "scripts"}
+        self._parsed_cache[skill_md_path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "source": source,
+            "skill": skill,
+        }
+        return parsed, True
+
     def scan_skills(self) -> Dict[str, Dict[str, Any]]:
+        if not self._parsed_cache_loaded:
+            self._load_parsed_cache()
+
         self._skill_index.clear()
         self._skill_aliases.clear()
+        # 先取指纹再扫描：扫描期间发生的变化会在下一次 refresh 时被发现。
+        fingerprint = self._compute_tree_fingerprint()
+        seen_paths: set[str] = set()
+        reparsed = 0
 
-        for subdir in ["builtin", "learned"]:
-            dir_path = os.path.join(self.skills_dir, subdir)
-            if not os.path.isdir(dir_path):
+        for subdir in _SKILL_SOURCES:
+            listed = self._list_skill_dirs(subdir)
+            if listed is None:
                 continue
+            dir_path, entries = listed
 
-            for entry in os.listdir(dir_path):
+            for entry in entries:
                 skill_dir = os.path.join(dir_path, entry)
-                if not os.path.isdir(skill_dir):
-                    continue
-
                 skill_md_path = os.path.join(skill_dir, "SKILL.md")
                 if not os.path.exists(skill_md_path):
                     continue
 
-                parsed = self._parse_skill(skill_md_path, skill_dir, subdir)
+                seen_paths.add(skill_md_path)
+                parsed, was_parsed = self._cached_or_parse(skill_md_path, skill_dir, subdir)
+                reparsed += int(was_parsed)
                 if not parsed:
                     continue
 
@@ -366,11 +538,22 @@ class SkillRegistry:
                     if safe_alias:
                         self._skill_aliases[safe_alias] = parsed["name"]
 
-        self._tree_fingerprint = self._compute_tree_fingerprint()
+        stale = [path for path in self._parsed_cache if path not in seen_paths]
+        for path in stale:
+            self._parsed_cache.pop(path, None)
+        if reparsed or stale:
+            self._save_parsed_cache()
+        self._tree_fingerprint = fingerprint
+        self.last_scan_stats = {
+            "skills": len(self._skill_index),
+            "reparsed": reparsed,
+            "removed": len(stale),
+        }
 
         logger.info(
-            "Total skills indexed: %s. Keys: %s",
+            "Total skills indexed: %s (reparsed %s). Keys: %s",
             len(self._skill_index),
+            reparsed,
             list(self._skill_index.keys()),
         )
         return self._skill_index
@@ -457,14 +640,7 @@ class SkillRegistry:
             permissions=permissions_obj,
         )
 
-        scripts: list[str] = []
-        scripts_dir = os.path.join(skill_dir, "scripts")
-        if os.path.isdir(scripts_dir):
-            scripts = sorted(
-                str(path.relative_to(scripts_dir)).replace("\\", "/")
-                for path in Path(scripts_dir).rglob("*.py")
-                if "__pycache__" not in path.parts
-            )
+        scripts = self._list_scripts(skill_dir)
 
         return {
             "api_version": api_version,
@@ -478,6 +654,7 @@ class SkillRegistry:
             "platform_handlers": platform_handlers,
             "scheduled_jobs": scheduled_jobs,
             "permissions": permissions_obj,
+            "read_only": _as_bool(frontmatter.get("read_only")),
             "ikaros_only": ikaros_only,
             "allowed_roles": allowed_roles,
             "contract": contract,
@@ -656,6 +833,8 @@ class SkillRegistry:
 
     def reload_skills(self):
         self._loaded_modules.clear()
+        self._parsed_cache.clear()
+        self._parsed_cache_loaded = True
         self.scan_skills()
 
     def unload_skill(self, skill_name: str) -> bool:
@@ -793,6 +972,11 @@ class SkillRegistry:
             return None
 
     def _load_skill_python_modules(self, skill_name: str, skill_info: Dict[str, Any]) -> list[Any]:
+        """Import the scripts of a skill that may define ``SkillExtension`` subclasses.
+
+        其余脚本推迟到 ``import_skill_module`` 首次使用时再导入，启动时不再
+        逐个 exec 所有技能脚本。
+        """
         modules: list[Any] = []
         scripts_dir = Path(str(skill_info.get("skill_dir") or "")) / "scripts"
         if not scripts_dir.is_dir():
@@ -801,6 +985,8 @@ class SkillRegistry:
         for script_path in sorted(scripts_dir.rglob("*.py")):
             if "__pycache__" in script_path.parts:
                 continue
+            if not _declares_skill_extension(script_path):
+                continue
             script_name = str(script_path.relative_to(scripts_dir)).replace("\\", "/")
             module = self._load_skill_script_module(
                 skill_name=skill_name,
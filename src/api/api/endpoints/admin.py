@@ -33,7 +33,10 @@ from api.services.admin_config_service import (
 from api.services.env_config import read_managed_env
 from core.app_paths import env_path, memory_config_path
 from core.memory_config import get_memory_provider_name, load_memory_config
+from core.model_health import read_model_health_snapshot
+from core.perf_trace import read_perf_snapshot
 from core.runtime_config_store import runtime_config_store
+from web_channel.store import get_inbound_queue_metrics
 
 router = APIRouter()
 
@@ -252,6 +255,27 @@ async def get_models_snapshot(
     return build_models_snapshot()
 
 
+@router.get("/models/health")
+async def get_models_health(
+    _: User = Depends(require_admin),
+):
+    return read_model_health_snapshot()
+
+
+@router.get("/perf")
+async def get_perf_snapshot(
+    _: User = Depends(require_admin),
+):
+    return read_perf_snapshot()
+
+
+@router.get("/web-inbox")
+async def get_web_inbox_metrics(
+    _: User = Depends(require_admin),
+):
+    return await get_inbound_queue_metrics()
+
+
 @router.patch("/models")
 async def patch_models_snapshot(
     payload: ModelsConfigPatchRequest,
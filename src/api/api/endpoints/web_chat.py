@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import asyncio
 import json
 import os
 import tempfile
@@ -23,14 +22,15 @@ from web_channel.store import (
     get_file_record,
     get_session_messages,
     get_session_projection,
-    list_outbound_events,
     list_session_projections,
     register_artifact_file,
     register_upload_file,
+    subscribe_outbound_events,
     upsert_session_message,
 )
 
 router = APIRouter()
+_STREAM_KEEPALIVE_SEC = 15.0
 
 
 def _user_id(user: User) -> str:
@@ -189,27 +189,27 @@ async def session_stream(
 ):
     async def event_stream():
         last_seq = int(after or 0)
-        while True:
-            if await request.is_disconnected():
-                return
-            events = await list_outbound_events(
-                owner_user_id=_user_id(user),
-                session_id=session_id,
-                after_seq=last_seq,
-                limit=100,
-            )
-            if not events:
-                yield ": keep-alive\n\n"
-                await asyncio.sleep(1.0)
-                continue
-            for event in events:
-                last_seq = max(last_seq, int(event.get("seq") or 0))
-                payload = json.dumps(event.get("payload") or {}, ensure_ascii=False)
-                yield (
-                    f"id: {event.get('seq')}\n"
-                    f"event: {event.get('type')}\n"
-                    f"data: {payload}\n\n"
+        async with subscribe_outbound_events(_user_id(user)) as subscription:
+            while True:
+                if await request.is_disconnected():
+                    return
+                events = await subscription.read_after(
+                    last_seq,
+                    session_id=session_id,
+                    limit=100,
                 )
+                if not events:
+                    if not await subscription.wait(timeout=_STREAM_KEEPALIVE_SEC):
+                        yield ": keep-alive\n\n"
+                    continue
+                for event in events:
+                    last_seq = max(last_seq, int(event.get("seq") or 0))
+                    payload = json.dumps(event.get("payload") or {}, ensure_ascii=False)
+                    yield (
+                        f"id: {event.get('seq')}\n"
+                        f"event: {event.get('type')}\n"
+                        f"data: {payload}\n\n"
+                    )
     return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
@@ -428,9 +428,19 @@ class AgentOrchestrator:
                         user_data.get("subagent_progress_final_preview") or ""
                     )[:180],
                 }
-                if event_name in {"tool_call_started", "tool_call_finished"}:
+                if event_name in {
+                    "tool_call_started",
+                    "tool_call_progress",
+                    "tool_call_finished",
+                }:
                     snapshot["name"] = str(payload.get("name") or "").strip()
-                if event_name == "tool_call_started":
+                if event_name == "tool_call_progress":
+                    snapshot["progress"] = {
+                        "lines": int(payload.get("lines") or 0),
+                        "elapsed_sec": float(payload.get("elapsed_sec") or 0.0),
+                        "last_line": str(payload.get("last_line") or "")[:160],
+                    }
+                elif event_name == "tool_call_started":
                     args = payload.get("args")
                     if isinstance(args, dict):
                         snapshot["args"] = dict(args)
@@ -476,6 +486,8 @@ class AgentOrchestrator:
             await emit_subagent_progress(event, payload)
             return directive
 
+        tool_dispatcher.event_callback = on_agent_event
+
         logger.info("final tools: %s", tools)
         async for chunk in self.ai_service.generate_response_stream(
             message_history,
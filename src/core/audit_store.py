@@ -7,6 +7,7 @@ from typing import Any, Dict, List
 from uuid import uuid4
 
 from core.config import DATA_DIR
+from core.perf_trace import traced
 
 
 def _now_iso() -> str:
@@ -288,6 +289,7 @@ class AuditStore:
             self._cleanup_old_logs_unlocked()
         return str(entry.get("version_id") or "").strip()
 
+    @traced("store.audit.write_versioned")
     def write_versioned(
         self,
         path: str | Path,
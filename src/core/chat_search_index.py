@@ -0,0 +1,456 @@
+"""Incremental full-text index over chat history (SQLite FTS5).
+
+索引表与会话目录同在 ``bot_data.db``，使用 trigram 分词，中英文子串都能命中：
+
+- 写路径：``state_store.save_message`` 每追加一条可见消息就写入一行，
+  与会话目录共用同一个连接和事务，在工作线程里提交；
+  ``replace_session_entries`` 会整体重建该会话的索引行。
+- 回填：每个进程首次访问某个用户目录时，对比会话目录里记录的文件
+  size/mtime，只重建发生变化的会话。
+- 查询：关键词 >= 3 个字符时走 ``MATCH`` + BM25 排序并返回片段；更短的
+  关键词（如两个汉字）trigram 无法命中，退化为表内 ``LIKE`` 扫描。
+  单次查询受 ``query_budget_ms`` 约束，超时后返回已取到的结果并标记
+  ``truncated``，调用方据此退回文件扫描。
+- SQLite 不带 FTS5 / trigram 时只记录一次，之后写路径直接跳过、查询抛
+  ``ChatSearchUnavailable``，不会每次调用都重试建表并刷警告。
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Iterator
+
+from core.app_paths import data_dir
+
+logger = logging.getLogger(__name__)
+
+_FTS_TABLE = "chat_message_fts"
+_STATE_TABLE = "chat_message_fts_state"
+_INDEXED_ROLES = frozenset({"user", "model"})
+_TRIGRAM_MIN_CHARS = 3
+_SNIPPET_TOKENS = 24
+_DEFAULT_QUERY_BUDGET_MS = 300
+
+
+class ChatSearchUnavailable(RuntimeError):
+    """The SQLite build lacks FTS5 (or the trigram tokenizer)."""
+
+
+class ChatSearchHits(list):
+    """Search hits; ``truncated`` is set when the query budget cut the scan short."""
+
+    truncated: bool = False
+
+
+def _fts_phrase(keyword: str) -> str:
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def _like_pattern(keyword: str) -> str:
+    escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _like_snippet(content: str, keyword: str, *, radius: int = 40) -> str:
+    lowered = content.lower()
+    position = lowered.find(keyword.lower())
+    if position < 0:
+        return content[: radius * 2]
+    start = max(0, position - radius)
+    end = min(len(content), position + len(keyword) + radius)
+    snippet = (
+        content[start:position]
+        + "["
+        + content[position : position + len(keyword)]
+        + "]"
+        + content[position + len(keyword) : end]
+    )
+    if start > 0:
+        snippet = "…" + snippet
+    if end < len(content):
+        snippet = snippet + "…"
+    return snippet
+
+
+class ChatSearchIndex:
+    def __init__(self, *, query_budget_ms: int = _DEFAULT_QUERY_BUDGET_MS) -> None:
+        self.query_budget_ms = int(query_budget_ms)
+        self._lock = Lock()
+        self._ready_dbs: set[str] = set()
+        self._synced_scopes: set[tuple[str, str]] = set()
+        self._unavailable_reason = ""
+
+    @property
+    def available(self) -> bool:
+        return not self._unavailable_reason
+
+    def _db_path(self) -> Path:
+        return (data_dir() / "bot_data.db").resolve()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db_path = self._db_path()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            self._ensure_db(conn, str(db_path))
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_db(self, conn: sqlite3.Connection, key: str) -> None:
+        if self._unavailable_reason:
+            raise ChatSearchUnavailable(self._unavailable_reason)
+        if key in self._ready_dbs:
+            return
+        try:
+            conn.execute(
+                f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {_FTS_TABLE} USING fts5(
+                    content,
+                    user_scope UNINDEXED,
+                    session_id UNINDEXED,
+                    day UNINDEXED,
+                    role UNINDEXED,
+                    seq UNINDEXED,
+                    tokenize = 'trigram'
+                )
+                """
+            )
+        except sqlite3.OperationalError as exc:
+            message = str(exc).lower()
+            if "fts5" not in message and "tokenizer" not in message:
+                raise
+            self._unavailable_reason = str(exc)
+            logger.warning(
+                "Chat search index disabled, SQLite %s lacks FTS5 trigram support: %s",
+                sqlite3.sqlite_version,
+                exc,
+            )
+            raise ChatSearchUnavailable(self._unavailable_reason) from exc
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {_STATE_TABLE} (
+                user_scope TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                next_seq INTEGER NOT NULL DEFAULT 0,
+                size INTEGER NOT NULL DEFAULT 0,
+                mtime_ns INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_scope, session_id)
+            )
+            """
+        )
+        conn.commit()
+        self._ready_dbs.add(key)
+
+    def _delete_session(
+        self, conn: sqlite3.Connection, scope: str, session_id: str
+    ) -> None:
+        conn.execute(
+            f"DELETE FROM {_FTS_TABLE} WHERE user_scope = ? AND session_id = ?",
+            (scope, session_id),
+        )
+        conn.execute(
+            f"DELETE FROM {_STATE_TABLE} WHERE user_scope = ? AND session_id = ?",
+            (scope, session_id),
+        )
+
+    def _write_session(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        scope: str,
+        session_id: str,
+        day: str,
+        path: Path,
+        rows: list[dict[str, str]],
+    ) -> None:
+        self._delete_session(conn, scope, session_id)
+        payload = [
+            (
+                str(row.get("content") or ""),
+                scope,
+                session_id,
+                day,
+                str(row.get("role") or ""),
+                seq,
+            )
+            for seq, row in enumerate(rows)
+            if str(row.get("role") or "") in _INDEXED_ROLES
+            and str(row.get("content") or "").strip()
+        ]
+        conn.executemany(
+            f"""
+            INSERT INTO {_FTS_TABLE} (content, user_scope, session_id, day, role, seq)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            payload,
+        )
+        self._write_state(conn, scope, session_id, next_seq=len(rows), path=path)
+
+    def _write_state(
+        self,
+        conn: sqlite3.Connection,
+        scope: str,
+        session_id: str,
+        *,
+        next_seq: int,
+        path: Path,
+    ) -> None:
+        stat = path.stat()
+        conn.execute(
+            f"""
+            INSERT INTO {_STATE_TABLE} (user_scope, session_id, next_seq, size, mtime_ns)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (user_scope, session_id) DO UPDATE SET
+                next_seq = excluded.next_seq,
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns
+            """,
+            (scope, session_id, int(next_seq), int(stat.st_size), int(stat.st_mtime_ns)),
+        )
+
+    def synced(self, scope: str) -> bool:
+        """Whether ``ensure_synced`` already ran for ``scope`` in this process."""
+        return not self.available or (str(self._db_path()), scope) in self._synced_scopes
+
+    def ensure_synced(
+        self,
+        scope: str,
+        *,
+        list_sessions: Callable[[], list[dict[str, Any]]],
+        read_rows: Callable[[Path], list[dict[str, str]]],
+    ) -> None:
+        """Backfill sessions whose file changed since they were last indexed."""
+        key = (str(self._db_path()), scope)
+        if key in self._synced_scopes or not self.available:
+            return
+        with self._lock:
+            if key in self._synced_scopes:
+                return
+            started = time.perf_counter()
+            reindexed = 0
+            with self._connect() as conn:
+                known = {
+                    str(row["session_id"]): (int(row["size"]), int(row["mtime_ns"]))
+                    for row in conn.execute(
+                        f"""
+                        SELECT session_id, size, mtime_ns FROM {_STATE_TABLE}
+                        WHERE user_scope = ?
+                        """,
+                        (scope,),
+                    ).fetchall()
+                }
+                live: set[str] = set()
+                for item in list_sessions():
+                    session_id = str(item.get("session_id") or "")
+                    path = Path(str(item.get("path") or ""))
+                    if not session_id or not path.is_file():
+                        continue
+                    live.add(session_id)
+                    stat = path.stat()
+                    if known.get(session_id) == (
+                        int(stat.st_size),
+                        int(stat.st_mtime_ns),
+                    ):
+                        continue
+                    self._write_session(
+                        conn,
+                        scope=scope,
+                        session_id=session_id,
+                        day=str(item.get("day") or ""),
+                        path=path,
+                        rows=read_rows(path),
+                    )
+                    reindexed += 1
+                for session_id in set(known) - live:
+                    self._delete_session(conn, scope, session_id)
+            self._synced_scopes.add(key)
+            if reindexed:
+                logger.info(
+                    "Chat search index backfilled %s sessions for %s in %.1f ms",
+                    reindexed,
+                    scope,
+                    (time.perf_counter() - started) * 1000,
+                )
+
+    def record_append(
+        self,
+        scope: str,
+        session_id: str,
+        *,
+        day: str,
+        path: Path,
+        role: str,
+        content: str,
+        conn: sqlite3.Connection | None = None,
+    ) -> None:
+        """Index one appended entry.
+
+        传入 ``conn`` 时写进调用方已开的 ``BEGIN IMMEDIATE`` 事务，
+        ``next_seq`` 的读改写由该事务的写锁保证串行。
+        """
+        if not self.available:
+            return
+        if conn is not None:
+            try:
+                self._ensure_db(conn, str(self._db_path()))
+            except ChatSearchUnavailable:
+                return
+            self._append_row(conn, scope, session_id, day, path, role, content)
+            return
+        with self._lock:
+            with self._connect() as conn:
+                self._append_row(conn, scope, session_id, day, path, role, content)
+
+    def _append_row(
+        self,
+        conn: sqlite3.Connection,
+        scope: str,
+        session_id: str,
+        day: str,
+        path: Path,
+        role: str,
+        content: str,
+    ) -> None:
+        row = conn.execute(
+            f"""
+            SELECT next_seq FROM {_STATE_TABLE}
+            WHERE user_scope = ? AND session_id = ?
+            """,
+            (scope, session_id),
+        ).fetchone()
+        seq = int(row["next_seq"]) if row is not None else 0
+        if role in _INDEXED_ROLES and str(content or "").strip():
+            conn.execute(
+                f"""
+                INSERT INTO {_FTS_TABLE}
+                    (content, user_scope, session_id, day, role, seq)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (str(content), scope, session_id, day, role, seq),
+            )
+        self._write_state(conn, scope, session_id, next_seq=seq + 1, path=path)
+
+    def record_snapshot(
+        self,
+        scope: str,
+        session_id: str,
+        *,
+        day: str,
+        path: Path,
+        rows: list[dict[str, str]],
+    ) -> None:
+        if not self.available:
+            return
+        with self._lock:
+            with self._connect() as conn:
+                self._write_session(
+                    conn,
+                    scope=scope,
+                    session_id=session_id,
+                    day=day,
+                    path=path,
+                    rows=rows,
+                )
+
+    def forget(self, scope: str, session_id: str) -> None:
+        if not self.available:
+            return
+        with self._lock:
+            with self._connect() as conn:
+                self._delete_session(conn, scope, session_id)
+
+    def search(
+        self,
+        scope: str,
+        keyword: str,
+        *,
+        limit: int = 20,
+        session_id: str | None = None,
+        day: str | None = None,
+        role: str | None = None,
+    ) -> ChatSearchHits:
+        """Return hits ranked by BM25 (newest first for short keywords)."""
+        text = str(keyword or "").strip()
+        if not text:
+            return ChatSearchHits()
+        if not self.available:
+            raise ChatSearchUnavailable(self._unavailable_reason)
+        filters = ["user_scope = ?"]
+        params: list[Any] = [scope]
+        if session_id:
+            filters.append("session_id = ?")
+            params.append(str(session_id))
+        if day:
+            filters.append("day = ?")
+            params.append(str(day))
+        if role:
+            filters.append("role = ?")
+            params.append(str(role))
+        use_match = len(text) >= _TRIGRAM_MIN_CHARS
+        if use_match:
+            sql = f"""
+                SELECT content, session_id, day, role, seq, rank,
+                    snippet({_FTS_TABLE}, 0, '[', ']', '…', {_SNIPPET_TOKENS}) AS snippet
+                FROM {_FTS_TABLE}
+                WHERE {_FTS_TABLE} MATCH ? AND {' AND '.join(filters)}
+                ORDER BY rank
+                LIMIT ?
+            """
+            params = [_fts_phrase(text), *params]
+        else:
+            sql = f"""
+                SELECT content, session_id, day, role, seq, 0.0 AS rank, '' AS snippet
+                FROM {_FTS_TABLE}
+                WHERE content LIKE ? ESCAPE '\\' AND {' AND '.join(filters)}
+                ORDER BY day DESC, rowid DESC
+                LIMIT ?
+            """
+            params = [_like_pattern(text), *params]
+        params.append(max(1, int(limit)))
+
+        deadline = time.perf_counter() + max(1, self.query_budget_ms) / 1000
+        hits = ChatSearchHits()
+        with self._connect() as conn:
+            conn.set_progress_handler(
+                lambda: 1 if time.perf_counter() > deadline else 0,
+                10_000,
+            )
+            try:
+                for row in conn.execute(sql, params):
+                    content = str(row["content"] or "")
+                    hits.append(
+                        {
+                            "role": str(row["role"] or "user"),
+                            "content": content,
+                            "created_at": str(row["day"] or ""),
+                            "session_id": str(row["session_id"] or ""),
+                            "snippet": str(row["snippet"] or "")
+                            or _like_snippet(content, text),
+                            "rank": float(row["rank"] or 0.0),
+                        }
+                    )
+            except sqlite3.OperationalError as exc:
+                if "interrupted" not in str(exc).lower():
+                    raise
+                hits.truncated = True
+                logger.warning(
+                    "Chat search exceeded %s ms budget for %r; returning %s partial hits",
+                    self.query_budget_ms,
+                    text,
+                    len(hits),
+                )
+            finally:
+                conn.set_progress_handler(None, 0)
+        return hits
+
+
+chat_search_index = ChatSearchIndex()
@@ -0,0 +1,381 @@
+"""Per-user chat session catalog stored in ``bot_data.db``.
+
+会话列表、最新会话与按 id 定位会话文件都走这张表，不再对聊天目录做
+``glob`` + ``stat``。表由 ``state_store`` 的写路径维护；每个进程第一次访问
+某个用户目录时会做一次对账，把旧版本写下、或在进程外被改动的会话文件补进来。
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Iterator
+
+from core.app_paths import data_dir
+
+logger = logging.getLogger(__name__)
+
+_CATALOG_TABLE = "chat_session_catalog"
+_VISIBLE_CHAT_ROLES = frozenset({"user", "model"})
+_TITLE_CHARS = 48
+_PREVIEW_CHARS = 120
+
+
+def _summarize_rows(rows: list[dict[str, str]]) -> dict[str, Any]:
+    visible = [
+        row
+        for row in rows
+        if str(row.get("role") or "").strip().lower() in _VISIBLE_CHAT_ROLES
+    ]
+    title = ""
+    for row in visible:
+        if str(row.get("role") or "").strip().lower() == "user":
+            title = str(row.get("content") or "").strip()
+            break
+    preview = str((visible[-1] if visible else {}).get("content") or "").strip()
+    return {
+        "title": title[:_TITLE_CHARS],
+        "preview": preview[:_PREVIEW_CHARS],
+        "message_count": len(visible),
+    }
+
+
+def _stat_fields(path: Path) -> dict[str, Any]:
+    stat = path.stat()
+    return {
+        "size": int(stat.st_size),
+        "mtime_ns": int(stat.st_mtime_ns),
+        "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+        "updated_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+    }
+
+
+def _row_to_dict(row: sqlite3.Row) -> dict[str, Any]:
+    title = str(row["title"] or "").strip()
+    return {
+        "session_id": str(row["session_id"] or ""),
+        "day": str(row["day"] or ""),
+        "title": title or "新对话",
+        "preview": str(row["preview"] or ""),
+        "message_count": int(row["message_count"] or 0),
+        "created_at": str(row["created_at"] or ""),
+        "updated_at": str(row["updated_at"] or ""),
+        "path": str(row["path"] or ""),
+    }
+
+
+class ChatSessionCatalog:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._ready_dbs: set[str] = set()
+        self._synced_roots: set[tuple[str, str]] = set()
+
+    def _db_path(self) -> Path:
+        return (data_dir() / "bot_data.db").resolve()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db_path = self._db_path()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            self._ensure_db(conn, str(db_path))
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def write_transaction(self) -> Iterator[sqlite3.Connection]:
+        """One ``BEGIN IMMEDIATE`` transaction on ``bot_data.db``.
+
+        ``state_store.save_message`` 让目录表和全文索引共用这一个连接和事务，
+        每条消息只提交一次；事务开头就拿写锁，并发追加不会读到旧的 ``next_seq``。
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    def _ensure_db(self, conn: sqlite3.Connection, key: str) -> None:
+        if key in self._ready_dbs:
+            return
+        # WAL 写在库文件里，一次设置长期有效；读者不再被写事务挡住。
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {_CATALOG_TABLE} (
+                user_scope TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                path TEXT NOT NULL,
+                title TEXT NOT NULL DEFAULT '',
+                preview TEXT NOT NULL DEFAULT '',
+                message_count INTEGER NOT NULL DEFAULT 0,
+                size INTEGER NOT NULL DEFAULT 0,
+                mtime_ns INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (user_scope, session_id)
+            )
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_{_CATALOG_TABLE}_scope_mtime
+            ON {_CATALOG_TABLE} (user_scope, mtime_ns DESC)
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_{_CATALOG_TABLE}_scope_day
+            ON {_CATALOG_TABLE} (user_scope, day, mtime_ns DESC)
+            """
+        )
+        conn.commit()
+        self._ready_dbs.add(key)
+
+    def _upsert_snapshot(
+        self,
+        conn: sqlite3.Connection,
+        *,
+        scope: str,
+        session_id: str,
+        day: str,
+        path: Path,
+        rows: list[dict[str, str]],
+    ) -> None:
+        fields = {**_summarize_rows(rows), **_stat_fields(path)}
+        conn.execute(
+            f"""
+            INSERT INTO {_CATALOG_TABLE} (
+                user_scope, session_id, day, path, title, preview,
+                message_count, size, mtime_ns, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_scope, session_id) DO UPDATE SET
+                day = excluded.day,
+                path = excluded.path,
+                title = excluded.title,
+                preview = excluded.preview,
+                message_count = excluded.message_count,
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                updated_at = excluded.updated_at
+            """,
+            (
+                scope,
+                session_id,
+                day,
+                str(path),
+                fields["title"],
+                fields["preview"],
+                fields["message_count"],
+                fields["size"],
+                fields["mtime_ns"],
+                fields["created_at"],
+                fields["updated_at"],
+            ),
+        )
+
+    def synced(self, scope: str) -> bool:
+        """Whether ``ensure_synced`` already ran for ``scope`` in this process."""
+        return (str(self._db_path()), scope) in self._synced_roots
+
+    def ensure_synced(
+        self,
+        scope: str,
+        root: Path,
+        *,
+        read_rows: Callable[[Path], list[dict[str, str]]],
+        extract_day: Callable[[Path], str],
+        extract_session: Callable[[Path], str],
+    ) -> None:
+        """Reconcile the catalog with ``root`` once per process and scope."""
+        key = (str(self._db_path()), scope)
+        if key in self._synced_roots:
+            return
+        with self._lock:
+            if key in self._synced_roots:
+                return
+            with self._connect() as conn:
+                known = {
+                    str(row["path"]): (int(row["size"]), int(row["mtime_ns"]))
+                    for row in conn.execute(
+                        f"""
+                        SELECT path, size, mtime_ns FROM {_CATALOG_TABLE}
+                        WHERE user_scope = ?
+                        """,
+                        (scope,),
+                    ).fetchall()
+                }
+                seen: set[str] = set()
+                for path in root.glob("*/*.md") if root.exists() else []:
+                    if not path.is_file():
+                        continue
+                    resolved = path.resolve()
+                    seen.add(str(resolved))
+                    stat = resolved.stat()
+                    if known.get(str(resolved)) == (
+                        int(stat.st_size),
+                        int(stat.st_mtime_ns),
+                    ):
+                        continue
+                    self._upsert_snapshot(
+                        conn,
+                        scope=scope,
+                        session_id=extract_session(resolved),
+                        day=extract_day(resolved),
+                        path=resolved,
+                        rows=read_rows(resolved),
+                    )
+                stale = [path for path in known if path not in seen]
+                for path in stale:
+                    conn.execute(
+                        f"DELETE FROM {_CATALOG_TABLE} WHERE user_scope = ? AND path = ?",
+                        (scope, path),
+                    )
+            self._synced_roots.add(key)
+
+    def record_snapshot(
+        self,
+        scope: str,
+        session_id: str,
+        *,
+        day: str,
+        path: Path,
+        rows: list[dict[str, str]],
+    ) -> None:
+        with self._lock:
+            with self._connect() as conn:
+                self._upsert_snapshot(
+                    conn,
+                    scope=scope,
+                    session_id=session_id,
+                    day=day,
+                    path=path,
+                    rows=rows,
+                )
+
+    def record_append(
+        self,
+        scope: str,
+        session_id: str,
+        *,
+        day: str,
+        path: Path,
+        role: str,
+        content: str,
+        conn: sqlite3.Connection | None = None,
+    ) -> None:
+        """Fold one appended entry into the catalog row without re-reading the file.
+
+        传入 ``conn`` 时写进调用方的事务（见 ``write_transaction``），不另开连接。
+        """
+        visible = str(role or "").strip().lower() in _VISIBLE_CHAT_ROLES
+        text = str(content or "").strip()
+        is_user = visible and str(role or "").strip().lower() == "user"
+        fields = _stat_fields(path)
+        params = (
+            scope,
+            session_id,
+            day,
+            str(path),
+            text[:_TITLE_CHARS] if is_user else "",
+            text[:_PREVIEW_CHARS] if visible else "",
+            1 if visible else 0,
+            fields["size"],
+            fields["mtime_ns"],
+            fields["created_at"],
+            fields["updated_at"],
+        )
+        if conn is not None:
+            self._append_row(conn, params)
+            return
+        with self._lock:
+            with self._connect() as conn:
+                self._append_row(conn, params)
+
+    def _append_row(self, conn: sqlite3.Connection, params: tuple[Any, ...]) -> None:
+        conn.execute(
+            f"""
+            INSERT INTO {_CATALOG_TABLE} (
+                user_scope, session_id, day, path, title, preview,
+                message_count, size, mtime_ns, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_scope, session_id) DO UPDATE SET
+                path = excluded.path,
+                title = CASE
+                    WHEN {_CATALOG_TABLE}.title = '' THEN excluded.title
+                    ELSE {_CATALOG_TABLE}.title
+                END,
+                preview = CASE
+                    WHEN excluded.message_count > 0 THEN excluded.preview
+                    ELSE {_CATALOG_TABLE}.preview
+                END,
+                message_count = {_CATALOG_TABLE}.message_count
+                    + excluded.message_count,
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                updated_at = excluded.updated_at
+            """,
+            params,
+        )
+
+    def forget(self, scope: str, session_id: str) -> None:
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute(
+                    f"""
+                    DELETE FROM {_CATALOG_TABLE}
+                    WHERE user_scope = ? AND session_id = ?
+                    """,
+                    (scope, session_id),
+                )
+
+    def lookup(self, scope: str, session_id: str) -> dict[str, Any] | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"""
+                SELECT * FROM {_CATALOG_TABLE}
+                WHERE user_scope = ? AND session_id = ?
+                """,
+                (scope, session_id),
+            ).fetchone()
+        return _row_to_dict(row) if row is not None else None
+
+    def list_sessions(
+        self,
+        scope: str,
+        *,
+        limit: int | None = None,
+        day: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """Return catalog rows newest first (by file mtime)."""
+        where_sql = "WHERE user_scope = ?"
+        params: list[Any] = [scope]
+        if day:
+            where_sql += " AND day = ?"
+            params.append(str(day))
+        limit_sql = ""
+        if limit is not None:
+            limit_sql = "LIMIT ?"
+            params.append(max(1, int(limit)))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT * FROM {_CATALOG_TABLE}
+                {where_sql}
+                ORDER BY mtime_ns DESC, session_id ASC
+                {limit_sql}
+                """,
+                params,
+            ).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+
+chat_session_catalog = ChatSessionCatalog()
@@ -0,0 +1,284 @@
+"""Append-only storage for chat session markdown files.
+
+会话文件仍然是原来的 markdown 结构（头部 + 若干 ``### role`` 代码块），
+但新消息只通过一次 ``O_APPEND`` 写入追加到文件末尾，不再整体解析与重写。
+
+每个会话文件在进程内维护一份按字节偏移的条目索引，以及最近若干条消息的
+内容缓存；索引以 (inode, size) 校验，其他进程追加写入时只增量解析新增字节，
+文件被整体替换时才完整重建。
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+_ENTRY_RE = re.compile(
+    rb"^###\s+(system|user|model)\s*\r?\n```text\r?\n(.*?)\r?\n```",
+    re.M | re.S,
+)
+_TAIL_CACHE_ROWS = 64
+_MAX_INDEXED_SESSIONS = 256
+
+_INDEX: dict[str, "_SessionIndex"] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+@dataclass
+class _SessionIndex:
+    inode: int
+    size: int
+    offsets: list[int] = field(default_factory=list)
+    roles: list[str] = field(default_factory=list)
+    tail: dict[int, str] = field(default_factory=dict)
+
+    def add(self, offset: int, role: str, content: str) -> None:
+        position = len(self.offsets)
+        self.offsets.append(offset)
+        self.roles.append(role)
+        self.tail[position] = content
+        floor = position - _TAIL_CACHE_ROWS
+        if floor >= 0:
+            for key in [key for key in self.tail if key <= floor]:
+                self.tail.pop(key, None)
+
+
+def entry_block(role: str, content: str) -> str:
+    text = str(content or "").replace("\r\n", "\n").replace("\r", "\n").rstrip()
+    return f"### {role}\n```text\n{text}\n```\n\n"
+
+
+def render_header(day: str, session_id: str) -> str:
+    lines = [
+        "# Chat Session",
+        "",
+        f"- date: {day}",
+        f"- session: {session_id}",
+        "",
+        "## Dialogue",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def render_session(day: str, session_id: str, rows: list[dict[str, str]]) -> str:
+    body = "".join(
+        entry_block(str(item.get("role") or "user"), str(item.get("content") or ""))
+        for item in rows
+    )
+    return render_header(day, session_id) + body
+
+
+def _decode_body(raw: bytes) -> str:
+    text = raw.decode("utf-8", errors="replace")
+    return text.replace("\r\n", "\n").strip()
+
+
+def _scan(data: bytes, base: int) -> list[tuple[int, str, str]]:
+    found: list[tuple[int, str, str]] = []
+    for match in _ENTRY_RE.finditer(data):
+        body = _decode_body(match.group(2) or b"")
+        if not body:
+            continue
+        role = (match.group(1) or b"user").decode("ascii").strip().lower()
+        found.append((base + match.start(), role, body))
+    return found
+
+
+def _remember(key: str, index: _SessionIndex) -> None:
+    with _INDEX_LOCK:
+        _INDEX.pop(key, None)
+        _INDEX[key] = index
+        while len(_INDEX) > _MAX_INDEXED_SESSIONS:
+            _INDEX.pop(next(iter(_INDEX)), None)
+
+
+def invalidate(path: Path) -> None:
+    with _INDEX_LOCK:
+        _INDEX.pop(str(path), None)
+
+
+def _load_index(path: Path) -> _SessionIndex | None:
+    """Return a fresh index for ``path``, parsing only bytes not yet indexed."""
+    key = str(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        invalidate(path)
+        return None
+    with _INDEX_LOCK:
+        index = _INDEX.get(key)
+    if index is not None and index.inode == stat.st_ino:
+        if index.size == stat.st_size:
+            return index
+        if index.size < stat.st_size:
+            with path.open("rb") as handle:
+                handle.seek(index.size)
+                chunk = handle.read(stat.st_size - index.size)
+            if chunk.endswith(b"\n\n"):
+                # 仅在追加的块已完整落盘时推进索引，避免吞掉写到一半的条目
+                for offset, role, body in _scan(chunk, index.size):
+                    index.add(offset, role, body)
+                index.size = index.size + len(chunk)
+            return index
+
+    data = path.read_bytes()
+    index = _SessionIndex(inode=stat.st_ino, size=len(data))
+    for offset, role, body in _scan(data, 0):
+        index.add(offset, role, body)
+    _remember(key, index)
+    return index
+
+
+def _read_blocks(path: Path, index: _SessionIndex, positions: list[int]) -> list[dict[str, str]]:
+    if not positions:
+        return []
+    missing = [pos for pos in positions if pos not in index.tail]
+    contents: dict[int, str] = {pos: index.tail[pos] for pos in positions if pos in index.tail}
+    if missing:
+        with path.open("rb") as handle:
+            for pos in missing:
+                start = index.offsets[pos]
+                end = (
+                    index.offsets[pos + 1]
+                    if pos + 1 < len(index.offsets)
+                    else index.size
+                )
+                handle.seek(start)
+                scanned = _scan(handle.read(max(0, end - start)), start)
+                contents[pos] = scanned[0][2] if scanned else ""
+    return [
+        {"role": index.roles[pos], "content": contents.get(pos, "")}
+        for pos in positions
+    ]
+
+
+def read_entries(path: Path) -> list[dict[str, str]]:
+    """Read every entry with one sequential read, refreshing the index as well."""
+    try:
+        stat = path.stat()
+        data = path.read_bytes()
+    except FileNotFoundError:
+        invalidate(path)
+        return []
+    index = _SessionIndex(inode=stat.st_ino, size=len(data))
+    rows: list[dict[str, str]] = []
+    for offset, role, body in _scan(data, 0):
+        index.add(offset, role, body)
+        rows.append({"role": role, "content": body})
+    if data.endswith(b"\n\n") or not data:
+        _remember(str(path), index)
+    return rows
+
+
+def read_tail(
+    path: Path,
+    limit: int,
+    *,
+    exclude_roles: frozenset[str] = frozenset(),
+) -> list[dict[str, str]]:
+    """Return the last ``limit`` entries whose role is not excluded."""
+    index = _load_index(path)
+    if index is None:
+        return []
+    wanted = max(1, int(limit))
+    positions: list[int] = []
+    for pos in range(len(index.roles) - 1, -1, -1):
+        if index.roles[pos] in exclude_roles:
+            continue
+        positions.append(pos)
+        if len(positions) >= wanted:
+            break
+    positions.reverse()
+    return _read_blocks(path, index, positions)
+
+
+def read_role(path: Path, role: str) -> list[dict[str, str]]:
+    index = _load_index(path)
+    if index is None:
+        return []
+    positions = [pos for pos, item in enumerate(index.roles) if item == role]
+    return _read_blocks(path, index, positions)
+
+
+def read_range(
+    path: Path,
+    start: int,
+    end: int | None = None,
+    *,
+    exclude_roles: frozenset[str] = frozenset(),
+) -> list[dict[str, str]]:
+    """Return entries ``[start, end)`` counted over roles that are not excluded."""
+    index = _load_index(path)
+    if index is None:
+        return []
+    positions = [
+        pos for pos, role in enumerate(index.roles) if role not in exclude_roles
+    ][max(0, int(start)) : end]
+    return _read_blocks(path, index, positions)
+
+
+def count_entries(path: Path, *, exclude_roles: frozenset[str] = frozenset()) -> int:
+    index = _load_index(path)
+    if index is None:
+        return 0
+    return sum(1 for role in index.roles if role not in exclude_roles)
+
+
+def append_entry(
+    path: Path,
+    *,
+    day: str,
+    session_id: str,
+    role: str,
+    content: str,
+) -> None:
+    """Append one entry with a single ``O_APPEND`` write."""
+    block = entry_block(role, content).encode("utf-8")
+    body = str(content or "").replace("\r\n", "\n").replace("\r", "\n").strip()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        stat = os.fstat(fd)
+        prefix = b""
+        if stat.st_size == 0:
+            prefix = render_header(day, session_id).encode("utf-8")
+        else:
+            with path.open("rb") as handle:
+                handle.seek(stat.st_size - 1)
+                if handle.read(1) != b"\n":
+                    prefix = b"\n"
+        payload = prefix + block
+        written = 0
+        while written < len(payload):
+            written += os.write(fd, payload[written:])
+        end = os.lseek(fd, 0, os.SEEK_END)
+    finally:
+        os.close(fd)
+
+    with _INDEX_LOCK:
+        index = _INDEX.get(str(path))
+    start = end - len(payload)
+    if index is None or index.inode != stat.st_ino or index.size != start:
+        return
+    if body:
+        index.add(start + len(prefix), role, body)
+    index.size = end
+
+
+def write_session(
+    path: Path,
+    *,
+    day: str,
+    session_id: str,
+    rows: list[dict[str, str]],
+) -> None:
+    """Atomically replace the whole session file and rebuild its index."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(render_session(day, session_id, rows), encoding="utf-8")
+    tmp.replace(path)
+    invalidate(path)
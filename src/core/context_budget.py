@@ -0,0 +1,339 @@
+"""Per-request context budgeting against the target model's window.
+
+每次调用 ``chat.completions.create`` 之前，按 ``models.json`` 中该模型的
+``contextWindow`` / ``maxTokens`` 计算输入预算，把消息列表裁到预算以内：
+
+- 开头的 system 消息（SOUL、USER、经验记忆快照、技能目录都在里面）固定保留；
+- 从最后一条 user 消息开始的本轮消息固定保留；
+- 超出预算时先把最大的工具结果做首尾截断（不低于
+  ``CONTEXT_BUDGET_TOOL_RESULT_MIN_TOKENS``），再从最早的历史开始整组丢弃
+  （带 tool_calls 的 assistant 与其 tool 结果视为一组，避免留下孤立的 tool 消息）。
+
+裁剪只作用于发给上游的 payload 副本，不会改动调用方持有的历史。每次请求的
+预算账目（``BudgetReport``）汇总进 ``context_budget_stats``，供 ``/usage prompt``
+展示。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Tuple
+
+from core.model_config import get_models_config
+from core.token_estimator import (
+    estimate_message_tokens,
+    estimate_tokens,
+    estimate_tools_tokens,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+CONTEXT_BUDGET_ENABLED = (
+    os.getenv("CONTEXT_BUDGET_ENABLED", "true").lower() == "true"
+)
+CONTEXT_BUDGET_OUTPUT_RESERVE_TOKENS = max(
+    256, _env_int("CONTEXT_BUDGET_OUTPUT_RESERVE_TOKENS", 8192)
+)
+CONTEXT_BUDGET_SAFETY_RATIO = min(
+    1.0, max(0.5, _env_float("CONTEXT_BUDGET_SAFETY_RATIO", 0.9))
+)
+CONTEXT_BUDGET_TOOL_RESULT_MIN_TOKENS = max(
+    64, _env_int("CONTEXT_BUDGET_TOOL_RESULT_MIN_TOKENS", 800)
+)
+CONTEXT_BUDGET_HISTORY_RATIO = min(
+    1.0, max(0.1, _env_float("CONTEXT_BUDGET_HISTORY_RATIO", 0.5))
+)
+
+_DEFAULT_CONTEXT_WINDOW = 1_000_000
+_DEFAULT_MAX_TOKENS = 65536
+_RECENT_REPORTS = 20
+_TRUNCATION_MARKER = "\n...[已截断 {omitted} 字符以适配上下文窗口]...\n"
+
+
+@dataclass
+class BudgetReport:
+    model: str
+    context_window: int
+    output_reserve: int
+    budget: int
+    tools_tokens: int = 0
+    system_tokens: int = 0
+    history_tokens: int = 0
+    turn_tokens: int = 0
+    input_tokens_before: int = 0
+    input_tokens_after: int = 0
+    truncated_tool_results: int = 0
+    dropped_messages: int = 0
+    over_budget: bool = False
+    elapsed_ms: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.truncated_tool_results or self.dropped_messages)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def resolve_model_limits(model_key: str) -> Tuple[int, int]:
+    config = get_models_config()
+    model = config.get_model(model_key) if config is not None else None
+    if model is None:
+        return _DEFAULT_CONTEXT_WINDOW, _DEFAULT_MAX_TOKENS
+    context_window = int(model.contextWindow or 0) or _DEFAULT_CONTEXT_WINDOW
+    max_tokens = int(model.maxTokens or 0) or _DEFAULT_MAX_TOKENS
+    return context_window, max_tokens
+
+
+def history_token_budget(model_key: str) -> int:
+    """Token budget for loading raw session history before the request is built.
+
+    ``get_user_context`` 按它决定读多少条历史；system 提示、工具 schema 和本轮
+    消息占用剩下的部分，最终仍由 ``fit_chat_request`` 精确裁剪。
+    """
+    context_window, max_tokens = resolve_model_limits(model_key)
+    reserve = min(max_tokens, CONTEXT_BUDGET_OUTPUT_RESERVE_TOKENS)
+    input_budget = max(0, int(context_window * CONTEXT_BUDGET_SAFETY_RATIO) - reserve)
+    return max(1000, int(input_budget * CONTEXT_BUDGET_HISTORY_RATIO))
+
+
+def _output_reserve(request_kwargs: Dict[str, Any], max_tokens: int) -> int:
+    for key in ("max_completion_tokens", "max_tokens"):
+        try:
+            requested = int(request_kwargs.get(key) or 0)
+        except (TypeError, ValueError):
+            requested = 0
+        if requested > 0:
+            return requested
+    return min(max_tokens, CONTEXT_BUDGET_OUTPUT_RESERVE_TOKENS)
+
+
+def _split(messages: List[Any]) -> Tuple[int, int]:
+    """Return ``(pinned_end, tail_start)`` for the message list."""
+    pinned_end = 0
+    while (
+        pinned_end < len(messages)
+        and isinstance(messages[pinned_end], dict)
+        and messages[pinned_end].get("role") == "system"
+    ):
+        pinned_end += 1
+    tail_start = len(messages)
+    for idx in range(len(messages) - 1, pinned_end - 1, -1):
+        item = messages[idx]
+        if isinstance(item, dict) and item.get("role") == "user":
+            tail_start = idx
+            break
+    return pinned_end, max(pinned_end, tail_start)
+
+
+def _history_groups(messages: List[Any], start: int, end: int) -> List[Tuple[int, int]]:
+    groups: List[Tuple[int, int]] = []
+    for idx in range(start, end):
+        item = messages[idx]
+        role = item.get("role") if isinstance(item, dict) else ""
+        if role == "tool" and groups:
+            groups[-1] = (groups[-1][0], idx + 1)
+        else:
+            groups.append((idx, idx + 1))
+    return groups
+
+
+def _truncate_text(text: str, tokens: int, target_tokens: int) -> str:
+    if tokens <= target_tokens or not text:
+        return text
+    # 标记本身也占 token，先从目标里扣掉，避免截断后仍略超预算。
+    marker_tokens = estimate_tokens(_TRUNCATION_MARKER.format(omitted=len(text)))
+    keep_chars = max(1, int(len(text) * (target_tokens - marker_tokens) / tokens))
+    if keep_chars >= len(text):
+        return text
+    head = keep_chars * 2 // 3
+    tail = keep_chars - head
+    omitted = len(text) - head - tail
+    return (
+        text[:head]
+        + _TRUNCATION_MARKER.format(omitted=omitted)
+        + (text[-tail:] if tail else "")
+    )
+
+
+def fit_chat_request(
+    request_kwargs: Dict[str, Any],
+    *,
+    model_key: str,
+) -> Tuple[Dict[str, Any], BudgetReport | None]:
+    payload = dict(request_kwargs)
+    messages = payload.get("messages")
+    if not CONTEXT_BUDGET_ENABLED or not isinstance(messages, list):
+        return payload, None
+
+    started = time.perf_counter()
+    context_window, max_tokens = resolve_model_limits(model_key)
+    reserve = _output_reserve(request_kwargs, max_tokens)
+    tools_tokens = estimate_tools_tokens(payload.get("tools"))
+    budget = max(0, int(context_window * CONTEXT_BUDGET_SAFETY_RATIO) - reserve)
+    costs = [estimate_message_tokens(item) for item in messages]
+    pinned_end, tail_start = _split(messages)
+    report = BudgetReport(
+        model=model_key,
+        context_window=context_window,
+        output_reserve=reserve,
+        budget=budget,
+        tools_tokens=tools_tokens,
+        system_tokens=sum(costs[:pinned_end]),
+        history_tokens=sum(costs[pinned_end:tail_start]),
+        turn_tokens=sum(costs[tail_start:]),
+    )
+    total = sum(costs)
+    report.input_tokens_before = total + tools_tokens
+    # tools schema 不可裁剪，剩下的才是消息可用的预算。
+    budget = max(0, budget - tools_tokens)
+
+    if total > budget:
+        working = list(messages)
+        # 1) 最大的工具结果优先做首尾截断。
+        tool_indexes = sorted(
+            (
+                idx
+                for idx, item in enumerate(working)
+                if isinstance(item, dict)
+                and item.get("role") == "tool"
+                and isinstance(item.get("content"), str)
+                and costs[idx] > CONTEXT_BUDGET_TOOL_RESULT_MIN_TOKENS
+            ),
+            key=lambda idx: costs[idx],
+            reverse=True,
+        )
+        for idx in tool_indexes:
+            if total <= budget:
+                break
+            item = dict(working[idx])
+            content = str(item.get("content") or "")
+            content_tokens = estimate_tokens(content)
+            target = max(
+                CONTEXT_BUDGET_TOOL_RESULT_MIN_TOKENS,
+                content_tokens - (total - budget),
+            )
+            item["content"] = _truncate_text(content, content_tokens, target)
+            new_cost = estimate_message_tokens(item)
+            if new_cost >= costs[idx]:
+                continue
+            working[idx] = item
+            total -= costs[idx] - new_cost
+            costs[idx] = new_cost
+            report.truncated_tool_results += 1
+
+        # 2) 仍超预算时，从最早的历史开始整组丢弃。
+        dropped: set[int] = set()
+        for start, end in _history_groups(working, pinned_end, tail_start):
+            if total <= budget:
+                break
+            dropped.update(range(start, end))
+            total -= sum(costs[start:end])
+            report.dropped_messages += end - start
+        if dropped:
+            working = [item for idx, item in enumerate(working) if idx not in dropped]
+        payload["messages"] = working
+        report.over_budget = total > budget
+
+    report.input_tokens_after = total + tools_tokens
+    report.elapsed_ms = round((time.perf_counter() - started) * 1000.0, 3)
+    context_budget_stats.record(report)
+    if report.changed or report.over_budget:
+        logger.info(
+            "[ContextBudget] model=%s tokens %s -> %s (budget=%s) truncated=%s dropped=%s over=%s",
+            model_key,
+            report.input_tokens_before,
+            report.input_tokens_after,
+            report.budget,
+            report.truncated_tool_results,
+            report.dropped_messages,
+            report.over_budget,
+        )
+    return payload, report
+
+
+class ContextBudgetStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._recent: "deque[BudgetReport]" = deque(maxlen=_RECENT_REPORTS)
+        self._requests = 0
+        self._trimmed = 0
+        self._over_budget = 0
+        self._tokens_before = 0
+        self._tokens_after = 0
+
+    def record(self, report: BudgetReport) -> None:
+        with self._lock:
+            self._recent.append(report)
+            self._requests += 1
+            self._trimmed += 1 if report.changed else 0
+            self._over_budget += 1 if report.over_budget else 0
+            self._tokens_before += report.input_tokens_before
+            self._tokens_after += report.input_tokens_after
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "trimmed": self._trimmed,
+                "over_budget": self._over_budget,
+                "input_tokens_before": self._tokens_before,
+                "input_tokens_after": self._tokens_after,
+                "recent": [item.to_dict() for item in self._recent],
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._requests = 0
+            self._trimmed = 0
+            self._over_budget = 0
+            self._tokens_before = 0
+            self._tokens_after = 0
+
+    def render_summary(self, *, limit: int = 5) -> str:
+        snapshot = self.snapshot()
+        if not snapshot["requests"]:
+            return "📐 暂无上下文预算统计。"
+        lines = [
+            "📐 上下文预算",
+            "",
+            f"- 请求数：`{snapshot['requests']}` | 触发裁剪：`{snapshot['trimmed']}`"
+            f" | 仍超预算：`{snapshot['over_budget']}`",
+            f"- 输入估算：`{snapshot['input_tokens_before']}` → "
+            f"`{snapshot['input_tokens_after']}` tokens",
+            "",
+            "最近请求：",
+        ]
+        for row in reversed(snapshot["recent"][-max(1, limit):]):
+            lines.append(
+                f"- `{row['model']}` | 窗口={row['context_window']} 预留输出={row['output_reserve']}"
+                f" | system={row['system_tokens']} 历史={row['history_tokens']}"
+                f" 本轮={row['turn_tokens']} tools={row['tools_tokens']}"
+                f" | {row['input_tokens_before']}→{row['input_tokens_after']}"
+                f" | 截断={row['truncated_tool_results']} 丢弃={row['dropped_messages']}"
+            )
+        return "\n".join(lines)
+
+
+context_budget_stats = ContextBudgetStats()
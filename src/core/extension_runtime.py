@@ -5,6 +5,7 @@ import logging
 from pathlib import Path
 from typing import Any, Callable, Iterable, Sequence
 
+from core.perf_trace import traced
 from core.platform.registry import adapter_manager
 
 logger = logging.getLogger(__name__)
@@ -47,6 +48,8 @@ class ExtensionRuntime:
         platforms: Sequence[str] | None = None,
         **kwargs: Any,
     ) -> None:
+        if inspect.iscoroutinefunction(handler_func):
+            handler_func = traced(f"handler.command.{command}")(handler_func)
         safe_platforms = [str(item).strip().lower() for item in list(platforms or []) if str(item).strip()]
         if safe_platforms:
             for platform_name in safe_platforms:
@@ -65,6 +68,8 @@ class ExtensionRuntime:
         *,
         platforms: Sequence[str] | None = None,
     ) -> None:
+        if inspect.iscoroutinefunction(handler_func):
+            handler_func = traced("handler.callback")(handler_func)
         safe_platforms = [str(item).strip().lower() for item in list(platforms or []) if str(item).strip()]
         if safe_platforms:
             for platform_name in safe_platforms:
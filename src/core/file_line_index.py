@@ -0,0 +1,143 @@
+"""Sparse line-offset index for range reads of large text files.
+
+``read`` 原语只需要文件里的一小段行窗口，这里按 (path, mtime_ns, size) 缓存一份
+稀疏索引：每 ``stride`` 行记录一次该行起始字节偏移，外加总行数。首次访问时按
+块顺序扫描一遍（只数换行符，不解码、不保留内容）；之后深入文件中部的
+``start_line`` 只需 seek 到最近的检查点再向后跳过不足 ``stride`` 行。
+
+窗口读取按字节预算截断，超长的单行文件（压缩 JSON、minified 脚本）也不会把
+整个文件读进内存。
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+
+_SCAN_CHUNK_BYTES = 1 << 20
+_DEFAULT_STRIDE = 1024
+_MAX_INDEXED_FILES = 64
+
+_INDEX: dict[str, "_LineIndex"] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+@dataclass
+class _LineIndex:
+    mtime_ns: int
+    size: int
+    stride: int
+    total_lines: int = 0
+    # checkpoints[k] 是第 ``k * stride + 1`` 行的起始字节偏移。
+    checkpoints: list[int] = field(default_factory=list)
+
+
+@dataclass
+class LineWindow:
+    start_line: int
+    total_lines: int
+    lines: list[bytes]
+    truncated: bool = False
+
+
+def _build_index(handle, mtime_ns: int, size: int, stride: int) -> _LineIndex:
+    index = _LineIndex(mtime_ns=mtime_ns, size=size, stride=stride, checkpoints=[0])
+    newlines = 0
+    offset = 0
+    last_byte = b""
+    while True:
+        chunk = handle.read(_SCAN_CHUNK_BYTES)
+        if not chunk:
+            break
+        pos = chunk.find(b"\n")
+        while pos != -1:
+            newlines += 1
+            if newlines % stride == 0:
+                index.checkpoints.append(offset + pos + 1)
+            pos = chunk.find(b"\n", pos + 1)
+        offset += len(chunk)
+        last_byte = chunk[-1:]
+    index.size = offset
+    index.total_lines = newlines + (1 if offset and last_byte != b"\n" else 0)
+    if index.checkpoints[-1] >= offset and len(index.checkpoints) > 1:
+        # 文件以换行结尾且行数正好是 stride 的整数倍时，末尾检查点指向 EOF。
+        index.checkpoints.pop()
+    return index
+
+
+def _remember(key: str, index: _LineIndex) -> None:
+    with _INDEX_LOCK:
+        _INDEX.pop(key, None)
+        _INDEX[key] = index
+        while len(_INDEX) > _MAX_INDEXED_FILES:
+            _INDEX.pop(next(iter(_INDEX)), None)
+
+
+def invalidate(path: str) -> None:
+    with _INDEX_LOCK:
+        _INDEX.pop(os.path.abspath(path), None)
+
+
+def _load_index(handle, key: str, stride: int) -> _LineIndex:
+    stat = os.fstat(handle.fileno())
+    with _INDEX_LOCK:
+        index = _INDEX.get(key)
+    if (
+        index is not None
+        and index.mtime_ns == stat.st_mtime_ns
+        and index.size == stat.st_size
+        and index.stride == stride
+    ):
+        return index
+    handle.seek(0)
+    index = _build_index(handle, stat.st_mtime_ns, stat.st_size, stride)
+    _remember(key, index)
+    return index
+
+
+def read_line_window(
+    path: str,
+    start_line: int,
+    max_lines: int,
+    *,
+    max_bytes: int,
+    tail: bool = False,
+    stride: int = _DEFAULT_STRIDE,
+) -> LineWindow:
+    """Return raw lines ``[start_line, start_line + max_lines)`` of ``path``.
+
+    ``tail=True`` ignores ``start_line`` and returns the last ``max_lines``
+    lines. Line terminators are kept; at most ``max_bytes`` bytes are read,
+    the last line may be cut short and ``truncated`` is set in that case.
+    """
+    key = os.path.abspath(path)
+    with open(key, "rb") as handle:
+        index = _load_index(handle, key, max(1, int(stride)))
+        total = index.total_lines
+        if tail:
+            start_line = max(1, total - max_lines + 1)
+        window = LineWindow(start_line=start_line, total_lines=total, lines=[])
+        if start_line > total:
+            return window
+
+        checkpoint = min((start_line - 1) // index.stride, len(index.checkpoints) - 1)
+        handle.seek(index.checkpoints[checkpoint])
+        for _ in range(start_line - 1 - checkpoint * index.stride):
+            if not handle.readline():
+                return window
+
+        budget = max(1, int(max_bytes))
+        while len(window.lines) < max_lines:
+            line = handle.readline(budget)
+            if not line:
+                break
+            budget -= len(line)
+            window.lines.append(line)
+            if budget <= 0:
+                window.truncated = not line.endswith(b"\n") or (
+                    len(window.lines) < max_lines
+                    and start_line + len(window.lines) <= total
+                )
+                break
+    return window
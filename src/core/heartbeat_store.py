@@ -14,6 +14,7 @@ from typing import Any
 import yaml
 
 from core.config import DATA_DIR
+from core.perf_trace import traced
 from core.state_paths import SINGLE_USER_SCOPE
 
 try:
@@ -519,6 +520,7 @@ class HeartbeatStore:
             notes = []
         return best_status, notes
 
+    @traced("store.heartbeat.write_status")
     def _write_status_unlocked(self, status: dict[str, Any]) -> dict[str, Any]:
         path = self.status_path(self.scope)
         normalized = self._normalize_status(status)
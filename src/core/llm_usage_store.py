@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
 import contextvars
 import inspect
 import logging
-import math
 import re
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
@@ -14,6 +17,8 @@ from typing import Any
 
 from core.config import DATA_DIR
 from core.model_config import get_model_id_for_api, get_models_config, load_models_config
+from core.perf_trace import traced
+from core.token_estimator import estimate_tokens
 from services.openai_adapter import (
     build_chat_completion_from_stream_chunks,
     is_async_chat_completion_stream,
@@ -23,6 +28,33 @@ from services.openai_adapter import (
 logger = logging.getLogger(__name__)
 
 _USAGE_TABLE = "llm_usage_daily_session_model"
+_USAGE_COUNTER_COLUMNS = (
+    "requests",
+    "success_requests",
+    "failed_requests",
+    "usage_requests",
+    "missing_usage_requests",
+    "estimated_token_requests",
+    "input_tokens",
+    "output_tokens",
+    "total_tokens",
+    "image_outputs",
+    "cache_hit_requests",
+    "cache_read_tokens",
+    "cache_write_tokens",
+)
+_USAGE_UPSERT_SQL = f"""
+    INSERT INTO {_USAGE_TABLE} (
+        day, session_id, model_key, {", ".join(_USAGE_COUNTER_COLUMNS)},
+        first_used_at, last_used_at
+    ) VALUES ({", ".join(["?"] * (len(_USAGE_COUNTER_COLUMNS) + 5))})
+    ON CONFLICT(day, session_id, model_key) DO UPDATE SET
+        {", ".join(
+            f"{column} = {_USAGE_TABLE}.{column} + excluded.{column}"
+            for column in _USAGE_COUNTER_COLUMNS
+        )},
+        last_used_at = MAX({_USAGE_TABLE}.last_used_at, excluded.last_used_at)
+"""
 _USAGE_SESSION_VAR: contextvars.ContextVar[str] = contextvars.ContextVar(
     "llm_usage_session_id",
     default="",
@@ -156,20 +188,6 @@ def _read_field(payload: Any, *path: str) -> Any:
     return current
 
 
-def _is_cjk_char(char: str) -> bool:
-    code = ord(char)
-    return (
-        0x3400 <= code <= 0x4DBF
-        or 0x4E00 <= code <= 0x9FFF
-        or 0xF900 <= code <= 0xFAFF
-        or 0x20000 <= code <= 0x2A6DF
-        or 0x2A700 <= code <= 0x2B73F
-        or 0x2B740 <= code <= 0x2B81F
-        or 0x2B820 <= code <= 0x2CEAF
-        or 0x2CEB0 <= code <= 0x2EBEF
-    )
-
-
 def _looks_like_binary_text(value: str) -> bool:
     text = str(value or "").strip()
     if not text:
@@ -276,16 +294,14 @@ def _collect_estimate_text(
 
 
 def _estimate_token_count(value: Any) -> int:
-    text = str(value or "").strip()
-    if not text:
-        return 0
-    cjk_chars = sum(1 for char in text if _is_cjk_char(char))
-    non_cjk = "".join(char for char in text if not _is_cjk_char(char))
-    non_cjk_bytes = len(non_cjk.encode("utf-8"))
-    estimate = cjk_chars + math.ceil(non_cjk_bytes / 4)
-    if estimate <= 0:
-        return 0
-    return max(1, estimate)
+    return estimate_tokens(value)
+
+
+def _ratio_text(part: Any, whole: Any) -> str:
+    denominator = _int_value(whole)
+    if denominator <= 0:
+        return "0.0%"
+    return f"{_int_value(part) * 100.0 / denominator:.1f}%"
 
 
 def _estimate_request_tokens(request_kwargs: dict[str, Any] | None) -> int:
@@ -582,10 +598,42 @@ def _blank_summary_row(model_key: str) -> dict[str, Any]:
 
 
 class LlmUsageStore:
-    def __init__(self) -> None:
+    """Daily per-session/per-model LLM usage counters.
+
+    ``record_event`` 只在内存里按 (db, day, session, model) 累加增量，不碰磁盘；
+    后台线程每 ``flush_interval_ms`` 或累计 ``flush_max_events`` 次调用后，
+    用一条常驻的 WAL 连接把增量合并成一个事务写入。读接口先 ``flush``，
+    保证读到自己刚记下的用量；进程退出时 ``atexit`` 兜底再刷一次。
+    当天各模型的累计值另有一份写穿缓存（见 ``_today_totals``），供选模型时
+    的额度判断与 ``least_usage`` 排序使用；缓存的定期重新汇总也在 flusher
+    线程里做。
+    """
+
+    def __init__(
+        self,
+        *,
+        flush_interval_ms: int = 500,
+        flush_max_events: int = 64,
+        daily_refresh_sec: float = 5.0,
+    ) -> None:
         self.db_path = (Path(DATA_DIR).resolve() / "bot_data.db").resolve()
+        self.flush_interval_sec = max(1, int(flush_interval_ms)) / 1000
+        self.flush_max_events = max(1, int(flush_max_events))
         self._lock = Lock()
         self._db_ready = False
+        self._pending: dict[tuple[str, str, str, str], dict[str, Any]] = {}
+        self._pending_events = 0
+        self._pending_lock = Lock()
+        self._flush_lock = Lock()
+        self._writer_conn: sqlite3.Connection | None = None
+        self._writer_path = ""
+        self._writer_ready: set[str] = set()
+        self._wakeup = threading.Event()
+        self.daily_refresh_sec = max(0.0, float(daily_refresh_sec))
+        self._daily_cache: dict[str, Any] | None = None
+        self._daily_lock = Lock()
+        self._flusher: threading.Thread | None = None
+        self._closed = False
 
     def _connect(self) -> sqlite3.Connection:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
@@ -593,10 +641,11 @@ class LlmUsageStore:
         conn.row_factory = sqlite3.Row
         return conn
 
-    def _ensure_db(self) -> None:
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
         def _ensure_columns(conn: sqlite3.Connection) -> None:
             existing_columns = {
-                str(row["name"] or "").strip()
+                str(row[1] or "").strip()
                 for row in conn.execute(f"PRAGMA table_info({_USAGE_TABLE})").fetchall()
             }
             if "image_outputs" not in existing_columns:
@@ -607,52 +656,212 @@ class LlmUsageStore:
                     """
                 )
 
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {_USAGE_TABLE} (
+                day TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                model_key TEXT NOT NULL,
+                requests INTEGER NOT NULL DEFAULT 0,
+                success_requests INTEGER NOT NULL DEFAULT 0,
+                failed_requests INTEGER NOT NULL DEFAULT 0,
+                usage_requests INTEGER NOT NULL DEFAULT 0,
+                missing_usage_requests INTEGER NOT NULL DEFAULT 0,
+                estimated_token_requests INTEGER NOT NULL DEFAULT 0,
+                input_tokens INTEGER NOT NULL DEFAULT 0,
+                output_tokens INTEGER NOT NULL DEFAULT 0,
+                total_tokens INTEGER NOT NULL DEFAULT 0,
+                image_outputs INTEGER NOT NULL DEFAULT 0,
+                cache_hit_requests INTEGER NOT NULL DEFAULT 0,
+                cache_read_tokens INTEGER NOT NULL DEFAULT 0,
+                cache_write_tokens INTEGER NOT NULL DEFAULT 0,
+                first_used_at TEXT NOT NULL,
+                last_used_at TEXT NOT NULL,
+                PRIMARY KEY (day, session_id, model_key)
+            )
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_{_USAGE_TABLE}_day_model
+            ON {_USAGE_TABLE} (day, model_key)
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_{_USAGE_TABLE}_last_used
+            ON {_USAGE_TABLE} (last_used_at)
+            """
+        )
+        _ensure_columns(conn)
+
+    def _ensure_db(self) -> None:
         if self._db_ready:
             return
         with self._lock:
             if self._db_ready:
                 return
             with self._connect() as conn:
-                conn.execute(
-                    f"""
-                    CREATE TABLE IF NOT EXISTS {_USAGE_TABLE} (
-                        day TEXT NOT NULL,
-                        session_id TEXT NOT NULL,
-                        model_key TEXT NOT NULL,
-                        requests INTEGER NOT NULL DEFAULT 0,
-                        success_requests INTEGER NOT NULL DEFAULT 0,
-                        failed_requests INTEGER NOT NULL DEFAULT 0,
-                        usage_requests INTEGER NOT NULL DEFAULT 0,
-                        missing_usage_requests INTEGER NOT NULL DEFAULT 0,
-                        estimated_token_requests INTEGER NOT NULL DEFAULT 0,
-                        input_tokens INTEGER NOT NULL DEFAULT 0,
-                        output_tokens INTEGER NOT NULL DEFAULT 0,
-                        total_tokens INTEGER NOT NULL DEFAULT 0,
-                        image_outputs INTEGER NOT NULL DEFAULT 0,
-                        cache_hit_requests INTEGER NOT NULL DEFAULT 0,
-                        cache_read_tokens INTEGER NOT NULL DEFAULT 0,
-                        cache_write_tokens INTEGER NOT NULL DEFAULT 0,
-                        first_used_at TEXT NOT NULL,
-                        last_used_at TEXT NOT NULL,
-                        PRIMARY KEY (day, session_id, model_key)
-                    )
-                    """
+                self._create_schema(conn)
+            self._db_ready = True
+
+    # -- batched writer ---------------------------------------------------
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._pending_lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._closed = False
+            self._flusher = threading.Thread(
+                target=self._flush_loop,
+                name="llm-usage-flusher",
+                daemon=True,
+            )
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(timeout=self.flush_interval_sec)
+            self._wakeup.clear()
+            self.flush()
+            try:
+                self._maybe_refresh_daily_cache()
+            except Exception:
+                logger.warning("Failed to refresh daily llm usage totals", exc_info=True)
+
+    def _get_writer(self, db_path: str) -> sqlite3.Connection:
+        if self._writer_conn is not None and self._writer_path == db_path:
+            return self._writer_conn
+        self._close_writer()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if db_path not in self._writer_ready:
+            with conn:
+                self._create_schema(conn)
+            self._writer_ready.add(db_path)
+        self._writer_conn = conn
+        self._writer_path = db_path
+        return conn
+
+    def _close_writer(self) -> None:
+        conn, self._writer_conn = self._writer_conn, None
+        self._writer_path = ""
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _enqueue(
+        self,
+        *,
+        day: str,
+        session_id: str,
+        model_key: str,
+        increments: dict[str, int],
+        ts: str,
+    ) -> None:
+        db_path = str(self.db_path)
+        key = (db_path, day, session_id, model_key)
+        with self._daily_lock, self._pending_lock:
+            bucket = self._pending.get(key)
+            if bucket is None:
+                bucket = {column: 0 for column in _USAGE_COUNTER_COLUMNS}
+                bucket["first_used_at"] = ts
+                self._pending[key] = bucket
+            for column in _USAGE_COUNTER_COLUMNS:
+                bucket[column] += int(increments.get(column) or 0)
+            bucket["last_used_at"] = ts
+            self._pending_events += 1
+            full = self._pending_events >= self.flush_max_events
+            cache = self._daily_cache
+            if cache is not None and cache["db"] == db_path and cache["day"] == day:
+                totals = cache["models"].get(model_key)
+                if totals is None:
+                    totals = _blank_summary_row(model_key)
+                    cache["models"][model_key] = totals
+                for column in _USAGE_COUNTER_COLUMNS:
+                    totals[column] += int(increments.get(column) or 0)
+        if full:
+            self._wakeup.set()
+
+    @traced("store.llm_usage.flush")
+    def flush(self) -> int:
+        """Write buffered increments now; returns the number of rows upserted."""
+        with self._flush_lock:
+            return self._flush_locked()
+
+    def _flush_locked(self) -> int:
+        with self._pending_lock:
+            batch, self._pending = self._pending, {}
+            self._pending_events = 0
+        if not batch:
+            return 0
+        by_db: dict[str, list[tuple[Any, ...]]] = {}
+        for (db_path, day, session_id, model_key), bucket in batch.items():
+            by_db.setdefault(db_path, []).append(
+                (
+                    day,
+                    session_id,
+                    model_key,
+                    *(bucket[column] for column in _USAGE_COUNTER_COLUMNS),
+                    bucket["first_used_at"],
+                    bucket["last_used_at"],
                 )
-                conn.execute(
-                    f"""
-                    CREATE INDEX IF NOT EXISTS idx_{_USAGE_TABLE}_day_model
-                    ON {_USAGE_TABLE} (day, model_key)
-                    """
+            )
+        written = 0
+        for db_path, rows in by_db.items():
+            try:
+                conn = self._get_writer(db_path)
+                with conn:
+                    conn.executemany(_USAGE_UPSERT_SQL, rows)
+                written += len(rows)
+            except Exception:
+                self._close_writer()
+                # 写库失败（如 database is locked）时把这批增量放回缓冲区，
+                # 下次 flush 重试，不丢计数。
+                self._requeue(
+                    {key: bucket for key, bucket in batch.items() if key[0] == db_path}
                 )
-                conn.execute(
-                    f"""
-                    CREATE INDEX IF NOT EXISTS idx_{_USAGE_TABLE}_last_used
-                    ON {_USAGE_TABLE} (last_used_at)
-                    """
+                logger.warning(
+                    "Failed to persist %d llm usage rows; will retry on next flush",
+                    len(rows),
+                    exc_info=True,
+                )
+        return written
+
+    def _requeue(self, failed: dict[tuple[str, str, str, str], dict[str, Any]]) -> None:
+        with self._pending_lock:
+            for key, bucket in failed.items():
+                current = self._pending.get(key)
+                if current is None:
+                    self._pending[key] = bucket
+                    continue
+                for column in _USAGE_COUNTER_COLUMNS:
+                    current[column] += bucket[column]
+                current["first_used_at"] = min(
+                    current["first_used_at"], bucket["first_used_at"]
+                )
+                current["last_used_at"] = max(
+                    current["last_used_at"], bucket["last_used_at"]
                 )
-                _ensure_columns(conn)
-            self._db_ready = True
 
+    def close(self) -> None:
+        """Stop the background flusher and write everything still buffered."""
+        self._closed = True
+        self._wakeup.set()
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join(timeout=5)
+        self.flush()
+        with self._flush_lock:
+            self._close_writer()
+
+    @traced("store.llm_usage.record")
     def record_event(
         self,
         *,
@@ -693,87 +902,17 @@ class LlmUsageStore:
             "cache_read_tokens": _int_value(metrics.get("cache_read_tokens")),
             "cache_write_tokens": _int_value(metrics.get("cache_write_tokens")),
         }
-
-        columns = [
-            "day",
-            "session_id",
-            "model_key",
-            "requests",
-            "success_requests",
-            "failed_requests",
-            "usage_requests",
-            "missing_usage_requests",
-            "estimated_token_requests",
-            "input_tokens",
-            "output_tokens",
-            "total_tokens",
-            "image_outputs",
-            "cache_hit_requests",
-            "cache_read_tokens",
-            "cache_write_tokens",
-            "first_used_at",
-            "last_used_at",
-        ]
-        placeholders = ", ".join(["?"] * len(columns))
-        update_columns = [
-            "requests",
-            "success_requests",
-            "failed_requests",
-            "usage_requests",
-            "missing_usage_requests",
-            "estimated_token_requests",
-            "input_tokens",
-            "output_tokens",
-            "total_tokens",
-            "image_outputs",
-            "cache_hit_requests",
-            "cache_read_tokens",
-            "cache_write_tokens",
-        ]
-        assignments = ", ".join(
-            f"{column} = {_USAGE_TABLE}.{column} + excluded.{column}"
-            for column in update_columns
+        self._enqueue(
+            day=day,
+            session_id=session_id,
+            model_key=model_key,
+            increments=increments,
+            ts=ts,
         )
-        assignments += ", last_used_at = excluded.last_used_at"
-
-        values = [
-            day,
-            session_id,
-            model_key,
-            increments["requests"],
-            increments["success_requests"],
-            increments["failed_requests"],
-            increments["usage_requests"],
-            increments["missing_usage_requests"],
-            increments["estimated_token_requests"],
-            increments["input_tokens"],
-            increments["output_tokens"],
-            increments["total_tokens"],
-            increments["image_outputs"],
-            increments["cache_hit_requests"],
-            increments["cache_read_tokens"],
-            increments["cache_write_tokens"],
-            ts,
-            ts,
-        ]
-
-        self._ensure_db()
-        with self._lock:
-            try:
-                with self._connect() as conn:
-                    conn.execute(
-                        f"""
-                        INSERT INTO {_USAGE_TABLE} ({", ".join(columns)})
-                        VALUES ({placeholders})
-                        ON CONFLICT(day, session_id, model_key)
-                        DO UPDATE SET {assignments}
-                        """,
-                        values,
-                    )
-            except Exception:
-                logger.debug("Failed to persist llm usage row", exc_info=True)
+        self._ensure_flusher()
 
     def summarize(self, *, day: str | None = None) -> dict[str, Any]:
+        self.flush()
         self._ensure_db()
         overall = _blank_summary_row("overall")
         overall["models"] = []
@@ -877,35 +1016,20 @@ class LlmUsageStore:
         ]
         return overall
 
-    def summarize_models(
+    def _query_model_totals(
         self,
-        model_keys: list[str],
-        *,
-        day: str | None = None,
+        day: str,
+        model_keys: list[str] | None = None,
     ) -> dict[str, dict[str, int]]:
-        """按模型汇总日用量，默认取今天。"""
-        self._ensure_db()
-        normalized_keys = [
-            str(model_key or "").strip()
-            for model_key in model_keys
-            if str(model_key or "").strip()
-        ]
-        summary = {
-            model_key: _blank_summary_row(model_key)
-            for model_key in normalized_keys
-        }
-        if not normalized_keys:
-            return summary
-
-        effective_day = _today_iso() if day is None else str(day or "").strip()
-        placeholders = ", ".join("?" for _ in normalized_keys)
         params: list[Any] = []
-        where_clauses = [f"model_key IN ({placeholders})"]
-        params.extend(normalized_keys)
-        if effective_day:
-            where_clauses.insert(0, "day = ?")
-            params.insert(0, effective_day)
-        where_sql = f"WHERE {' AND '.join(where_clauses)}"
+        where_clauses: list[str] = []
+        if day:
+            where_clauses.append("day = ?")
+            params.append(day)
+        if model_keys is not None:
+            where_clauses.append(f"model_key IN ({', '.join('?' for _ in model_keys)})")
+            params.extend(model_keys)
+        where_sql = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
 
         with self._lock:
             with self._connect() as conn:
@@ -933,26 +1057,111 @@ class LlmUsageStore:
                     params,
                 ).fetchall()
 
+        totals: dict[str, dict[str, int]] = {}
         for row in rows:
             model_key = str(row["model_key"] or "").strip()
             if not model_key:
                 continue
-            summary[model_key] = {
+            totals[model_key] = {
                 "model_key": model_key,
-                "requests": _int_value(row["requests"]),
-                "success_requests": _int_value(row["success_requests"]),
-                "failed_requests": _int_value(row["failed_requests"]),
-                "usage_requests": _int_value(row["usage_requests"]),
-                "missing_usage_requests": _int_value(row["missing_usage_requests"]),
-                "estimated_token_requests": _int_value(row["estimated_token_requests"]),
-                "input_tokens": _int_value(row["input_tokens"]),
-                "output_tokens": _int_value(row["output_tokens"]),
-                "total_tokens": _int_value(row["total_tokens"]),
-                "image_outputs": _int_value(row["image_outputs"]),
-                "cache_hit_requests": _int_value(row["cache_hit_requests"]),
-                "cache_read_tokens": _int_value(row["cache_read_tokens"]),
-                "cache_write_tokens": _int_value(row["cache_write_tokens"]),
+                **{column: _int_value(row[column]) for column in _USAGE_COUNTER_COLUMNS},
+            }
+        return totals
+
+    def _refresh_daily_cache(self) -> None:
+        """Rebuild today's per-model totals from the database.
+
+        先把缓冲区落库再汇总；汇总期间新入队、还没落库的增量在换上新缓存时
+        补进去。整个过程持有 ``_flush_lock``，不会有增量在两步之间被别的
+        ``flush`` 写走而漏算。
+        """
+        day = _today_iso()
+        db_path = str(self.db_path)
+        with self._flush_lock:
+            self._flush_locked()
+            self._ensure_db()
+            models = self._query_model_totals(day)
+            with self._daily_lock, self._pending_lock:
+                for (pending_db, pending_day, _session, model_key), bucket in (
+                    self._pending.items()
+                ):
+                    if pending_db != db_path or pending_day != day:
+                        continue
+                    totals = models.get(model_key)
+                    if totals is None:
+                        totals = _blank_summary_row(model_key)
+                        models[model_key] = totals
+                    for column in _USAGE_COUNTER_COLUMNS:
+                        totals[column] += int(bucket[column])
+                self._daily_cache = {
+                    "db": db_path,
+                    "day": day,
+                    "loaded_at": time.monotonic(),
+                    "models": models,
+                }
+
+    def _maybe_refresh_daily_cache(self) -> None:
+        # 由 flusher 线程调用：只刷新已经有人在用的缓存。
+        cache = self._daily_cache
+        if cache is None:
+            return
+        if (
+            cache["db"] == str(self.db_path)
+            and cache["day"] == _today_iso()
+            and time.monotonic() - cache["loaded_at"] < self.daily_refresh_sec
+        ):
+            return
+        self._refresh_daily_cache()
+
+    def _today_totals(self, model_keys: list[str]) -> dict[str, dict[str, int]]:
+        """Today's per-model totals from the write-through cache.
+
+        这里只读缓存：本进程 ``record_event`` 的增量直接累加在缓存上，
+        每 ``daily_refresh_sec`` 从库里重新汇总（吸收其它进程写入的用量）
+        由后台 flusher 线程完成，不在调用方线程里跑 ``GROUP BY``。
+        只有冷启动、跨过零点或换库时缓存对不上，才同步汇总一次。
+        """
+        day = _today_iso()
+        db_path = str(self.db_path)
+        cache = self._daily_cache
+        if cache is None or cache["db"] != db_path or cache["day"] != day:
+            self._refresh_daily_cache()
+            self._ensure_flusher()
+        with self._daily_lock:
+            cache = self._daily_cache or {"models": {}}
+            return {
+                model_key: dict(cache["models"][model_key])
+                for model_key in model_keys
+                if model_key in cache["models"]
             }
+
+    def summarize_models(
+        self,
+        model_keys: list[str],
+        *,
+        day: str | None = None,
+    ) -> dict[str, dict[str, int]]:
+        """按模型汇总日用量，默认取今天（今天的数据走内存缓存）。"""
+        normalized_keys = [
+            str(model_key or "").strip()
+            for model_key in model_keys
+            if str(model_key or "").strip()
+        ]
+        summary = {
+            model_key: _blank_summary_row(model_key)
+            for model_key in normalized_keys
+        }
+        if not normalized_keys:
+            return summary
+
+        effective_day = _today_iso() if day is None else str(day or "").strip()
+        if effective_day == _today_iso():
+            summary.update(self._today_totals(normalized_keys))
+            return summary
+
+        self.flush()
+        self._ensure_db()
+        summary.update(self._query_model_totals(effective_day, normalized_keys))
         return summary
 
     def render_summary(
@@ -983,8 +1192,10 @@ class LlmUsageStore:
             f"- 输出 tokens：`{summary.get('output_tokens', 0)}`",
             f"- 总 tokens：`{summary.get('total_tokens', 0)}`",
             f"- 图片产出数：`{summary.get('image_outputs', 0)}`",
-            f"- 缓存命中请求：`{summary.get('cache_hit_requests', 0)}`",
-            f"- 缓存命中 tokens：`{summary.get('cache_read_tokens', 0)}`",
+            f"- 缓存命中请求：`{summary.get('cache_hit_requests', 0)}`"
+            f"（`{_ratio_text(summary.get('cache_hit_requests', 0), summary.get('usage_requests', 0))}`）",
+            f"- 缓存命中 tokens：`{summary.get('cache_read_tokens', 0)}`"
+            f"（占输入 `{_ratio_text(summary.get('cache_read_tokens', 0), summary.get('input_tokens', 0))}`）",
             f"- 缓存写入 tokens：`{summary.get('cache_write_tokens', 0)}`",
         ]
         last_event_at = str(summary.get("last_event_at") or "").strip()
@@ -1013,14 +1224,18 @@ class LlmUsageStore:
         )
 
     def reset(self) -> int:
-        self._ensure_db()
-        with self._lock:
-            with self._connect() as conn:
-                count_row = conn.execute(
-                    f"SELECT COUNT(*) AS count FROM {_USAGE_TABLE}"
-                ).fetchone()
-                count = _int_value(count_row["count"] if count_row else 0)
-                conn.execute(f"DELETE FROM {_USAGE_TABLE}")
+        with self._flush_lock:
+            self._flush_locked()
+            self._ensure_db()
+            with self._lock:
+                with self._connect() as conn:
+                    count_row = conn.execute(
+                        f"SELECT COUNT(*) AS count FROM {_USAGE_TABLE}"
+                    ).fetchone()
+                    count = _int_value(count_row["count"] if count_row else 0)
+                    conn.execute(f"DELETE FROM {_USAGE_TABLE}")
+            with self._daily_lock:
+                self._daily_cache = None
         return count
 
 
@@ -1074,6 +1289,26 @@ class _TrackedOpenAIProxy:
         except Exception:
             logger.debug("Failed to persist llm usage failure row", exc_info=True)
 
+    def _record_cancelled(
+        self,
+        *,
+        operation: str,
+        request_kwargs: dict[str, Any],
+        chunks: list[Any],
+    ) -> None:
+        # 被取消的请求（如对冲落败方）上游已经在计费：按失败请求记一次，
+        # token 用已收到的部分响应 + 请求内容估算。
+        try:
+            llm_usage_store.record_event(
+                operation=operation,
+                default_model_key=self._default_model_key,
+                request_kwargs=request_kwargs,
+                response=build_chat_completion_from_stream_chunks(chunks),
+                success=False,
+            )
+        except Exception:
+            logger.debug("Failed to persist llm usage cancellation row", exc_info=True)
+
     def _record_success(
         self,
         *,
@@ -1098,6 +1333,13 @@ class _TrackedOpenAIProxy:
             async def _async_wrapper(*args, **kwargs):
                 try:
                     response = await method(*args, **kwargs)
+                except asyncio.CancelledError:
+                    self._record_cancelled(
+                        operation=operation,
+                        request_kwargs=dict(kwargs),
+                        chunks=[],
+                    )
+                    raise
                 except Exception as exc:
                     self._record_failure(
                         operation=operation,
@@ -1118,6 +1360,11 @@ class _TrackedOpenAIProxy:
                             request_kwargs=dict(kwargs),
                             error=exc,
                         ),
+                        on_cancel=lambda chunks: self._record_cancelled(
+                            operation=operation,
+                            request_kwargs=dict(kwargs),
+                            chunks=chunks,
+                        ),
                     )
                 self._record_success(
                     operation=operation,
@@ -1145,6 +1392,13 @@ class _TrackedOpenAIProxy:
                 async def _awaitable_wrapper():
                     try:
                         awaited_response = await response
+                    except asyncio.CancelledError:
+                        self._record_cancelled(
+                            operation=operation,
+                            request_kwargs=request_kwargs,
+                            chunks=[],
+                        )
+                        raise
                     except Exception as exc:
                         self._record_failure(
                             operation=operation,
@@ -1165,6 +1419,11 @@ class _TrackedOpenAIProxy:
                                 request_kwargs=request_kwargs,
                                 error=exc,
                             ),
+                            on_cancel=lambda chunks: self._record_cancelled(
+                                operation=operation,
+                                request_kwargs=request_kwargs,
+                                chunks=chunks,
+                            ),
                         )
                     self._record_success(
                         operation=operation,
@@ -1207,10 +1466,12 @@ class _TrackedAsyncStream:
         *,
         on_success: Any,
         on_failure: Any,
+        on_cancel: Any = None,
     ) -> None:
         self._target = target
         self._on_success = on_success
         self._on_failure = on_failure
+        self._on_cancel = on_cancel
         self._iterator = target.__aiter__()
         self._chunks: list[Any] = []
         self._finalized = False
@@ -1224,6 +1485,9 @@ class _TrackedAsyncStream:
         except StopAsyncIteration:
             self._finalize_success()
             raise
+        except asyncio.CancelledError:
+            self._finalize_cancelled()
+            raise
         except Exception as exc:
             self._finalize_failure(exc)
             raise
@@ -1231,6 +1495,8 @@ class _TrackedAsyncStream:
         return chunk
 
     async def aclose(self) -> None:
+        # 未读完就关闭（调用方放弃 / 对冲落败）也要记一次用量。
+        self._finalize_cancelled()
         close_method = getattr(self._target, "aclose", None)
         if callable(close_method):
             await close_method()
@@ -1263,6 +1529,13 @@ class _TrackedAsyncStream:
         self._finalized = True
         self._on_failure(exc)
 
+    def _finalize_cancelled(self) -> None:
+        if self._finalized:
+            return
+        self._finalized = True
+        if self._on_cancel is not None:
+            self._on_cancel(list(self._chunks))
+
 
 class _TrackedSyncStream:
     def __init__(
@@ -1335,3 +1608,4 @@ def wrap_openai_client(client: Any, *, default_model_key: str) -> Any:
 
 
 llm_usage_store = LlmUsageStore()
+atexit.register(llm_usage_store.close)
@@ -11,6 +11,7 @@ from pathlib import Path
 
 from core.app_paths import models_config_path
 from core.audit_store import audit_store
+from core.model_health import ModelHealthTracker
 
 logger = logging.getLogger(__name__)
 
@@ -63,6 +64,16 @@ def normalize_pool_type(pool_type: str) -> str:
     return aliases[0] if aliases else normalized
 
 
+# selection.<pool>.hedge 的默认参数；hedge 写成 true 时全部取默认值。
+_HEDGE_DEFAULTS = {
+    "percentile": 90.0,
+    "min_samples": 5.0,
+    "default_delay_ms": 4000.0,
+    "min_delay_ms": 800.0,
+    "max_delay_ms": 15000.0,
+}
+
+
 def normalize_selection_strategy(value: Any) -> str:
     token = str(value or "").strip().lower()
     if token in _MODEL_SELECTION_STRATEGIES:
@@ -312,11 +323,18 @@ class ModelsConfig:
 class ModelManager:
     """模型管理器 - 处理模型轮询、失效切换"""
 
-    def __init__(self, config: ModelsConfig, primary_model: str):
+    def __init__(
+        self,
+        config: ModelsConfig,
+        primary_model: str,
+        *,
+        health: Optional[ModelHealthTracker] = None,
+    ):
         self.config = config
         self.primary_model = primary_model
         self._current_model = primary_model
-        self._failed_models: set[str] = set()
+        # 重载配置时沿用旧 manager 的健康状态，熔断不会因 /model 刷新而清零。
+        self.health = health if health is not None else ModelHealthTracker()
         self._model_order: list[str] = []
         self._round_robin_next_index: dict[str, int] = {}
         self._initialize_model_order()
@@ -376,16 +394,66 @@ class ModelManager:
         provider_name = self.get_provider_name(model_key)
         return self.config.providers.get(provider_name)
 
-    def mark_failed(self, model_key: str):
-        """标记模型失效"""
-        self._failed_models.add(model_key)
+    def mark_failed(
+        self,
+        model_key: str,
+        *,
+        error: Any = None,
+        latency_ms: Optional[float] = None,
+    ):
+        """标记模型失效（熔断后冷却一段时间再半开试探）"""
+        self.health.record_failure(model_key, error=error, latency_ms=latency_ms)
         logger.warning(f"[ModelManager] Model failed: {model_key}")
 
-    def mark_success(self, model_key: str):
+    def mark_success(self, model_key: str, *, latency_ms: Optional[float] = None):
         """标记模型成功"""
-        if model_key in self._failed_models:
-            self._failed_models.discard(model_key)
-            logger.info(f"[ModelManager] Model recovered: {model_key}")
+        self.health.record_success(model_key, latency_ms=latency_ms)
+
+    def begin_attempt(self, model_key: str) -> bool:
+        """请求前调用：熔断冷却中或半开试探名额已被占用时返回 False。"""
+        return self.health.try_acquire(model_key)
+
+    def _hedge_config(self, pool_type: str) -> Optional[dict[str, float]]:
+        raw = self.config.get_selection_config(pool_type).get("hedge")
+        if isinstance(raw, str):
+            raw = raw.strip().lower() in {"1", "true", "yes", "on"}
+        if isinstance(raw, dict):
+            options = dict(raw)
+            enabled = options.get("enabled", True)
+            if isinstance(enabled, str):
+                enabled = enabled.strip().lower() in {"1", "true", "yes", "on"}
+            if not enabled:
+                return None
+        elif raw:
+            options = {}
+        else:
+            return None
+        resolved = dict(_HEDGE_DEFAULTS)
+        for key in resolved:
+            try:
+                resolved[key] = float(options.get(key, resolved[key]))
+            except (TypeError, ValueError):
+                continue
+        return resolved
+
+    def hedge_delay_sec(self, model_key: str, pool_type: str = "primary") -> Optional[float]:
+        """对冲截止时间（秒）；该池未开启 ``selection.<pool>.hedge`` 时返回 None。
+
+        取该模型最近首 token 延迟的 ``percentile`` 分位，样本不足 ``min_samples``
+        时用 ``default_delay_ms``，再夹在 ``[min_delay_ms, max_delay_ms]`` 之间。
+        """
+        options = self._hedge_config(pool_type)
+        if options is None:
+            return None
+        delay_ms = self.health.first_token_percentile(
+            model_key,
+            options["percentile"],
+            min_samples=int(options["min_samples"]),
+        )
+        if delay_ms is None:
+            delay_ms = options["default_delay_ms"]
+        delay_ms = min(options["max_delay_ms"], max(options["min_delay_ms"], delay_ms))
+        return delay_ms / 1000.0
 
     @staticmethod
     def _pool_priority(meta: dict[str, Any], index: int) -> tuple[float, int]:
@@ -515,6 +583,32 @@ class ModelManager:
             ),
         )
 
+    def _latency_weighted(self, pool_type: str) -> bool:
+        raw = self.config.get_selection_config(pool_type).get("latency_weighted")
+        if isinstance(raw, str):
+            return raw.strip().lower() in {"1", "true", "yes", "on"}
+        return bool(raw)
+
+    def _latency_weighted_order(
+        self,
+        *,
+        candidates: list[str],
+        base_order: list[str],
+        preferred_model: Optional[str],
+    ) -> list[str]:
+        # 按 延迟EWMA / (1 - 错误率) 升序；还没有延迟样本的模型得分为 0，
+        # 会被优先试一次以积累数据。preferred 只在得分相同时靠前。
+        base_index = {model_key: index for index, model_key in enumerate(base_order)}
+        preferred = str(preferred_model or "").strip()
+        return sorted(
+            candidates,
+            key=lambda model_key: (
+                self.health.score(model_key),
+                0 if model_key == preferred else 1,
+                base_index.get(model_key, len(base_order)),
+            ),
+        )
+
     @staticmethod
     def _move_preferred_to_front(
         ordered_models: list[str],
@@ -541,22 +635,35 @@ class ModelManager:
             usage_snapshot = self._load_usage_snapshot(base_order)
 
         candidates: list[str] = []
+        cooling: list[str] = []
         for model_key in base_order:
             model_config = self.config.get_model(model_key)
             if model_config is None or not model_config.supports_input(required_input_type):
                 continue
-            if not include_failed and model_key in self._failed_models:
-                continue
             if not self._within_usage_limit(
                 model_key=model_key,
                 pool_type=pool_type,
                 usage_snapshot=usage_snapshot,
             ):
                 continue
+            if not include_failed and not self.health.is_available(model_key):
+                cooling.append(model_key)
+                continue
             candidates.append(model_key)
+        if not candidates and cooling:
+            # 全部熔断时不直接报错：放行冷却最早结束的模型做一次半开试探。
+            probe = self.health.grant_early_probe(cooling)
+            if probe:
+                candidates.append(probe)
 
         ordered_models: list[str]
-        if strategy == "least_usage":
+        if self._latency_weighted(pool_type):
+            ordered_models = self._latency_weighted_order(
+                candidates=candidates,
+                base_order=base_order,
+                preferred_model=preferred_model,
+            )
+        elif strategy == "least_usage":
             ordered_models = self._least_usage_order(
                 candidates=candidates,
                 base_order=base_order,
@@ -646,7 +753,7 @@ class ModelManager:
 
     def reset(self):
         """重置所有失败状态"""
-        self._failed_models.clear()
+        self.health.reset()
         self._current_model = self.primary_model
         self._round_robin_next_index.clear()
         self._initialize_model_order()
@@ -749,6 +856,7 @@ def load_models_config(
         return _models_config
 
     config_file = resolve_models_config_path(config_path)
+    previous_health = _model_manager.health if _model_manager is not None else None
     _model_manager = None
     _primary_model = ""
     _loaded_config_path = config_file
@@ -773,7 +881,11 @@ def load_models_config(
         primary_model = _models_config.get_primary_model()
         if primary_model:
             _primary_model = primary_model
-            _model_manager = ModelManager(_models_config, primary_model)
+            _model_manager = ModelManager(
+                _models_config,
+                primary_model,
+                health=previous_health,
+            )
             logger.info(
                 f"[ModelManager] Auto-initialized with primary model: {primary_model}"
             )
@@ -999,18 +1111,61 @@ def get_model_candidates_for_input(
     return candidates
 
 
-def mark_model_failed(model_key: str) -> None:
-    """标记模型失败，用于后续请求跳过该模型。"""
+def mark_model_failed(
+    model_key: str,
+    *,
+    error: Any = None,
+    latency_ms: Optional[float] = None,
+) -> None:
+    """标记模型失败，熔断冷却期内后续请求跳过该模型。"""
     _ensure_models_loaded()
     if _model_manager and model_key:
-        _model_manager.mark_failed(model_key)
+        _model_manager.mark_failed(model_key, error=error, latency_ms=latency_ms)
 
 
-def mark_model_success(model_key: str) -> None:
+def mark_model_success(model_key: str, *, latency_ms: Optional[float] = None) -> None:
     """标记模型恢复成功。"""
     _ensure_models_loaded()
     if _model_manager and model_key:
-        _model_manager.mark_success(model_key)
+        _model_manager.mark_success(model_key, latency_ms=latency_ms)
+
+
+def begin_model_attempt(model_key: str) -> bool:
+    """请求某个模型前调用；返回 False 表示应跳过它（熔断中或半开试探已占用）。"""
+    _ensure_models_loaded()
+    if _model_manager and model_key:
+        return _model_manager.begin_attempt(model_key)
+    return True
+
+
+def record_model_latency(model_key: str, latency_ms: float) -> None:
+    """记录一次成功请求的延迟样本（用于 latency_weighted 排序）。"""
+    _ensure_models_loaded()
+    if _model_manager and model_key:
+        _model_manager.health.record_latency(model_key, latency_ms)
+
+
+def record_model_first_token(model_key: str, latency_ms: float) -> None:
+    """记录一次首 token 延迟样本（用于对冲截止时间）。"""
+    _ensure_models_loaded()
+    if _model_manager and model_key:
+        _model_manager.health.record_first_token(model_key, latency_ms)
+
+
+def get_model_hedge_delay(model_key: str, pool_type: str = "primary") -> Optional[float]:
+    """对冲请求的截止时间（秒）；未开启对冲时返回 None。"""
+    _ensure_models_loaded()
+    if _model_manager and model_key:
+        return _model_manager.hedge_delay_sec(model_key, pool_type)
+    return None
+
+
+def get_model_health_snapshot() -> dict[str, dict[str, Any]]:
+    """当前进程内各模型的熔断/健康状态。"""
+    _ensure_models_loaded()
+    if _model_manager:
+        return _model_manager.health.snapshot()
+    return {}
 
 
 def get_model_id_for_api(model_key: Optional[str] = None) -> str:
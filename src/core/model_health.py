@@ -0,0 +1,341 @@
+"""Per-model circuit breaker used by ``ModelManager``.
+
+每个模型维护一份健康状态：
+
+- ``closed``：正常可用；连续失败达到 ``failure_threshold`` 次（默认 3）后熔断为
+  ``open``，单次偶发超时不会把模型踢出候选。
+- ``open``：冷却 ``cooldown_sec`` 秒内不参与候选；冷却时间随连续熔断次数
+  指数增长（``base_cooldown_sec`` * 2^n，上限 ``max_cooldown_sec``）。
+- ``half_open``：冷却结束后只放行一个试探请求，成功则恢复 ``closed``，
+  失败则重新熔断并加倍冷却；试探超过 ``trial_timeout_sec`` 没有结果时
+  允许下一个请求接着试探。
+- 候选全部处于冷却中时，``grant_early_probe`` 提前放行冷却最早结束的那个
+  模型做一次半开试探，而不是让请求直接失败（单模型部署尤其需要）。
+
+同时记录错误率与延迟的 EWMA，供 ``latency_weighted`` 选择策略排序；
+首 token 延迟保留最近 ``first_token_window`` 个样本，用于计算对冲请求的
+百分位截止时间。
+状态快照会写到 ``DATA_DIR/system/model_health.json``，API 进程通过
+``read_model_health_snapshot`` 读取。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Optional
+
+from core.app_paths import data_dir
+
+logger = logging.getLogger(__name__)
+
+_SNAPSHOT_MIN_INTERVAL_SEC = 5.0
+DEFAULT_FAILURE_THRESHOLD = 3
+
+
+def _now_iso() -> str:
+    return datetime.now().astimezone().isoformat(timespec="seconds")
+
+
+def model_health_snapshot_path() -> Path:
+    return (data_dir() / "system" / "model_health.json").resolve()
+
+
+@dataclass
+class ModelHealth:
+    state: str = "closed"
+    consecutive_failures: int = 0
+    consecutive_opens: int = 0
+    error_rate: float = 0.0
+    latency_ms: float = 0.0
+    latency_samples: int = 0
+    successes: int = 0
+    failures: int = 0
+    opened_at: float = 0.0
+    cooldown_sec: float = 0.0
+    trial_started_at: float = 0.0
+    last_error: str = ""
+    last_success_at: str = ""
+    last_failure_at: str = ""
+
+
+class ModelHealthTracker:
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        base_cooldown_sec: float = 30.0,
+        max_cooldown_sec: float = 600.0,
+        trial_timeout_sec: float = 120.0,
+        ewma_alpha: float = 0.3,
+        first_token_window: int = 64,
+        clock: Callable[[], float] = time.monotonic,
+        snapshot_path: Optional[Callable[[], Path]] = model_health_snapshot_path,
+    ) -> None:
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_cooldown_sec = max(0.0, float(base_cooldown_sec))
+        self.max_cooldown_sec = max(self.base_cooldown_sec, float(max_cooldown_sec))
+        self.trial_timeout_sec = max(1.0, float(trial_timeout_sec))
+        self.ewma_alpha = min(1.0, max(0.01, float(ewma_alpha)))
+        self.first_token_window = max(1, int(first_token_window))
+        self._clock = clock
+        self._snapshot_path = snapshot_path
+        self._lock = Lock()
+        self._models: dict[str, ModelHealth] = {}
+        self._first_token_ms: dict[str, deque[float]] = {}
+        self._last_persist = 0.0
+
+    def _get(self, model_key: str) -> ModelHealth:
+        health = self._models.get(model_key)
+        if health is None:
+            health = ModelHealth()
+            self._models[model_key] = health
+        return health
+
+    def _ewma(self, current: float, sample: float, samples: int) -> float:
+        if samples <= 0:
+            return float(sample)
+        return current + self.ewma_alpha * (float(sample) - current)
+
+    def _observe_latency(self, health: ModelHealth, latency_ms: Optional[float]) -> None:
+        if latency_ms is None or latency_ms < 0:
+            return
+        health.latency_ms = self._ewma(health.latency_ms, latency_ms, health.latency_samples)
+        health.latency_samples += 1
+
+    def _cooled_down(self, health: ModelHealth, now: float) -> bool:
+        return now >= health.opened_at + health.cooldown_sec
+
+    def _trial_in_flight(self, health: ModelHealth, now: float) -> bool:
+        return bool(health.trial_started_at) and (
+            now - health.trial_started_at < self.trial_timeout_sec
+        )
+
+    # -- transitions ------------------------------------------------------
+
+    def record_success(self, model_key: str, *, latency_ms: Optional[float] = None) -> None:
+        with self._lock:
+            health = self._get(model_key)
+            recovered = health.state != "closed"
+            health.state = "closed"
+            health.consecutive_failures = 0
+            health.consecutive_opens = 0
+            health.trial_started_at = 0.0
+            health.successes += 1
+            health.error_rate = self._ewma(
+                health.error_rate, 0.0, health.successes + health.failures - 1
+            )
+            health.last_success_at = _now_iso()
+            self._observe_latency(health, latency_ms)
+        if recovered:
+            logger.info("[ModelHealth] Model recovered: %s", model_key)
+        self._persist(force=recovered)
+
+    def record_failure(
+        self,
+        model_key: str,
+        *,
+        error: Any = None,
+        latency_ms: Optional[float] = None,
+    ) -> None:
+        now = self._clock()
+        with self._lock:
+            health = self._get(model_key)
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.error_rate = self._ewma(
+                health.error_rate, 1.0, health.successes + health.failures - 1
+            )
+            health.last_failure_at = _now_iso()
+            if error is not None:
+                health.last_error = str(error)[:240]
+            self._observe_latency(health, latency_ms)
+            opened = health.state == "half_open" or (
+                health.state == "closed"
+                and health.consecutive_failures >= self.failure_threshold
+            )
+            if opened:
+                health.consecutive_opens += 1
+                health.state = "open"
+                health.opened_at = now
+                health.trial_started_at = 0.0
+                health.cooldown_sec = min(
+                    self.max_cooldown_sec,
+                    self.base_cooldown_sec * (2 ** (health.consecutive_opens - 1)),
+                )
+                cooldown = health.cooldown_sec
+        if opened:
+            logger.warning(
+                "[ModelHealth] Circuit opened for %s (cool-down %.0fs): %s",
+                model_key,
+                cooldown,
+                error,
+            )
+        self._persist(force=opened)
+
+    def record_latency(self, model_key: str, latency_ms: float) -> None:
+        with self._lock:
+            self._observe_latency(self._get(model_key), latency_ms)
+        self._persist()
+
+    def record_first_token(self, model_key: str, latency_ms: float) -> None:
+        if latency_ms is None or latency_ms < 0:
+            return
+        with self._lock:
+            samples = self._first_token_ms.get(model_key)
+            if samples is None:
+                samples = deque(maxlen=self.first_token_window)
+                self._first_token_ms[model_key] = samples
+            samples.append(float(latency_ms))
+
+    # -- queries ----------------------------------------------------------
+
+    def first_token_percentile(
+        self,
+        model_key: str,
+        percentile: float,
+        *,
+        min_samples: int = 1,
+    ) -> Optional[float]:
+        """Nearest-rank percentile of recent time-to-first-token samples (ms)."""
+        with self._lock:
+            samples = sorted(self._first_token_ms.get(model_key) or ())
+        if not samples or len(samples) < max(1, int(min_samples)):
+            return None
+        rank = math.ceil(min(100.0, max(0.0, float(percentile))) / 100.0 * len(samples))
+        return samples[max(0, rank - 1)]
+
+    def is_available(self, model_key: str) -> bool:
+        """Whether the model may be offered as a candidate right now."""
+        now = self._clock()
+        with self._lock:
+            health = self._models.get(model_key)
+            if health is None or health.state == "closed":
+                return True
+            if health.state == "open":
+                return self._cooled_down(health, now)
+            return not self._trial_in_flight(health, now)
+
+    def try_acquire(self, model_key: str) -> bool:
+        """Claim permission to send a request; takes the half-open trial slot."""
+        now = self._clock()
+        with self._lock:
+            health = self._models.get(model_key)
+            if health is None or health.state == "closed":
+                return True
+            if health.state == "open":
+                if not self._cooled_down(health, now):
+                    return False
+                health.state = "half_open"
+            elif self._trial_in_flight(health, now):
+                return False
+            health.trial_started_at = now
+        logger.info("[ModelHealth] Half-open trial request for %s", model_key)
+        return True
+
+    def grant_early_probe(self, model_keys: list[str]) -> str:
+        """All of ``model_keys`` are cooling down: end the soonest cool-down now.
+
+        返回被放行的模型；已有试探在进行中（或列表为空）时返回空串。放行后
+        仍要经过 ``try_acquire`` 抢唯一的试探名额，失败照常加倍冷却。
+        """
+        now = self._clock()
+        chosen = ""
+        with self._lock:
+            soonest: Optional[float] = None
+            for model_key in model_keys:
+                health = self._models.get(model_key)
+                if health is None or health.state == "closed":
+                    return ""
+                if health.state == "half_open":
+                    if self._trial_in_flight(health, now):
+                        return ""
+                    return model_key
+                expires_at = health.opened_at + health.cooldown_sec
+                if soonest is None or expires_at < soonest:
+                    soonest, chosen = expires_at, model_key
+            if chosen:
+                health = self._models[chosen]
+                health.cooldown_sec = max(0.0, now - health.opened_at)
+        if chosen:
+            logger.warning(
+                "[ModelHealth] All candidates cooling down; early probe for %s", chosen
+            )
+        return chosen
+
+    def score(self, model_key: str) -> float:
+        """Expected cost for latency-weighted ordering (lower is better)."""
+        with self._lock:
+            health = self._models.get(model_key)
+            if health is None or not health.latency_samples:
+                return 0.0
+            return health.latency_ms / max(0.05, 1.0 - health.error_rate)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        now = self._clock()
+        with self._lock:
+            rows: dict[str, dict[str, Any]] = {}
+            for model_key, health in self._models.items():
+                row = asdict(health)
+                for internal in ("opened_at", "trial_started_at"):
+                    row.pop(internal, None)
+                row["error_rate"] = round(health.error_rate, 4)
+                row["latency_ms"] = round(health.latency_ms, 1)
+                row["cooldown_remaining_sec"] = (
+                    round(max(0.0, health.opened_at + health.cooldown_sec - now), 1)
+                    if health.state == "open"
+                    else 0.0
+                )
+                row["available"] = (
+                    health.state == "closed"
+                    or (health.state == "open" and self._cooled_down(health, now))
+                    or (health.state == "half_open" and not self._trial_in_flight(health, now))
+                )
+                first_token = sorted(self._first_token_ms.get(model_key) or ())
+                if first_token:
+                    row["first_token_p50_ms"] = round(
+                        first_token[(len(first_token) - 1) // 2], 1
+                    )
+                rows[model_key] = row
+            return rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._first_token_ms.clear()
+        self._persist(force=True)
+
+    def _persist(self, *, force: bool = False) -> None:
+        if self._snapshot_path is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_persist < _SNAPSHOT_MIN_INTERVAL_SEC:
+            return
+        self._last_persist = now
+        payload = {"updated_at": _now_iso(), "models": self.snapshot()}
+        try:
+            path = self._snapshot_path()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            tmp.replace(path)
+        except Exception:
+            logger.debug("Failed to persist model health snapshot", exc_info=True)
+
+
+def read_model_health_snapshot() -> dict[str, Any]:
+    """Last snapshot written by the core process (for the API process)."""
+    try:
+        loaded = json.loads(model_health_snapshot_path().read_text(encoding="utf-8"))
+    except Exception:
+        return {"updated_at": "", "models": {}}
+    if not isinstance(loaded, dict) or not isinstance(loaded.get("models"), dict):
+        return {"updated_at": "", "models": {}}
+    return loaded
@@ -178,6 +178,12 @@ class OrchestratorEventHandler:
             task_manager.heartbeat(self.user_id, f"tool:{tool_name}:running")
             return None
 
+        if event == "tool_call_progress":
+            tool_name = payload.get("name", "unknown")
+            self.todo_session.heartbeat(f"tool:{tool_name}:progress")
+            task_manager.heartbeat(self.user_id, f"tool:{tool_name}:running")
+            return None
+
         if event == "tool_call_finished":
             return await self._handle_tool_call_finished(payload)
 
@@ -149,6 +149,7 @@ class ToolCallDispatcher:
     available_tool_names: Set[str] = field(default_factory=set)
     allowed_skill_names: Set[str] | None = None
     allowed_tool_names: Set[str] | None = None
+    event_callback: Callable[[str, Dict[str, Any]], Awaitable[Any]] | None = None
 
     def _runtime_only_allowed_tool_names(self) -> Set[str]:
         allowed: Set[str] = set()
@@ -167,6 +168,16 @@ class ToolCallDispatcher:
                 allowed.add(name)
         return allowed
 
+    def _tool_progress_callback(self, tool_name: str):
+        callback = self.event_callback
+        if callback is None:
+            return None
+
+        async def _emit(progress: Dict[str, Any]) -> None:
+            await callback("tool_call_progress", {"name": tool_name, **progress})
+
+        return _emit
+
     def _policy_allows(self, tool_name: str, *, kind: str = "tool") -> bool:
         return _policy_result_allowed(
             self.runtime_tool_allowed(
@@ -574,11 +585,16 @@ class ToolCallDispatcher:
                 normalized_args = dict(normalized_args)
                 normalized_args = self._apply_loaded_skill_bash_context(normalized_args)
                 normalized_args = self._inject_runtime_bash_env(normalized_args)
+            broker_kwargs: Dict[str, Any] = {}
+            progress_callback = self._tool_progress_callback(tool_name)
+            if progress_callback is not None:
+                broker_kwargs["progress_callback"] = progress_callback
             result = await self.tool_broker.execute_core_tool(
                 name=tool_name,
                 args=normalized_args,
                 execution_policy=execution_policy,
                 task_workspace_root=self.task_workspace_root,
+                **broker_kwargs,
             )
             self.todo_mark_step("act", "in_progress", f"Tool `{tool_name}` finished.")
             return result
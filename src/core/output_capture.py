@@ -0,0 +1,109 @@
+"""Bounded capture of subprocess output.
+
+``bash`` 原语以前用 ``communicate()`` 把 stdout/stderr 全部读进内存后再截断。
+这里按块增量消费管道：只保留预算内的头部和尾部字节，中间部分计数后丢弃；
+可选地把完整输出边读边写进一个文件。
+
+``saved_file=`` / ``tool_result=`` 标记行在流上逐行识别并完整保留，即使落在
+被丢弃的中间部分也不会丢失。
+"""
+
+from __future__ import annotations
+
+from typing import BinaryIO, Optional
+
+_MARKER_PREFIXES = (b"saved_file=", b"tool_result=")
+_MARKER_PROBE_BYTES = max(len(prefix) for prefix in _MARKER_PREFIXES)
+_MARKER_LINE_MAX = 1 << 20
+_MAX_MARKER_LINES = 64
+_PREVIEW_BYTES = 200
+
+
+class BoundedOutputCapture:
+    """Keep the head and tail of a byte stream within ``budget`` bytes."""
+
+    def __init__(self, budget: int, *, spill: Optional[BinaryIO] = None) -> None:
+        budget = max(2, int(budget))
+        self.head_budget = budget // 2
+        self.tail_budget = budget - self.head_budget
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self.lines = 0
+        self.last_line = ""
+        self.marker_lines: list[str] = []
+        self._spill = spill
+        self._line = bytearray()
+        self._line_is_marker: Optional[bool] = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > self.head_budget + self.tail_budget
+
+    def feed(self, data: bytes) -> None:
+        if not data:
+            return
+        if self._spill is not None:
+            self._spill.write(data)
+        self.total_bytes += len(data)
+
+        room = self.head_budget - len(self.head)
+        overflow = data
+        if room > 0:
+            self.head += data[:room]
+            overflow = data[room:]
+        if overflow:
+            self.tail += overflow
+            excess = len(self.tail) - self.tail_budget
+            if excess > 0:
+                del self.tail[:excess]
+
+        start = 0
+        while True:
+            newline = data.find(b"\n", start)
+            if newline == -1:
+                self._append_line(data[start:])
+                break
+            self._append_line(data[start:newline])
+            self._finish_line()
+            start = newline + 1
+
+    def close(self) -> None:
+        if self._line:
+            self._finish_line()
+
+    def text(self) -> str:
+        if not self.truncated:
+            return bytes(self.head + self.tail).decode("utf-8", errors="replace")
+        omitted = self.total_bytes - len(self.head) - len(self.tail)
+        return (
+            self.head.decode("utf-8", errors="replace")
+            + f"\n...[truncated {omitted} bytes]...\n"
+            + self.tail.decode("utf-8", errors="replace")
+        )
+
+    def _append_line(self, piece: bytes) -> None:
+        if not piece:
+            return
+        limit = _MARKER_LINE_MAX if self._line_is_marker is not False else _PREVIEW_BYTES
+        if len(self._line) < limit:
+            self._line += piece[: limit - len(self._line)]
+        if self._line_is_marker is None:
+            probe = bytes(self._line).lstrip()
+            if len(probe) >= _MARKER_PROBE_BYTES:
+                self._line_is_marker = probe.lower().startswith(_MARKER_PREFIXES)
+                if not self._line_is_marker:
+                    del self._line[_PREVIEW_BYTES:]
+
+    def _finish_line(self) -> None:
+        raw = bytes(self._line)
+        is_marker = self._line_is_marker
+        if is_marker is None:
+            is_marker = raw.lstrip().lower().startswith(_MARKER_PREFIXES)
+        if is_marker and len(self.marker_lines) < _MAX_MARKER_LINES:
+            self.marker_lines.append(raw.decode("utf-8", errors="replace").strip())
+        elif raw.strip():
+            self.last_line = raw[:_PREVIEW_BYTES].decode("utf-8", errors="replace").strip()
+        self.lines += 1
+        self._line = bytearray()
+        self._line_is_marker = None
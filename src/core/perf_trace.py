@@ -0,0 +1,413 @@
+"""In-process latency tracing for the message pipeline.
+
+- ``span(name)``：同步/异步通用的计时上下文，也可以用 ``traced(name)`` 装饰函数；
+  耗时写入按名称聚合的滚动直方图（``window_sec`` 内按 ``slot_sec`` 分片，
+  过期分片自动丢弃）。
+- ``LoopStallWatchdog``：事件循环里跑一个心跳协程，另起守护线程检查心跳；
+  心跳超过 ``threshold_ms`` 没有推进时，直接抓取事件循环线程当前的调用栈，
+  因此能看到到底是哪段同步 I/O 把循环卡住了。
+- 快照由看门狗线程定期写到 ``DATA_DIR/system/perf_snapshot.json``，API 进程
+  通过 ``read_perf_snapshot`` 读取；core 进程内可直接用 ``perf_recorder.snapshot()``。
+
+span 命名约定：``handler.*``、``prompt.*``、``llm.*``、``tool.<name>``、``store.*``、
+``loop.stall``。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional, TypeVar
+
+from core.app_paths import data_dir
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# 直方图桶上界（毫秒），最后一个桶收纳所有更大的值。
+BUCKET_BOUNDS_MS: tuple[float, ...] = (
+    1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000,
+)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+PERF_TRACE_ENABLED = os.getenv("PERF_TRACE_ENABLED", "true").lower() == "true"
+PERF_LOOP_STALL_MS = max(10.0, _env_float("PERF_LOOP_STALL_MS", 200.0))
+PERF_WINDOW_SEC = max(60.0, _env_float("PERF_WINDOW_SEC", 900.0))
+
+
+def _now_iso() -> str:
+    return datetime.now().astimezone().isoformat(timespec="seconds")
+
+
+def perf_snapshot_path() -> Path:
+    return (data_dir() / "system" / "perf_snapshot.json").resolve()
+
+
+class _SpanStats:
+    __slots__ = ("counts", "count", "total_ms", "max_ms", "errors")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+
+    def add(self, duration_ms: float, *, error: bool) -> None:
+        self.counts[bisect_left(BUCKET_BOUNDS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        if error:
+            self.errors += 1
+
+    def merge(self, other: "_SpanStats") -> None:
+        for index, value in enumerate(other.counts):
+            self.counts[index] += value
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.errors += other.errors
+
+    def percentile(self, pct: float) -> float:
+        """Bucket-interpolated percentile, capped by the observed maximum."""
+        if not self.count:
+            return 0.0
+        target = pct / 100.0 * self.count
+        seen = 0
+        for index, value in enumerate(self.counts):
+            if not value:
+                continue
+            if seen + value >= target:
+                lower = BUCKET_BOUNDS_MS[index - 1] if index else 0.0
+                upper = (
+                    BUCKET_BOUNDS_MS[index]
+                    if index < len(BUCKET_BOUNDS_MS)
+                    else max(self.max_ms, lower)
+                )
+                estimate = lower + (upper - lower) * ((target - seen) / value)
+                return min(estimate, self.max_ms)
+            seen += value
+        return self.max_ms
+
+    def as_dict(self) -> dict[str, Any]:
+        buckets: dict[str, int] = {}
+        for index, value in enumerate(self.counts):
+            if not value:
+                continue
+            label = (
+                f"le_{BUCKET_BOUNDS_MS[index]:g}"
+                if index < len(BUCKET_BOUNDS_MS)
+                else "le_inf"
+            )
+            buckets[label] = value
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": buckets,
+        }
+
+
+class PerfRecorder:
+    """Rolling per-span histograms plus loop-stall stack samples."""
+
+    def __init__(
+        self,
+        *,
+        window_sec: float = PERF_WINDOW_SEC,
+        slot_sec: float = 60.0,
+        max_stall_samples: int = 20,
+        enabled: bool = PERF_TRACE_ENABLED,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.slot_sec = max(1.0, float(slot_sec))
+        self.window_sec = max(self.slot_sec, float(window_sec))
+        self.enabled = bool(enabled)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._slots: deque[tuple[int, dict[str, _SpanStats]]] = deque()
+        self._stalls: deque[dict[str, Any]] = deque(maxlen=max(1, int(max_stall_samples)))
+
+    def _current_slot_unlocked(self) -> dict[str, _SpanStats]:
+        slot_id = int(self._clock() // self.slot_sec)
+        if not self._slots or self._slots[-1][0] != slot_id:
+            self._slots.append((slot_id, {}))
+        oldest = slot_id - int(self.window_sec // self.slot_sec) + 1
+        while self._slots and self._slots[0][0] < oldest:
+            self._slots.popleft()
+        return self._slots[-1][1]
+
+    def record(self, name: str, duration_ms: float, *, error: bool = False) -> None:
+        if not self.enabled or not name:
+            return
+        with self._lock:
+            slot = self._current_slot_unlocked()
+            stats = slot.get(name)
+            if stats is None:
+                stats = slot[name] = _SpanStats()
+            stats.add(max(0.0, float(duration_ms)), error=error)
+
+    def record_stall(self, sample: dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._stalls.append(dict(sample))
+
+    def update_last_stall(self, token: int, duration_ms: float) -> None:
+        with self._lock:
+            for sample in reversed(self._stalls):
+                if sample.get("token") == token:
+                    sample["duration_ms"] = round(duration_ms, 1)
+                    return
+
+    def span(self, name: str) -> "_Span":
+        return _Span(self, name)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            self._current_slot_unlocked()
+            merged: dict[str, _SpanStats] = {}
+            for _slot_id, slot in self._slots:
+                for name, stats in slot.items():
+                    target = merged.get(name)
+                    if target is None:
+                        target = merged[name] = _SpanStats()
+                    target.merge(stats)
+            stalls = [
+                {key: value for key, value in sample.items() if key != "token"}
+                for sample in self._stalls
+            ]
+        return {
+            "updated_at": _now_iso(),
+            "enabled": self.enabled,
+            "window_sec": self.window_sec,
+            "spans": {name: merged[name].as_dict() for name in sorted(merged)},
+            "stalls": stalls,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._slots.clear()
+            self._stalls.clear()
+
+    def persist(self, path: Optional[Path] = None) -> None:
+        target = path or perf_snapshot_path()
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(target.suffix + ".tmp")
+            tmp.write_text(
+                json.dumps(self.snapshot(), ensure_ascii=False, indent=2) + "\n",
+                encoding="utf-8",
+            )
+            tmp.replace(target)
+        except Exception:
+            logger.debug("Failed to persist perf snapshot", exc_info=True)
+
+
+class _Span:
+    """Timing context usable with both ``with`` and ``async with``."""
+
+    __slots__ = ("_recorder", "_name", "_started")
+
+    def __init__(self, recorder: PerfRecorder, name: str) -> None:
+        self._recorder = recorder
+        self._name = name
+        self._started = 0.0
+
+    def __enter__(self) -> "_Span":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._recorder.record(
+            self._name,
+            (time.perf_counter() - self._started) * 1000.0,
+            error=exc_type is not None and not issubclass(exc_type, asyncio.CancelledError),
+        )
+
+    async def __aenter__(self) -> "_Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+
+class LoopStallWatchdog:
+    """Detect event-loop stalls and sample the blocked thread's stack."""
+
+    def __init__(
+        self,
+        recorder: PerfRecorder,
+        *,
+        threshold_ms: float = PERF_LOOP_STALL_MS,
+        persist_interval_sec: float = 10.0,
+        snapshot_path: Optional[Callable[[], Path]] = perf_snapshot_path,
+        max_stack_frames: int = 25,
+    ) -> None:
+        self.recorder = recorder
+        self.threshold_sec = max(0.005, float(threshold_ms) / 1000.0)
+        self.beat_interval_sec = min(0.05, self.threshold_sec / 4)
+        self.persist_interval_sec = max(1.0, float(persist_interval_sec))
+        self.max_stack_frames = max(1, int(max_stack_frames))
+        self._snapshot_path = snapshot_path
+        self._last_beat = time.monotonic()
+        self._beat_token = 0
+        self._sampled_token = -1
+        self._loop_thread_id: Optional[int] = None
+        self._beat_task: Optional[asyncio.Task[None]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._beat_task is not None and not self._beat_task.done()
+
+    def start(self) -> None:
+        """Start on the running loop; safe to call twice."""
+        if self.running or not self.recorder.enabled:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._beat_task = asyncio.get_running_loop().create_task(self._beat())
+        self._thread = threading.Thread(
+            target=self._watch, name="perf-loop-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._beat_task is not None:
+            self._beat_task.cancel()
+            try:
+                await self._beat_task
+            except asyncio.CancelledError:
+                pass
+            self._beat_task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 2.0)
+            self._thread = None
+        if self._snapshot_path is not None:
+            self.recorder.persist(self._snapshot_path())
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.beat_interval_sec
+            await asyncio.sleep(self.beat_interval_sec)
+            now = time.monotonic()
+            lag = now - expected
+            token = self._beat_token
+            self._beat_token += 1
+            self._last_beat = now
+            if lag >= self.threshold_sec:
+                self.recorder.record("loop.stall", lag * 1000.0)
+                if self._sampled_token == token:
+                    self.recorder.update_last_stall(token, lag * 1000.0)
+
+    def _watch(self) -> None:
+        last_persist = time.monotonic()
+        check_interval = max(0.005, self.threshold_sec / 2)
+        while not self._stop.wait(check_interval):
+            now = time.monotonic()
+            token = self._beat_token
+            blocked = now - self._last_beat - self.beat_interval_sec
+            if blocked >= self.threshold_sec and self._sampled_token != token:
+                self._sampled_token = token
+                self._sample_stack(token, blocked)
+            if (
+                self._snapshot_path is not None
+                and now - last_persist >= self.persist_interval_sec
+            ):
+                last_persist = now
+                self.recorder.persist(self._snapshot_path())
+
+    def _sample_stack(self, token: int, blocked_sec: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id or -1)
+        if frame is None:
+            return
+        stack = traceback.format_stack(frame, limit=self.max_stack_frames)
+        self.recorder.record_stall(
+            {
+                "token": token,
+                "at": _now_iso(),
+                "blocked_ms_at_sample": round(blocked_sec * 1000.0, 1),
+                "duration_ms": round(blocked_sec * 1000.0, 1),
+                "stack": [line.rstrip() for line in stack],
+            }
+        )
+        logger.warning(
+            "Event loop blocked for %.0fms; stack sample:\n%s",
+            blocked_sec * 1000.0,
+            "".join(stack[-6:]),
+        )
+
+
+perf_recorder = PerfRecorder()
+loop_watchdog = LoopStallWatchdog(perf_recorder)
+
+
+def span(name: str) -> _Span:
+    return perf_recorder.span(name)
+
+
+def record(name: str, duration_ms: float, *, error: bool = False) -> None:
+    perf_recorder.record(name, duration_ms, error=error)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator: time every call of a sync or async function as span ``name``."""
+
+    def _decorate(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def _async_wrapper(*args, **kwargs):
+                with perf_recorder.span(name):
+                    return await func(*args, **kwargs)
+
+            return _async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            with perf_recorder.span(name):
+                return func(*args, **kwargs)
+
+        return _wrapper  # type: ignore[return-value]
+
+    return _decorate
+
+
+def read_perf_snapshot() -> dict[str, Any]:
+    """Last snapshot written by the core process (for the API process)."""
+    try:
+        loaded = json.loads(perf_snapshot_path().read_text(encoding="utf-8"))
+    except Exception:
+        return {"updated_at": "", "spans": {}, "stalls": []}
+    if not isinstance(loaded, dict) or not isinstance(loaded.get("spans"), dict):
+        return {"updated_at": "", "spans": {}, "stalls": []}
+    return loaded
@@ -1,10 +1,12 @@
 import asyncio
+import codecs
 import contextlib
 import logging
 import os
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from core.file_artifacts import (
     extract_saved_file_rows,
@@ -12,10 +14,19 @@ from core.file_artifacts import (
     strip_saved_file_markers,
     strip_tool_result_markers,
 )
+from core import file_line_index
+from core.file_line_index import LineWindow, read_line_window
+from core.output_capture import BoundedOutputCapture
+from core.skill_warm_pool import WarmSpawnDispatched, skill_warm_pool
 
 
 DEFAULT_BASH_TIMEOUT_SEC = 60
 MAX_BASH_OUTPUT = 32_000
+DEFAULT_READ_MAX_BYTES = 256_000
+BASH_PROGRESS_INTERVAL_SEC = 2.0
+_PIPE_READ_BYTES = 64 * 1024
+
+BashProgressCallback = Callable[[Dict[str, Any]], Awaitable[Any]]
 
 logger = logging.getLogger(__name__)
 
@@ -137,12 +148,67 @@ class PrimitiveRuntime:
             expanded = os.path.join(str(self.workspace_root or os.getcwd()), expanded)
         return os.path.abspath(expanded)
 
+    @staticmethod
+    def _decode_window(window: LineWindow, encoding: str) -> List[str]:
+        lines: List[str] = []
+        last = len(window.lines) - 1
+        for position, raw in enumerate(window.lines):
+            if position == last and window.truncated:
+                # 截断可能落在多字节字符中间，未完整的尾部字节直接丢弃。
+                decoder = codecs.getincrementaldecoder(encoding)()
+                lines.append(decoder.decode(raw, final=False).rstrip())
+            else:
+                lines.append(raw.decode(encoding).rstrip())
+        return lines
+
+    @staticmethod
+    def _is_line_seekable(encoding: str) -> bool:
+        try:
+            return "\n".encode(encoding) == b"\n"
+        except (LookupError, UnicodeError):
+            return False
+
+    def _read_lines(
+        self,
+        target: str,
+        start_line: int,
+        max_lines: int,
+        encoding: str,
+        tail: bool,
+        max_bytes: int,
+    ) -> tuple[int, int, List[str], bool]:
+        if not self._is_line_seekable(encoding):
+            # UTF-16/32 等编码的换行不是单字节 \n，无法按字节索引，退回整读。
+            with open(target, "r", encoding=encoding) as f:
+                all_lines = f.readlines()
+            total = len(all_lines)
+            if tail:
+                start_line = max(1, total - max_lines + 1)
+            selected = all_lines[start_line - 1 : start_line - 1 + max_lines]
+            return start_line, total, [line.rstrip() for line in selected], False
+
+        window = read_line_window(
+            target,
+            start_line,
+            max_lines,
+            max_bytes=max_bytes,
+            tail=tail,
+        )
+        return (
+            window.start_line,
+            window.total_lines,
+            self._decode_window(window, encoding),
+            window.truncated,
+        )
+
     async def read(
         self,
         path: str,
         start_line: int = 1,
         max_lines: int = 200,
         encoding: str = "utf-8",
+        tail: bool = False,
+        max_bytes: int = DEFAULT_READ_MAX_BYTES,
     ) -> Dict[str, Any]:
         try:
             target = self._resolve_path(path)
@@ -153,6 +219,8 @@ class PrimitiveRuntime:
             return self._err("invalid_args", "start_line must be >= 1")
         if max_lines < 1:
             return self._err("invalid_args", "max_lines must be >= 1")
+        if max_bytes < 1:
+            return self._err("invalid_args", "max_bytes must be >= 1")
 
         if not os.path.exists(target):
             return self._err("not_found", f"Path not found: {target}")
@@ -160,19 +228,28 @@ class PrimitiveRuntime:
             return self._err("is_directory", f"Path is a directory: {target}")
 
         try:
-            with open(target, "r", encoding=encoding) as f:
-                lines = f.readlines()
+            start_line, total, selected, truncated = await asyncio.to_thread(
+                self._read_lines,
+                target,
+                start_line,
+                max_lines,
+                encoding,
+                bool(tail),
+                int(max_bytes),
+            )
         except UnicodeDecodeError:
             return self._err("decode_error", f"Failed to decode file as {encoding}")
+        except LookupError as exc:
+            return self._err("invalid_args", str(exc))
         except Exception as exc:
             return self._err("read_failed", str(exc))
 
-        total = len(lines)
         start_idx = start_line - 1
-        end_idx = min(start_idx + max_lines, total)
-        selected = lines[start_idx:end_idx]
+        end_idx = (
+            start_idx + len(selected) if selected else min(start_idx + max_lines, total)
+        )
         numbered = [
-            f"{idx + 1:>5}: {line.rstrip()}"
+            f"{idx + 1:>5}: {line}"
             for idx, line in enumerate(selected, start=start_idx)
         ]
 
@@ -183,7 +260,12 @@ class PrimitiveRuntime:
             "total_lines": total,
             "content": "\n".join(numbered),
         }
-        return self._ok(data, f"Read {len(selected)} line(s) from {target}")
+        if truncated:
+            data["truncated"] = True
+        summary = f"Read {len(selected)} line(s) from {target}"
+        if truncated:
+            summary += f" (truncated at {max_bytes} bytes)"
+        return self._ok(data, summary)
 
     async def write(
         self,
@@ -222,6 +304,7 @@ class PrimitiveRuntime:
             file_mode = "w" if write_mode == "overwrite" else "a"
             with open(target, file_mode, encoding=encoding) as f:
                 f.write(content)
+            file_line_index.invalidate(target)
         except Exception as exc:
             return self._err("write_failed", str(exc))
 
@@ -317,6 +400,7 @@ class PrimitiveRuntime:
             try:
                 with open(target, "w", encoding=encoding) as f:
                     f.write(updated)
+                file_line_index.invalidate(target)
             except Exception as exc:
                 return self._err("write_failed", str(exc))
 
@@ -331,12 +415,83 @@ class PrimitiveRuntime:
             + (" (dry-run)" if dry_run else ""),
         )
 
+    async def _spawn_command(self, command: str, cwd: str) -> Any:
+        route = skill_warm_pool.match(command, cwd=cwd)
+        if route is not None:
+            if skill_warm_pool.ready:
+                try:
+                    return await skill_warm_pool.spawn(route)
+                except WarmSpawnDispatched:
+                    # 子进程可能已在跑，不能再用 shell 执行第二遍。
+                    raise
+                except Exception:
+                    logger.warning(
+                        "Warm skill execution failed, falling back to shell",
+                        exc_info=True,
+                    )
+            else:
+                skill_warm_pool.ensure_started()
+        return await asyncio.create_subprocess_shell(
+            command,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+    async def _drain_process(
+        self,
+        process: Any,
+        stdout: BoundedOutputCapture,
+        stderr: BoundedOutputCapture,
+        command: str,
+        progress_callback: Optional[BashProgressCallback],
+    ) -> None:
+        started = time.monotonic()
+        last_emit = started
+
+        async def _pump(stream: Any, capture: BoundedOutputCapture) -> None:
+            nonlocal last_emit
+            if stream is None:
+                return
+            while True:
+                chunk = await stream.read(_PIPE_READ_BYTES)
+                if not chunk:
+                    break
+                capture.feed(chunk)
+                now = time.monotonic()
+                if (
+                    progress_callback is not None
+                    and now - last_emit >= BASH_PROGRESS_INTERVAL_SEC
+                ):
+                    last_emit = now
+                    try:
+                        await progress_callback(
+                            {
+                                "command": command,
+                                "elapsed_sec": round(now - started, 1),
+                                "lines": stdout.lines,
+                                "bytes": stdout.total_bytes + stderr.total_bytes,
+                                "last_line": stdout.last_line or stderr.last_line,
+                            }
+                        )
+                    except Exception:
+                        logger.debug("bash progress callback failed", exc_info=True)
+            capture.close()
+
+        await asyncio.gather(
+            _pump(process.stdout, stdout),
+            _pump(process.stderr, stderr),
+        )
+        await process.wait()
+
     async def bash(
         self,
         command: str,
         cwd: str | None = None,
         timeout_sec: int = DEFAULT_BASH_TIMEOUT_SEC,
         execution_policy: str = "ikaros_execution_policy",
+        output_file: str = "",
+        progress_callback: Optional[BashProgressCallback] = None,
     ) -> Dict[str, Any]:
         if not command or not command.strip():
             return self._err("invalid_args", "command is required")
@@ -366,37 +521,55 @@ class PrimitiveRuntime:
                     f"command references kernel-protected path: {root}"
                 )
 
+        spill_target = ""
+        if output_file:
+            try:
+                spill_target = self._resolve_path(output_file)
+            except Exception as exc:
+                return self._err("invalid_path", str(exc))
+            if self._is_kernel_protected_path(spill_target):
+                return self._policy_block(
+                    f"kernel-protected path is read-only: {spill_target}"
+                )
+
+        spill = None
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                cwd=workdir or self.workspace_root,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+            if spill_target:
+                os.makedirs(os.path.dirname(spill_target), exist_ok=True)
+                spill = open(spill_target, "wb")
+            stdout = BoundedOutputCapture(MAX_BASH_OUTPUT, spill=spill)
+            stderr = BoundedOutputCapture(MAX_BASH_OUTPUT // 4, spill=spill)
+            process = await self._spawn_command(command, workdir or self.workspace_root)
             try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(),
+                await asyncio.wait_for(
+                    self._drain_process(
+                        process, stdout, stderr, command, progress_callback
+                    ),
                     timeout=timeout_sec,
                 )
             except asyncio.CancelledError:
                 with contextlib.suppress(ProcessLookupError):
                     process.kill()
                 with contextlib.suppress(Exception):
-                    await process.communicate()
+                    await process.wait()
                 raise
             except asyncio.TimeoutError:
                 with contextlib.suppress(ProcessLookupError):
                     process.kill()
                 with contextlib.suppress(Exception):
-                    await process.communicate()
+                    await process.wait()
                 return self._err("timeout", f"Command timed out after {timeout_sec}s")
         except Exception as exc:
             return self._err("exec_failed", str(exc))
-
-        out_text = (stdout or b"").decode("utf-8", errors="replace")
-        err_text = (stderr or b"").decode("utf-8", errors="replace")
-        tool_result = extract_tool_result_payload(out_text)
-        saved_files = extract_saved_file_rows(out_text)
+        finally:
+            if spill is not None:
+                spill.close()
+
+        out_text = stdout.text()
+        err_text = stderr.text()
+        marker_text = "\n".join(stdout.marker_lines)
+        tool_result = extract_tool_result_payload(marker_text)
+        saved_files = extract_saved_file_rows(marker_text)
         cleaned_out_text = strip_tool_result_markers(strip_saved_file_markers(out_text))
         combined = cleaned_out_text
         if err_text:
@@ -406,8 +579,10 @@ class PrimitiveRuntime:
                 else f"[stderr]\n{err_text}"
             )
 
-        if len(combined) > MAX_BASH_OUTPUT:
-            combined = combined[:MAX_BASH_OUTPUT] + "\n...[truncated]"
+        if spill_target:
+            combined = f"{combined}\n[full output saved to {spill_target}]"
+        elif stdout.truncated or stderr.truncated:
+            combined = f"{combined}\n[pass output_file to keep the full output]"
 
         data = {
             "command": command,
@@ -415,6 +590,8 @@ class PrimitiveRuntime:
             "exit_code": process.returncode,
             "output": combined,
         }
+        if spill_target:
+            data["output_file"] = spill_target
         if saved_files:
             data["files"] = list(saved_files)
         if tool_result is not None:
@@ -12,6 +12,18 @@ from core.prompts import (
     SUBAGENT_CORE_PROMPT,
 )
 from core.long_term_memory import long_term_memory
+from core.perf_trace import traced
+from core.prompt_layout import (
+    TIER_AGENT,
+    TIER_POLICY,
+    TIER_SESSION,
+    TIER_STATIC,
+    TIER_TURN,
+    TIER_USER,
+    PromptSegment,
+    fingerprint,
+    prompt_layout,
+)
 from core.soul_store import soul_store
 from core.tool_registry import tool_registry
 import logging
@@ -55,12 +67,14 @@ def _normalize_text_list(values: Any) -> List[str]:
 
 class PromptComposer:
     """
-    Build minimal runtime instruction:
-    1) default system prompt
-    2) ikaros AGENTS (ikaros only)
-    3) SOUL
+    Build minimal runtime instruction, ordered from most to least stable
+    so provider-side prompt caching can reuse the prefix:
+    1) default system prompt / ikaros AGENTS / session contract
+    2) SOUL
+    3) mode prompt (ikaros tool guidance depends on tool policy)
     4) USER
-    5) tool inventory
+    5) ikaros memory snapshot
+    6) skill catalog (routed per turn)
     """
 
     def __init__(self) -> None:
@@ -141,6 +155,41 @@ class PromptComposer:
             "- 本块优先级高于旧文档里任何“先读长期记忆文件”之类的历史说明。"
         )
 
+    def _policy_inputs(self, *, runtime_user_id: str, platform: str) -> Dict[str, Any]:
+        """Inputs that decide ``tool_access_store.is_tool_allowed`` for this caller."""
+        from core.tool_access_store import tool_access_store
+
+        safe_platform = str(platform or "").strip().lower()
+        safe_user_id = str(runtime_user_id or "").strip()
+        access: Dict[str, Any] = {}
+        if safe_platform and safe_platform != "subagent_kernel" and safe_user_id:
+            # 渠道功能开关只看一次 profile，而不是对每个 feature 各读一次。
+            profile = channel_user_store.get_profile(
+                platform=safe_platform,
+                platform_user_id=safe_user_id,
+                is_admin=is_user_admin(safe_user_id),
+            )
+            access = {
+                "admin": profile.is_admin,
+                "status": profile.status,
+                "features": dict(profile.access),
+            }
+        return {
+            "role": self._runtime_role(runtime_user_id, platform),
+            "policy": tool_access_store.get_core_policy(),
+            "access": access,
+        }
+
+    @staticmethod
+    def _skills_inputs() -> List[Dict[str, Any]]:
+        try:
+            from extension.skills.registry import skill_registry as skill_loader
+
+            return skill_loader.get_skills_summary()
+        except Exception:
+            return []
+
+    @traced("prompt.compose")
     def compose_base(
         self,
         *,
@@ -153,41 +202,84 @@ class PromptComposer:
     ) -> str:
         soul_payload = soul_store.resolve_for_runtime_user(str(runtime_user_id or ""))
         runtime_role = self._runtime_role(runtime_user_id, platform)
-        parts: List[str] = []
+        safe_mode = str(mode or "").strip().lower()
+        segments: List[PromptSegment] = []
         if not soul_payload:
-            parts.append(DEFAULT_SYSTEM_PROMPT.strip())
+            segments.append(
+                PromptSegment("default", TIER_STATIC, DEFAULT_SYSTEM_PROMPT.strip())
+            )
 
         if runtime_role == "ikaros":
             agents_doc = self._load_ikaros_agents_doc()
             if agents_doc:
-                parts.append("【AGENTS】\n" + agents_doc)
-            parts.append(self._build_ikaros_session_context_contract())
+                segments.append(
+                    PromptSegment("agents", TIER_STATIC, "【AGENTS】\n" + agents_doc)
+                )
+            segments.append(
+                PromptSegment(
+                    "session_contract",
+                    TIER_STATIC,
+                    self._build_ikaros_session_context_contract(),
+                )
+            )
 
-        parts.append("【SOUL】\n" + soul_payload.content.strip())
+        segments.append(
+            PromptSegment("soul", TIER_AGENT, "【SOUL】\n" + soul_payload.content.strip())
+        )
         user_identity_doc = self._load_user_identity_doc(
             runtime_user_id=runtime_user_id,
             platform=platform,
         )
         if user_identity_doc:
-            parts.append("【USER】\n" + user_identity_doc.strip())
+            segments.append(
+                PromptSegment("user", TIER_USER, "【USER】\n" + user_identity_doc.strip())
+            )
+
+        # 技能列表和工具策略的指纹只在需要时计算一次，供下面的 memo 段共用。
+        shared_inputs: Dict[str, Any] = {}
+
+        def _memo_inputs(**extra: Any) -> Dict[str, Any]:
+            if not shared_inputs:
+                shared_inputs["skills"] = fingerprint(self._skills_inputs())
+                shared_inputs.update(
+                    self._policy_inputs(
+                        runtime_user_id=runtime_user_id,
+                        platform=platform,
+                    )
+                )
+                shared_inputs["user"] = str(runtime_user_id or "").strip()
+                shared_inputs["platform"] = str(platform or "").strip().lower()
+            return {**shared_inputs, **extra}
 
         # 如果是 ikaros 模式，添加 Ikaros 核心 Prompt
-        if str(mode or "").strip().lower() == "ikaros":
+        if safe_mode == "ikaros":
             ikaros_memory = self._load_ikaros_memory_snapshot(max_chars=1200)
             if ikaros_memory:
-                parts.append("【IKAROS 经验记忆】\n" + ikaros_memory)
-            management_tool_guidance = self._build_ikaros_tool_guidance(
-                runtime_user_id=runtime_user_id,
-                platform=platform,
+                segments.append(
+                    PromptSegment(
+                        "ikaros_memory",
+                        TIER_SESSION,
+                        "【IKAROS 经验记忆】\n" + ikaros_memory,
+                    )
+                )
+            management_tool_guidance = prompt_layout.memoized(
+                "ikaros_tool_guidance",
+                _memo_inputs(),
+                lambda: self._build_ikaros_tool_guidance(
+                    runtime_user_id=runtime_user_id,
+                    platform=platform,
+                ),
             )
             ikaros_prompt = IKAROS_CORE_PROMPT.format(
                 management_tool_guidance=management_tool_guidance,
             )
             logger.debug("Ikaros Prompt: \n" + ikaros_prompt)
-            parts.append("\n" + ikaros_prompt)
-        elif str(mode or "").strip().lower() == "subagent":
-            parts.append("\n" + SUBAGENT_CORE_PROMPT)
-        elif str(mode or "").strip().lower() == "media_image":
+            segments.append(PromptSegment("ikaros_core", TIER_POLICY, ikaros_prompt))
+        elif safe_mode == "subagent":
+            segments.append(
+                PromptSegment("subagent_core", TIER_POLICY, SUBAGENT_CORE_PROMPT)
+            )
+        elif safe_mode == "media_image":
             resolved_platform, platform_user_id = self._runtime_platform_user(
                 runtime_user_id,
                 platform,
@@ -202,33 +294,50 @@ class PromptComposer:
                 )
             )
             text = (
-                "\n【当前任务要求】\n这是一次图片分析请求。你需要保持你的角色语气，结合图片与用户指令完成任务。"
+                "【当前任务要求】\n这是一次图片分析请求。你需要保持你的角色语气，结合图片与用户指令完成任务。"
             )
             if accounting_enabled:
                 text += "\n如果用户明确要求记账/入账，请优先调用 `quick_accounting` 完成真实入账；其他场景优先直接给出分析结论，避免无关工具调用。"
-            parts.append(text)
+            segments.append(PromptSegment("media_image", TIER_POLICY, text))
 
-        # 注入 Skill 目录与 load_skill 使用引导
-        skill_catalog = self._build_skill_catalog(
-            runtime_user_id=runtime_user_id,
-            platform=platform,
-            allowed_skill_names=allowed_skill_names,
+        # 注入 Skill 目录与 load_skill 使用引导；目录随本轮路由结果变化，放在最后。
+        allowed_skill_key = (
+            sorted(
+                {
+                    str(item or "").strip()
+                    for item in list(allowed_skill_names or [])
+                    if str(item or "").strip()
+                }
+            )
+            if allowed_skill_names is not None
+            else None
+        )
+        skill_catalog = prompt_layout.memoized(
+            "skill_catalog",
+            _memo_inputs(allowed=allowed_skill_key),
+            lambda: self._build_skill_catalog(
+                runtime_user_id=runtime_user_id,
+                platform=platform,
+                allowed_skill_names=allowed_skill_key,
+            ),
         )
         if skill_catalog:
-            parts.append(skill_catalog)
+            segments.append(PromptSegment("skill_catalog", TIER_TURN, skill_catalog))
 
         # 拼接当前日期
         # parts.append("\n【当前日期】\n" + datetime.now().strftime("%Y-%m-%d"))
 
-        final_prompt = "\n\n".join([item for item in parts if str(item).strip()]).strip()
+        final_prompt = prompt_layout.render(
+            segments,
+            scope=f"{runtime_role}:{safe_mode}:{str(platform or '').strip().lower()}:{runtime_user_id}",
+            tools=list(tools or []),
+        )
         logger.debug(
             "Prompt composed role=%s mode=%s len=%s allowed_skills=%s",
             runtime_role,
-            str(mode or "").strip().lower() or "chat",
+            safe_mode or "chat",
             len(final_prompt),
-            ",".join(sorted({str(item).strip() for item in list(allowed_skill_names or []) if str(item).strip()}))
-            if allowed_skill_names is not None
-            else "*",
+            ",".join(allowed_skill_key) if allowed_skill_key is not None else "*",
         )
 
         return final_prompt
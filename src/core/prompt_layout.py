@@ -0,0 +1,238 @@
+"""Stability-ordered system prompt layout.
+
+Provider 侧的 prompt cache 只对逐字节相同的前缀生效。``PromptComposer`` 把
+system instruction 拆成若干段，这里按稳定性从高到低排序拼接：
+
+``static``（内置文本） → ``agent``（SOUL） → ``policy``（受工具策略影响的引导）
+→ ``user``（USER 档案） → ``session``（经验记忆快照） → ``turn``（本轮路由出的
+技能目录）。
+
+昂贵的段通过 ``memoized`` 按输入指纹缓存；``render`` 额外记录每段的 token 估算、
+memo 命中次数，以及与同一 scope 上一次渲染相比保持不变的前缀 token 数（工具
+schema 视为最前面的一段，因为上游缓存前缀从 tools 开始），供 ``/usage prompt``
+展示。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List
+
+from core.token_estimator import estimate_tokens
+
+TIER_STATIC = 0
+TIER_AGENT = 1
+TIER_POLICY = 2
+TIER_USER = 3
+TIER_SESSION = 4
+TIER_TURN = 5
+
+TIER_NAMES = {
+    TIER_STATIC: "static",
+    TIER_AGENT: "agent",
+    TIER_POLICY: "policy",
+    TIER_USER: "user",
+    TIER_SESSION: "session",
+    TIER_TURN: "turn",
+}
+
+_TOOLS_SEGMENT = "tools"
+_MAX_MEMO_ENTRIES = 256
+_MAX_SCOPES = 512
+_MAX_TOKEN_CACHE = 512
+
+
+def fingerprint(value: Any) -> str:
+    if isinstance(value, str):
+        raw = value
+    else:
+        raw = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class PromptSegment:
+    name: str
+    tier: int
+    text: str
+
+
+@dataclass
+class _SegmentStats:
+    tier: int = 0
+    renders: int = 0
+    changes: int = 0
+    lookups: int = 0
+    memo_hits: int = 0
+    tokens: int = 0
+
+
+class PromptLayout:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._memo: "OrderedDict[tuple[str, str], str]" = OrderedDict()
+        self._token_cache: "OrderedDict[str, int]" = OrderedDict()
+        self._last_by_scope: "OrderedDict[str, tuple[tuple[str, str, int], ...]]" = (
+            OrderedDict()
+        )
+        self._stats: Dict[str, _SegmentStats] = {}
+        self._composes = 0
+        self._prompt_tokens = 0
+        self._stable_prefix_tokens = 0
+
+    def memoized(self, name: str, inputs: Any, build: Callable[[], str]) -> str:
+        key = (name, fingerprint(inputs))
+        with self._lock:
+            stats = self._stats.setdefault(name, _SegmentStats())
+            stats.lookups += 1
+            cached = self._memo.get(key)
+            if cached is not None:
+                self._memo.move_to_end(key)
+                stats.memo_hits += 1
+                return cached
+        text = str(build() or "")
+        with self._lock:
+            self._memo[key] = text
+            while len(self._memo) > _MAX_MEMO_ENTRIES:
+                self._memo.popitem(last=False)
+        return text
+
+    def _tokens(self, digest: str, text: str) -> int:
+        cached = self._token_cache.get(digest)
+        if cached is None:
+            cached = estimate_tokens(text)
+            self._token_cache[digest] = cached
+            while len(self._token_cache) > _MAX_TOKEN_CACHE:
+                self._token_cache.popitem(last=False)
+        return cached
+
+    def render(
+        self,
+        segments: Iterable[PromptSegment],
+        *,
+        scope: str,
+        tools: List[Any] | None = None,
+    ) -> str:
+        ordered = sorted(
+            (item for item in segments if str(item.text or "").strip()),
+            key=lambda item: item.tier,
+        )
+        text = "\n\n".join(item.text for item in ordered).strip()
+
+        rows: list[tuple[str, int, str]] = []
+        if tools:
+            rows.append(
+                (
+                    _TOOLS_SEGMENT,
+                    -1,
+                    json.dumps(list(tools), ensure_ascii=False, default=str),
+                )
+            )
+        rows.extend((item.name, item.tier, item.text) for item in ordered)
+
+        with self._lock:
+            signature = []
+            for name, tier, body in rows:
+                digest = fingerprint(body)
+                signature.append((name, digest, self._tokens(digest, body)))
+            previous = self._last_by_scope.pop(scope, None)
+            self._last_by_scope[scope] = tuple(signature)
+            while len(self._last_by_scope) > _MAX_SCOPES:
+                self._last_by_scope.popitem(last=False)
+
+            previous_digests = {name: digest for name, digest, _ in previous or ()}
+            stable_prefix = 0
+            prefix_intact = previous is not None
+            for idx, (name, digest, tokens) in enumerate(signature):
+                stats = self._stats.setdefault(name, _SegmentStats())
+                stats.tier = rows[idx][1]
+                stats.renders += 1
+                stats.tokens = tokens
+                if name in previous_digests and previous_digests[name] != digest:
+                    stats.changes += 1
+                if (
+                    prefix_intact
+                    and idx < len(previous)
+                    and previous[idx][:2] == (name, digest)
+                ):
+                    stable_prefix += tokens
+                else:
+                    prefix_intact = False
+
+            self._composes += 1
+            self._prompt_tokens += sum(tokens for _, _, tokens in signature)
+            self._stable_prefix_tokens += stable_prefix
+        return text
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            segments = {
+                name: {
+                    "tier": TIER_NAMES.get(stats.tier, _TOOLS_SEGMENT),
+                    "renders": stats.renders,
+                    "changes": stats.changes,
+                    "tokens": stats.tokens,
+                    "memo_lookups": stats.lookups,
+                    "memo_hits": stats.memo_hits,
+                }
+                for name, stats in sorted(
+                    self._stats.items(), key=lambda item: (item[1].tier, item[0])
+                )
+            }
+            return {
+                "composes": self._composes,
+                "prompt_tokens": self._prompt_tokens,
+                "stable_prefix_tokens": self._stable_prefix_tokens,
+                "segments": segments,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._memo.clear()
+            self._token_cache.clear()
+            self._last_by_scope.clear()
+            self._stats.clear()
+            self._composes = 0
+            self._prompt_tokens = 0
+            self._stable_prefix_tokens = 0
+
+    def render_summary(self) -> str:
+        snapshot = self.snapshot()
+        if not snapshot["composes"]:
+            return "🧩 暂无 system prompt 布局统计。"
+        prompt_tokens = snapshot["prompt_tokens"]
+        stable = snapshot["stable_prefix_tokens"]
+        lines = [
+            "🧩 System Prompt 布局",
+            "",
+            "- 说明：段按稳定性排序（tools → static → agent → policy → user → session → turn）；token 为本地估算，统计自进程启动起。",
+            f"- 组装次数：`{snapshot['composes']}`",
+            f"- 与上一轮相同的前缀：`{stable}` / `{prompt_tokens}` tokens"
+            f"（`{_percent(stable, prompt_tokens)}`）",
+            "",
+            "按段：",
+        ]
+        for name, row in snapshot["segments"].items():
+            memo = (
+                f" | memo={row['memo_hits']}/{row['memo_lookups']}"
+                if row["memo_lookups"]
+                else ""
+            )
+            lines.append(
+                f"- `{name}` [{row['tier']}] | tokens={row['tokens']} | "
+                f"renders={row['renders']} | changes={row['changes']}{memo}"
+            )
+        return "\n".join(lines)
+
+
+def _percent(part: int, whole: int) -> str:
+    if whole <= 0:
+        return "0.0%"
+    return f"{part * 100.0 / whole:.1f}%"
+
+
+prompt_layout = PromptLayout()
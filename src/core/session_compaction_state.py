@@ -0,0 +1,133 @@
+"""Rolling compaction state per chat session, stored in ``bot_data.db``.
+
+会话文件保持只追加；压缩不再重写文件，而是在这里记录一份滚动摘要和高水位
+``summarized_rows``——已并入摘要的可见消息（user/model）条数。后续压缩只总结
+高水位之后新增的消息，组装上下文时也只读取高水位之后的原始消息。
+
+``boundary_digest`` 是高水位前最后一条已总结消息的内容指纹，用来发现会话文件
+被整体替换（例如稀疏会话对账）后高水位已失效的情况。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Iterator
+
+from core.app_paths import data_dir
+
+_STATE_TABLE = "session_compaction_state"
+
+
+def boundary_digest(content: str) -> str:
+    return hashlib.sha1(str(content or "").encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CompactionState:
+    summary: str = ""
+    summarized_rows: int = 0
+    boundary_digest: str = ""
+    updated_at: str = ""
+
+
+class SessionCompactionStateStore:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._ready_dbs: set[str] = set()
+
+    def _db_path(self) -> Path:
+        return (data_dir() / "bot_data.db").resolve()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db_path = self._db_path()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            self._ensure_db(conn, str(db_path))
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_db(self, conn: sqlite3.Connection, key: str) -> None:
+        if key in self._ready_dbs:
+            return
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {_STATE_TABLE} (
+                user_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                summary TEXT NOT NULL DEFAULT '',
+                summarized_rows INTEGER NOT NULL DEFAULT 0,
+                boundary_digest TEXT NOT NULL DEFAULT '',
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (user_id, session_id)
+            )
+            """
+        )
+        conn.commit()
+        self._ready_dbs.add(key)
+
+    def get(self, user_id: str, session_id: str) -> CompactionState:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"""
+                SELECT summary, summarized_rows, boundary_digest, updated_at
+                FROM {_STATE_TABLE}
+                WHERE user_id = ? AND session_id = ?
+                """,
+                (str(user_id), str(session_id)),
+            ).fetchone()
+        if row is None:
+            return CompactionState()
+        return CompactionState(
+            summary=str(row["summary"] or ""),
+            summarized_rows=max(0, int(row["summarized_rows"] or 0)),
+            boundary_digest=str(row["boundary_digest"] or ""),
+            updated_at=str(row["updated_at"] or ""),
+        )
+
+    def save(self, user_id: str, session_id: str, state: CompactionState) -> None:
+        state.updated_at = datetime.now().astimezone().isoformat(timespec="seconds")
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute(
+                    f"""
+                    INSERT INTO {_STATE_TABLE} (
+                        user_id, session_id, summary, summarized_rows,
+                        boundary_digest, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(user_id, session_id) DO UPDATE SET
+                        summary = excluded.summary,
+                        summarized_rows = excluded.summarized_rows,
+                        boundary_digest = excluded.boundary_digest,
+                        updated_at = excluded.updated_at
+                    """,
+                    (
+                        str(user_id),
+                        str(session_id),
+                        state.summary,
+                        int(state.summarized_rows),
+                        state.boundary_digest,
+                        state.updated_at,
+                    ),
+                )
+
+    def forget(self, user_id: str, session_id: str) -> None:
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute(
+                    f"DELETE FROM {_STATE_TABLE} WHERE user_id = ? AND session_id = ?",
+                    (str(user_id), str(session_id)),
+                )
+
+
+session_compaction_state = SessionCompactionStateStore()
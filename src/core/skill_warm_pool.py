@@ -0,0 +1,561 @@
+"""Warm, forkserver-style executor for skill CLI invocations.
+
+``load_skill`` 之后模型通过 bash 运行 ``cd <skill_dir> && python scripts/execute.py ...``，
+每次都要冷启动解释器并重新导入 httpx/openai/feedparser 等重依赖。这里维护一个
+常驻的 forkserver 进程：启动时预先导入 ``SKILL_WARM_POOL_PRELOAD`` 里的模块，
+之后每次调用 fork 出一个子进程执行脚本。
+
+约定与冷启动保持一致：
+
+- 子进程的 fd 0/1/2 是调用方通过 ``SCM_RIGHTS`` 传过来的管道，stdout 上的
+  ``saved_file=`` / ``tool_result=`` 标记、退出码都原样返回；
+- 每次调用在 fork 出来的独立进程里运行，``os.environ`` 整体替换为调用方环境
+  加上命令里的 ``export``，``sys.argv`` / cwd / ``sys.path[0]`` 按
+  ``python <script>`` 的语义设置，调用之间互不影响；
+- 只有形如 ``[export K=V ... &&] [cd DIR &&] python <...>/scripts/execute.py args``、
+  不含管道/重定向/变量展开、且脚本使用 ``core.skill_cli.run_execute_cli`` 的命令
+  才会被路由，其余命令仍走普通 shell。
+
+forkserver 通过 ``python -m core.skill_warm_pool --socket <path>`` 启动，stdin 关闭
+（主进程退出）时自动退出；主进程的环境变量变化后会在下次调用时重启。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import struct
+import sys
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+SKILL_WARM_POOL_ENABLED = (
+    os.getenv("SKILL_WARM_POOL_ENABLED", "true").lower() == "true"
+    and hasattr(os, "fork")
+    and hasattr(socket, "send_fds")
+)
+DEFAULT_PRELOAD = (
+    "core.skill_cli",
+    "core.platform.models",
+    "httpx",
+    "openai",
+    "feedparser",
+    "yfinance",
+    "ddgs",
+    "exa_py",
+    "yaml",
+)
+_READY_TIMEOUT_SEC = 60.0
+_ACK_TIMEOUT_SEC = 5.0
+_HEADER = struct.Struct("!I")
+_SCRIPT_MARKER = "run_execute_cli"
+_OPERATORS = {"&&", ";", "|", "||", "&", ">", ">>", "<", "(", ")"}
+_UNQUOTED_SPECIAL = set("$`\\*?[]{}~!#")
+_SRC_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _preload_modules() -> list[str]:
+    configured = os.getenv("SKILL_WARM_POOL_PRELOAD", "")
+    if configured.strip():
+        return [item.strip() for item in configured.split(",") if item.strip()]
+    return list(DEFAULT_PRELOAD)
+
+
+# ---------------------------------------------------------------------------
+# Command matching
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class WarmRoute:
+    script: str
+    argv: list[str]
+    cwd: str
+    env: dict[str, str] = field(default_factory=dict)
+
+
+def _tokenize(command: str) -> Optional[list[str]]:
+    """Split a shell command; return ``None`` if it needs a real shell."""
+    tokens: list[str] = []
+    current: list[str] = []
+    has_token = False
+    quote = ""
+    index = 0
+    text = str(command or "")
+    while index < len(text):
+        char = text[index]
+        if quote == "'":
+            if char == "'":
+                quote = ""
+            else:
+                current.append(char)
+        elif quote == '"':
+            if char == '"':
+                quote = ""
+            elif char in "$`\\":
+                return None
+            else:
+                current.append(char)
+        elif char in "'\"":
+            quote = char
+            has_token = True
+        elif char in " \t":
+            if has_token:
+                tokens.append("".join(current))
+                current, has_token = [], False
+        elif char in "&;|<>()":
+            if has_token:
+                tokens.append("".join(current))
+                current, has_token = [], False
+            pair = text[index : index + 2]
+            if pair in {"&&", "||", ">>"}:
+                tokens.append(pair)
+                index += 1
+            else:
+                tokens.append(char)
+        elif char in _UNQUOTED_SPECIAL or char in "\r\n":
+            return None
+        else:
+            current.append(char)
+            has_token = True
+        index += 1
+    if quote:
+        return None
+    if has_token:
+        tokens.append("".join(current))
+    return tokens
+
+
+def _is_assignment(token: str) -> bool:
+    name, sep, _value = token.partition("=")
+    return bool(sep) and name.isidentifier()
+
+
+_SCRIPT_CHECKS: dict[str, tuple[int, bool]] = {}
+
+
+def _is_skill_cli_script(path: str) -> bool:
+    target = Path(path)
+    if target.name != "execute.py" or target.parent.name != "scripts":
+        return False
+    try:
+        mtime_ns = target.stat().st_mtime_ns
+    except OSError:
+        return False
+    cached = _SCRIPT_CHECKS.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    try:
+        compatible = _SCRIPT_MARKER in target.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError):
+        compatible = False
+    _SCRIPT_CHECKS[path] = (mtime_ns, compatible)
+    return compatible
+
+
+def _same_interpreter(token: str, env_path: str) -> bool:
+    resolved = token if os.sep in token else shutil.which(token, path=env_path)
+    if not resolved:
+        return False
+    return os.path.realpath(resolved) == os.path.realpath(sys.executable)
+
+
+def match_skill_command(command: str, *, cwd: str) -> Optional[WarmRoute]:
+    """Return a route if ``command`` is a plain skill CLI invocation."""
+    tokens = _tokenize(command)
+    if not tokens:
+        return None
+    segments: list[list[str]] = [[]]
+    for token in tokens:
+        if token == "&&":
+            segments.append([])
+        elif token in _OPERATORS:
+            return None
+        else:
+            segments[-1].append(token)
+    if any(not segment for segment in segments):
+        return None
+
+    env: dict[str, str] = {}
+    workdir = cwd
+    for segment in segments[:-1]:
+        head, rest = segment[0], segment[1:]
+        if head == "export" and rest and all(_is_assignment(item) for item in rest):
+            for item in rest:
+                name, _, value = item.partition("=")
+                env[name] = value
+        elif head == "cd" and len(rest) == 1:
+            workdir = os.path.abspath(os.path.join(workdir, rest[0]))
+        else:
+            return None
+
+    call = list(segments[-1])
+    while call and _is_assignment(call[0]):
+        name, _, value = call.pop(0).partition("=")
+        env[name] = value
+    if len(call) < 2 or call[1].startswith("-"):
+        return None
+    if not _same_interpreter(call[0], env.get("PATH", os.environ.get("PATH", ""))):
+        return None
+    script = os.path.abspath(os.path.join(workdir, call[1]))
+    if not os.path.isdir(workdir) or not _is_skill_cli_script(script):
+        return None
+    return WarmRoute(script=script, argv=[call[1], *call[2:]], cwd=workdir, env=env)
+
+
+# ---------------------------------------------------------------------------
+# Forkserver (runs in its own process)
+# ---------------------------------------------------------------------------
+
+
+def _recv_request(conn: socket.socket) -> tuple[dict[str, Any], list[int]]:
+    data, fds, _flags, _addr = socket.recv_fds(conn, 1 << 16, 3)
+    while len(data) < _HEADER.size:
+        more = conn.recv(1 << 16)
+        if not more:
+            raise ConnectionError("truncated request")
+        data += more
+    (length,) = _HEADER.unpack_from(data)
+    payload = bytearray(data[_HEADER.size :])
+    while len(payload) < length:
+        more = conn.recv(1 << 16)
+        if not more:
+            raise ConnectionError("truncated request")
+        payload += more
+    return json.loads(bytes(payload[:length])), list(fds)
+
+
+def _exit_code(code: Any) -> int:
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _pythonpath_entries(env: dict[str, str]) -> list[str]:
+    return [item for item in str(env.get("PYTHONPATH") or "").split(os.pathsep) if item]
+
+
+def _run_child(conn: socket.socket, base_sys_path: list[str]) -> None:
+    import atexit
+    import runpy
+    import traceback
+
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    code = 1
+    try:
+        os.setpgid(0, 0)
+        request, fds = _recv_request(conn)
+        conn.sendall(json.dumps({"pid": os.getpid()}).encode("utf-8") + b"\n")
+        for target, fd in zip((0, 1, 2), fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        sys.argv = list(request["argv"])
+        # 与 ``python <script>`` 一致：脚本目录 + 调用方 PYTHONPATH + 标准库/site。
+        sys.path[:] = [
+            os.path.dirname(request["script"]),
+            *(os.path.abspath(item) for item in _pythonpath_entries(request["env"])),
+            *base_sys_path,
+        ]
+        try:
+            # run_path 会把 sys.argv[0] 设成传入的路径，保持与命令行一致。
+            runpy.run_path(sys.argv[0], run_name="__main__")
+            code = 0
+        except SystemExit as exc:
+            code = _exit_code(exc.code)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        with contextlib.suppress(Exception):
+            atexit._run_exitfuncs()
+        with contextlib.suppress(Exception):
+            logging.shutdown()
+        for stream in (sys.stdout, sys.stderr):
+            with contextlib.suppress(Exception):
+                stream.flush()
+        with contextlib.suppress(Exception):
+            conn.sendall(json.dumps({"exit": code}).encode("utf-8") + b"\n")
+    finally:
+        os._exit(code & 0xFF)
+
+
+def serve(socket_path: str) -> None:
+    import importlib
+    import selectors
+
+    for name in _preload_modules():
+        try:
+            importlib.import_module(name)
+        except Exception as exc:
+            print(f"skill warm pool: preload {name} skipped: {exc}", file=sys.stderr)
+
+    own_entries = {os.path.abspath(item) for item in _pythonpath_entries(dict(os.environ))}
+    base_sys_path = [
+        item for item in sys.path[1:] if os.path.abspath(item) not in own_entries
+    ]
+
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+    sys.stdout.write("READY\n")
+    sys.stdout.flush()
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ, "accept")
+    selector.register(sys.stdin, selectors.EVENT_READ, "parent")
+    try:
+        while True:
+            for key, _mask in selector.select():
+                if key.data == "parent":
+                    if not sys.stdin.buffer.read1(1):
+                        return
+                    continue
+                conn, _ = server.accept()
+                if os.fork() == 0:
+                    selector.close()
+                    server.close()
+                    _run_child(conn, base_sys_path)
+                conn.close()
+    finally:
+        server.close()
+        with contextlib.suppress(OSError):
+            os.unlink(socket_path)
+
+
+# ---------------------------------------------------------------------------
+# Client side (runs inside the bot process)
+# ---------------------------------------------------------------------------
+
+
+def _env_signature(env: dict[str, str]) -> str:
+    digest = hashlib.sha1()
+    for key in sorted(env):
+        digest.update(f"{key}={env[key]}\0".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+class WarmProcess:
+    """Subset of ``asyncio.subprocess.Process`` used by ``PrimitiveRuntime.bash``."""
+
+    def __init__(
+        self,
+        pid: int,
+        stdout: asyncio.StreamReader,
+        stderr: asyncio.StreamReader,
+        control: asyncio.StreamReader,
+        control_writer: asyncio.StreamWriter,
+    ) -> None:
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode: Optional[int] = None
+        self._control = control
+        self._control_writer = control_writer
+        self._killed = False
+
+    def kill(self) -> None:
+        self._killed = True
+        os.killpg(self.pid, signal.SIGKILL)
+
+    async def wait(self) -> int:
+        if self.returncode is None:
+            line = await self._control.readline()
+            try:
+                self.returncode = int(json.loads(line)["exit"])
+            except Exception:
+                self.returncode = -signal.SIGKILL if self._killed else 1
+            self._control_writer.close()
+        return self.returncode
+
+
+class WarmSpawnDispatched(RuntimeError):
+    """The request already reached the forkserver; the script may be running.
+
+    调用方不能再退回 shell 重跑同一条命令，否则脚本会执行两次。
+    """
+
+
+async def _pipe_reader(fd: int) -> tuple[asyncio.StreamReader, asyncio.BaseTransport]:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=1 << 20)
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", buffering=0)
+    )
+    return reader, transport
+
+
+class SkillWarmPool:
+    def __init__(self, *, enabled: bool = SKILL_WARM_POOL_ENABLED) -> None:
+        self.enabled = bool(enabled)
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._socket_dir = ""
+        self._socket_path = ""
+        self._env_signature = ""
+        self._starting: Optional[asyncio.Task[None]] = None
+
+    @property
+    def ready(self) -> bool:
+        return (
+            self._process is not None
+            and self._process.returncode is None
+            and self._env_signature == _env_signature(dict(os.environ))
+        )
+
+    def match(self, command: str, *, cwd: str) -> Optional[WarmRoute]:
+        if not self.enabled:
+            return None
+        return match_skill_command(command, cwd=cwd)
+
+    def ensure_started(self) -> None:
+        """Start (or restart) the forkserver in the background."""
+        if not self.enabled or self.ready:
+            return
+        if self._starting is not None and not self._starting.done():
+            return
+        self._starting = asyncio.get_running_loop().create_task(self.start())
+
+    async def start(self) -> None:
+        await self.close()
+        self._socket_dir = tempfile.mkdtemp(prefix="ikaros-skill-")
+        self._socket_path = os.path.join(self._socket_dir, "fs.sock")
+        env = dict(os.environ)
+        signature = _env_signature(env)
+        env["PYTHONPATH"] = os.pathsep.join(
+            item for item in (str(_SRC_ROOT), env.get("PYTHONPATH", "")) if item
+        )
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "core.skill_warm_pool",
+            "--socket",
+            self._socket_path,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        try:
+            line = await asyncio.wait_for(
+                process.stdout.readline(), timeout=_READY_TIMEOUT_SEC
+            )
+        except asyncio.TimeoutError:
+            line = b""
+        if line.strip() != b"READY":
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+            await process.wait()
+            logger.warning("Skill warm pool failed to start; using cold execution.")
+            return
+        self._process = process
+        self._env_signature = signature
+        logger.info("Skill warm pool ready (pid=%s)", process.pid)
+
+    async def spawn(self, route: WarmRoute) -> WarmProcess:
+        if not self.ready:
+            raise RuntimeError("skill warm pool is not ready")
+        env = dict(os.environ)
+        env.update(route.env)
+        body = json.dumps(
+            {"script": route.script, "argv": route.argv, "cwd": route.cwd, "env": env},
+            ensure_ascii=False,
+        ).encode("utf-8")
+
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(5.0)
+            sock.connect(self._socket_path)
+            socket.send_fds(sock, [_HEADER.pack(len(body)) + body], [devnull, out_w, err_w])
+            sock.setblocking(False)
+        except BaseException:
+            sock.close()
+            for fd in (out_r, err_r):
+                os.close(fd)
+            raise
+        finally:
+            for fd in (devnull, out_w, err_w):
+                os.close(fd)
+
+        # 请求已交给 forkserver：之后的失败都不能让调用方退回 shell 重跑。
+        transports: list[asyncio.BaseTransport] = []
+        pending_fds = [out_r, err_r]
+        control_writer: Optional[asyncio.StreamWriter] = None
+        pid = 0
+        try:
+            stdout, transport = await _pipe_reader(pending_fds.pop(0))
+            transports.append(transport)
+            stderr, transport = await _pipe_reader(pending_fds.pop(0))
+            transports.append(transport)
+            control, control_writer = await asyncio.open_unix_connection(sock=sock)
+            hello = json.loads(
+                await asyncio.wait_for(control.readline(), timeout=_ACK_TIMEOUT_SEC)
+            )
+            pid = int(hello["pid"])
+            return WarmProcess(pid, stdout, stderr, control, control_writer)
+        except BaseException as exc:
+            if pid:
+                with contextlib.suppress(ProcessLookupError, PermissionError):
+                    os.killpg(pid, signal.SIGKILL)
+            for transport in transports:
+                transport.close()
+            for fd in pending_fds:
+                os.close(fd)
+            if control_writer is not None:
+                control_writer.close()
+            else:
+                sock.close()
+            if isinstance(exc, Exception):
+                raise WarmSpawnDispatched(
+                    "skill warm pool did not acknowledge the request"
+                ) from exc
+            raise
+
+    async def close(self) -> None:
+        process, self._process = self._process, None
+        if process is not None and process.returncode is None:
+            with contextlib.suppress(Exception):
+                process.stdin.close()
+            try:
+                await asyncio.wait_for(process.wait(), timeout=2.0)
+            except asyncio.TimeoutError:
+                with contextlib.suppress(ProcessLookupError):
+                    process.kill()
+                await process.wait()
+        if self._socket_dir:
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+            self._socket_dir = ""
+
+
+skill_warm_pool = SkillWarmPool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Skill CLI forkserver")
+    parser.add_argument("--socket", required=True)
+    args = parser.parse_args()
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
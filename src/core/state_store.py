@@ -1,3 +1,4 @@
+import asyncio
 import importlib
 import logging
 import re
@@ -8,6 +9,8 @@ from typing import Any
 from urllib.parse import quote
 
 from core.app_paths import data_dir
+from core.perf_trace import traced
+from core.token_estimator import estimate_tokens
 
 _state_io = importlib.import_module("core.state_io")
 init_db = _state_io.init_db
@@ -15,6 +18,12 @@ now_iso = _state_io.now_iso
 read_json = _state_io.read_json
 write_json = _state_io.write_json
 
+_chat_session_log = importlib.import_module("core.chat_session_log")
+_chat_session_catalog = importlib.import_module("core.chat_session_catalog")
+chat_session_catalog = _chat_session_catalog.chat_session_catalog
+_chat_search_index = importlib.import_module("core.chat_search_index")
+chat_search_index = _chat_search_index.chat_search_index
+
 _state_paths = importlib.import_module("core.state_paths")
 system_path = _state_paths.system_path
 user_path = _state_paths.user_path
@@ -22,9 +31,9 @@ SINGLE_USER_SCOPE = _state_paths.SINGLE_USER_SCOPE
 
 logger = logging.getLogger(__name__)
 
-_ENTRY_RE = re.compile(r"^###\s+(system|user|model)\s*\n```text\n(.*?)\n```", re.M | re.S)
 _VISIBLE_CHAT_ROLES = {"user", "model"}
 _SUPPORTED_CHAT_ROLES = _VISIBLE_CHAT_ROLES | {"system"}
+_SYSTEM_ROLES = frozenset({"system"})
 
 
 def _safe_session_id(value: str) -> str:
@@ -67,23 +76,6 @@ def _session_path(user_id: int | str, day: str, session_id: str) -> Path:
     return (_chat_root(user_id) / day / f"{_safe_session_id(session_id)}.md").resolve()
 
 
-def _entry_block(role: str, content: str) -> str:
-    text = str(content or "").replace("\r\n", "\n").replace("\r", "\n").rstrip()
-    return f"### {role}\n```text\n{text}\n```\n\n"
-
-
-def _parse_entries(content: str) -> list[dict[str, str]]:
-    rows: list[dict[str, str]] = []
-    raw = str(content or "")
-    for match in _ENTRY_RE.finditer(raw):
-        role = str(match.group(1) or "user").strip().lower()
-        body = str(match.group(2) or "").strip()
-        if not body:
-            continue
-        rows.append({"role": role, "content": body})
-    return rows
-
-
 def _normalize_chat_role(role: str) -> str:
     safe_role = str(role or "").strip().lower()
     if safe_role in _SUPPORTED_CHAT_ROLES:
@@ -92,20 +84,7 @@ def _normalize_chat_role(role: str) -> str:
 
 
 def _render_session(day: str, session_id: str, rows: list[dict[str, str]]) -> str:
-    lines = [
-        "# Chat Session",
-        "",
-        f"- date: {day}",
-        f"- session: {session_id}",
-        "",
-        "## Dialogue",
-        "",
-    ]
-    body = "".join(
-        _entry_block(str(item.get("role") or "user"), str(item.get("content") or ""))
-        for item in rows
-    )
-    return "\n".join(lines) + body
+    return _chat_session_log.render_session(day, session_id, rows)
 
 
 def _extract_day_from_path(path: Path) -> str:
@@ -119,29 +98,101 @@ def _extract_session_from_path(path: Path) -> str:
     return str(path.stem or "").strip() or str(uuid.uuid4())
 
 
+def _backfill_session_indexes(user_id: int | str, scope: str) -> None:
+    chat_session_catalog.ensure_synced(
+        scope,
+        _chat_root(user_id),
+        read_rows=_chat_session_log.read_entries,
+        extract_day=_extract_day_from_path,
+        extract_session=_extract_session_from_path,
+    )
+    try:
+        chat_search_index.ensure_synced(
+            scope,
+            list_sessions=lambda: chat_session_catalog.list_sessions(scope),
+            read_rows=_chat_session_log.read_entries,
+        )
+    except Exception as e:
+        logger.warning(f"Error backfilling chat search index: {e}")
+
+
+async def _sync_session_indexes(user_id: int | str) -> str:
+    scope = _safe_user_scope(user_id)
+    if chat_session_catalog.synced(scope) and chat_search_index.synced(scope):
+        return scope
+    # 进程内首次访问该用户目录：对账会话目录并回填全文索引，可能要读遍
+    # 所有会话文件，放到线程里做，不阻塞事件循环。
+    await asyncio.to_thread(_backfill_session_indexes, user_id, scope)
+    return scope
+
+
 async def _list_session_files(user_id: int | str) -> list[Path]:
-    root = _chat_root(user_id)
-    if not root.exists():
-        return []
-    files = [p for p in root.glob("*/*.md") if p.is_file()]
-    files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return files
+    scope = await _sync_session_indexes(user_id)
+    return [
+        Path(item["path"])
+        for item in chat_session_catalog.list_sessions(scope)
+        if item.get("path")
+    ]
 
 
 async def _resolve_session_file(user_id: int | str, session_id: str) -> Path | None:
     sid = _safe_session_id(session_id)
-    root = _chat_root(user_id)
-    if not root.exists():
-        return None
     today_path = _session_path(user_id, date.today().isoformat(), sid)
     if today_path.exists():
         return today_path
-    for p in root.glob(f"*/{sid}.md"):
-        if p.is_file():
-            return p
+    scope = await _sync_session_indexes(user_id)
+    item = chat_session_catalog.lookup(scope, sid)
+    if item is None:
+        return None
+    path = Path(item["path"])
+    if path.is_file():
+        return path
+    chat_session_catalog.forget(scope, sid)
+    chat_search_index.forget(scope, sid)
     return None
 
 
+async def _catalog_snapshot(user_id: int | str, session_id: str, path: Path) -> None:
+    scope = await _sync_session_indexes(user_id)
+    day = _extract_day_from_path(path)
+    rows = _chat_session_log.read_entries(path)
+    try:
+        chat_session_catalog.record_snapshot(
+            scope,
+            session_id,
+            day=day,
+            path=path,
+            rows=rows,
+        )
+        chat_search_index.record_snapshot(
+            scope,
+            session_id,
+            day=day,
+            path=path,
+            rows=rows,
+        )
+    except Exception as e:
+        logger.warning(f"Error updating chat session indexes: {e}")
+
+
+def _record_append_indexes(
+    scope: str, session_id: str, *, day: str, path: Path, role: str, content: str
+) -> None:
+    # 会话目录与全文索引同在 bot_data.db：一个连接、一个事务、一次提交。
+    with chat_session_catalog.write_transaction() as conn:
+        for index in (chat_session_catalog, chat_search_index):
+            index.record_append(
+                scope,
+                session_id,
+                day=day,
+                path=path,
+                role=role,
+                content=content,
+                conn=conn,
+            )
+
+
+@traced("store.state.save_message")
 async def save_message(
     user_id: int | str, role: str, content: str, session_id: str
 ) -> bool:
@@ -152,25 +203,50 @@ async def save_message(
         if session_file is None:
             session_file = _session_path(uid, date.today().isoformat(), sid)
 
-        session_file.parent.mkdir(parents=True, exist_ok=True)
-        existing = (
-            session_file.read_text(encoding="utf-8") if session_file.exists() else ""
-        )
+        text = str(content or "").strip()
+        if not text:
+            return True
         day = _extract_day_from_path(session_file)
-        rows = _parse_entries(existing)
-        rows.append(
-            {
-                "role": _normalize_chat_role(role),
-                "content": str(content or "").strip(),
-            }
+        safe_role = _normalize_chat_role(role)
+        scope = await _sync_session_indexes(uid)
+        _chat_session_log.append_entry(
+            session_file,
+            day=day,
+            session_id=sid,
+            role=safe_role,
+            content=text,
         )
-        session_file.write_text(_render_session(day, sid, rows), encoding="utf-8")
+        try:
+            await asyncio.to_thread(
+                _record_append_indexes,
+                scope,
+                sid,
+                day=day,
+                path=session_file,
+                role=safe_role,
+                content=text,
+            )
+        except Exception as e:
+            logger.warning(f"Error updating chat session indexes: {e}")
         return True
     except Exception as e:
         logger.error(f"Error saving message: {e}")
         return False
 
 
+def _tail_within_tokens(rows: list[dict[str, Any]], max_tokens: int) -> list[dict[str, Any]]:
+    """Keep the newest rows whose estimated tokens fit ``max_tokens`` (at least one)."""
+    used = 0
+    start = len(rows)
+    while start > 0:
+        cost = estimate_tokens(str(rows[start - 1].get("content") or ""))
+        if start < len(rows) and used + cost > max_tokens:
+            break
+        used += cost
+        start -= 1
+    return rows[start:]
+
+
 async def get_session_messages(
     user_id: int | str,
     session_id: str,
@@ -179,25 +255,23 @@ async def get_session_messages(
     include_system: bool = False,
     preserve_system_prefixes: tuple[str, ...] = (),
     preserve_system_limit: int = 0,
+    max_tokens: int = 0,
 ) -> list[dict[str, Any]]:
     try:
         uid = str(user_id)
         path = await _resolve_session_file(uid, session_id)
         if not path or not path.exists():
             return []
-        rows = _parse_entries(path.read_text(encoding="utf-8"))
-        visible_rows = [
-            item
-            for item in rows
-            if str(item.get("role") or "").strip().lower() != "system"
-        ]
-        tail = visible_rows[-max(1, int(limit)) :]
-        selected_rows = list(tail)
+        selected_rows = _chat_session_log.read_tail(
+            path,
+            max(1, int(limit)),
+            exclude_roles=_SYSTEM_ROLES,
+        )
+        if max_tokens > 0:
+            selected_rows = _tail_within_tokens(selected_rows, int(max_tokens))
         if include_system:
             system_rows = []
-            for item in rows:
-                if str(item.get("role") or "").strip().lower() != "system":
-                    continue
+            for item in _chat_session_log.read_role(path, "system"):
                 content = str(item.get("content") or "")
                 if preserve_system_prefixes and not any(
                     content.startswith(prefix) for prefix in preserve_system_prefixes
@@ -222,13 +296,18 @@ async def get_session_messages(
 async def get_session_entries(
     user_id: int | str,
     session_id: str,
+    *,
+    role: str = "",
 ) -> list[dict[str, str]]:
     try:
         uid = str(user_id)
         path = await _resolve_session_file(uid, session_id)
         if not path or not path.exists():
             return []
-        rows = _parse_entries(path.read_text(encoding="utf-8"))
+        if role:
+            rows = _chat_session_log.read_role(path, _normalize_chat_role(role))
+        else:
+            rows = _chat_session_log.read_entries(path)
         return [
             {
                 "role": _normalize_chat_role(str(item.get("role") or "user")),
@@ -242,6 +321,44 @@ async def get_session_entries(
         return []
 
 
+async def count_session_messages(user_id: int | str, session_id: str) -> int:
+    """Count visible (user/model) rows using the in-process entry index."""
+    try:
+        path = await _resolve_session_file(str(user_id), session_id)
+        if not path or not path.exists():
+            return 0
+        return _chat_session_log.count_entries(path, exclude_roles=_SYSTEM_ROLES)
+    except Exception as e:
+        logger.error(f"Error counting session messages: {e}")
+        return 0
+
+
+async def get_session_message_range(
+    user_id: int | str,
+    session_id: str,
+    start: int,
+    end: int | None = None,
+) -> list[dict[str, str]]:
+    """Visible rows ``[start, end)``; only the selected blocks are read from disk."""
+    try:
+        path = await _resolve_session_file(str(user_id), session_id)
+        if not path or not path.exists():
+            return []
+        rows = _chat_session_log.read_range(
+            path, start, end, exclude_roles=_SYSTEM_ROLES
+        )
+        return [
+            {
+                "role": _normalize_chat_role(str(item.get("role") or "user")),
+                "content": str(item.get("content") or "").strip(),
+            }
+            for item in rows
+        ]
+    except Exception as e:
+        logger.error(f"Error reading session message range: {e}")
+        return []
+
+
 async def replace_session_entries(
     user_id: int | str,
     session_id: str,
@@ -263,10 +380,13 @@ async def replace_session_entries(
             for item in list(rows or [])
             if str(item.get("content") or "").strip()
         ]
-        session_file.write_text(
-            _render_session(day, sid, normalized_rows),
-            encoding="utf-8",
+        _chat_session_log.write_session(
+            session_file,
+            day=day,
+            session_id=sid,
+            rows=normalized_rows,
         )
+        await _catalog_snapshot(uid, sid, session_file)
         return True
     except Exception as e:
         logger.error(f"Error replacing session entries: {e}")
@@ -276,9 +396,10 @@ async def replace_session_entries(
 async def get_latest_session_id(user_id: int | str) -> str:
     try:
         uid = str(user_id)
-        files = await _list_session_files(uid)
-        if files:
-            return _extract_session_from_path(files[0])
+        scope = await _sync_session_indexes(uid)
+        latest = chat_session_catalog.list_sessions(scope, limit=1)
+        if latest:
+            return str(latest[0]["session_id"])
         return str(uuid.uuid4())
     except Exception as e:
         logger.error(f"Error getting latest session: {e}")
@@ -300,6 +421,7 @@ async def create_chat_session(
             _render_session(_extract_day_from_path(session_file), sid, []),
             encoding="utf-8",
         )
+        await _catalog_snapshot(uid, sid, session_file)
     stat = session_file.stat()
     return {
         "session_id": sid,
@@ -316,79 +438,111 @@ async def list_chat_sessions(
 ) -> list[dict[str, Any]]:
     try:
         uid = str(user_id)
-        files = await _list_session_files(uid)
-        sessions: list[dict[str, Any]] = []
-        for path in files[: max(1, int(limit))]:
-            rows = _parse_entries(path.read_text(encoding="utf-8"))
-            visible_rows = [
-                row
-                for row in rows
-                if str(row.get("role") or "").strip().lower() in _VISIBLE_CHAT_ROLES
-            ]
-            preview = str((visible_rows[-1] if visible_rows else {}).get("content") or "").strip()
-            title = ""
-            for item in visible_rows:
-                if str(item.get("role") or "").strip().lower() == "user":
-                    title = str(item.get("content") or "").strip()
-                    break
-            stat = path.stat()
-            sessions.append(
-                {
-                    "session_id": _extract_session_from_path(path),
-                    "title": (title[:48] if title else "新对话"),
-                    "preview": preview[:120],
-                    "message_count": len(visible_rows),
-                    "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                    "updated_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    "path": str(path),
-                }
+        sessions = [
+            {
+                "session_id": item["session_id"],
+                "title": item["title"],
+                "preview": item["preview"],
+                "message_count": item["message_count"],
+                "created_at": item["created_at"],
+                "updated_at": item["updated_at"],
+                "path": item["path"],
+            }
+            for item in chat_session_catalog.list_sessions(
+                await _sync_session_indexes(uid),
+                limit=max(1, int(limit)),
             )
+        ]
         return sessions
     except Exception as e:
         logger.error(f"Error listing chat sessions: {e}")
         return []
 
 
+async def _scan_messages(
+    user_id: int | str,
+    keyword: str,
+    *,
+    limit: int = 20,
+    session_id: str | None = None,
+    day: str | None = None,
+    role: str | None = None,
+) -> list[dict[str, Any]]:
+    """Linear newest-first substring scan, used when the FTS index is unavailable."""
+    needle = str(keyword or "").strip().lower()
+    uid = str(user_id)
+    if session_id:
+        resolved = await _resolve_session_file(uid, session_id)
+        files = [resolved] if resolved is not None else []
+    else:
+        files = await _list_session_files(uid)
+
+    matched: list[dict[str, Any]] = []
+    for path in files:
+        path_day = _extract_day_from_path(path)
+        if day and path_day != day:
+            continue
+        sid = _extract_session_from_path(path)
+        rows = _chat_session_log.read_entries(path)
+        for row in reversed(rows):
+            row_role = str(row.get("role") or "").strip().lower()
+            if row_role == "system" or (role and row_role != role):
+                continue
+            content = str(row.get("content") or "")
+            if needle not in content.lower():
+                continue
+            matched.append(
+                {
+                    "role": str(row.get("role") or "user"),
+                    "content": content,
+                    "created_at": path_day,
+                    "session_id": sid,
+                }
+            )
+            if len(matched) >= max(1, int(limit)):
+                return matched
+    return matched
+
+
 async def search_messages(
     user_id: int | str,
     keyword: str,
     *,
     limit: int = 20,
     session_id: str | None = None,
+    day: str | None = None,
+    role: str | None = None,
 ) -> list[dict[str, Any]]:
     text = str(keyword or "").strip()
     if not text:
         return []
-    needle = text.lower()
     try:
         uid = str(user_id)
-        files = await _list_session_files(uid)
-        if session_id:
-            sid = _safe_session_id(session_id)
-            files = [p for p in files if p.stem == sid]
-
-        matched: list[dict[str, Any]] = []
-        for path in files:
-            day = _extract_day_from_path(path)
-            sid = _extract_session_from_path(path)
-            rows = _parse_entries(path.read_text(encoding="utf-8"))
-            for row in reversed(rows):
-                if str(row.get("role") or "").strip().lower() == "system":
-                    continue
-                content = str(row.get("content") or "")
-                if needle not in content.lower():
-                    continue
-                matched.append(
-                    {
-                        "role": str(row.get("role") or "user"),
-                        "content": content,
-                        "created_at": day,
-                        "session_id": sid,
-                    }
-                )
-                if len(matched) >= max(1, int(limit)):
-                    return matched
-        return matched
+        scope = await _sync_session_indexes(uid)
+        try:
+            hits = chat_search_index.search(
+                scope,
+                text,
+                limit=limit,
+                session_id=_safe_session_id(session_id) if session_id else None,
+                day=day,
+                role=_normalize_chat_role(role) if role else None,
+            )
+            # 超出查询预算被打断时结果不完整，退回按文件从新到旧扫描。
+            if not hits.truncated:
+                return hits
+        except _chat_search_index.ChatSearchUnavailable:
+            pass
+        except Exception as e:
+            logger.warning(f"Chat search index unavailable, scanning files: {e}")
+        return await _scan_messages(
+            uid,
+            text,
+            limit=limit,
+            session_id=session_id,
+            day=day,
+            role=role,
+        )
     except Exception as e:
         logger.error(f"Error searching messages: {e}")
         return []
@@ -406,7 +560,7 @@ async def get_recent_messages_for_user(
         for path in files:
             day = _extract_day_from_path(path)
             sid = _extract_session_from_path(path)
-            rows = _parse_entries(path.read_text(encoding="utf-8"))
+            rows = _chat_session_log.read_entries(path)
             for row in reversed(rows):
                 if str(row.get("role") or "").strip().lower() == "system":
                     continue
@@ -436,18 +590,19 @@ async def get_day_session_transcripts(
     try:
         uid = str(user_id)
         target_day = (day or date.today()).isoformat()
-        day_dir = _chat_root(uid) / target_day
-        if not day_dir.exists():
-            return []
-
-        files = [p for p in day_dir.glob("*.md") if p.is_file()]
-        files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+        catalog_rows = chat_session_catalog.list_sessions(
+            await _sync_session_indexes(uid),
+            day=target_day,
+            limit=max(1, int(max_sessions)),
+        )
 
         bundles: list[dict[str, Any]] = []
-        for path in files[: max(1, int(max_sessions))]:
+        for item in catalog_rows:
+            path = Path(item["path"])
+            if not path.is_file():
+                continue
             sid = _extract_session_from_path(path)
-            text = path.read_text(encoding="utf-8")
-            rows = _parse_entries(text)
+            rows = _chat_session_log.read_entries(path)
             if not rows:
                 continue
             rendered_lines: list[str] = []
@@ -468,9 +623,7 @@ async def get_day_session_transcripts(
                     "messages": rows,
                     "transcript": transcript,
                     "path": str(path),
-                    "updated_at": datetime.fromtimestamp(
-                        path.stat().st_mtime
-                    ).isoformat(),
+                    "updated_at": item["updated_at"],
                 }
             )
         return bundles
@@ -0,0 +1,319 @@
+"""Content-addressed cache for LLM summaries, stored in ``bot_data.db``.
+
+RSS 条目摘要和网页摘要对同一份内容会被反复请求（同一条目出现在多个订阅、
+同一链接被多人转发）。这里按「规范化内容 + 模型 + prompt 版本」的 sha256
+做键，把摘要结果落盘：
+
+- TTL：超过 ``SUMMARY_CACHE_TTL_SEC`` 的条目视为过期，读到时删除；
+- LRU：写入后按 ``last_access`` 淘汰，保证条目数不超过
+  ``SUMMARY_CACHE_MAX_ENTRIES``、总字节数不超过 ``SUMMARY_CACHE_MAX_BYTES``；
+- single-flight：同一进程内相同键的并发请求只触发一次 LLM 调用，其余请求
+  等待同一个结果。
+
+只缓存计算成功且非空的结果；调用方的降级文本（例如截断原文）不会写入缓存。
+命中率计数汇总在进程内（进程重启清零），供 ``/usage`` 展示。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Iterator
+
+from core.app_paths import data_dir
+
+logger = logging.getLogger(__name__)
+
+_CACHE_TABLE = "summary_cache"
+# 发起计算的请求被取消时交给等待者的信号：让它们重新查缓存或自己计算。
+_OWNER_CANCELLED = object()
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() == "true"
+SUMMARY_CACHE_TTL_SEC = max(60, _env_int("SUMMARY_CACHE_TTL_SEC", 7 * 24 * 3600))
+SUMMARY_CACHE_MAX_ENTRIES = max(16, _env_int("SUMMARY_CACHE_MAX_ENTRIES", 5000))
+SUMMARY_CACHE_MAX_BYTES = max(
+    64 * 1024, _env_int("SUMMARY_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+)
+
+
+def normalize_content(text: str) -> str:
+    """折叠空白，让仅有排版差异的同一内容落到同一个键。"""
+    return _WHITESPACE_RE.sub(" ", str(text or "")).strip()
+
+
+def summary_cache_key(
+    kind: str,
+    content: str,
+    *,
+    model: str,
+    prompt_version: str,
+) -> str:
+    digest = hashlib.sha256()
+    for part in (kind, model, prompt_version, normalize_content(content)):
+        digest.update(str(part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class SummaryCache:
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._ready_dbs: set[str] = set()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _db_path(self) -> Path:
+        return (data_dir() / "bot_data.db").resolve()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db_path = self._db_path()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            self._ensure_db(conn, str(db_path))
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_db(self, conn: sqlite3.Connection, key: str) -> None:
+        if key in self._ready_dbs:
+            return
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {_CACHE_TABLE} (
+                cache_key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{_CACHE_TABLE}_last_access "
+            f"ON {_CACHE_TABLE}(last_access)"
+        )
+        conn.commit()
+        self._ready_dbs.add(key)
+
+    def _bump(self, kind: str, field: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            row = self._stats.setdefault(
+                kind,
+                {"hits": 0, "misses": 0, "joined": 0, "stores": 0, "errors": 0},
+            )
+            row[field] = row.get(field, 0) + amount
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            with self._connect() as conn:
+                row = conn.execute(
+                    f"SELECT value, created_at FROM {_CACHE_TABLE} WHERE cache_key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    return None
+                if now - float(row["created_at"] or 0) > SUMMARY_CACHE_TTL_SEC:
+                    conn.execute(
+                        f"DELETE FROM {_CACHE_TABLE} WHERE cache_key = ?", (key,)
+                    )
+                    return None
+                conn.execute(
+                    f"UPDATE {_CACHE_TABLE} SET last_access = ? WHERE cache_key = ?",
+                    (now, key),
+                )
+        return str(row["value"])
+
+    def put(self, key: str, kind: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute(
+                    f"""
+                    INSERT INTO {_CACHE_TABLE} (
+                        cache_key, kind, value, size, created_at, last_access
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(cache_key) DO UPDATE SET
+                        value = excluded.value,
+                        size = excluded.size,
+                        created_at = excluded.created_at,
+                        last_access = excluded.last_access
+                    """,
+                    (key, kind, value, size, now, now),
+                )
+                self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            f"DELETE FROM {_CACHE_TABLE} WHERE created_at < ?",
+            (now - SUMMARY_CACHE_TTL_SEC,),
+        )
+        row = conn.execute(
+            f"SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM {_CACHE_TABLE}"
+        ).fetchone()
+        entries = int(row["entries"] or 0)
+        total_bytes = int(row["bytes"] or 0)
+        if entries <= SUMMARY_CACHE_MAX_ENTRIES and total_bytes <= SUMMARY_CACHE_MAX_BYTES:
+            return
+        # 按最久未访问的顺序淘汰，直到条目数和字节数都回到上限以内。
+        stale: list[str] = []
+        for item in conn.execute(
+            f"SELECT cache_key, size FROM {_CACHE_TABLE} ORDER BY last_access ASC"
+        ):
+            if entries <= SUMMARY_CACHE_MAX_ENTRIES and total_bytes <= SUMMARY_CACHE_MAX_BYTES:
+                break
+            stale.append(str(item["cache_key"]))
+            entries -= 1
+            total_bytes -= int(item["size"] or 0)
+        conn.executemany(
+            f"DELETE FROM {_CACHE_TABLE} WHERE cache_key = ?",
+            [(key,) for key in stale],
+        )
+
+    async def get_or_compute(
+        self,
+        kind: str,
+        content: str,
+        *,
+        model: str,
+        prompt_version: str,
+        compute: Callable[[], Awaitable[str]],
+    ) -> str:
+        """返回缓存的摘要；未命中时调用 ``compute``，并发的相同请求共享一次调用。
+
+        ``compute`` 抛出的异常会原样传给所有等待者，且不写入缓存；发起调用的
+        请求被取消时，等待者不跟着收到 ``CancelledError``，而是重新查缓存或
+        自己接手计算。SQLite 读写放到线程里，不阻塞事件循环。
+        """
+        if not SUMMARY_CACHE_ENABLED:
+            return await compute()
+
+        key = summary_cache_key(
+            kind, content, model=model, prompt_version=prompt_version
+        )
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = self._inflight.get(key)
+            if pending is None or pending.get_loop() is not loop:
+                break
+            self._bump(kind, "joined")
+            value = await asyncio.shield(pending)
+            if value is not _OWNER_CANCELLED:
+                return value
+
+        cached = await asyncio.to_thread(self.get, key)
+        if cached is not None:
+            self._bump(kind, "hits")
+            return cached
+        pending = self._inflight.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            # 查缓存期间已有别的请求接手计算。
+            return await self.get_or_compute(
+                kind,
+                content,
+                model=model,
+                prompt_version=prompt_version,
+                compute=compute,
+            )
+
+        self._bump(kind, "misses")
+        future: asyncio.Future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            if not future.done():
+                future.set_result(_OWNER_CANCELLED)
+            raise
+        except Exception as exc:
+            self._bump(kind, "errors")
+            if not future.done():
+                future.set_exception(exc)
+                # 没有等待者时避免 "exception was never retrieved" 日志。
+                future.exception()
+            raise
+        else:
+            value = str(value or "")
+            if value.strip():
+                try:
+                    await asyncio.to_thread(self.put, key, kind, value)
+                    self._bump(kind, "stores")
+                except sqlite3.Error as exc:
+                    logger.warning("Summary cache write failed: %s", exc)
+            if not future.done():
+                future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                self._inflight.pop(key, None)
+
+    def disk_usage(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM {_CACHE_TABLE}"
+            ).fetchone()
+        return {"entries": int(row["entries"] or 0), "bytes": int(row["bytes"] or 0)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            kinds = {kind: dict(row) for kind, row in self._stats.items()}
+        return {"kinds": kinds, **self.disk_usage()}
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._stats.clear()
+
+    def clear(self) -> int:
+        with self._lock:
+            with self._connect() as conn:
+                cursor = conn.execute(f"DELETE FROM {_CACHE_TABLE}")
+        return int(cursor.rowcount or 0)
+
+    def render_summary(self) -> str:
+        snapshot = self.snapshot()
+        kinds = snapshot["kinds"]
+        if not kinds and not snapshot["entries"]:
+            return "🗂️ 暂无摘要缓存统计。"
+        lines = [
+            "🗂️ 摘要缓存（命中计数为本进程启动以来累计，非今日数据）",
+            "",
+            f"- 磁盘条目：`{snapshot['entries']}` | 占用：`{snapshot['bytes']}` bytes",
+        ]
+        for kind in sorted(kinds):
+            row = kinds[kind]
+            served = row["hits"] + row["joined"]
+            lookups = served + row["misses"]
+            ratio = f"{served / lookups * 100:.1f}%" if lookups else "0.0%"
+            lines.append(
+                f"- `{kind}` | 命中={row['hits']} 合并={row['joined']}"
+                f" 未命中={row['misses']} 失败={row['errors']} | 命中率 `{ratio}`"
+            )
+        return "\n".join(lines)
+
+
+summary_cache = SummaryCache()
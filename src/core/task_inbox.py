@@ -10,6 +10,7 @@ from typing import Any, Dict, List, Optional
 from uuid import uuid4
 
 from core.config import DATA_DIR
+from core.perf_trace import traced
 
 logger = logging.getLogger(__name__)
 
@@ -397,6 +398,7 @@ class TaskInbox:
             self._startup_maintenance_done = True
             self._loaded = True
 
+    @traced("store.task_inbox.persist")
     async def _persist_task_unlocked(self, task: TaskEnvelope) -> None:
         if not self.persist:
             return
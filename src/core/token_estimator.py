@@ -0,0 +1,108 @@
+"""Local token estimator shared by usage accounting and the context budgeter.
+
+估算规则与 ``llm_usage_store`` 原实现一致：每个 CJK 字符计 1 token，其余字符按
+UTF-8 字节数 / 4 向上取整。实现上用一次正则 ``subn`` 代替逐字符 Python 循环，
+并对较长文本按内容缓存结果——同一段 system prompt / 工具结果在一轮对话的多次
+请求里会被反复估算。缓存键是内容的 sha1 摘要加长度，不持有原文本身，
+4096 条上限下占用的内存与文本大小无关。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import Any
+
+_CJK_RE = re.compile(
+    "[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+    "\U00020000-\U0002a6df\U0002a700-\U0002ebef]"
+)
+_CACHE_MIN_CHARS = 256
+_MAX_CACHE_ENTRIES = 4096
+MESSAGE_OVERHEAD_TOKENS = 4
+TOOLS_OVERHEAD_TOKENS = 12
+
+_cache: "OrderedDict[tuple[bytes, int], int]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _count(text: str) -> int:
+    non_cjk, cjk_chars = _CJK_RE.subn("", text)
+    if non_cjk.isascii():
+        non_cjk_bytes = len(non_cjk)
+    else:
+        non_cjk_bytes = len(non_cjk.encode("utf-8"))
+    return cjk_chars + math.ceil(non_cjk_bytes / 4)
+
+
+def estimate_tokens(value: Any) -> int:
+    text = value if isinstance(value, str) else str(value or "")
+    text = text.strip()
+    if not text:
+        return 0
+    if len(text) < _CACHE_MIN_CHARS:
+        return _count(text)
+
+    key = (hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest(), len(text))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+    estimate = _count(text)
+    with _cache_lock:
+        _cache[key] = estimate
+        while len(_cache) > _MAX_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return estimate
+
+
+def _content_tokens(content: Any) -> int:
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return estimate_tokens(content)
+    if isinstance(content, list):
+        total = 0
+        for part in content:
+            if isinstance(part, dict):
+                if part.get("type") == "text" or "text" in part:
+                    total += estimate_tokens(part.get("text"))
+                else:
+                    # 图片等非文本块：按序列化长度粗估，避免完全不计入。
+                    total += estimate_tokens(
+                        json.dumps(part, ensure_ascii=False, default=str)[:2048]
+                    )
+            else:
+                total += estimate_tokens(part)
+        return total
+    return estimate_tokens(json.dumps(content, ensure_ascii=False, default=str))
+
+
+def estimate_message_tokens(message: Any) -> int:
+    if not isinstance(message, dict):
+        return estimate_tokens(message) + MESSAGE_OVERHEAD_TOKENS
+    total = MESSAGE_OVERHEAD_TOKENS + _content_tokens(message.get("content"))
+    for call in message.get("tool_calls") or []:
+        function = call.get("function") if isinstance(call, dict) else None
+        if isinstance(function, dict):
+            total += estimate_tokens(function.get("name"))
+            total += estimate_tokens(function.get("arguments"))
+    return total
+
+
+def estimate_tools_tokens(tools: Any) -> int:
+    if not tools:
+        return 0
+    return TOOLS_OVERHEAD_TOKENS + estimate_tokens(
+        json.dumps(tools, ensure_ascii=False, default=str)
+    )
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
@@ -1,7 +1,21 @@
 import inspect
 from typing import Any, Dict
 
-from core.primitive_runtime import PrimitiveRuntime
+from core.primitive_runtime import DEFAULT_READ_MAX_BYTES, PrimitiveRuntime
+
+
+def _as_bool(value: Any, *, default: bool = False) -> bool:
+    # 模型常把布尔参数写成字符串，bool("false") 会得到 True。
+    if value is None:
+        return bool(default)
+    if isinstance(value, bool):
+        return value
+    token = str(value).strip().lower()
+    if token in {"1", "true", "yes", "on"}:
+        return True
+    if token in {"0", "false", "no", "off"}:
+        return False
+    return bool(default)
 
 
 class ToolBroker:
@@ -25,6 +39,7 @@ class ToolBroker:
         args: Dict[str, Any],
         execution_policy: str,
         task_workspace_root: str = "",
+        progress_callback: Any = None,
     ) -> Dict[str, Any]:
         if name == "read":
             resolved_path = self._normalize_task_path(args.get("path", ""), task_workspace_root)
@@ -33,6 +48,8 @@ class ToolBroker:
                 start_line=int(args.get("start_line", 1)),
                 max_lines=int(args.get("max_lines", 200)),
                 encoding=args.get("encoding", "utf-8"),
+                tail=_as_bool(args.get("tail"), default=False),
+                max_bytes=int(args.get("max_bytes", DEFAULT_READ_MAX_BYTES)),
             )
         if name == "write":
             resolved_path = self._normalize_task_path(args.get("path", ""), task_workspace_root)
@@ -40,7 +57,7 @@ class ToolBroker:
                 "path": resolved_path,
                 "content": args.get("content", ""),
                 "mode": args.get("mode", "overwrite"),
-                "create_parents": bool(args.get("create_parents", True)),
+                "create_parents": _as_bool(args.get("create_parents"), default=True),
                 "encoding": args.get("encoding", "utf-8"),
             }
             if self._accepts_kwarg(self.runtime.write, "execution_policy"):
@@ -53,7 +70,7 @@ class ToolBroker:
             payload = {
                 "path": resolved_path,
                 "edits": args.get("edits", []),
-                "dry_run": bool(args.get("dry_run", False)),
+                "dry_run": _as_bool(args.get("dry_run"), default=False),
                 "encoding": args.get("encoding", "utf-8"),
             }
             if self._accepts_kwarg(self.runtime.edit, "execution_policy"):
@@ -66,8 +83,17 @@ class ToolBroker:
                 "cwd": resolved_cwd,
                 "timeout_sec": int(args.get("timeout_sec", 60)),
             }
+            output_file = str(args.get("output_file") or "").strip()
+            if output_file:
+                payload["output_file"] = self._normalize_task_path(
+                    output_file, task_workspace_root
+                )
             if self._accepts_kwarg(self.runtime.bash, "execution_policy"):
                 payload["execution_policy"] = execution_policy
+            if progress_callback is not None and self._accepts_kwarg(
+                self.runtime.bash, "progress_callback"
+            ):
+                payload["progress_callback"] = progress_callback
             return await self.runtime.bash(**payload)
         return {
             "ok": False,
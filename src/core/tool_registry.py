@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import os
 from copy import deepcopy
 from typing import Any, Dict, List
 
+from core.skill_warm_pool import match_skill_command
 from extension.skills.registry import skill_registry as skill_loader
 
 
@@ -10,6 +12,7 @@ CORE_TOOLS: List[Dict[str, Any]] = [
     {
         "name": "read",
         "description": "Read file content by lines.",
+        "read_only": True,
         "parameters": {
             "type": "object",
             "properties": {
@@ -24,6 +27,16 @@ CORE_TOOLS: List[Dict[str, Any]] = [
                     "description": "Max number of lines to read",
                     "default": 200,
                 },
+                "tail": {
+                    "type": "boolean",
+                    "description": "Read the last max_lines lines instead of starting at start_line",
+                    "default": False,
+                },
+                "max_bytes": {
+                    "type": "integer",
+                    "description": "Byte budget for the returned lines; the last line is cut when exceeded",
+                    "default": 256000,
+                },
                 "encoding": {
                     "type": "string",
                     "description": "Text encoding",
@@ -113,6 +126,10 @@ CORE_TOOLS: List[Dict[str, Any]] = [
                     "default": 60,
                     "description": "Command timeout in seconds",
                 },
+                "output_file": {
+                    "type": "string",
+                    "description": "Optional file to stream the full stdout/stderr into; the returned output keeps only head and tail",
+                },
             },
             "required": ["command"],
         },
@@ -327,16 +344,17 @@ class ToolRegistry:
             ):
                 continue
             seen.add(name)
-            tools.append(
-                {
-                    "name": name,
-                    "description": str(exported.get("description") or "").strip(),
-                    "parameters": deepcopy(
-                        exported.get("parameters")
-                        or {"type": "object", "properties": {}}
-                    ),
-                }
-            )
+            tool: Dict[str, Any] = {
+                "name": name,
+                "description": str(exported.get("description") or "").strip(),
+                "parameters": deepcopy(
+                    exported.get("parameters")
+                    or {"type": "object", "properties": {}}
+                ),
+            }
+            if exported.get("read_only"):
+                tool["read_only"] = True
+            tools.append(tool)
         tools.sort(key=lambda item: str(item.get("name") or ""))
         return tools
 
@@ -377,6 +395,24 @@ class ToolRegistry:
             return None
         return deepcopy(exported)
 
+    def is_read_only_bash_command(self, command: str, *, cwd: str | None = None) -> bool:
+        """Whether ``command`` is the CLI of a skill whose SKILL.md declares ``read_only``.
+
+        web_search / web_extractor 这类 skill 都经 ``bash`` 调用，工具 schema 上的
+        ``read_only`` 覆盖不到它们；这里用 warm pool 同一套 matcher 认出脚本，
+        再按所属 skill 的声明判断。带管道、重定向等的命令一律不算只读。
+        """
+        workdir = os.path.abspath(os.path.expanduser(cwd)) if cwd else os.getcwd()
+        route = match_skill_command(str(command or ""), cwd=workdir)
+        if route is None:
+            return False
+        skill_dir = os.path.realpath(os.path.dirname(os.path.dirname(route.script)))
+        return any(
+            info.get("read_only")
+            and os.path.realpath(str(info.get("skill_dir") or "")) == skill_dir
+            for info in skill_loader.get_enabled_skill_index().values()
+        )
+
     # Backward-compatible alias.
     def get_all_tools(self) -> List[Dict[str, Any]]:
         return self.get_core_tools()
@@ -27,6 +27,7 @@ from core.file_artifacts import (
     normalize_file_rows,
 )
 from core.model_config import select_model_for_role
+from core.perf_trace import traced
 from core.platform.exceptions import MediaProcessingError, MessageSendError
 from core.runtime_callbacks import pop_runtime_callback, set_runtime_callback
 from services.openai_adapter import generate_text
@@ -775,6 +776,7 @@ async def _try_handle_memory_commands(ctx: UnifiedContext, user_message: str) ->
     return False
 
 
+@traced("handler.ai_chat")
 async def handle_ai_chat(
     ctx: UnifiedContext,
     user_message_override: str | None = None,
@@ -1397,6 +1399,7 @@ async def handle_ai_chat(
         task_manager.unregister_task(user_id)
 
 
+@traced("handler.ai_photo")
 async def handle_ai_photo(ctx: UnifiedContext) -> None:
     """
     处理图片消息，使用对话模型分析图片
@@ -9,6 +9,7 @@ from core.document_artifacts import (
     persist_document_artifact,
     pop_pending_document_artifacts,
 )
+from core.perf_trace import traced
 from core.platform.exceptions import MediaProcessingError
 from core.platform.models import UnifiedContext, MessageType
 from .ai_handlers import _acknowledge_received
@@ -18,6 +19,7 @@ from .media_utils import extract_media_input
 logger = logging.getLogger(__name__)
 
 
+@traced("handler.document")
 async def handle_document(ctx: UnifiedContext) -> None:
     """
     处理文档消息。
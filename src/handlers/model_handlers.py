@@ -6,6 +6,7 @@ from typing import Any
 from core.model_config import (
     get_configured_model,
     get_current_model,
+    get_model_health_snapshot,
     normalize_model_role,
     reload_models_config,
     resolve_models_config_path,
@@ -60,6 +61,7 @@ def _model_usage_text() -> str:
         "`/model list <primary|routing|vision|image_generation|voice>`\n"
         "`/model use <provider/model>`\n"
         "`/model use <role> <provider/model>`\n"
+        "`/model health`\n"
         "`/model help`\n\n"
         "示例:\n"
         "`/model use proxy/qwen3.5-flash`\n"
@@ -177,6 +179,36 @@ def _build_summary_payload(prefix: str = "") -> tuple[str, dict[str, Any]]:
     return "\n".join(lines), _home_ui()
 
 
+_HEALTH_STATE_LABELS = {
+    "closed": "✅ 正常",
+    "open": "⛔ 熔断",
+    "half_open": "🟡 试探中",
+}
+
+
+def _build_health_text() -> str:
+    snapshot = get_model_health_snapshot()
+    if not snapshot:
+        return "🩺 模型健康状态\n\n当前进程还没有模型请求记录。"
+    lines = ["🩺 模型健康状态", ""]
+    for model_key, row in sorted(snapshot.items()):
+        state = str(row.get("state") or "closed")
+        parts = [
+            _HEALTH_STATE_LABELS.get(state, state),
+            f"错误率 {float(row.get('error_rate') or 0.0) * 100:.0f}%",
+        ]
+        if row.get("latency_samples"):
+            parts.append(f"延迟 {float(row.get('latency_ms') or 0.0):.0f}ms")
+        remaining = float(row.get("cooldown_remaining_sec") or 0.0)
+        if state == "open" and remaining > 0:
+            parts.append(f"冷却剩余 {remaining:.0f}s")
+        lines.append(f"- `{model_key}`：" + "，".join(parts))
+        last_error = str(row.get("last_error") or "").strip()
+        if state != "closed" and last_error:
+            lines.append(f"  最近错误：{last_error[:120]}")
+    return "\n".join(lines)
+
+
 def _build_all_models_payload() -> tuple[str, dict[str, Any]]:
     config = reload_models_config()
     current_model = get_current_model()
@@ -309,6 +341,10 @@ async def model_command(ctx: UnifiedContext) -> None:
         await ctx.reply(summary_text, ui=summary_ui)
         return
 
+    if sub in {"health", "circuit"}:
+        await ctx.reply(_build_health_text())
+        return
+
     if sub in {"list", "ls"}:
         role = args.strip()
         if role and not normalize_model_role(role):
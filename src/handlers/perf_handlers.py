@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from core.perf_trace import perf_recorder
+from core.platform.models import UnifiedContext
+
+from .base_handlers import check_permission_unified
+
+_TOP_SPANS = 15
+_STALL_STACK_LINES = 8
+
+
+def _parse_subcommand(text: str) -> tuple[str, str]:
+    raw = (text or "").strip()
+    parts = raw.split(maxsplit=2)
+    if len(parts) < 2 or not parts[0].startswith("/perf"):
+        return "show", ""
+    cmd = parts[1].strip().lower()
+    args = parts[2].strip() if len(parts) >= 3 else ""
+    return cmd, args
+
+
+def _perf_help_text() -> str:
+    return (
+        "用法:\n"
+        "`/perf`\n"
+        "`/perf show [前缀]`\n"
+        "`/perf stalls`\n"
+        "`/perf reset`\n"
+        "`/perf help`\n\n"
+        "说明：展示滚动窗口内各阶段（handler / prompt / llm / tool / store）的"
+        "调用次数与 p50/p95/p99/max 耗时，以及事件循环卡顿时抓到的调用栈。"
+    )
+
+
+def _render_spans(prefix: str = "") -> str:
+    snapshot = perf_recorder.snapshot()
+    if not snapshot.get("enabled"):
+        return "性能追踪未启用（PERF_TRACE_ENABLED=false）。"
+    spans = {
+        name: stats
+        for name, stats in dict(snapshot.get("spans") or {}).items()
+        if not prefix or name.startswith(prefix)
+    }
+    window_min = int(float(snapshot.get("window_sec") or 0) // 60)
+    if not spans:
+        return f"最近 {window_min} 分钟内没有性能记录。"
+
+    ranked = sorted(
+        spans.items(),
+        key=lambda item: float(item[1].get("p95_ms") or 0.0),
+        reverse=True,
+    )
+    lines = [f"⏱️ 最近 {window_min} 分钟阶段耗时（按 p95 排序，单位 ms）", ""]
+    for name, stats in ranked[:_TOP_SPANS]:
+        errors = int(stats.get("errors") or 0)
+        error_text = f" err={errors}" if errors else ""
+        lines.append(
+            f"`{name}` n={stats.get('count', 0)}{error_text} "
+            f"p50={stats.get('p50_ms', 0):g} p95={stats.get('p95_ms', 0):g} "
+            f"p99={stats.get('p99_ms', 0):g} max={stats.get('max_ms', 0):g}"
+        )
+    if len(ranked) > _TOP_SPANS:
+        lines.append(f"... 另有 {len(ranked) - _TOP_SPANS} 项，可用 `/perf show <前缀>` 过滤")
+    stalls = list(snapshot.get("stalls") or [])
+    if stalls:
+        lines.extend(["", f"⚠️ 事件循环卡顿样本 {len(stalls)} 条，`/perf stalls` 查看"])
+    return "\n".join(lines)
+
+
+def _render_stalls() -> str:
+    stalls = list(perf_recorder.snapshot().get("stalls") or [])
+    if not stalls:
+        return "没有记录到事件循环卡顿。"
+    lines = [f"⚠️ 最近 {min(3, len(stalls))} 次事件循环卡顿"]
+    for sample in reversed(stalls[-3:]):
+        lines.append("")
+        lines.append(f"{sample.get('at', '')} 阻塞 {sample.get('duration_ms', 0):g}ms")
+        stack = list(sample.get("stack") or [])[-_STALL_STACK_LINES:]
+        lines.append("```\n" + "\n".join(stack) + "\n```")
+    return "\n".join(lines)
+
+
+async def perf_command(ctx: UnifiedContext) -> None:
+    if not await check_permission_unified(ctx):
+        return
+
+    text = getattr(ctx.message, "text", "") or ""
+    sub, args = _parse_subcommand(text)
+
+    if sub in {"show", "list", "ls"}:
+        await ctx.reply(_render_spans(args))
+        return
+
+    if sub in {"stalls", "stall", "stack"}:
+        await ctx.reply(_render_stalls())
+        return
+
+    if sub in {"reset", "clear"}:
+        perf_recorder.reset()
+        await ctx.reply("已清空性能追踪统计。")
+        return
+
+    await ctx.reply(_perf_help_text())
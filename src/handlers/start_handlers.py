@@ -153,7 +153,8 @@ def _build_help_payload(
             "• `/model` 查看和切换模型。\n"
             "• `/usage` 查看按模型聚合的 token 用量。\n"
             "• `/usage today` 看当天用量。\n"
-            "• `/usage reset` 立即清空统计；菜单按钮会二次确认。",
+            "• `/usage reset` 立即清空统计；菜单按钮会二次确认。\n"
+            "• `/perf` 查看各阶段耗时分位数，`/perf stalls` 看事件循环卡顿的调用栈。",
             {
                 "actions": [
                     [
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+from core.context_budget import context_budget_stats
 from core.llm_usage_store import llm_usage_store
 from core.platform.models import UnifiedContext
+from core.prompt_layout import prompt_layout
 from core.skill_menu import make_callback, parse_callback
+from core.summary_cache import summary_cache
 
 from .base_handlers import check_permission_unified, edit_callback_message
 
@@ -31,9 +34,11 @@ def _usage_help_text() -> str:
         "`/usage`\n"
         "`/usage show`\n"
         "`/usage today`\n"
+        "`/usage prompt`\n"
         "`/usage reset`\n"
         "`/usage help`\n\n"
-        "说明：展示按模型聚合的 LLM 调用次数、输入/输出 token、总 token、缓存命中请求数和缓存命中 token。"
+        "说明：展示按模型聚合的 LLM 调用次数、输入/输出 token、总 token、缓存命中请求数和缓存命中 token，以及 RSS/网页摘要缓存的命中率；"
+        "`prompt` 展示 system prompt 各段的 token 估算、memo 命中和跨轮稳定前缀，以及按模型上下文窗口裁剪请求的预算账目。"
     )
 
 
@@ -55,6 +60,7 @@ def _usage_menu_ui(*, confirm_reset: bool = False) -> dict:
                 {"text": "📅 今日", "callback_data": make_callback(USAGE_MENU_NS, "today")},
             ],
             [
+                {"text": "🧩 Prompt 布局", "callback_data": make_callback(USAGE_MENU_NS, "prompt")},
                 {"text": "🗑️ 重置统计", "callback_data": make_callback(USAGE_MENU_NS, "reset")},
             ],
         ]
@@ -64,7 +70,15 @@ def _usage_menu_ui(*, confirm_reset: bool = False) -> dict:
 def _build_usage_payload(mode: str = "show", *, prefix: str = "") -> tuple[str, dict]:
     normalized = str(mode or "show").strip().lower()
     if normalized == "today":
-        body = llm_usage_store.render_today_summary()
+        body = (
+            f"{llm_usage_store.render_today_summary()}\n\n"
+            f"{summary_cache.render_summary()}"
+        )
+    elif normalized == "prompt":
+        body = (
+            f"{prompt_layout.render_summary()}\n\n"
+            f"{context_budget_stats.render_summary()}"
+        )
     elif normalized == "reset":
         body = (
             "⚠️ 确认重置 LLM 用量统计？\n\n"
@@ -74,7 +88,10 @@ def _build_usage_payload(mode: str = "show", *, prefix: str = "") -> tuple[str,
     elif normalized == "help":
         body = _usage_help_text()
     else:
-        body = llm_usage_store.render_summary()
+        body = (
+            f"{llm_usage_store.render_summary()}\n\n"
+            f"{summary_cache.render_summary()}"
+        )
 
     if prefix:
         body = f"{prefix.strip()}\n\n{body}"
@@ -98,6 +115,11 @@ async def usage_command(ctx: UnifiedContext) -> None:
         await ctx.reply(payload, ui=ui)
         return
 
+    if sub in {"prompt", "layout"}:
+        payload, ui = _build_usage_payload("prompt")
+        await ctx.reply(payload, ui=ui)
+        return
+
     if sub in {"reset", "clear"}:
         removed = llm_usage_store.reset()
         payload, ui = _build_usage_payload(
@@ -129,6 +151,8 @@ async def handle_usage_callback(ctx: UnifiedContext) -> None:
         payload, ui = _build_usage_payload("show")
     elif action == "today":
         payload, ui = _build_usage_payload("today")
+    elif action == "prompt":
+        payload, ui = _build_usage_payload("prompt")
     elif action == "reset":
         payload, ui = _build_usage_payload("reset")
     elif action == "resetconfirm":
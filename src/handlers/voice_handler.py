@@ -18,6 +18,7 @@ from telegram.error import BadRequest
 
 from core.config import is_user_allowed, get_client_for_model
 from core.model_config import select_model_for_role
+from core.perf_trace import traced
 from core.platform.exceptions import MediaProcessingError
 from services.openai_adapter import (
     build_messages,
@@ -588,6 +589,7 @@ async def transcribe_voice(voice_bytes: bytes, mime_type: str) -> str | None:
         return None
 
 
+@traced("handler.voice")
 async def handle_voice_message(ctx: UnifiedContext) -> None:
     user_id = ctx.message.user.id
 
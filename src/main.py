@@ -16,13 +16,17 @@ from core.config import (
 )
 from core.extension_runtime import init_extension_runtime
 from core.heartbeat_worker import heartbeat_worker
+from core.llm_usage_store import llm_usage_store
 from core.long_term_memory import long_term_memory
+from core.perf_trace import loop_watchdog
+from core.skill_warm_pool import skill_warm_pool
 from core.platform.registry import adapter_manager
 from core.subagent_supervisor import subagent_supervisor
 from extension.channels.registry import channel_registry
 from extension.memories.registry import memory_registry
 from extension.plugins.registry import plugin_registry
 from extension.skills.registry import skill_registry
+from services.browser_worker import browser_worker
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -91,6 +95,7 @@ async def main():
     logger.info("Starting Ikaros (Extension Runtime Mode)...")
     runtime = await init_services()
     await heartbeat_worker.start()
+    loop_watchdog.start()
 
     stop_event = asyncio.Event()
 
@@ -116,6 +121,10 @@ async def main():
         await subagent_supervisor.stop()
         await heartbeat_worker.stop()
         await adapter_manager.stop_all()
+        await loop_watchdog.stop()
+        await skill_warm_pool.close()
+        await browser_worker.shutdown()
+        llm_usage_store.close()
 
 
 if __name__ == "__main__":
@@ -2,19 +2,27 @@ import logging
 import inspect
 import os
 import json
+import time
 import asyncio
 from typing import Any, Awaitable, Callable, cast
 
 from core.config import get_client_for_model
+from core.context_budget import fit_chat_request
 from core.file_artifacts import normalize_file_rows
+from core import perf_trace
+from core.tool_registry import tool_registry
 from core.model_config import (
+    begin_model_attempt,
     load_models_config,
     get_configured_model,
     get_model_candidates_for_input,
     get_model_for_input,
+    get_model_hedge_delay,
     get_model_id_for_api,
     mark_model_failed,
     mark_model_success,
+    record_model_first_token,
+    record_model_latency,
     resolve_models_config_path,
 )
 from services.openai_adapter import (
@@ -24,6 +32,7 @@ from services.openai_adapter import (
     extract_text_from_chat_completion_stream_delta,
     is_async_chat_completion_stream,
     prepare_chat_completion_kwargs,
+    prime_chat_completion_stream,
 )
 
 # 初始化模型配置（如果存在配置文件）
@@ -57,6 +66,63 @@ def _missing_model_error_message(input_type: str) -> str:
     return "No candidate model available for current request (missing config or daily quota exhausted)"
 
 
+async def _discard_stream(response: Any) -> None:
+    close_method = getattr(response, "aclose", None)
+    if callable(close_method):
+        try:
+            await close_method()
+        except Exception:
+            logger.debug("[AiService] Failed to close hedged stream", exc_info=True)
+
+
+async def _race_hedged(
+    primary: Awaitable[Any],
+    start_hedge: Callable[[], Awaitable[Any] | None],
+    *,
+    delay_sec: float,
+) -> tuple[bool, Any, Exception | None]:
+    """Run ``primary``; if it is still silent after ``delay_sec``, race a hedge.
+
+    返回 ``(hedge_won, response, primary_error)``。先拿到首个 chunk 的一方胜出，
+    另一方被取消（已建立的流会被关闭，用量照常记录）。两边都失败时抛出主请求
+    的异常；主请求在截止前就失败则不会发起对冲，交给外层按顺序故障转移。
+    """
+    primary_task = asyncio.ensure_future(primary)
+    tasks: dict[asyncio.Future[Any], bool] = {primary_task: False}
+    primary_error: Exception | None = None
+    hedge_error: Exception | None = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=max(0.0, delay_sec))
+        if not done:
+            hedge = start_hedge()
+            if hedge is not None:
+                tasks[asyncio.ensure_future(hedge)] = True
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda item: tasks[item]):
+                is_hedge = tasks.pop(task)
+                exc = task.exception()
+                if exc is None:
+                    return is_hedge, task.result(), primary_error
+                if not isinstance(exc, Exception):
+                    raise exc
+                if is_hedge:
+                    hedge_error = exc
+                else:
+                    primary_error = exc
+        raise primary_error or hedge_error or RuntimeError("Hedged request failed")
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except BaseException:
+                continue
+            await _discard_stream(task.result())
+
+
 def _split_text_for_streaming(text: str, max_chars: int) -> list[str]:
     payload = str(text or "")
     if not payload:
@@ -161,6 +227,38 @@ class AiService:
             )
         except ValueError:
             MAX_SEMANTIC_REPEAT_TOOL_CALLS = 3
+        try:
+            TOOL_PARALLEL_LIMIT = max(
+                1, int(os.getenv("AI_TOOL_PARALLEL_LIMIT", "4"))
+            )
+        except ValueError:
+            TOOL_PARALLEL_LIMIT = 4
+        # 声明了 read_only 的工具（无副作用）可以在同一批 tool_calls 里并发执行。
+        parallel_safe_tools = {
+            str(tool.get("name") or "").strip()
+            for tool in tools or []
+            if isinstance(tool, dict) and tool.get("read_only") is True
+        }
+        bash_available = any(
+            isinstance(tool, dict) and str(tool.get("name") or "").strip() == "bash"
+            for tool in tools or []
+        )
+
+        def _is_parallel_safe(tool_name: str, tool_args: dict[str, Any]) -> bool:
+            if tool_name in parallel_safe_tools:
+                return True
+            # 只读 skill（SKILL.md 声明 read_only）走 bash CLI 调用，按命令识别。
+            if tool_name != "bash" or not bash_available:
+                return False
+            try:
+                return tool_registry.is_read_only_bash_command(
+                    str(tool_args.get("command") or ""),
+                    cwd=str(tool_args.get("cwd") or "") or None,
+                )
+            except Exception:
+                return False
+
+        tool_semaphore = asyncio.Semaphore(TOOL_PARALLEL_LIMIT)
         turn_count = 0
         completed = False
         has_tool_call = False
@@ -205,18 +303,64 @@ class AiService:
                     )
 
                 last_error: Exception | None = None
-                for index, candidate_model in enumerate(candidate_models):
+                attempted: set[str] = set()
+
+                def _next_untried() -> str:
+                    for model_key in candidate_models:
+                        if model_key not in attempted:
+                            return model_key
+                    return ""
+
+                async def _open_candidate(model_key: str, model_client: Any) -> Any:
+                    # 按目标模型的 contextWindow 裁剪本次请求的消息副本。
+                    payload, budget_report = fit_chat_request(
+                        request_kwargs, model_key=model_key
+                    )
+                    if budget_report is not None and (
+                        budget_report.changed or budget_report.over_budget
+                    ):
+                        await _emit(
+                            "context_budget",
+                            {"turn": turn_count, **budget_report.to_dict()},
+                        )
+                    payload["model"] = get_model_id_for_api(model_key)
+                    upstream_payload = prepare_chat_completion_kwargs(payload)
+                    started_at[model_key] = time.perf_counter()
+                    response = await cast(Any, model_client).chat.completions.create(
+                        **upstream_payload
+                    )
+                    response = await prime_chat_completion_stream(response)
+                    first_token_ms = (time.perf_counter() - started_at[model_key]) * 1000.0
+                    record_model_first_token(model_key, first_token_ms)
+                    perf_trace.record("llm.first_token", first_token_ms)
+                    return response
+
+                async def _open_hedge(model_key: str, model_client: Any) -> Any:
+                    try:
+                        return await _open_candidate(model_key, model_client)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as exc:
+                        mark_model_failed(model_key)
+                        logger.warning(
+                            "[AiService] Hedged request failed via %s: %s",
+                            model_key,
+                            exc,
+                        )
+                        raise
+
+                started_at: dict[str, float] = {}
+                for candidate_model in candidate_models:
+                    if candidate_model in attempted:
+                        continue
+                    attempted.add(candidate_model)
                     model_client = _resolve_async_client(candidate_model)
                     if model_client is None:
                         last_error = RuntimeError(
                             f"No async client available for model: {candidate_model}"
                         )
                         mark_model_failed(candidate_model)
-                        next_model = (
-                            candidate_models[index + 1]
-                            if index + 1 < len(candidate_models)
-                            else ""
-                        )
+                        next_model = _next_untried()
                         if next_model:
                             logger.warning(
                                 "[AiService] Model client unavailable for %s; trying %s",
@@ -226,13 +370,61 @@ class AiService:
                             continue
                         raise last_error
 
-                    payload = dict(request_kwargs)
-                    payload["model"] = get_model_id_for_api(candidate_model)
+                    if not begin_model_attempt(candidate_model):
+                        # 半开状态的试探名额已被其它请求占用，跳过该模型。
+                        last_error = RuntimeError(
+                            f"Model circuit is open: {candidate_model}"
+                        )
+                        continue
+
+                    # 对冲：主候选在首 token 截止时间内没有输出时，并行请求下一个候选。
+                    hedge_model = ""
+                    hedge_client: Any = None
+                    hedge_delay = get_model_hedge_delay(
+                        candidate_model, pool_type=request_pool_type
+                    )
+                    if hedge_delay is not None:
+                        for backup_model in candidate_models:
+                            if backup_model in attempted:
+                                continue
+                            hedge_client = _resolve_async_client(backup_model)
+                            if hedge_client is not None:
+                                hedge_model = backup_model
+                                break
+
+                    def _start_hedge() -> Awaitable[Any] | None:
+                        if not begin_model_attempt(hedge_model):
+                            return None
+                        attempted.add(hedge_model)
+                        logger.info(
+                            "[AiService] No first token from %s after %.2fs; hedging with %s",
+                            candidate_model,
+                            hedge_delay,
+                            hedge_model,
+                        )
+                        return _open_hedge(hedge_model, hedge_client)
+
                     try:
-                        upstream_payload = prepare_chat_completion_kwargs(payload)
-                        response = await cast(
-                            Any, model_client
-                        ).chat.completions.create(**upstream_payload)
+                        if hedge_model:
+                            hedge_won, response, primary_error = await _race_hedged(
+                                _open_candidate(candidate_model, model_client),
+                                _start_hedge,
+                                delay_sec=float(hedge_delay or 0.0),
+                            )
+                            if primary_error is not None:
+                                mark_model_failed(candidate_model)
+                            if hedge_won:
+                                logger.warning(
+                                    "[AiService] Hedged request won: %s -> %s",
+                                    candidate_model,
+                                    hedge_model,
+                                )
+                                candidate_model = hedge_model
+                                model_client = hedge_client
+                        else:
+                            response = await _open_candidate(
+                                candidate_model, model_client
+                            )
                         if not request_kwargs.get("stream"):
                             response = await collect_chat_completion_response(response)
                     except asyncio.CancelledError:
@@ -240,11 +432,7 @@ class AiService:
                     except Exception as exc:
                         last_error = exc
                         mark_model_failed(candidate_model)
-                        next_model = (
-                            candidate_models[index + 1]
-                            if index + 1 < len(candidate_models)
-                            else ""
-                        )
+                        next_model = _next_untried()
                         if next_model:
                             logger.warning(
                                 "[AiService] Model request failed via %s: %s; trying %s",
@@ -255,7 +443,7 @@ class AiService:
                             continue
                         raise
 
-                    if not payload.get("stream"):
+                    if not request_kwargs.get("stream"):
                         has_text = bool(self._extract_response_text(response).strip())
                         has_tool_calls = bool(self._extract_tool_calls(response))
                         if not has_text and not has_tool_calls:
@@ -263,11 +451,7 @@ class AiService:
                                 "Model returned empty completion payload"
                             )
                             mark_model_failed(candidate_model)
-                            next_model = (
-                                candidate_models[index + 1]
-                                if index + 1 < len(candidate_models)
-                                else ""
-                            )
+                            next_model = _next_untried()
                             if next_model:
                                 logger.warning(
                                     "[AiService] Model returned empty completion via %s; details=%s; trying %s",
@@ -282,6 +466,9 @@ class AiService:
                                 self._response_debug_summary(response),
                             )
 
+                    request_ms = (time.perf_counter() - started_at[candidate_model]) * 1000.0
+                    record_model_latency(candidate_model, request_ms)
+                    perf_trace.record("llm.request", request_ms)
                     mark_model_success(candidate_model)
                     if candidate_model != current_model:
                         logger.warning(
@@ -309,6 +496,74 @@ class AiService:
                     logger.debug("[AiService] event_callback error: %s", exc)
                     return None
 
+            async def _execute_tool(tool_name: str, tool_args: dict[str, Any]) -> Any:
+                try:
+                    logger.info(f"Executing tool: {tool_name} args={tool_args}")
+                    with perf_trace.span(f"tool.{tool_name or 'unknown'}"):
+                        return await asyncio.wait_for(
+                            cast(Any, tool_executor)(tool_name, tool_args),
+                            timeout=float(TOOL_EXEC_TIMEOUT_SEC),
+                        )
+                except asyncio.TimeoutError:
+                    logger.error(f"Tool execution timed out: {tool_name}")
+                    return (
+                        f"Error: Tool '{tool_name}' timed out after "
+                        f"{TOOL_EXEC_TIMEOUT_SEC} seconds."
+                    )
+                except Exception as e:
+                    logger.error(f"Tool execution error: {e}")
+                    return f"Error executing tool {tool_name}: {str(e)}"
+
+            async def _execute_tool_limited(
+                tool_name: str, tool_args: dict[str, Any]
+            ) -> Any:
+                async with tool_semaphore:
+                    return await _execute_tool(tool_name, tool_args)
+
+            async def _start_parallel_tool_batch(
+                calls: list[tuple[str, dict[str, Any]]],
+                start: int,
+            ) -> dict[int, asyncio.Task[Any]]:
+                """Start the run of read-only calls beginning at ``start`` concurrently.
+
+                只有连续两个及以上的只读调用才会并发；遇到写类工具即止，
+                保证写操作仍按原顺序串行执行。
+                """
+                end = start
+                while end < len(calls) and _is_parallel_safe(*calls[end]):
+                    end += 1
+                if end - start < 2:
+                    return {}
+                batch: dict[int, asyncio.Task[Any]] = {}
+                for position in range(start, end):
+                    tool_name, tool_args = calls[position]
+                    await _emit(
+                        "tool_call_started",
+                        {
+                            "turn": turn_count,
+                            "name": tool_name,
+                            "args": tool_args,
+                        },
+                    )
+                    batch[position] = asyncio.create_task(
+                        _execute_tool_limited(tool_name, tool_args)
+                    )
+                logger.info(
+                    "[AiService] Running %s read-only tool calls concurrently",
+                    len(batch),
+                )
+                return batch
+
+            async def _cancel_tool_batch(batch: dict[int, asyncio.Task[Any]]) -> None:
+                for task in batch.values():
+                    task.cancel()
+                for task in batch.values():
+                    try:
+                        await task
+                    except BaseException:
+                        continue
+                batch.clear()
+
             async def _synthesize_async_dispatch_notice(
                 dispatch_rows: list[dict[str, str]],
             ) -> str:
@@ -629,201 +884,204 @@ class AiService:
                         terminal_short_circuit_text = ""
                         continue_after_tool_prompt = ""
                         should_terminal_stop = False
-                        for index, fc in enumerate(function_calls):
-                            tool_name = str(fc.get("name") or "").strip()
-                            tool_args = fc.get("args")
-                            if not isinstance(tool_args, dict):
-                                tool_args = {}
-                            tool_call_id = str(fc.get("id") or "").strip() or (
-                                f"call_{turn_count}_{index + 1}"
-                            )
-                            if tool_executor:
-                                await _emit(
-                                    "tool_call_started",
-                                    {
-                                        "turn": turn_count,
-                                        "name": tool_name,
-                                        "args": tool_args,
-                                    },
+                        parsed_calls: list[tuple[str, dict[str, Any]]] = []
+                        for fc in function_calls:
+                            call_args = fc.get("args")
+                            parsed_calls.append(
+                                (
+                                    str(fc.get("name") or "").strip(),
+                                    call_args if isinstance(call_args, dict) else {},
                                 )
-
-                                try:
-                                    logger.info(
-                                        f"Executing tool: {tool_name} args={tool_args}"
-                                    )
-                                    tool_result = await asyncio.wait_for(
-                                        tool_executor(tool_name, tool_args),
-                                        timeout=float(TOOL_EXEC_TIMEOUT_SEC),
-                                    )
-                                except asyncio.TimeoutError:
-                                    logger.error(
-                                        f"Tool execution timed out: {tool_name}"
-                                    )
-                                    tool_result = (
-                                        f"Error: Tool '{tool_name}' timed out after "
-                                        f"{TOOL_EXEC_TIMEOUT_SEC} seconds."
-                                    )
-                                except Exception as e:
-                                    logger.error(f"Tool execution error: {e}")
-                                    tool_result = (
-                                        f"Error executing tool {tool_name}: {str(e)}"
-                                    )
-
-                                tool_ok = self._tool_result_ok(tool_result)
-                                task_outcome = ""
-                                is_terminal = False
-                                terminal_text = ""
-                                terminal_ui = {}
-                                terminal_payload = {}
-                                failure_mode = ""
-                                if isinstance(tool_result, dict):
-                                    task_outcome = (
-                                        str(tool_result.get("task_outcome") or "")
-                                        .strip()
-                                        .lower()
-                                    )
-                                    is_terminal = (
-                                        bool(tool_result.get("terminal"))
-                                        or task_outcome == "done"
-                                    )
-                                    (
-                                        terminal_text,
-                                        terminal_ui,
-                                        terminal_payload,
-                                    ) = self._extract_terminal_artifacts(tool_result)
-                                    failure_mode = (
-                                        str(tool_result.get("failure_mode") or "")
-                                        .strip()
-                                        .lower()
-                                    )
-                                elif tool_result is not None:
-                                    terminal_text = str(tool_result).strip()
-                                    terminal_payload = {"text": terminal_text}
-
-                                if not failure_mode and not tool_ok:
-                                    failure_mode = "recoverable"
-                                if failure_mode not in {"recoverable", "fatal"}:
-                                    failure_mode = "recoverable" if not tool_ok else ""
-
-                                if is_terminal and tool_ok:
-                                    last_terminal_success_text = terminal_text
-                                    last_terminal_success_summary = (
-                                        self._summarize_tool_result(tool_result)
-                                    )
-                                    last_terminal_tool_name = tool_name
-
-                                if not tool_ok:
-                                    turn_failures.append(
-                                        f"{tool_name}: {self._summarize_tool_result(tool_result)}"
-                                    )
-                                directive = await _emit(
-                                    "tool_call_finished",
-                                    {
-                                        "turn": turn_count,
-                                        "name": tool_name,
-                                        "ok": tool_ok,
-                                        "summary": self._summarize_tool_result(
-                                            tool_result
-                                        ),
-                                        "terminal": is_terminal,
-                                        "task_outcome": task_outcome,
-                                        # Keep full terminal text so orchestrator can
-                                        # deliver complete URLs/commands without truncation.
-                                        "terminal_text": terminal_text,
-                                        "terminal_text_preview": terminal_text[:200],
-                                        "terminal_ui": terminal_ui,
-                                        "terminal_payload": terminal_payload,
-                                        "failure_mode": failure_mode,
-                                        "history_visibility": (
-                                            str(
-                                                tool_result.get("history_visibility")
-                                                or ""
-                                            ).strip()
-                                            if isinstance(tool_result, dict)
-                                            else ""
-                                        ),
-                                    },
+                            )
+                        # 连续的只读调用并发执行，结果仍按原调用顺序写回历史。
+                        parallel_batch: dict[int, asyncio.Task[Any]] = {}
+                        try:
+                            for index, fc in enumerate(function_calls):
+                                tool_name, tool_args = parsed_calls[index]
+                                tool_call_id = str(fc.get("id") or "").strip() or (
+                                    f"call_{turn_count}_{index + 1}"
                                 )
-                                current_history.append(
-                                    {
-                                        "role": "tool",
-                                        "tool_call_id": tool_call_id,
-                                        "content": json.dumps(
+                                if tool_executor:
+                                    if (
+                                        index not in parallel_batch
+                                        and _is_parallel_safe(tool_name, tool_args)
+                                    ):
+                                        parallel_batch = await _start_parallel_tool_batch(
+                                            parsed_calls, index
+                                        )
+                                    if index in parallel_batch:
+                                        tool_result = await parallel_batch.pop(index)
+                                    else:
+                                        await _emit(
+                                            "tool_call_started",
                                             {
-                                                "result": self._sanitize_tool_result_for_history(
-                                                    tool_result
-                                                )
+                                                "turn": turn_count,
+                                                "name": tool_name,
+                                                "args": tool_args,
                                             },
-                                            ensure_ascii=False,
-                                            default=str,
-                                        ),
-                                    }
-                                )
-                                if (
-                                    tool_ok
-                                    and isinstance(tool_result, dict)
-                                    and str(tool_result.get("history_visibility") or "")
-                                    .strip()
-                                    .lower()
-                                    == "suppress_success"
-                                ):
-                                    current_history.append(
+                                        )
+                                        tool_result = await _execute_tool(
+                                            tool_name, tool_args
+                                        )
+
+                                    tool_ok = self._tool_result_ok(tool_result)
+                                    task_outcome = ""
+                                    is_terminal = False
+                                    terminal_text = ""
+                                    terminal_ui = {}
+                                    terminal_payload = {}
+                                    failure_mode = ""
+                                    if isinstance(tool_result, dict):
+                                        task_outcome = (
+                                            str(tool_result.get("task_outcome") or "")
+                                            .strip()
+                                            .lower()
+                                        )
+                                        is_terminal = (
+                                            bool(tool_result.get("terminal"))
+                                            or task_outcome == "done"
+                                        )
+                                        (
+                                            terminal_text,
+                                            terminal_ui,
+                                            terminal_payload,
+                                        ) = self._extract_terminal_artifacts(tool_result)
+                                        failure_mode = (
+                                            str(tool_result.get("failure_mode") or "")
+                                            .strip()
+                                            .lower()
+                                        )
+                                    elif tool_result is not None:
+                                        terminal_text = str(tool_result).strip()
+                                        terminal_payload = {"text": terminal_text}
+
+                                    if not failure_mode and not tool_ok:
+                                        failure_mode = "recoverable"
+                                    if failure_mode not in {"recoverable", "fatal"}:
+                                        failure_mode = "recoverable" if not tool_ok else ""
+
+                                    if is_terminal and tool_ok:
+                                        last_terminal_success_text = terminal_text
+                                        last_terminal_success_summary = (
+                                            self._summarize_tool_result(tool_result)
+                                        )
+                                        last_terminal_tool_name = tool_name
+
+                                    if not tool_ok:
+                                        turn_failures.append(
+                                            f"{tool_name}: {self._summarize_tool_result(tool_result)}"
+                                        )
+                                    directive = await _emit(
+                                        "tool_call_finished",
                                         {
-                                            "role": "user",
-                                            "content": (
-                                                "系统提示：上一步工具只是内部预检且已成功，"
-                                                "不要把该成功结果直接回复给用户。"
-                                                "如果当前任务还没完成，请继续调用后续工具或继续执行；"
-                                                "只有当认证异常、未登录或用户明确询问状态时，才需要显式说明认证情况。"
+                                            "turn": turn_count,
+                                            "name": tool_name,
+                                            "ok": tool_ok,
+                                            "summary": self._summarize_tool_result(
+                                                tool_result
                                             ),
-                                        }
-                                    )
-                                if self._should_apply_cost_guards(tool_name):
-                                    per_tool_call_count[tool_name] = (
-                                        int(per_tool_call_count.get(tool_name) or 0) + 1
+                                            "terminal": is_terminal,
+                                            "task_outcome": task_outcome,
+                                            # Keep full terminal text so orchestrator can
+                                            # deliver complete URLs/commands without truncation.
+                                            "terminal_text": terminal_text,
+                                            "terminal_text_preview": terminal_text[:200],
+                                            "terminal_ui": terminal_ui,
+                                            "terminal_payload": terminal_payload,
+                                            "failure_mode": failure_mode,
+                                            "history_visibility": (
+                                                str(
+                                                    tool_result.get("history_visibility")
+                                                    or ""
+                                                ).strip()
+                                                if isinstance(tool_result, dict)
+                                                else ""
+                                            ),
+                                        },
                                     )
-
-                                if (
-                                    tool_ok
-                                    and isinstance(tool_result, dict)
-                                    and bool(tool_result.get("async_dispatch"))
-                                ):
-                                    async_dispatch_rows.append(
+                                    current_history.append(
                                         {
-                                            "tool_name": tool_name,
-                                            "executor_name": str(
-                                                tool_result.get("executor_name")
-                                                or tool_result.get("subagent_id")
-                                                or ""
-                                            ).strip(),
-                                            "task_id": str(
-                                                tool_result.get("task_id") or ""
-                                            ).strip(),
+                                            "role": "tool",
+                                            "tool_call_id": tool_call_id,
+                                            "content": json.dumps(
+                                                {
+                                                    "result": self._sanitize_tool_result_for_history(
+                                                        tool_result
+                                                    )
+                                                },
+                                                ensure_ascii=False,
+                                                default=str,
+                                            ),
                                         }
                                     )
+                                    if (
+                                        tool_ok
+                                        and isinstance(tool_result, dict)
+                                        and str(tool_result.get("history_visibility") or "")
+                                        .strip()
+                                        .lower()
+                                        == "suppress_success"
+                                    ):
+                                        current_history.append(
+                                            {
+                                                "role": "user",
+                                                "content": (
+                                                    "系统提示：上一步工具只是内部预检且已成功，"
+                                                    "不要把该成功结果直接回复给用户。"
+                                                    "如果当前任务还没完成，请继续调用后续工具或继续执行；"
+                                                    "只有当认证异常、未登录或用户明确询问状态时，才需要显式说明认证情况。"
+                                                ),
+                                            }
+                                        )
+                                    if self._should_apply_cost_guards(tool_name):
+                                        per_tool_call_count[tool_name] = (
+                                            int(per_tool_call_count.get(tool_name) or 0) + 1
+                                        )
 
-                                if (
-                                    isinstance(directive, dict)
-                                    and directive.get("stop") is True
-                                ):
-                                    terminal_short_circuit_text = str(
-                                        directive.get("final_text") or ""
-                                    ).strip()
-                                    if not terminal_short_circuit_text:
-                                        terminal_short_circuit_text = (
-                                            terminal_text
-                                            or self._summarize_tool_result(tool_result)
+                                    if (
+                                        tool_ok
+                                        and isinstance(tool_result, dict)
+                                        and bool(tool_result.get("async_dispatch"))
+                                    ):
+                                        async_dispatch_rows.append(
+                                            {
+                                                "tool_name": tool_name,
+                                                "executor_name": str(
+                                                    tool_result.get("executor_name")
+                                                    or tool_result.get("subagent_id")
+                                                    or ""
+                                                ).strip(),
+                                                "task_id": str(
+                                                    tool_result.get("task_id") or ""
+                                                ).strip(),
+                                            }
                                         )
-                                    should_terminal_stop = True
-                                    break
-                                if isinstance(directive, dict):
-                                    continue_after_tool_prompt = str(
-                                        directive.get("continue_prompt") or ""
-                                    ).strip()
-                            else:
-                                logger.error("No tool_executor provided!")
-                                break
 
+                                    if (
+                                        isinstance(directive, dict)
+                                        and directive.get("stop") is True
+                                    ):
+                                        terminal_short_circuit_text = str(
+                                            directive.get("final_text") or ""
+                                        ).strip()
+                                        if not terminal_short_circuit_text:
+                                            terminal_short_circuit_text = (
+                                                terminal_text
+                                                or self._summarize_tool_result(tool_result)
+                                            )
+                                        should_terminal_stop = True
+                                        break
+                                    if isinstance(directive, dict):
+                                        continue_after_tool_prompt = str(
+                                            directive.get("continue_prompt") or ""
+                                        ).strip()
+                                else:
+                                    logger.error("No tool_executor provided!")
+                                    break
+                        finally:
+                            # 正常结束、提前终止或本轮抛错/被取消时，同批次尚未写回的
+                            # 只读调用都要取消，不能留在后台继续跑。
+                            await _cancel_tool_batch(parallel_batch)
                         pending_tool_failures = turn_failures
 
                         if should_terminal_stop:
@@ -0,0 +1,472 @@
+"""Long-lived headless browser worker for page snapshots.
+
+每次 ``fetch_with_playwright_cli_snapshot`` 都冷启动一个 playwright-cli 浏览器，
+deep_research 一次 gather 十个 URL 就是十个浏览器进程。这里改为一个常驻的
+worker 进程：
+
+- 只保留一个浏览器进程；每个页面用一个新的 ``BrowserContext``，页面关掉后
+  context 随即关闭，cookie / localStorage / IndexedDB / 权限都不会带到下一个 URL；
+- 同时打开的页面数不超过 ``BROWSER_MAX_CONCURRENT_PAGES``，多出的请求排队；
+- 完全空闲超过 ``BROWSER_WORKER_BROWSER_IDLE_SEC`` 时关闭浏览器（下次请求再懒启动），
+  空闲超过 ``BROWSER_WORKER_EXIT_IDLE_SEC`` 后 worker 自行退出；
+- 每个页面回报 ``queue_ms`` / ``launch_ms`` / ``goto_ms`` / ``snapshot_ms`` /
+  ``total_ms``，客户端汇总进 ``BrowserWorkerClient.stats()`` 并写日志。
+
+worker 通过 ``python -m services.browser_worker --socket <path>`` 启动，监听一个按
+``DATA_DIR`` 区分的 unix socket，协议是一行 JSON 请求、一行 JSON 响应。socket 路径
+固定，所以主进程和 skill 子进程共用同一个 worker；worker 以独立会话启动，不随
+发起它的进程退出。
+
+依赖 Python 版 ``playwright``（可选依赖）。未安装时 ``available`` 为 False，调用方
+继续走 playwright-cli 子进程。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import fcntl
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.app_paths import data_dir
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+BROWSER_WORKER_ENABLED = (
+    os.getenv("BROWSER_WORKER_ENABLED", "true").lower() == "true"
+    and hasattr(asyncio, "open_unix_connection")
+)
+BROWSER_MAX_CONCURRENT_PAGES = max(1, _env_int("BROWSER_MAX_CONCURRENT_PAGES", 3))
+BROWSER_WORKER_PAGE_TIMEOUT_SEC = max(5, _env_int("BROWSER_WORKER_PAGE_TIMEOUT_SEC", 45))
+BROWSER_WORKER_BROWSER_IDLE_SEC = max(30, _env_int("BROWSER_WORKER_BROWSER_IDLE_SEC", 300))
+BROWSER_WORKER_EXIT_IDLE_SEC = max(60, _env_int("BROWSER_WORKER_EXIT_IDLE_SEC", 1800))
+
+_READY_TIMEOUT_SEC = 30.0
+_REAP_INTERVAL_SEC = 15.0
+_RECENT_TIMINGS = 50
+_NETWORK_IDLE_WAIT_MS = 5000
+_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+_SRC_ROOT = Path(__file__).resolve().parents[1]
+_CHANNELS = {"chrome", "chrome-beta", "msedge", "msedge-beta"}
+
+
+def playwright_available() -> bool:
+    return importlib.util.find_spec("playwright") is not None
+
+
+def default_socket_path() -> str:
+    # unix socket 路径有长度上限，放在临时目录里，用 DATA_DIR 的指纹区分实例。
+    tag = hashlib.sha1(str(data_dir().resolve()).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"ikaros-browser-{tag}.sock")
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return round(ordered[min(rank, len(ordered)) - 1], 1)
+
+
+# ---------------------------------------------------------------------------
+# Worker (runs in its own process)
+# ---------------------------------------------------------------------------
+
+
+class BrowserWorker:
+    def __init__(
+        self,
+        *,
+        max_pages: int = BROWSER_MAX_CONCURRENT_PAGES,
+        browser_idle_sec: float = BROWSER_WORKER_BROWSER_IDLE_SEC,
+        exit_idle_sec: float = BROWSER_WORKER_EXIT_IDLE_SEC,
+    ) -> None:
+        self.max_pages = max(1, int(max_pages))
+        self.browser_idle_sec = float(browser_idle_sec)
+        self.exit_idle_sec = float(exit_idle_sec)
+        self._pages = asyncio.Semaphore(self.max_pages)
+        self._launch_lock = asyncio.Lock()
+        self._playwright: Any = None
+        self._browser: Any = None
+        self._active = 0
+        self._last_used = time.monotonic()
+        self.stopped = asyncio.Event()
+
+    async def _launch(self) -> Any:
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            await self._close_browser()
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+            channel = str(os.getenv("PLAYWRIGHT_CLI_BROWSER", "chrome") or "").strip()
+            try:
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True,
+                    channel=channel if channel in _CHANNELS else None,
+                )
+            except Exception:
+                if channel not in _CHANNELS:
+                    raise
+                # 指定的浏览器渠道未安装时退回 playwright 自带的 chromium。
+                self._browser = await self._playwright.chromium.launch(headless=True)
+            return self._browser
+
+    async def _acquire_context(self) -> Any:
+        # context 不复用：clear_cookies 清不掉 localStorage、IndexedDB、缓存和已授予的
+        # 权限，复用会把上一个站点的状态带给下一个 URL。新建 context 只要几毫秒，
+        # 省时间的大头是常驻的浏览器进程。
+        browser = await self._launch()
+        return await browser.new_context(user_agent=_USER_AGENT)
+
+    async def _release_context(self, context: Any) -> None:
+        with contextlib.suppress(Exception):
+            await context.close()
+
+    async def snapshot(self, url: str, *, timeout_sec: float) -> Dict[str, Any]:
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        async with self._pages:
+            self._active += 1
+            timings["queue_ms"] = (time.perf_counter() - started) * 1000.0
+            try:
+                mark = time.perf_counter()
+                context = await self._acquire_context()
+                timings["launch_ms"] = (time.perf_counter() - mark) * 1000.0
+                page = await context.new_page()
+                try:
+                    mark = time.perf_counter()
+                    await page.goto(
+                        url,
+                        wait_until="domcontentloaded",
+                        timeout=int(timeout_sec * 1000),
+                    )
+                    with contextlib.suppress(Exception):
+                        await page.wait_for_load_state(
+                            "networkidle", timeout=_NETWORK_IDLE_WAIT_MS
+                        )
+                    timings["goto_ms"] = (time.perf_counter() - mark) * 1000.0
+                    mark = time.perf_counter()
+                    title = await page.title()
+                    content = await page.locator("body").aria_snapshot()
+                    timings["snapshot_ms"] = (time.perf_counter() - mark) * 1000.0
+                finally:
+                    with contextlib.suppress(Exception):
+                        await page.close()
+                    await self._release_context(context)
+            finally:
+                self._active -= 1
+                self._last_used = time.monotonic()
+        timings["total_ms"] = (time.perf_counter() - started) * 1000.0
+        return {
+            "ok": True,
+            "url": url,
+            "title": str(title or ""),
+            "content": str(content or ""),
+            "timings": {key: round(value, 1) for key, value in timings.items()},
+        }
+
+    async def reap_idle(self) -> None:
+        if self._active:
+            return
+        idle = time.monotonic() - self._last_used
+        if self._browser is not None and idle > self.browser_idle_sec:
+            logger.info("Browser worker idle for %.0fs; closing browser.", idle)
+            await self._close_browser()
+        if idle > self.exit_idle_sec:
+            self.stopped.set()
+
+    async def _close_browser(self) -> None:
+        browser, self._browser = self._browser, None
+        if browser is not None:
+            with contextlib.suppress(Exception):
+                await browser.close()
+        runtime, self._playwright = self._playwright, None
+        if runtime is not None:
+            with contextlib.suppress(Exception):
+                await runtime.stop()
+
+    async def close(self) -> None:
+        await self._close_browser()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            line = await reader.readline()
+            request = json.loads(line or b"{}")
+            op = str(request.get("op") or "")
+            if op == "snapshot":
+                url = str(request.get("url") or "")
+                timeout_sec = float(
+                    request.get("timeout") or BROWSER_WORKER_PAGE_TIMEOUT_SEC
+                )
+                try:
+                    response = await self.snapshot(url, timeout_sec=timeout_sec)
+                except Exception as exc:
+                    response = {"ok": False, "url": url, "error": str(exc)[:500]}
+            elif op == "ping":
+                response = {"ok": True, "active": self._active}
+            elif op == "shutdown":
+                response = {"ok": True}
+                self.stopped.set()
+            else:
+                response = {"ok": False, "error": f"unknown op: {op}"}
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+        except Exception as exc:
+            logger.warning("Browser worker request failed: %s", exc)
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+
+async def _serve(socket_path: str) -> None:
+    worker = BrowserWorker()
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(worker.handle, path=socket_path)
+    os.chmod(socket_path, 0o600)
+    sys.stdout.write("READY\n")
+    sys.stdout.flush()
+    # 发起方读到 READY 就会关掉管道，之后不能再写 stdout。
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.close(devnull)
+
+    async def _reaper() -> None:
+        while not worker.stopped.is_set():
+            await asyncio.sleep(_REAP_INTERVAL_SEC)
+            await worker.reap_idle()
+
+    reaper = asyncio.create_task(_reaper())
+    try:
+        await worker.stopped.wait()
+    finally:
+        reaper.cancel()
+        server.close()
+        await server.wait_closed()
+        await worker.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
+
+
+def serve(socket_path: str) -> None:
+    asyncio.run(_serve(socket_path))
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class PageSnapshot:
+    url: str
+    ok: bool
+    title: str = ""
+    content: str = ""
+    error: str = ""
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class BrowserWorkerClient:
+    def __init__(
+        self,
+        *,
+        socket_path: str = "",
+        enabled: bool = BROWSER_WORKER_ENABLED,
+    ) -> None:
+        self._socket_path = socket_path
+        self.enabled = bool(enabled)
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._start_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._timings: "deque[Dict[str, float]]" = deque(maxlen=_RECENT_TIMINGS)
+        self._pages = 0
+        self._failures = 0
+
+    @property
+    def socket_path(self) -> str:
+        return self._socket_path or default_socket_path()
+
+    @property
+    def available(self) -> bool:
+        return self.enabled and playwright_available()
+
+    def _lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._start_lock is None or self._start_lock_loop is not loop:
+            self._start_lock = asyncio.Lock()
+            self._start_lock_loop = loop
+        return self._start_lock
+
+    async def _request(self, payload: Dict[str, Any], *, timeout_sec: float) -> Dict[str, Any]:
+        reader, writer = await asyncio.open_unix_connection(self.socket_path)
+        try:
+            writer.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), timeout=timeout_sec)
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+        if not line:
+            raise ConnectionError("browser worker closed the connection")
+        return json.loads(line)
+
+    async def _ping(self) -> bool:
+        try:
+            await self._request({"op": "ping"}, timeout_sec=5.0)
+            return True
+        except (OSError, ConnectionError, asyncio.TimeoutError, ValueError):
+            return False
+
+    async def ensure_started(self) -> bool:
+        if not self.available:
+            return False
+        if await self._ping():
+            return True
+        async with self._lock():
+            if await self._ping():
+                return True
+            # 主进程和多个 skill 子进程可能同时发现 worker 不在，用文件锁保证只拉起一个。
+            lock_fd = os.open(f"{self.socket_path}.lock", os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                await asyncio.to_thread(fcntl.flock, lock_fd, fcntl.LOCK_EX)
+                if await self._ping():
+                    return True
+                return await self._spawn()
+            finally:
+                os.close(lock_fd)
+
+    async def _spawn(self) -> bool:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            item for item in (str(_SRC_ROOT), env.get("PYTHONPATH", "")) if item
+        )
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "services.browser_worker",
+            "--socket",
+            self.socket_path,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+            start_new_session=True,
+        )
+        try:
+            line = await asyncio.wait_for(
+                process.stdout.readline(), timeout=_READY_TIMEOUT_SEC
+            )
+        except asyncio.TimeoutError:
+            line = b""
+        if line.strip() != b"READY":
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+            await process.wait()
+            logger.warning("Browser worker failed to start; using playwright-cli.")
+            return False
+        self._process = process
+        logger.info("Browser worker ready (pid=%s)", process.pid)
+        return True
+
+    async def snapshot(self, url: str) -> Optional[PageSnapshot]:
+        """返回页面快照；worker 不可用时返回 None，由调用方回退到其它抓取方式。"""
+        if not await self.ensure_started():
+            return None
+        timeout_sec = float(BROWSER_WORKER_PAGE_TIMEOUT_SEC)
+        try:
+            # 排队等待页面名额的时间也算在内，所以读超时放宽到两倍。
+            response = await self._request(
+                {"op": "snapshot", "url": url, "timeout": timeout_sec},
+                timeout_sec=timeout_sec * 2 + 10,
+            )
+        except (OSError, ConnectionError, asyncio.TimeoutError, ValueError) as exc:
+            logger.warning("Browser worker request failed for %s: %s", url, exc)
+            return None
+        result = PageSnapshot(
+            url=url,
+            ok=bool(response.get("ok")),
+            title=str(response.get("title") or ""),
+            content=str(response.get("content") or ""),
+            error=str(response.get("error") or ""),
+            timings={
+                str(key): float(value)
+                for key, value in dict(response.get("timings") or {}).items()
+            },
+        )
+        self._record(result)
+        return result
+
+    def _record(self, result: PageSnapshot) -> None:
+        self._pages += 1
+        if not result.ok:
+            self._failures += 1
+            logger.warning("Browser worker snapshot failed for %s: %s", result.url, result.error)
+            return
+        self._timings.append(result.timings)
+        logger.info(
+            "[BrowserWorker] %s queue=%.0fms launch=%.0fms goto=%.0fms snapshot=%.0fms total=%.0fms",
+            result.url,
+            result.timings.get("queue_ms", 0.0),
+            result.timings.get("launch_ms", 0.0),
+            result.timings.get("goto_ms", 0.0),
+            result.timings.get("snapshot_ms", 0.0),
+            result.timings.get("total_ms", 0.0),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        totals = [item.get("total_ms", 0.0) for item in self._timings]
+        return {
+            "pages": self._pages,
+            "failures": self._failures,
+            "total_ms_p50": _percentile(totals, 50),
+            "total_ms_p95": _percentile(totals, 95),
+            "recent": list(self._timings),
+        }
+
+    async def shutdown(self) -> None:
+        """通知 worker 退出；worker 是共享的，只应由主进程在退出时调用。"""
+        if not self.available:
+            return
+        with contextlib.suppress(OSError, ConnectionError, asyncio.TimeoutError, ValueError):
+            await self._request({"op": "shutdown"}, timeout_sec=5.0)
+
+
+browser_worker = BrowserWorkerClient()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless browser snapshot worker")
+    parser.add_argument("--socket", required=True)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
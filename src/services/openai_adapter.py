@@ -216,6 +216,52 @@ async def collect_chat_completion_response(response: Any) -> Any:
     return build_chat_completion_from_stream_chunks(chunks)
 
 
+class _PrimedAsyncStream:
+    """Async stream whose first chunk has already been received."""
+
+    def __init__(self, target: Any, iterator: Any, first_chunks: list[Any]) -> None:
+        self._target = target
+        self._iterator = iterator
+        self._pending = list(first_chunks)
+        self._exhausted = not first_chunks
+
+    def __aiter__(self) -> "_PrimedAsyncStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._pending:
+            return self._pending.pop(0)
+        if self._exhausted:
+            raise StopAsyncIteration
+        return await self._iterator.__anext__()
+
+    async def aclose(self) -> None:
+        close_method = getattr(self._target, "aclose", None)
+        if callable(close_method):
+            await close_method()
+
+
+async def prime_chat_completion_stream(response: Any) -> Any:
+    """Wait for the first streamed chunk; the returned stream replays it.
+
+    用于测量首 token 延迟，以及在对冲请求里以"谁先出 token"决定胜者。
+    非流式响应原样返回。
+    """
+    if not is_async_chat_completion_stream(response):
+        return response
+    iterator = response.__aiter__()
+    try:
+        first_chunk = await iterator.__anext__()
+    except StopAsyncIteration:
+        return _PrimedAsyncStream(response, iterator, [])
+    except BaseException:
+        close_method = getattr(response, "aclose", None)
+        if callable(close_method):
+            await close_method()
+        raise
+    return _PrimedAsyncStream(response, iterator, [first_chunk])
+
+
 def collect_chat_completion_response_sync(response: Any) -> Any:
     if not is_sync_chat_completion_stream(response):
         return response
@@ -1,28 +1,45 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
 from typing import Any
 
 from core.config import get_client_for_model
 from core.llm_usage_store import llm_usage_session
 from core.model_config import select_model_for_role
-from core.state_store import get_session_entries, replace_session_entries
+from core.session_compaction_state import (
+    CompactionState,
+    boundary_digest,
+    session_compaction_state,
+)
+from core.state_store import (
+    count_session_messages,
+    get_session_entries,
+    get_session_message_range,
+)
+from core.token_estimator import estimate_tokens
 from services.openai_adapter import generate_text
 
 logger = logging.getLogger(__name__)
 
 SESSION_SUMMARY_PREFIX = "【会话压缩摘要】"
 SESSION_MEMORY_PREFIX = "【会话记忆种子】"
-VISIBLE_DIALOG_ROLES = {"user", "model"}
+DEFAULT_KEEP_RECENT = 10
+DEFAULT_ROW_THRESHOLD = 100
 
 
-def _dialog_rows(rows: list[dict[str, str]]) -> list[dict[str, str]]:
-    return [
-        item
-        for item in list(rows or [])
-        if str(item.get("role") or "").strip().lower() in VISIBLE_DIALOG_ROLES
-        and str(item.get("content") or "").strip()
-    ]
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+# 未压缩的原始消息估算超过该 token 数时触发后台压缩。
+SESSION_COMPACTION_TRIGGER_TOKENS = max(
+    1000, _env_int("SESSION_COMPACTION_TRIGGER_TOKENS", 24000)
+)
 
 
 def _system_rows_with_prefix(
@@ -69,17 +86,138 @@ def _fallback_summary(
 
 
 class SessionCompactionService:
+    """Incremental rolling compaction.
+
+    会话文件只追加不重写；``session_compaction_state`` 保存滚动摘要与高水位，
+    每次压缩只把高水位之后、最近 ``keep_recent`` 条之前的新消息并入摘要。
+    ``maybe_schedule`` 在组装上下文时按未压缩部分的 token / 条数判断是否需要
+    压缩，需要时放到后台任务里跑，不阻塞当前这一轮回复。
+    """
+
+    def __init__(self) -> None:
+        self._running: dict[tuple[str, str], asyncio.Task[Any]] = {}
+
+    def load_state(self, user_id: str, session_id: str) -> CompactionState:
+        try:
+            return session_compaction_state.get(str(user_id), str(session_id))
+        except Exception as exc:
+            logger.warning("Failed to load session compaction state: %s", exc)
+            return CompactionState()
+
+    def needs_compaction(
+        self,
+        *,
+        pending_rows: int,
+        pending_tokens: int,
+        keep_recent: int = DEFAULT_KEEP_RECENT,
+        threshold: int = DEFAULT_ROW_THRESHOLD,
+        token_limit: int = 0,
+    ) -> bool:
+        if pending_rows <= max(1, int(keep_recent)):
+            return False
+        # 小窗口模型的历史预算可能低于全局阈值，此时按预算触发，
+        # 否则读路径截掉的消息永远等不到压缩。
+        trigger_tokens = SESSION_COMPACTION_TRIGGER_TOKENS
+        if token_limit > 0:
+            trigger_tokens = min(trigger_tokens, int(token_limit))
+        return (
+            pending_rows > max(1, int(threshold))
+            or pending_tokens > trigger_tokens
+        )
+
+    def maybe_schedule(
+        self,
+        *,
+        user_id: str,
+        session_id: str,
+        pending_rows: int,
+        pending_tokens: int,
+        token_limit: int = 0,
+    ) -> bool:
+        if not self.needs_compaction(
+            pending_rows=pending_rows,
+            pending_tokens=pending_tokens,
+            token_limit=token_limit,
+        ):
+            return False
+        key = (str(user_id), str(session_id))
+        if key in self._running:
+            return False
+        try:
+            task = asyncio.get_running_loop().create_task(
+                self._compact_in_background(*key, token_limit=token_limit)
+            )
+        except RuntimeError:
+            return False
+        self._running[key] = task
+        task.add_done_callback(lambda _t, k=key: self._running.pop(k, None))
+        return True
+
+    async def _compact_in_background(
+        self, user_id: str, session_id: str, *, token_limit: int = 0
+    ) -> None:
+        try:
+            result = await self._compact(
+                user_id=user_id,
+                session_id=session_id,
+                keep_recent=DEFAULT_KEEP_RECENT,
+                threshold=DEFAULT_ROW_THRESHOLD,
+                force=False,
+                token_limit=token_limit,
+            )
+            if result.get("compacted"):
+                logger.info(
+                    "Session compacted in background user=%s session=%s rows=%s",
+                    user_id,
+                    session_id,
+                    result.get("compressed_count"),
+                )
+        except Exception:
+            logger.warning(
+                "Background session compaction failed user=%s session=%s",
+                user_id,
+                session_id,
+                exc_info=True,
+            )
+
+    async def wait_idle(self) -> None:
+        tasks = list(self._running.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
     async def compact_session(
         self,
         *,
         user_id: str,
         session_id: str,
-        keep_recent: int = 10,
-        threshold: int = 100,
+        keep_recent: int = DEFAULT_KEEP_RECENT,
+        threshold: int = DEFAULT_ROW_THRESHOLD,
         force: bool = False,
     ) -> dict[str, Any]:
-        rows = await get_session_entries(user_id, session_id)
-        if not rows:
+        running = self._running.get((str(user_id), str(session_id)))
+        if running is not None:
+            # 后台压缩正在进行时等它结束，再基于新的高水位继续。
+            await asyncio.gather(running, return_exceptions=True)
+        return await self._compact(
+            user_id=user_id,
+            session_id=session_id,
+            keep_recent=keep_recent,
+            threshold=threshold,
+            force=force,
+        )
+
+    async def _compact(
+        self,
+        *,
+        user_id: str,
+        session_id: str,
+        keep_recent: int,
+        threshold: int,
+        force: bool,
+        token_limit: int = 0,
+    ) -> dict[str, Any]:
+        dialog_count = await count_session_messages(user_id, session_id)
+        if dialog_count <= 0:
             return {
                 "ok": True,
                 "compacted": False,
@@ -89,36 +227,45 @@ class SessionCompactionService:
                 "kept_recent": 0,
             }
 
-        dialog_rows = _dialog_rows(rows)
-        dialog_count = len(dialog_rows)
-        if not force and dialog_count <= max(1, int(threshold)):
+        keep_recent = max(1, int(keep_recent))
+        state = await self.validated_state(user_id, session_id, dialog_count)
+        pending_rows = await get_session_message_range(
+            user_id, session_id, state.summarized_rows, dialog_count
+        )
+        pending_tokens = sum(
+            estimate_tokens(item.get("content")) for item in pending_rows
+        )
+        if not force and not self.needs_compaction(
+            pending_rows=len(pending_rows),
+            pending_tokens=pending_tokens,
+            keep_recent=keep_recent,
+            threshold=threshold,
+            token_limit=token_limit,
+        ):
             return {
                 "ok": True,
                 "compacted": False,
                 "reason": "below_threshold",
                 "dialog_count": dialog_count,
                 "compressed_count": 0,
-                "kept_recent": min(dialog_count, max(1, int(keep_recent))),
+                "kept_recent": min(len(pending_rows), keep_recent),
+                "pending_tokens": pending_tokens,
             }
 
-        keep_recent = max(1, int(keep_recent))
-        preserved_recent = dialog_rows[-keep_recent:]
-        older_rows = dialog_rows[:-keep_recent]
-        summary_rows = _system_rows_with_prefix(rows, SESSION_SUMMARY_PREFIX)
-        previous_summary = ""
-        if summary_rows:
-            previous_summary = str(summary_rows[-1].get("content") or "").strip()
-
-        if not older_rows and not previous_summary:
+        older_rows = pending_rows[:-keep_recent]
+        if not older_rows:
             return {
                 "ok": True,
                 "compacted": False,
                 "reason": "nothing_to_compact",
                 "dialog_count": dialog_count,
                 "compressed_count": 0,
-                "kept_recent": len(preserved_recent),
+                "kept_recent": len(pending_rows),
             }
 
+        previous_summary = state.summary or await self._legacy_summary(
+            user_id, session_id
+        )
         summary_text = await self._summarize_history(
             user_id=user_id,
             session_id=session_id,
@@ -133,25 +280,82 @@ class SessionCompactionService:
         if summary_text and not summary_text.startswith(SESSION_SUMMARY_PREFIX):
             summary_text = f"{SESSION_SUMMARY_PREFIX}\n{summary_text.strip()}"
 
-        memory_rows = _system_rows_with_prefix(rows, SESSION_MEMORY_PREFIX)
-        rebuilt_rows: list[dict[str, str]] = []
-        if memory_rows:
-            rebuilt_rows.append(memory_rows[-1])
-        if summary_text:
-            rebuilt_rows.append({"role": "system", "content": summary_text.strip()})
-        rebuilt_rows.extend(preserved_recent)
-
-        ok = await replace_session_entries(user_id, session_id, rebuilt_rows)
+        next_state = CompactionState(
+            summary=summary_text.strip(),
+            summarized_rows=state.summarized_rows + len(older_rows),
+            boundary_digest=boundary_digest(older_rows[-1].get("content") or ""),
+        )
+        try:
+            await asyncio.to_thread(
+                session_compaction_state.save, user_id, session_id, next_state
+            )
+        except Exception as exc:
+            logger.error("Failed to persist session compaction state: %s", exc)
+            return {
+                "ok": False,
+                "compacted": False,
+                "reason": "write_failed",
+                "dialog_count": dialog_count,
+                "compressed_count": 0,
+                "kept_recent": len(pending_rows),
+            }
         return {
-            "ok": bool(ok),
-            "compacted": bool(ok),
-            "reason": "compacted" if ok else "write_failed",
+            "ok": True,
+            "compacted": True,
+            "reason": "compacted",
             "dialog_count": dialog_count,
             "compressed_count": len(older_rows),
-            "kept_recent": len(preserved_recent),
+            "kept_recent": len(pending_rows) - len(older_rows),
             "has_summary": bool(summary_text),
+            "summarized_rows": next_state.summarized_rows,
         }
 
+    async def validated_state(
+        self,
+        user_id: str,
+        session_id: str,
+        dialog_count: int,
+    ) -> CompactionState:
+        """Load the compaction state, resetting the watermark if the file was replaced.
+
+        读路径（``get_user_context``）和压缩任务共用这一份校验；检测到重置时
+        立即落盘，之后的读取不会再按失效的高水位截断历史。
+        """
+        # 状态表是同步 SQLite，放到线程里读写，不占事件循环。
+        state = await asyncio.to_thread(self.load_state, user_id, session_id)
+        if state.summarized_rows <= 0:
+            return state
+        boundary = []
+        if state.summarized_rows <= dialog_count:
+            boundary = await get_session_message_range(
+                user_id,
+                session_id,
+                state.summarized_rows - 1,
+                state.summarized_rows,
+            )
+        if boundary and boundary_digest(boundary[0]["content"]) == state.boundary_digest:
+            return state
+        # 会话文件被整体替换过，高水位不再对应原来的消息；保留摘要，从头累计。
+        logger.info(
+            "Session compaction watermark reset user=%s session=%s", user_id, session_id
+        )
+        reset = CompactionState(summary=state.summary)
+        try:
+            await asyncio.to_thread(
+                session_compaction_state.save, user_id, session_id, reset
+            )
+        except Exception as exc:
+            logger.warning("Failed to persist session compaction reset: %s", exc)
+        return reset
+
+    async def _legacy_summary(self, user_id: str, session_id: str) -> str:
+        # 旧版本压缩把摘要写成会话文件里的 system 行，首次增量压缩时接着用。
+        rows = _system_rows_with_prefix(
+            await get_session_entries(user_id, session_id, role="system"),
+            SESSION_SUMMARY_PREFIX,
+        )
+        return str(rows[-1].get("content") or "").strip() if rows else ""
+
     async def _summarize_history(
         self,
         *,
@@ -165,12 +369,12 @@ class SessionCompactionService:
             source_blocks.append(previous_summary.strip())
         rendered_dialog = _render_dialog_lines(older_rows)
         if rendered_dialog:
-            source_blocks.append(rendered_dialog)
+            # 旧摘要总是完整保留；超长时只截掉新增对话里最早的部分。
+            budget = max(2000, 18000 - len(previous_summary or ""))
+            source_blocks.append(rendered_dialog[-budget:])
         source_text = "\n\n".join(block for block in source_blocks if block).strip()
         if not source_text:
             return ""
-        if len(source_text) > 18000:
-            source_text = source_text[-18000:]
 
         prompt = (
             "请把下面这段更早的会话内容压缩成一段后续对话可复用的中文摘要。\n"
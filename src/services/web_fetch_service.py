@@ -0,0 +1,572 @@
+"""Process-wide HTTP fetcher for page content.
+
+网页摘要、web_extractor、deep_research 等都经由 ``fetch_webpage_content`` 抓页面。
+这里把 HTTP 抓取收敛到一个共享的 ``httpx.AsyncClient``（连接池 + keep-alive，
+安装了 ``h2`` 时启用 HTTP/2），并提供：
+
+- 磁盘响应缓存（``bot_data.db`` 的 ``web_fetch_cache`` 表）：按 RFC 9111 计算
+  新鲜度（``max-age`` > ``Expires`` > 基于 ``Last-Modified`` 的启发式），过期后
+  带 ``If-None-Match`` / ``If-Modified-Since`` 重新验证，304 时复用已存的正文；
+  ``no-store`` / ``Vary: *`` 不入缓存，``no-cache`` 每次都重新验证；总字节数超过
+  ``WEB_FETCH_CACHE_MAX_BYTES`` 时按最久未访问淘汰；
+- 按 host 的并发上限（``WEB_FETCH_PER_HOST``）；
+- 抓取策略记忆（``web_fetch_strategy`` 表）：记录每个 host 上 playwright / jina /
+  http 各策略最近的成败；在 ``WEB_FETCH_STRATEGY_TTL_SEC`` 内连续失败达到
+  ``WEB_FETCH_STRATEGY_FAIL_THRESHOLD`` 次的策略排到最后，成功一次即恢复。
+
+客户端与信号量绑定在创建它们的事件循环上；换了事件循环（例如 skill 子进程里
+``asyncio.run``）会自动重建。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+from core.app_paths import data_dir
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(str(os.getenv(name, str(default))).strip())
+    except ValueError:
+        return default
+
+
+WEB_FETCH_TIMEOUT_SEC = max(1.0, _env_float("WEB_FETCH_TIMEOUT_SEC", 30.0))
+WEB_FETCH_MAX_CONNECTIONS = max(1, _env_int("WEB_FETCH_MAX_CONNECTIONS", 32))
+WEB_FETCH_PER_HOST = max(1, _env_int("WEB_FETCH_PER_HOST", 4))
+WEB_FETCH_CACHE_ENABLED = (
+    os.getenv("WEB_FETCH_CACHE_ENABLED", "true").lower() == "true"
+)
+WEB_FETCH_CACHE_MAX_BYTES = max(
+    1024 * 1024, _env_int("WEB_FETCH_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+WEB_FETCH_CACHE_MAX_ITEM_BYTES = max(
+    64 * 1024, _env_int("WEB_FETCH_CACHE_MAX_ITEM_BYTES", 2 * 1024 * 1024)
+)
+WEB_FETCH_CACHE_HEURISTIC_MAX_SEC = max(
+    0, _env_int("WEB_FETCH_CACHE_HEURISTIC_MAX_SEC", 24 * 3600)
+)
+WEB_FETCH_STRATEGY_TTL_SEC = max(60, _env_int("WEB_FETCH_STRATEGY_TTL_SEC", 6 * 3600))
+WEB_FETCH_STRATEGY_FAIL_THRESHOLD = max(
+    1, _env_int("WEB_FETCH_STRATEGY_FAIL_THRESHOLD", 2)
+)
+
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_CACHE_TABLE = "web_fetch_cache"
+_STRATEGY_TABLE = "web_fetch_strategy"
+_CACHEABLE_STATUS = {200, 203}
+# 只保留与缓存语义和内容解析相关的响应头；正文已由 httpx 解码，
+# content-encoding / content-length 不能原样回放。
+_STORED_HEADERS = (
+    "content-type",
+    "content-language",
+    "etag",
+    "last-modified",
+    "cache-control",
+    "expires",
+    "date",
+    "age",
+    "vary",
+)
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(str(url or "")).hostname or "").lower()
+
+
+def parse_cache_control(value: str) -> Dict[str, str]:
+    directives: Dict[str, str] = {}
+    for part in str(value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        name = name.strip().lower()
+        if name:
+            directives[name] = arg.strip().strip('"')
+    return directives
+
+
+def _http_date(value: str) -> float | None:
+    try:
+        return parsedate_to_datetime(str(value or "")).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _int_or_none(value: str | None) -> int | None:
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers: Dict[str, str], now: float) -> float:
+    """RFC 9111 §4.2.1：max-age 优先，其次 Expires - Date，最后用 Last-Modified 启发式。"""
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    max_age = _int_or_none(directives.get("max-age"))
+    if max_age is not None:
+        return float(max(0, max_age))
+    date = _http_date(headers.get("date", "")) or now
+    if "expires" in headers:
+        expires = _http_date(headers.get("expires", ""))
+        return max(0.0, expires - date) if expires is not None else 0.0
+    last_modified = _http_date(headers.get("last-modified", ""))
+    if last_modified is not None and last_modified < date:
+        return min(float(WEB_FETCH_CACHE_HEURISTIC_MAX_SEC), (date - last_modified) * 0.1)
+    return 0.0
+
+
+def _expires_at(headers: Dict[str, str], now: float) -> float:
+    directives = parse_cache_control(headers.get("cache-control", ""))
+    if "no-cache" in directives:
+        return now
+    age = _int_or_none(headers.get("age")) or 0
+    return now + freshness_lifetime(headers, now) - max(0, age)
+
+
+def _stored_headers(headers: httpx.Headers | Dict[str, str]) -> Dict[str, str]:
+    return {
+        name: str(headers.get(name))
+        for name in _STORED_HEADERS
+        if headers.get(name) is not None
+    }
+
+
+def _vary_names(headers: Dict[str, str]) -> List[str]:
+    return sorted(
+        item.strip().lower()
+        for item in str(headers.get("vary") or "").split(",")
+        if item.strip()
+    )
+
+
+def _is_storable(status: int, headers: Dict[str, str], size: int) -> bool:
+    if status not in _CACHEABLE_STATUS or size > WEB_FETCH_CACHE_MAX_ITEM_BYTES:
+        return False
+    if "no-store" in parse_cache_control(headers.get("cache-control", "")):
+        return False
+    if "*" in _vary_names(headers):
+        return False
+    has_validator = bool(headers.get("etag") or headers.get("last-modified"))
+    return has_validator or freshness_lifetime(headers, time.time()) > 0
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    vary: Dict[str, str] = field(default_factory=dict)
+    stored_at: float = 0.0
+    expires_at: float = 0.0
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.expires_at
+
+    @property
+    def has_validator(self) -> bool:
+        return bool(self.headers.get("etag") or self.headers.get("last-modified"))
+
+    def to_response(self, request: httpx.Request, source: str) -> httpx.Response:
+        return httpx.Response(
+            status_code=self.status,
+            headers=self.headers,
+            content=self.body,
+            request=request,
+            extensions={"web_fetch_cache": source},
+        )
+
+
+class _SqliteStore:
+    _schema: tuple[str, ...] = ()
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._ready_dbs: set[str] = set()
+
+    def _db_path(self) -> Path:
+        return (data_dir() / "bot_data.db").resolve()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db_path = self._db_path()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            self._ensure_db(conn, str(db_path))
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_db(self, conn: sqlite3.Connection, key: str) -> None:
+        if key in self._ready_dbs:
+            return
+        for statement in self._schema:
+            conn.execute(statement)
+        conn.commit()
+        self._ready_dbs.add(key)
+
+
+class WebFetchCache(_SqliteStore):
+    _schema = (
+        f"""
+        CREATE TABLE IF NOT EXISTS {_CACHE_TABLE} (
+            cache_key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            headers_json TEXT NOT NULL,
+            vary_json TEXT NOT NULL DEFAULT '{{}}',
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            stored_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        """,
+        f"CREATE INDEX IF NOT EXISTS idx_{_CACHE_TABLE}_last_access "
+        f"ON {_CACHE_TABLE}(last_access)",
+    )
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return hashlib.sha256(f"GET {url}".encode("utf-8")).hexdigest()
+
+    def lookup(self, url: str) -> CachedResponse | None:
+        key = self.key_for(url)
+        with self._lock:
+            with self._connect() as conn:
+                row = conn.execute(
+                    f"""
+                    SELECT url, status, headers_json, vary_json, body, stored_at, expires_at
+                    FROM {_CACHE_TABLE} WHERE cache_key = ?
+                    """,
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    f"UPDATE {_CACHE_TABLE} SET last_access = ? WHERE cache_key = ?",
+                    (time.time(), key),
+                )
+        return CachedResponse(
+            url=str(row["url"]),
+            status=int(row["status"]),
+            headers=json.loads(row["headers_json"] or "{}"),
+            vary=json.loads(row["vary_json"] or "{}"),
+            body=bytes(row["body"] or b""),
+            stored_at=float(row["stored_at"]),
+            expires_at=float(row["expires_at"]),
+        )
+
+    def store(self, entry: CachedResponse) -> None:
+        now = time.time()
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute(
+                    f"""
+                    INSERT INTO {_CACHE_TABLE} (
+                        cache_key, url, status, headers_json, vary_json, body,
+                        size, stored_at, expires_at, last_access
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(cache_key) DO UPDATE SET
+                        status = excluded.status,
+                        headers_json = excluded.headers_json,
+                        vary_json = excluded.vary_json,
+                        body = excluded.body,
+                        size = excluded.size,
+                        stored_at = excluded.stored_at,
+                        expires_at = excluded.expires_at,
+                        last_access = excluded.last_access
+                    """,
+                    (
+                        self.key_for(entry.url),
+                        entry.url,
+                        int(entry.status),
+                        json.dumps(entry.headers, ensure_ascii=False),
+                        json.dumps(entry.vary, ensure_ascii=False),
+                        sqlite3.Binary(entry.body),
+                        len(entry.body),
+                        entry.stored_at,
+                        entry.expires_at,
+                        now,
+                    ),
+                )
+                self._evict(conn)
+
+    def forget(self, url: str) -> None:
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute(
+                    f"DELETE FROM {_CACHE_TABLE} WHERE cache_key = ?",
+                    (self.key_for(url),),
+                )
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = int(
+            conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {_CACHE_TABLE}"
+            ).fetchone()[0]
+            or 0
+        )
+        if total <= WEB_FETCH_CACHE_MAX_BYTES:
+            return
+        stale: list[str] = []
+        for item in conn.execute(
+            f"SELECT cache_key, size FROM {_CACHE_TABLE} ORDER BY last_access ASC"
+        ):
+            if total <= WEB_FETCH_CACHE_MAX_BYTES:
+                break
+            stale.append(str(item["cache_key"]))
+            total -= int(item["size"] or 0)
+        conn.executemany(
+            f"DELETE FROM {_CACHE_TABLE} WHERE cache_key = ?",
+            [(key,) for key in stale],
+        )
+
+    def disk_usage(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM {_CACHE_TABLE}"
+            ).fetchone()
+        return {"entries": int(row["entries"] or 0), "bytes": int(row["bytes"] or 0)}
+
+
+class FetchStrategyMemory(_SqliteStore):
+    """记住每个 host 上各抓取策略最近的成败，用来调整尝试顺序。"""
+
+    _schema = (
+        f"""
+        CREATE TABLE IF NOT EXISTS {_STRATEGY_TABLE} (
+            host TEXT NOT NULL,
+            strategy TEXT NOT NULL,
+            last_ok_at REAL NOT NULL DEFAULT 0,
+            last_fail_at REAL NOT NULL DEFAULT 0,
+            fail_streak INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (host, strategy)
+        )
+        """,
+    )
+
+    def record(self, host: str, strategy: str, ok: bool) -> None:
+        if not host:
+            return
+        now = time.time()
+        with self._lock:
+            with self._connect() as conn:
+                if ok:
+                    conn.execute(
+                        f"""
+                        INSERT INTO {_STRATEGY_TABLE} (host, strategy, last_ok_at, fail_streak)
+                        VALUES (?, ?, ?, 0)
+                        ON CONFLICT(host, strategy) DO UPDATE SET
+                            last_ok_at = excluded.last_ok_at,
+                            fail_streak = 0
+                        """,
+                        (host, strategy, now),
+                    )
+                else:
+                    conn.execute(
+                        f"""
+                        INSERT INTO {_STRATEGY_TABLE} (host, strategy, last_fail_at, fail_streak)
+                        VALUES (?, ?, ?, 1)
+                        ON CONFLICT(host, strategy) DO UPDATE SET
+                            last_fail_at = excluded.last_fail_at,
+                            fail_streak = fail_streak + 1
+                        """,
+                        (host, strategy, now),
+                    )
+
+    def order(self, host: str, strategies: List[str]) -> List[str]:
+        """持续失败的策略推到最后，其余保持配置顺序；不会移除任何策略。"""
+        if not host:
+            return list(strategies)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT strategy, last_ok_at, last_fail_at, fail_streak
+                FROM {_STRATEGY_TABLE} WHERE host = ?
+                """,
+                (host,),
+            ).fetchall()
+        cutoff = time.time() - WEB_FETCH_STRATEGY_TTL_SEC
+        failing_names = {
+            str(row["strategy"])
+            for row in rows
+            if int(row["fail_streak"] or 0) >= WEB_FETCH_STRATEGY_FAIL_THRESHOLD
+            and float(row["last_fail_at"] or 0) >= cutoff
+        }
+        return [name for name in strategies if name not in failing_names] + [
+            name for name in strategies if name in failing_names
+        ]
+
+
+async def _aclose_quietly(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except Exception as exc:
+        # 连接绑定在已关闭的循环上时 transport 关闭会报错，不影响新客户端。
+        logger.debug("Failed to close retired web fetch client: %s", exc)
+
+
+class WebFetcher:
+    def __init__(self, cache: WebFetchCache | None = None) -> None:
+        self.cache = cache or WebFetchCache()
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+        self._retiring: Set[asyncio.Task] = set()
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats_lock = Lock()
+        self._stats = {"requests": 0, "hits": 0, "revalidated": 0, "misses": 0, "stores": 0}
+
+    def _bump(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _client_for_loop(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            if self._client is not None:
+                self._retire_client(self._client, self._client_loop)
+            self._client = httpx.AsyncClient(
+                timeout=WEB_FETCH_TIMEOUT_SEC,
+                follow_redirects=True,
+                http2=_HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=WEB_FETCH_MAX_CONNECTIONS,
+                    max_keepalive_connections=WEB_FETCH_MAX_CONNECTIONS,
+                ),
+            )
+            self._client_loop = loop
+            self._host_semaphores = {}
+        return self._client
+
+    def _retire_client(
+        self, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop | None
+    ) -> None:
+        """关闭换下来的旧客户端，释放它连接池里的 socket。"""
+        if loop is not None and loop.is_running():
+            # 旧循环还在别的线程里跑：交回它自己的循环去关。
+            asyncio.run_coroutine_threadsafe(_aclose_quietly(client), loop)
+            return
+        # 旧循环已经停止，只能在当前循环里尽力关闭。
+        task = asyncio.get_running_loop().create_task(_aclose_quietly(client))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(WEB_FETCH_PER_HOST)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    async def get(self, url: str, *, headers: Dict[str, str] | None = None) -> httpx.Response:
+        """GET ``url``，新鲜的缓存直接返回，过期的缓存带校验头重新验证。"""
+        self._bump("requests")
+        request_headers = {str(k).lower(): str(v) for k, v in (headers or {}).items()}
+        client = self._client_for_loop()
+        request = httpx.Request("GET", url, headers=request_headers)
+        now = time.time()
+
+        cached: CachedResponse | None = None
+        if WEB_FETCH_CACHE_ENABLED:
+            # SQLite 读写放到线程里，和 rss 的 feed_state_store 一样不阻塞事件循环。
+            cached = await asyncio.to_thread(self.cache.lookup, url)
+            if cached is not None and any(
+                request_headers.get(name, "") != value
+                for name, value in cached.vary.items()
+            ):
+                cached = None
+            if cached is not None and cached.is_fresh(now):
+                self._bump("hits")
+                return cached.to_response(request, "hit")
+
+        send_headers = dict(request_headers)
+        if cached is not None and cached.has_validator:
+            if cached.headers.get("etag"):
+                send_headers["if-none-match"] = cached.headers["etag"]
+            if cached.headers.get("last-modified"):
+                send_headers["if-modified-since"] = cached.headers["last-modified"]
+
+        async with self._host_semaphore(host_of(url)):
+            response = await client.get(url, headers=send_headers)
+
+        if not WEB_FETCH_CACHE_ENABLED:
+            return response
+
+        if response.status_code == 304 and cached is not None:
+            # 304 只带更新后的元数据，正文沿用缓存（RFC 9111 §4.3.4）。
+            merged = {**cached.headers, **_stored_headers(response.headers)}
+            cached.headers = merged
+            cached.stored_at = now
+            cached.expires_at = _expires_at(merged, now)
+            await asyncio.to_thread(self.cache.store, cached)
+            self._bump("revalidated")
+            return cached.to_response(request, "revalidated")
+
+        self._bump("misses")
+        stored = _stored_headers(response.headers)
+        body = response.content
+        if _is_storable(response.status_code, stored, len(body)):
+            await asyncio.to_thread(
+                self.cache.store,
+                CachedResponse(
+                    url=url,
+                    status=response.status_code,
+                    headers=stored,
+                    body=body,
+                    vary={
+                        name: request_headers.get(name, "")
+                        for name in _vary_names(stored)
+                    },
+                    stored_at=now,
+                    expires_at=_expires_at(stored, now),
+                ),
+            )
+            self._bump("stores")
+        elif cached is not None:
+            await asyncio.to_thread(self.cache.forget, url)
+        return response
+
+    async def aclose(self) -> None:
+        client = self._client
+        self._client = None
+        self._client_loop = None
+        self._host_semaphores = {}
+        if client is not None:
+            await client.aclose()
+
+
+web_fetcher = WebFetcher()
+fetch_strategy_memory = FetchStrategyMemory()
@@ -8,19 +8,30 @@ import asyncio
 import os
 import shlex
 import shutil
-import httpx
 from pathlib import Path
 from uuid import uuid4
 
 from core.config import get_client_for_model
 from core.model_config import select_model_for_role
+from core.summary_cache import summary_cache
+from services.browser_worker import BROWSER_MAX_CONCURRENT_PAGES, browser_worker
 from services.openai_adapter import generate_text_sync
+from services.web_fetch_service import fetch_strategy_memory, host_of, web_fetcher
 
 logger = logging.getLogger(__name__)
 
 # URL 正则表达式
 URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
 
+# 修改摘要 prompt 时同步递增，旧的摘要缓存会自然失效。
+WEB_SUMMARY_PROMPT_VERSION = "web-page-v1"
+
+# 各抓取策略在正文前加的来源标签，如 ``【HTTP 原始页面内容】``。
+_FETCH_LABEL_PATTERN = re.compile(r"\A【[^】\n]*】\n\n")
+
+_cli_slot: asyncio.Semaphore | None = None
+_cli_slot_loop: asyncio.AbstractEventLoop | None = None
+
 
 def extract_urls(text: str) -> list[str]:
     """从文本中提取 URL"""
@@ -76,11 +87,38 @@ def _extract_snapshot_path(snapshot_stdout: str) -> str:
     return str(match.group(1) or "").strip()
 
 
+def _cli_page_slot() -> asyncio.Semaphore:
+    global _cli_slot, _cli_slot_loop
+    loop = asyncio.get_running_loop()
+    if _cli_slot is None or _cli_slot_loop is not loop:
+        _cli_slot = asyncio.Semaphore(BROWSER_MAX_CONCURRENT_PAGES)
+        _cli_slot_loop = loop
+    return _cli_slot
+
+
 async def fetch_with_playwright_cli_snapshot(url: str) -> str | None:
+    # 优先交给常驻浏览器 worker；未安装 playwright、worker 起不来或该页在 worker
+    # 里失败（崩溃、超时、空快照）时再冷启动 CLI 试一次。
+    snapshot = await browser_worker.snapshot(url) if browser_worker.available else None
+    if snapshot is not None:
+        content = snapshot.content.strip() if snapshot.ok else ""
+        if content:
+            return f"【通过 Playwright 常驻浏览器获取的页面 Markdown 快照】\n\n{content}"
+        logger.info(
+            "Browser worker snapshot failed for %s, falling back to playwright-cli: %s",
+            url,
+            snapshot.error or "empty snapshot",
+        )
+
     command_prefix = _playwright_cli_command()
     if not command_prefix:
         return None
+    # 每个 CLI 会话都是一个完整的浏览器进程，限制同时存在的数量。
+    async with _cli_page_slot():
+        return await _snapshot_with_playwright_cli(url, command_prefix)
+
 
+async def _snapshot_with_playwright_cli(url: str, command_prefix: list[str]) -> str | None:
     session_id = f"ikaros-{uuid4().hex[:8]}"
     output_root = Path(os.getenv("PLAYWRIGHT_CLI_OUTPUT_DIR", "/tmp/ikaros-playwright"))
     output_root.mkdir(parents=True, exist_ok=True)
@@ -153,19 +191,18 @@ async def fetch_with_jina_reader(url: str) -> str | None:
     """使用 Jina Reader 提取网页 Markdown 内容"""
     try:
         jina_url = f"https://r.jina.ai/{url}"
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-            response = await client.get(
-                jina_url,
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                    "Accept": "text/markdown",
-                },
-            )
-            response.raise_for_status()
-            text = response.text.strip()
-            if not text:
-                return None
-            return f"【通过 Jina Reader 获取的页面 Markdown 快照】\n\n{text}"
+        response = await web_fetcher.get(
+            jina_url,
+            headers={
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+                "Accept": "text/markdown",
+            },
+        )
+        response.raise_for_status()
+        text = response.text.strip()
+        if not text:
+            return None
+        return f"【通过 Jina Reader 获取的页面 Markdown 快照】\n\n{text}"
     except Exception as e:
         logger.warning(f"Jina Reader fetch failed for {url}: {e}")
         return None
@@ -174,18 +211,17 @@ async def fetch_with_jina_reader(url: str) -> str | None:
 async def fetch_with_http_raw(url: str) -> str | None:
     """直接抓取原始 HTTP 页面内容。"""
     try:
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-            response = await client.get(
-                url,
-                headers={
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                },
-            )
-            response.raise_for_status()
-            text = str(response.text or "").strip()
-            if not text:
-                return None
-            return f"【HTTP 原始页面内容】\n\n{text}"
+        response = await web_fetcher.get(
+            url,
+            headers={
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            },
+        )
+        response.raise_for_status()
+        text = str(response.text or "").strip()
+        if not text:
+            return None
+        return f"【HTTP 原始页面内容】\n\n{text}"
     except Exception as e:
         logger.warning(f"HTTP fetch failed for {url}: {e}")
         return None
@@ -202,36 +238,34 @@ async def fetch_webpage_content(url: str) -> str | None:
         网页文本内容，如果失败返回 None
     """
 
+    fetchers = {
+        "playwright": fetch_with_playwright_cli_snapshot,
+        "jina": fetch_with_jina_reader,
+        "http": fetch_with_http_raw,
+    }
     prefer_cli = _as_bool(os.getenv("WEB_BROWSER_PREFER_PLAYWRIGHT_CLI", "true"))
     if prefer_cli:
-        cli_content = await fetch_with_playwright_cli_snapshot(url)
-        if cli_content:
-            return cli_content
-
-        jina_content = await fetch_with_jina_reader(url)
-        if jina_content:
-            return jina_content
-
-        http_content = await fetch_with_http_raw(url)
-        if http_content:
-            return http_content
+        order = ["playwright", "jina", "http"]
     else:
-        http_content = await fetch_with_http_raw(url)
-        if http_content:
-            return http_content
-
-        jina_content = await fetch_with_jina_reader(url)
-        if jina_content:
-            return jina_content
+        order = ["http", "jina", "playwright"]
 
-        cli_content = await fetch_with_playwright_cli_snapshot(url)
-        if cli_content:
-            return cli_content
+    # 按 host 记住各策略的成败：总失败的策略排到最后，不再每次先试一遍。
+    host = host_of(url)
+    for name in await asyncio.to_thread(fetch_strategy_memory.order, host, order):
+        content = await fetchers[name](url)
+        await asyncio.to_thread(fetch_strategy_memory.record, host, name, bool(content))
+        if content:
+            return content
 
     logger.warning("All scraping methods failed or unavailable for: %s", url)
     return None
 
 
+def _page_body(content: str) -> str:
+    # 摘要缓存按正文计键：同一页面换了抓取策略（Jina / HTTP / Playwright）也命中。
+    return _FETCH_LABEL_PATTERN.sub("", content, count=1)
+
+
 async def summarize_webpage(url: str) -> str:
     """
     获取网页并生成摘要
@@ -259,16 +293,27 @@ async def summarize_webpage(url: str) -> str:
         )
 
         model_to_use = select_model_for_role("primary")
-        client_to_use = get_client_for_model(model_to_use, is_async=False)
-        if client_to_use is None:
-            raise RuntimeError("OpenAI sync client is not initialized")
-        summary = generate_text_sync(
-            sync_client=client_to_use,
+
+        async def _generate() -> str:
+            client_to_use = get_client_for_model(model_to_use, is_async=False)
+            if client_to_use is None:
+                raise RuntimeError("OpenAI sync client is not initialized")
+            return await asyncio.to_thread(
+                generate_text_sync,
+                sync_client=client_to_use,
+                model=model_to_use,
+                contents=prompt,
+                config={
+                    "system_instruction": system_instruction,
+                },
+            )
+
+        summary = await summary_cache.get_or_compute(
+            "web_page",
+            _page_body(content),
             model=model_to_use,
-            contents=prompt,
-            config={
-                "system_instruction": system_instruction,
-            },
+            prompt_version=WEB_SUMMARY_PROMPT_VERSION,
+            compute=_generate,
         )
 
         if summary:
@@ -3,9 +3,18 @@ from __future__ import annotations
 import asyncio
 import json
 import os
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
 
 
 class FileLock:
@@ -112,54 +121,488 @@ class FileLock:
         return False
 
 
+class AdvisoryFileLock:
+    """Blocking ``fcntl.flock`` on a persistent lock file.
+
+    与 ``FileLock`` 不同，这里不靠 O_EXCL 建文件再轮询，而是阻塞在内核
+    advisory lock 上；持锁进程退出时内核自动释放，不存在陈旧锁文件的问题。
+    无竞争时同步拿锁；有竞争时在该表专用的锁线程里阻塞 ``flock(LOCK_EX)``，
+    锁一释放就被内核唤醒。超时或取消时 fd 会在那次 ``flock`` 返回后立即关闭，
+    即使它晚一步拿到了锁也随 fd 一起释放，不会留下没人持有的锁。
+    """
+
+    def __init__(self, lock_path: Path, *, timeout_sec: float = 8.0) -> None:
+        self.lock_path = lock_path
+        self.timeout_sec = max(0.2, float(timeout_sec))
+        self._fd: int | None = None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    async def __aenter__(self) -> "AdvisoryFileLock":
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.lock_path), os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            locked = self._try_lock(fd)
+        except BaseException:
+            os.close(fd)
+            raise
+        if not locked:
+            waiter = _lock_executor(self.lock_path).submit(
+                fcntl.flock, fd, fcntl.LOCK_EX
+            )
+            try:
+                await asyncio.wait_for(
+                    asyncio.wrap_future(waiter), timeout=self.timeout_sec
+                )
+            except BaseException as exc:
+                # flock 可能还阻塞在锁线程里：不能现在关 fd（编号会被复用），
+                # 等它返回后再关，拿到的锁随之释放。
+                if waiter.cancel():
+                    os.close(fd)
+                else:
+                    waiter.add_done_callback(lambda _f: os.close(fd))
+                if isinstance(exc, asyncio.TimeoutError):
+                    raise TimeoutError(f"queue lock timeout: {self.lock_path}") from None
+                raise
+        self._fd = fd
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+        return False
+
+
+_LOCK_EXECUTORS: Dict[str, ThreadPoolExecutor] = {}
+_LOCK_EXECUTORS_GUARD = threading.Lock()
+
+
+def _lock_executor(lock_path: Path) -> ThreadPoolExecutor:
+    """One dedicated thread per lock file for contended ``flock`` waits."""
+    key = str(lock_path)
+    with _LOCK_EXECUTORS_GUARD:
+        executor = _LOCK_EXECUTORS.get(key)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="jsonl-flock"
+            )
+            _LOCK_EXECUTORS[key] = executor
+        return executor
+
+
+def table_lock(lock_path: Path, *, timeout_sec: float = 8.0):
+    if fcntl is not None:
+        return AdvisoryFileLock(lock_path, timeout_sec=timeout_sec)
+    return FileLock(lock_path, timeout_sec=timeout_sec)
+
+
+_SEGMENT_SUFFIX_RE = re.compile(r"^\.(\d{6,})$")
+
+
+_SEGMENT_HEAD_BYTES = 64
+
+
+@dataclass
+class _SegmentIndex:
+    key: tuple[int, int]
+    size: int = 0
+    mtime_ns: int = 0
+    head: bytes = b""
+    offsets: List[int] = field(default_factory=list)
+
+
+@dataclass
+class _TableState:
+    """Per-path state shared by every ``JsonlTable`` instance in this process."""
+
+    inproc_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    segments: Dict[tuple[int, int], _SegmentIndex] = field(default_factory=dict)
+    append_fd: int | None = None
+    append_inode: int = 0
+    unsynced_rows: int = 0
+    fsync_handle: asyncio.TimerHandle | None = None
+
+
+_TABLE_STATES: Dict[str, _TableState] = {}
+
+
+def _scan_offsets(data: bytes, base: int) -> tuple[List[int], int]:
+    """Return start offsets of complete lines in ``data`` and bytes consumed."""
+    offsets: List[int] = []
+    position = 0
+    while position < len(data):
+        end = data.find(b"\n", position)
+        if end < 0:
+            break
+        if data[position:end].strip():
+            offsets.append(base + position)
+        position = end + 1
+    return offsets, position
+
+
+def _decode_row(raw: bytes) -> Dict[str, Any] | None:
+    text = raw.decode("utf-8", errors="replace").strip()
+    if not text:
+        return None
+    try:
+        item = json.loads(text)
+    except Exception:
+        return None
+    return dict(item) if isinstance(item, dict) else None
+
+
 class JsonlTable:
-    def __init__(self, path: str) -> None:
+    """Segmented append-only JSONL table.
+
+    ``path`` 本身是当前活跃段（与旧版单文件格式完全兼容），写满
+    ``segment_max_bytes`` 后改名为 ``<path>.000001`` 这样的只读段。
+
+    - ``append``：``O_APPEND`` 单次写入，O(1)；fsync 按行数/时间批量合并。
+    - 读取：进程内维护每段的行偏移索引，活跃段被追加后只扫描新增字节；
+      ``read_from(position)`` 直接 seek 到第 position 行。
+    - 压缩：给了 ``retain`` 时，轮转后若只读段中不再需要保留的行数超过
+      ``compact_min_dead``，就重写只读段、丢弃这些行。
+    - 锁：优先使用 ``fcntl`` advisory lock 阻塞等待；无 ``fcntl`` 的平台
+      回退到 ``FileLock``。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        segment_max_bytes: int = 4 * 1024 * 1024,
+        fsync_batch_rows: int = 64,
+        fsync_interval_sec: float = 0.2,
+        retain: Callable[[Dict[str, Any]], bool] | None = None,
+        compact_min_dead: int = 1000,
+    ) -> None:
         self.path = Path(str(path or "")).expanduser().resolve()
         self.path.parent.mkdir(parents=True, exist_ok=True)
         self.lock_path = self.path.with_suffix(self.path.suffix + ".lock")
-        self._inproc_lock = asyncio.Lock()
+        self.segment_max_bytes = max(1024, int(segment_max_bytes))
+        self.fsync_batch_rows = max(1, int(fsync_batch_rows))
+        self.fsync_interval_sec = max(0.0, float(fsync_interval_sec))
+        self.retain = retain
+        self.compact_min_dead = max(1, int(compact_min_dead))
+        key = str(self.path)
+        state = _TABLE_STATES.get(key)
+        if state is None:
+            state = _TableState()
+            _TABLE_STATES[key] = state
+        self._state = state
 
-    def _read_all_unlocked(self) -> List[Dict[str, Any]]:
-        if not self.path.exists():
+    @property
+    def _inproc_lock(self) -> asyncio.Lock:
+        return self._state.inproc_lock
+
+    def locked(self) -> "_TableLock":
+        """Hold both the in-process and the cross-process lock of this table."""
+        return _TableLock(self)
+
+    # -- segment layout -------------------------------------------------
+
+    def _sealed_segments(self) -> List[Path]:
+        prefix = self.path.name
+        numbered: List[tuple[int, Path]] = []
+        for candidate in self.path.parent.glob(f"{prefix}.*"):
+            match = _SEGMENT_SUFFIX_RE.match(candidate.name[len(prefix) :])
+            if match and candidate.is_file():
+                numbered.append((int(match.group(1)), candidate))
+        numbered.sort()
+        return [item[1] for item in numbered]
+
+    def _segment_paths(self) -> List[Path]:
+        paths = self._sealed_segments()
+        if self.path.exists():
+            paths.append(self.path)
+        return paths
+
+    def _index_segment(self, path: Path) -> _SegmentIndex | None:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        key = (stat.st_dev, stat.st_ino)
+        index = self._state.segments.get(key)
+        if index is not None and not self._index_matches(path, index, stat):
+            index = None
+        if index is None:
+            index = _SegmentIndex(key=key)
+            self._state.segments[key] = index
+        if index.size < stat.st_size:
+            with path.open("rb") as handle:
+                handle.seek(index.size)
+                chunk = handle.read(stat.st_size - index.size)
+            if not index.size:
+                index.head = chunk[:_SEGMENT_HEAD_BYTES]
+            offsets, consumed = _scan_offsets(chunk, index.size)
+            index.offsets.extend(offsets)
+            index.size += consumed
+        index.mtime_ns = stat.st_mtime_ns
+        return index
+
+    @staticmethod
+    def _index_matches(path: Path, index: _SegmentIndex, stat: os.stat_result) -> bool:
+        """Whether a cached index still describes the file behind ``stat``.
+
+        inode 会被复用：段被删掉后新建的文件可能拿到同一个 inode。大小和
+        mtime 都没变才算原样；文件变大时还要求 mtime 不倒退、开头字节一致，
+        否则当成新文件重新建索引。
+        """
+        if stat.st_size < index.size or stat.st_mtime_ns < index.mtime_ns:
+            return False
+        if stat.st_size == index.size:
+            return stat.st_mtime_ns == index.mtime_ns or not index.size
+        if not index.size:
+            return True
+        try:
+            with path.open("rb") as handle:
+                head = handle.read(len(index.head))
+        except OSError:
+            return False
+        return head == index.head
+
+    def _refresh_index(self) -> List[tuple[Path, _SegmentIndex]]:
+        indexed: List[tuple[Path, _SegmentIndex]] = []
+        live: set[tuple[int, int]] = set()
+        for path in self._segment_paths():
+            index = self._index_segment(path)
+            if index is None:
+                continue
+            live.add(index.key)
+            indexed.append((path, index))
+        for key in list(self._state.segments):
+            if key not in live:
+                self._state.segments.pop(key, None)
+        return indexed
+
+    # -- unlocked primitives (caller holds ``locked()``) ---------------
+
+    def _read_segment(self, path: Path, index: _SegmentIndex, start: int = 0) -> List[Dict[str, Any]]:
+        if start >= len(index.offsets):
             return []
         rows: List[Dict[str, Any]] = []
+        with path.open("rb") as handle:
+            handle.seek(index.offsets[start])
+            data = handle.read(index.size - index.offsets[start])
+        for line in data.split(b"\n"):
+            row = _decode_row(line)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def _read_all_unlocked(self) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
         try:
-            with self.path.open("r", encoding="utf-8") as f:
-                for line in f:
-                    raw = str(line or "").strip()
-                    if not raw:
-                        continue
-                    try:
-                        item = json.loads(raw)
-                    except Exception:
-                        continue
-                    if isinstance(item, dict):
-                        rows.append(dict(item))
+            for path, index in self._refresh_index():
+                rows.extend(self._read_segment(path, index))
         except Exception:
             return []
         return rows
 
+    def _read_from_unlocked(self, position: int) -> List[Dict[str, Any]]:
+        remaining = max(0, int(position))
+        rows: List[Dict[str, Any]] = []
+        for path, index in self._refresh_index():
+            count = len(index.offsets)
+            if remaining >= count:
+                remaining -= count
+                continue
+            rows.extend(self._read_segment(path, index, remaining))
+            remaining = 0
+        return rows
+
+    def _count_unlocked(self) -> int:
+        return sum(len(index.offsets) for _, index in self._refresh_index())
+
+    def _close_append_fd(self) -> None:
+        state = self._state
+        if state.append_fd is None:
+            return
+        fd, state.append_fd = state.append_fd, None
+        try:
+            if state.unsynced_rows:
+                os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            state.unsynced_rows = 0
+            os.close(fd)
+
+    def _append_fd(self) -> int:
+        state = self._state
+        if state.append_fd is not None:
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = -1
+            if current == state.append_inode:
+                return state.append_fd
+            self._close_append_fd()
+        fd = os.open(str(self.path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        state.append_fd = fd
+        state.append_inode = os.fstat(fd).st_ino
+        return fd
+
+    def _fsync_pending(self) -> None:
+        state = self._state
+        state.fsync_handle = None
+        if state.append_fd is None or not state.unsynced_rows:
+            return
+        try:
+            os.fsync(state.append_fd)
+        except OSError:
+            pass
+        state.unsynced_rows = 0
+
+    def _schedule_fsync(self) -> None:
+        state = self._state
+        if state.unsynced_rows >= self.fsync_batch_rows or self.fsync_interval_sec <= 0:
+            self._fsync_pending()
+            return
+        if state.fsync_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._fsync_pending()
+            return
+        state.fsync_handle = loop.call_later(self.fsync_interval_sec, self._fsync_pending)
+
+    def _append_unlocked(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        payload = "".join(
+            json.dumps(dict(row or {}), ensure_ascii=False) + "\n" for row in rows
+        ).encode("utf-8")
+        fd = self._append_fd()
+        written = 0
+        while written < len(payload):
+            written += os.write(fd, payload[written:])
+        self._state.unsynced_rows += len(rows)
+        self._schedule_fsync()
+        if os.fstat(fd).st_size >= self.segment_max_bytes:
+            self._rotate_unlocked()
+
+    def _rotate_unlocked(self) -> None:
+        self._close_append_fd()
+        sealed = self._sealed_segments()
+        next_number = 1
+        if sealed:
+            next_number = int(sealed[-1].name[len(self.path.name) + 1 :]) + 1
+        target = self.path.with_name(f"{self.path.name}.{next_number:06d}")
+        os.replace(self.path, target)
+        self._maybe_compact_unlocked()
+
+    def _maybe_compact_unlocked(self) -> None:
+        if self.retain is None:
+            return
+        sealed = self._sealed_segments()
+        plans: List[tuple[Path, List[Dict[str, Any]], int]] = []
+        dead_total = 0
+        for path in sealed:
+            index = self._index_segment(path)
+            if index is None:
+                continue
+            rows = self._read_segment(path, index)
+            kept = [row for row in rows if self.retain(row)]
+            dead_total += len(rows) - len(kept)
+            plans.append((path, kept, len(rows) - len(kept)))
+        if dead_total < self.compact_min_dead:
+            return
+        self._state.segments.clear()
+        for path, kept, dead in plans:
+            if not dead:
+                continue
+            if not kept:
+                path.unlink(missing_ok=True)
+                continue
+            tmp = path.with_name(path.name + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                for row in kept:
+                    f.write(json.dumps(row, ensure_ascii=False))
+                    f.write("\n")
+                f.flush()
+                os.fsync(f.fileno())
+            tmp.replace(path)
+
     def _write_all_unlocked(self, rows: List[Dict[str, Any]]) -> None:
+        self._close_append_fd()
+        self._state.segments.clear()
         tmp = self.path.with_suffix(self.path.suffix + ".tmp")
         with tmp.open("w", encoding="utf-8") as f:
             for row in rows:
                 f.write(json.dumps(dict(row or {}), ensure_ascii=False))
                 f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
         tmp.replace(self.path)
+        for sealed in self._sealed_segments():
+            sealed.unlink(missing_ok=True)
+
+    # -- public API -----------------------------------------------------
 
     async def read_all(self) -> List[Dict[str, Any]]:
-        async with self._inproc_lock:
-            async with FileLock(self.lock_path):
-                return self._read_all_unlocked()
+        async with self.locked():
+            return self._read_all_unlocked()
+
+    async def read_from(self, position: int) -> List[Dict[str, Any]]:
+        """Return rows starting at logical row ``position`` (0-based)."""
+        async with self.locked():
+            return self._read_from_unlocked(position)
+
+    async def count(self) -> int:
+        async with self.locked():
+            return self._count_unlocked()
 
     async def write_all(self, rows: List[Dict[str, Any]]) -> None:
-        async with self._inproc_lock:
-            async with FileLock(self.lock_path):
-                self._write_all_unlocked(rows)
+        async with self.locked():
+            self._write_all_unlocked(rows)
 
     async def append(self, row: Dict[str, Any]) -> None:
-        async with self._inproc_lock:
-            async with FileLock(self.lock_path):
-                rows = self._read_all_unlocked()
-                rows.append(dict(row or {}))
-                self._write_all_unlocked(rows)
+        async with self.locked():
+            self._append_unlocked([dict(row or {})])
+
+    async def append_many(self, rows: List[Dict[str, Any]]) -> None:
+        async with self.locked():
+            self._append_unlocked([dict(row or {}) for row in rows])
+
+    async def flush(self) -> None:
+        async with self.locked():
+            if self._state.fsync_handle is not None:
+                self._state.fsync_handle.cancel()
+            self._fsync_pending()
+
+
+class _TableLock:
+    def __init__(self, table: JsonlTable) -> None:
+        self._table = table
+        self._file_lock = None
+
+    async def __aenter__(self) -> JsonlTable:
+        await self._table._inproc_lock.acquire()
+        try:
+            self._file_lock = table_lock(self._table.lock_path)
+            await self._file_lock.__aenter__()
+        except BaseException:
+            self._table._inproc_lock.release()
+            raise
+        return self._table
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        try:
+            if self._file_lock is not None:
+                await self._file_lock.__aexit__(exc_type, exc, tb)
+        finally:
+            self._file_lock = None
+            self._table._inproc_lock.release()
+        return False
@@ -10,6 +10,7 @@ from typing import Any, Literal, TYPE_CHECKING
 from core.channel_runtime_store import channel_runtime_store
 from core.state_store import (
     save_message,
+    count_session_messages,
     get_session_messages,
     get_session_entries,
     get_latest_session_id,
@@ -17,6 +18,9 @@ from core.state_store import (
 )
 from core.long_term_memory import long_term_memory
 from core.llm_usage_store import set_current_llm_usage_session_id
+from core.context_budget import history_token_budget
+from core.model_config import get_configured_model
+from core.token_estimator import estimate_tokens
 from services.session_compaction_service import (
     SESSION_MEMORY_PREFIX,
     SESSION_SUMMARY_PREFIX,
@@ -135,10 +139,18 @@ async def get_user_context(
     limit: int = 100,
     include_hidden_system: bool = True,
     auto_compact: bool = True,
+    max_history_tokens: int | None = None,
 ) -> list[dict]:
     """
     获取用户的对话上下文 (Async)
 
+    已压缩的会话返回：记忆种子 + 滚动摘要 + 高水位之后的原始消息。
+    原始消息除了 ``limit`` 条数上限，还按 ``max_history_tokens``（默认取主模型
+    ``contextWindow`` 推算的历史预算，见 ``history_token_budget``）从新到旧截取，
+    小窗口模型不会先读进一大段历史再被 ``fit_chat_request`` 整组丢弃。
+    ``auto_compact`` 时若未压缩部分超过阈值，会在后台安排一次增量压缩，
+    本轮不等待其完成。
+
     Returns:
         对话历史列表，格式符合当前对话模型输入要求
     """
@@ -146,20 +158,55 @@ async def get_user_context(
     if include_hidden_system:
         await _ensure_session_memory_seed(context, user_id, session_id)
     await _reconcile_sparse_session_history(str(user_id), session_id)
-    if auto_compact:
-        await session_compaction_service.compact_session(
-            user_id=str(user_id),
-            session_id=session_id,
-            force=False,
-        )
-    return await get_session_messages(
+
+    # 高水位之前的消息已并入滚动摘要，只取之后的原始消息。
+    dialog_count = await count_session_messages(user_id, session_id)
+    # 与压缩任务同一套边界校验：会话文件被整体替换后高水位作废。
+    state = await session_compaction_service.validated_state(
+        str(user_id), session_id, dialog_count
+    )
+    summarized = state.summarized_rows
+    summary = state.summary if summarized else ""
+    pending_rows = dialog_count - summarized
+    if max_history_tokens is None:
+        max_history_tokens = history_token_budget(get_configured_model("primary"))
+    history_tokens = max(1, int(max_history_tokens) - estimate_tokens(summary))
+    history = await get_session_messages(
         user_id,
         session_id,
-        limit=limit,
+        limit=max(1, min(int(limit), pending_rows)),
+        max_tokens=history_tokens,
         include_system=include_hidden_system,
-        preserve_system_prefixes=(SESSION_MEMORY_PREFIX, SESSION_SUMMARY_PREFIX),
-        preserve_system_limit=2,
+        preserve_system_prefixes=(
+            (SESSION_MEMORY_PREFIX,)
+            if summary
+            else (SESSION_MEMORY_PREFIX, SESSION_SUMMARY_PREFIX)
+        ),
+        preserve_system_limit=1 if summary else 2,
     )
+    if summary and include_hidden_system:
+        system_count = sum(1 for item in history if item.get("role") == "system")
+        history.insert(system_count, {"role": "system", "parts": [{"text": summary}]})
+
+    if auto_compact:
+        dialog = [item for item in history if item.get("role") != "system"]
+        pending_tokens = sum(
+            estimate_tokens(part.get("text"))
+            for item in dialog
+            for part in item.get("parts") or []
+        )
+        if len(dialog) < min(int(limit), pending_rows):
+            # 历史已被 token 预算截断：只统计读进来的部分永远到不了阈值，
+            # 未压缩部分的真实大小至少超过了预算。
+            pending_tokens = max(pending_tokens, history_tokens + 1)
+        session_compaction_service.maybe_schedule(
+            user_id=str(user_id),
+            session_id=session_id,
+            pending_rows=pending_rows,
+            pending_tokens=pending_tokens,
+            token_limit=history_tokens,
+        )
+    return history
 
 
 async def add_message(
@@ -203,15 +250,9 @@ async def _reconcile_sparse_session_history(user_id: str, session_id: str) -> No
     if not safe_user_id or not safe_session_id:
         return
 
-    existing_rows = await get_session_entries(safe_user_id, safe_session_id)
-    visible_rows = [
-        row
-        for row in existing_rows
-        if str(row.get("role") or "").strip().lower() in {"user", "model"}
-        and str(row.get("content") or "").strip()
-    ]
-    if len(visible_rows) > 1:
+    if await count_session_messages(safe_user_id, safe_session_id) > 1:
         return
+    existing_rows = await get_session_entries(safe_user_id, safe_session_id)
 
     try:
         from core.task_inbox import task_inbox
@@ -375,10 +416,9 @@ async def _ensure_session_memory_seed(
 ) -> None:
     if not _is_private_session_context(context):
         return
-    existing_rows = await get_session_entries(user_id, session_id)
+    existing_rows = await get_session_entries(user_id, session_id, role="system")
     if any(
-        str(item.get("role") or "").strip().lower() == "system"
-        and str(item.get("content") or "").startswith(SESSION_MEMORY_PREFIX)
+        str(item.get("content") or "").startswith(SESSION_MEMORY_PREFIX)
         for item in existing_rows
     ):
         return
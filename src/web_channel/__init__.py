@@ -8,6 +8,7 @@ from .store import (
     ensure_session_projection,
     fail_inbound_event,
     get_file_record,
+    get_inbound_queue_metrics,
     get_session_messages,
     get_session_projection,
     infer_message_type,
@@ -16,7 +17,9 @@ from .store import (
     load_file_bytes,
     register_artifact_file,
     register_upload_file,
+    subscribe_outbound_events,
     upsert_session_message,
+    watch_inbound_events,
 )
 
 __all__ = [
@@ -29,6 +32,7 @@ __all__ = [
     "ensure_session_projection",
     "fail_inbound_event",
     "get_file_record",
+    "get_inbound_queue_metrics",
     "get_session_messages",
     "get_session_projection",
     "infer_message_type",
@@ -37,5 +41,7 @@ __all__ = [
     "load_file_bytes",
     "register_artifact_file",
     "register_upload_file",
+    "subscribe_outbound_events",
     "upsert_session_message",
+    "watch_inbound_events",
 ]
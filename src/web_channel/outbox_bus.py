@@ -0,0 +1,309 @@
+"""Push notifications for the per-user web outbox.
+
+``session_stream`` 不再每秒把整个 outbox JSONL 读一遍，而是挂在这里等唤醒：
+
+- 每个用户一个 ``_OutboxFeed``，维护 ``seq -> 行号`` 的进程内索引，并缓存
+  最近 ``recent_rows`` 条事件；``after_seq`` 续传先二分定位行号，落在缓存里
+  就直接从内存返回，否则用 ``JsonlTable.read_from`` 从对应行开始读。
+- 订阅者只持有一个 ``asyncio.Event`` 和自己的游标，唤醒后按自己的节奏拉取
+  （每批最多 ``limit`` 条），慢连接不会堆积内存，也不会阻塞写入方。
+- 跨进程：每个监听进程在 ``notify_dir`` 下绑定一个 Unix datagram socket，
+  写入方追加事件后给其它进程的 socket 发一个 outbox 文件名即可。平台不支持
+  ``AF_UNIX`` 或 socket 路径过长时，订阅者退化为每 ``fallback_poll_sec``
+  增量同步一次（只 stat + 读新增字节）。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+from bisect import bisect_right
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List
+from uuid import uuid4
+
+from shared.queue.jsonl_queue import JsonlTable
+
+logger = logging.getLogger(__name__)
+
+_SOCKET_SUFFIX = ".sock"
+# sockaddr_un.sun_path 在 Linux 上是 108 字节（含结尾 NUL）。
+_MAX_SOCKET_PATH = 107
+
+
+def _row_seq(row: Dict[str, Any]) -> int:
+    try:
+        return int(row.get("seq") or 0)
+    except Exception:
+        return 0
+
+
+def _session_matches(row: Dict[str, Any], session_id: str) -> bool:
+    if not session_id:
+        return True
+    return str(row.get("session_id") or "").strip() in {"", session_id}
+
+
+def _socket_is_stale(path: Path) -> bool:
+    """Only a refused/missing peer proves the socket file is left over."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        probe.connect(str(path))
+    except (ConnectionRefusedError, FileNotFoundError):
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+    return False
+
+
+class _OutboxFeed:
+    def __init__(self, table: JsonlTable, *, recent_rows: int) -> None:
+        self.table = table
+        self.seqs: List[int] = []
+        self.recent: deque[Dict[str, Any]] = deque(maxlen=max(1, int(recent_rows)))
+        self.waiters: set[asyncio.Event] = set()
+        self._sync_lock = asyncio.Lock()
+
+    def wake(self) -> None:
+        for waiter in list(self.waiters):
+            waiter.set()
+
+    async def sync(self) -> None:
+        """Index rows appended since the last sync (by this or another process)."""
+        async with self._sync_lock:
+            async with self.table.locked():
+                count = self.table._count_unlocked()
+                if count < len(self.seqs):
+                    self.seqs.clear()
+                    self.recent.clear()
+                rows = (
+                    self.table._read_from_unlocked(len(self.seqs))
+                    if count > len(self.seqs)
+                    else []
+                )
+            last = self.seqs[-1] if self.seqs else 0
+            for row in rows:
+                last = max(last, _row_seq(row))
+                self.seqs.append(last)
+                self.recent.append(row)
+
+    async def read_after(
+        self,
+        after_seq: int,
+        *,
+        session_id: str = "",
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        await self.sync()
+        position = bisect_right(self.seqs, int(after_seq or 0))
+        cached_from = len(self.seqs) - len(self.recent)
+        if position >= cached_from:
+            candidates = list(self.recent)[position - cached_from :]
+        else:
+            candidates = await self.table.read_from(position)
+        output: List[Dict[str, Any]] = []
+        for row in candidates:
+            if _row_seq(row) <= int(after_seq or 0):
+                continue
+            if not _session_matches(row, session_id):
+                continue
+            output.append(dict(row))
+            if len(output) >= max(1, int(limit)):
+                break
+        return output
+
+
+class OutboxSubscription:
+    def __init__(self, bus: "OutboxBus", feed: _OutboxFeed) -> None:
+        self._bus = bus
+        self._feed = feed
+        self._event = asyncio.Event()
+
+    def clear(self) -> None:
+        """Drop a pending wakeup; call before re-checking the table."""
+        self._event.clear()
+
+    async def read_after(
+        self,
+        after_seq: int,
+        *,
+        session_id: str = "",
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        # 先清信号再读：读的过程中到达的新事件会重新置位，不会丢唤醒。
+        self.clear()
+        return await self._feed.read_after(
+            after_seq, session_id=session_id, limit=limit
+        )
+
+    async def wait(self, timeout: float | None = None) -> bool:
+        """Wait for new rows; ``False`` on timeout.
+
+        没有跨进程通知通道时，超时上限收紧到 ``fallback_poll_sec``。
+        """
+        if not self._bus.listening:
+            limit = self._bus.fallback_poll_sec
+            timeout = limit if timeout is None else min(float(timeout), limit)
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class OutboxBus:
+    def __init__(
+        self,
+        notify_dir: Path,
+        *,
+        name: str | None = None,
+        recent_rows: int = 256,
+        fallback_poll_sec: float = 1.0,
+    ) -> None:
+        self.notify_dir = Path(notify_dir)
+        # docker 里 api / core 两个容器都是 PID 1 且共享 /app/data，单用 pid 会撞名。
+        self.name = str(name or f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}")
+        self.recent_rows = max(1, int(recent_rows))
+        self.fallback_poll_sec = max(0.05, float(fallback_poll_sec))
+        self._feeds: Dict[str, _OutboxFeed] = {}
+        self._listen_sock: socket.socket | None = None
+        self._listen_loop: asyncio.AbstractEventLoop | None = None
+        self._send_sock: socket.socket | None = None
+        self._peers: List[Path] = []
+        self._peers_mtime_ns = -1
+
+    @property
+    def listening(self) -> bool:
+        return self._listen_sock is not None
+
+    @property
+    def socket_path(self) -> Path:
+        return self.notify_dir / f"{self.name}{_SOCKET_SUFFIX}"
+
+    def feed(self, table: JsonlTable) -> _OutboxFeed:
+        key = str(table.path)
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = _OutboxFeed(table, recent_rows=self.recent_rows)
+            self._feeds[key] = feed
+        return feed
+
+    @asynccontextmanager
+    async def subscribe(self, table: JsonlTable) -> AsyncIterator[OutboxSubscription]:
+        self._ensure_listening()
+        feed = self.feed(table)
+        subscription = OutboxSubscription(self, feed)
+        feed.waiters.add(subscription._event)
+        try:
+            yield subscription
+        finally:
+            feed.waiters.discard(subscription._event)
+
+    def publish(self, table: JsonlTable) -> None:
+        """Announce rows appended to ``table`` to local and remote subscribers."""
+        feed = self._feeds.get(str(table.path))
+        if feed is not None:
+            feed.wake()
+        self._broadcast(table.path.name)
+
+    # -- cross-process notification ------------------------------------
+
+    def _ensure_listening(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._listen_sock is not None and self._listen_loop is loop:
+            return
+        self.close()
+        if not hasattr(socket, "AF_UNIX"):
+            return
+        path = self.socket_path
+        if len(os.fsencode(str(path))) > _MAX_SOCKET_PATH:
+            logger.info("Outbox notify socket path too long, falling back to polling: %s", path)
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            self.notify_dir.mkdir(parents=True, exist_ok=True)
+            if path.exists():
+                if not _socket_is_stale(path):
+                    raise OSError(f"notify socket in use by another listener: {path}")
+                path.unlink(missing_ok=True)
+            sock.setblocking(False)
+            sock.bind(str(path))
+            loop.add_reader(sock.fileno(), self._on_readable)
+        except Exception as exc:
+            sock.close()
+            logger.warning("Outbox notify socket unavailable, falling back to polling: %s", exc)
+            return
+        self._listen_sock = sock
+        self._listen_loop = loop
+
+    def _on_readable(self) -> None:
+        sock = self._listen_sock
+        if sock is None:
+            return
+        names: set[str] = set()
+        while True:
+            try:
+                data = sock.recv(512)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            names.add(data.decode("utf-8", errors="ignore"))
+        for feed in self._feeds.values():
+            if feed.table.path.name in names:
+                feed.wake()
+
+    def _peer_paths(self) -> List[Path]:
+        try:
+            mtime_ns = self.notify_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if mtime_ns != self._peers_mtime_ns:
+            own = self.socket_path.name
+            self._peers = [
+                path
+                for path in self.notify_dir.glob(f"*{_SOCKET_SUFFIX}")
+                if path.name != own
+            ]
+            self._peers_mtime_ns = mtime_ns
+        return self._peers
+
+    def _broadcast(self, name: str) -> None:
+        peers = self._peer_paths()
+        if not peers or not hasattr(socket, "AF_UNIX"):
+            return
+        if self._send_sock is None:
+            self._send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._send_sock.setblocking(False)
+        payload = name.encode("utf-8")
+        for peer in peers:
+            try:
+                self._send_sock.sendto(payload, str(peer))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # 监听进程已退出，清掉残留 socket 文件。
+                peer.unlink(missing_ok=True)
+            except OSError:
+                # 对端缓冲区满：它已有待处理的唤醒，同步时会一并读到。
+                continue
+
+    def close(self) -> None:
+        sock, self._listen_sock = self._listen_sock, None
+        loop, self._listen_loop = self._listen_loop, None
+        if sock is None:
+            return
+        try:
+            if loop is not None and not loop.is_closed():
+                loop.remove_reader(sock.fileno())
+        except Exception:
+            pass
+        sock.close()
+        self.socket_path.unlink(missing_ok=True)
@@ -5,6 +5,7 @@ import json
 import mimetypes
 import os
 import shutil
+import time
 import uuid
 from datetime import datetime
 from pathlib import Path
@@ -14,6 +15,7 @@ from core.config import DATA_DIR
 from core.state_store import create_chat_session, list_chat_sessions
 from core.platform.models import MessageType
 from shared.queue.jsonl_queue import FileLock, JsonlTable
+from web_channel.outbox_bus import OutboxBus
 
 
 WEB_CHANNEL_ROOT = (Path(DATA_DIR) / "web_channel").resolve()
@@ -23,7 +25,15 @@ WEB_CHANNEL_UPLOADS_DIR = (WEB_CHANNEL_ROOT / "uploads").resolve()
 WEB_CHANNEL_ARTIFACTS_DIR = (WEB_CHANNEL_ROOT / "artifacts").resolve()
 WEB_CHANNEL_FILES_DIR = (WEB_CHANNEL_ROOT / "files").resolve()
 WEB_CHANNEL_SESSIONS_DIR = (WEB_CHANNEL_ROOT / "sessions").resolve()
+# inbox 事件行只追加、不再改写：claim 推进 cursor.json 里的行号游标，ack 追加到
+# acks.jsonl。已全部 claim 且全部 ack（或超过保留期）的只读段整段删除。
 WEB_CHANNEL_INBOX_TABLE = JsonlTable(str((WEB_CHANNEL_INBOX_DIR / "events.jsonl").resolve()))
+WEB_CHANNEL_INBOX_ACKS_TABLE = JsonlTable(str((WEB_CHANNEL_INBOX_DIR / "acks.jsonl").resolve()))
+WEB_CHANNEL_INBOX_CURSOR_PATH = (WEB_CHANNEL_INBOX_DIR / "cursor.json").resolve()
+WEB_CHANNEL_INBOX_BUS = OutboxBus(WEB_CHANNEL_INBOX_DIR / ".notify")
+WEB_CHANNEL_OUTBOX_BUS = OutboxBus(WEB_CHANNEL_OUTBOX_DIR / ".notify")
+_INBOX_RETENTION_SEC = 24 * 3600
+_CLAIM_LATENCY_EWMA_ALPHA = 0.2
 
 
 for directory in (
@@ -250,55 +260,183 @@ async def load_file_bytes(file_id: str) -> bytes:
     return path.read_bytes()
 
 
+def _inbox_cursor_default() -> dict[str, Any]:
+    return {
+        "position": 0,
+        "claimed_total": 0,
+        "acked_compacted": 0,
+        "claim_latency_ms": {"last": 0.0, "avg": 0.0, "max": 0.0},
+        "updated_at": "",
+    }
+
+
+def _read_inbox_cursor() -> dict[str, Any]:
+    cursor = _inbox_cursor_default()
+    try:
+        loaded = json.loads(WEB_CHANNEL_INBOX_CURSOR_PATH.read_text(encoding="utf-8"))
+    except Exception:
+        return cursor
+    if isinstance(loaded, dict):
+        cursor.update(loaded)
+    return cursor
+
+
+def _write_inbox_cursor(cursor: dict[str, Any]) -> None:
+    cursor["updated_at"] = now_iso()
+    tmp = WEB_CHANNEL_INBOX_CURSOR_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(cursor, ensure_ascii=False) + "\n", encoding="utf-8")
+    tmp.replace(WEB_CHANNEL_INBOX_CURSOR_PATH)
+
+
+def _record_claim_latency(cursor: dict[str, Any], rows: list[dict[str, Any]], claimed_ts: float) -> None:
+    stats = dict(cursor.get("claim_latency_ms") or {})
+    avg = float(stats.get("avg") or 0.0)
+    peak = float(stats.get("max") or 0.0)
+    last = float(stats.get("last") or 0.0)
+    for row in rows:
+        try:
+            enqueued_ts = float(row.get("enqueued_ts") or 0.0)
+        except Exception:
+            enqueued_ts = 0.0
+        if enqueued_ts <= 0:
+            continue
+        last = max(0.0, (claimed_ts - enqueued_ts) * 1000)
+        avg = last if not avg else avg + _CLAIM_LATENCY_EWMA_ALPHA * (last - avg)
+        peak = max(peak, last)
+    cursor["claim_latency_ms"] = {
+        "last": round(last, 3),
+        "avg": round(avg, 3),
+        "max": round(peak, 3),
+    }
+
+
+async def _compact_inbox_unlocked(cursor: dict[str, Any]) -> bool:
+    """Drop sealed inbox segments that are fully claimed and settled.
+
+    调用方持有 inbox 表锁。只从最老的段开始连续删除，删掉多少行就把游标
+    前移多少行；随后把 acks.jsonl 里已无对应事件的记录一并清掉。acks 表
+    另有写入方（``ack_inbound_event``），读和改写都要在它自己的表锁内进行，
+    加锁顺序固定为 inbox -> acks。
+    """
+    table = WEB_CHANNEL_INBOX_TABLE
+    sealed = table._sealed_segments()
+    if not sealed:
+        return False
+    acked: set[str] | None = None
+    position = int(cursor.get("position") or 0)
+    dropped = 0
+    for path in sealed:
+        index = table._index_segment(path)
+        if index is None:
+            continue
+        count = len(index.offsets)
+        if position - dropped < count:
+            break
+        expired = time.time() - path.stat().st_mtime >= _INBOX_RETENTION_SEC
+        if not expired:
+            if acked is None:
+                acked = {
+                    _safe_text(row.get("id"))
+                    for row in await WEB_CHANNEL_INBOX_ACKS_TABLE.read_all()
+                }
+            rows = table._read_segment(path, index)
+            if any(
+                _safe_text(row.get("status")).lower() == "pending"
+                and _safe_text(row.get("id")) not in acked
+                for row in rows
+            ):
+                break
+        path.unlink(missing_ok=True)
+        dropped += count
+    if not dropped:
+        return False
+    cursor["position"] = position - dropped
+    live_ids = {_safe_text(row.get("id")) for row in table._read_all_unlocked()}
+    async with WEB_CHANNEL_INBOX_ACKS_TABLE.locked():
+        acks = WEB_CHANNEL_INBOX_ACKS_TABLE._read_all_unlocked()
+        kept = [row for row in acks if _safe_text(row.get("id")) in live_ids]
+        if len(kept) < len(acks):
+            WEB_CHANNEL_INBOX_ACKS_TABLE._write_all_unlocked(kept)
+    if len(kept) < len(acks):
+        cursor["acked_compacted"] = int(cursor.get("acked_compacted") or 0) + len(acks) - len(kept)
+    return True
+
+
 async def enqueue_inbound_event(payload: dict[str, Any]) -> dict[str, Any]:
     normalized = {
         "id": uuid.uuid4().hex,
         "status": "pending",
         "created_at": now_iso(),
+        "enqueued_ts": time.time(),
         "claimed_at": "",
         "processed_at": "",
         **dict(payload or {}),
     }
     await WEB_CHANNEL_INBOX_TABLE.append(normalized)
+    WEB_CHANNEL_INBOX_BUS.publish(WEB_CHANNEL_INBOX_TABLE)
     return normalized
 
 
+def watch_inbound_events():
+    """Async context manager yielding a subscription woken by ``enqueue_inbound_event``.
+
+    消费方用法：``clear()`` -> ``claim_inbound_events`` -> 为空时 ``wait(timeout)``。
+    """
+    return WEB_CHANNEL_INBOX_BUS.subscribe(WEB_CHANNEL_INBOX_TABLE)
+
+
 async def claim_inbound_events(*, limit: int = 20) -> list[dict[str, Any]]:
     claimed: list[dict[str, Any]] = []
     claim_time = now_iso()
-    async with WEB_CHANNEL_INBOX_TABLE._inproc_lock:
-        async with FileLock(WEB_CHANNEL_INBOX_TABLE.lock_path):
-            rows = WEB_CHANNEL_INBOX_TABLE._read_all_unlocked()
-            changed = False
-            for row in rows:
-                if len(claimed) >= max(1, int(limit)):
-                    break
-                if _safe_text(row.get("status")).lower() != "pending":
-                    continue
-                row["status"] = "claimed"
-                row["claimed_at"] = claim_time
-                claimed.append(dict(row))
-                changed = True
-            if changed:
-                WEB_CHANNEL_INBOX_TABLE._write_all_unlocked(rows)
+    async with WEB_CHANNEL_INBOX_TABLE.locked():
+        cursor = _read_inbox_cursor()
+        position = int(cursor.get("position") or 0)
+        start = position
+        for row in WEB_CHANNEL_INBOX_TABLE._read_from_unlocked(position):
+            if len(claimed) >= max(1, int(limit)):
+                break
+            position += 1
+            # 旧版本原地改写过的行（claimed/done/failed）直接跳过。
+            if _safe_text(row.get("status")).lower() != "pending":
+                continue
+            row["status"] = "claimed"
+            row["claimed_at"] = claim_time
+            claimed.append(dict(row))
+        if position != start:
+            cursor["position"] = position
+            cursor["claimed_total"] = int(cursor.get("claimed_total") or 0) + len(claimed)
+            _record_claim_latency(cursor, claimed, time.time())
+            await _compact_inbox_unlocked(cursor)
+            _write_inbox_cursor(cursor)
     return claimed
 
 
 async def ack_inbound_event(event_id: str, *, status: str = "done", error: str = "") -> None:
-    async with WEB_CHANNEL_INBOX_TABLE._inproc_lock:
-        async with FileLock(WEB_CHANNEL_INBOX_TABLE.lock_path):
-            rows = WEB_CHANNEL_INBOX_TABLE._read_all_unlocked()
-            changed = False
-            for row in rows:
-                if _safe_text(row.get("id")) != _safe_text(event_id):
-                    continue
-                row["status"] = _safe_text(status) or "done"
-                row["processed_at"] = now_iso()
-                row["error"] = _safe_text(error)
-                changed = True
-                break
-            if changed:
-                WEB_CHANNEL_INBOX_TABLE._write_all_unlocked(rows)
+    await WEB_CHANNEL_INBOX_ACKS_TABLE.append(
+        {
+            "id": _safe_text(event_id),
+            "status": _safe_text(status) or "done",
+            "processed_at": now_iso(),
+            "error": _safe_text(error),
+        }
+    )
+
+
+async def get_inbound_queue_metrics() -> dict[str, Any]:
+    async with WEB_CHANNEL_INBOX_TABLE.locked():
+        total = WEB_CHANNEL_INBOX_TABLE._count_unlocked()
+        cursor = _read_inbox_cursor()
+    acked = await WEB_CHANNEL_INBOX_ACKS_TABLE.count()
+    claimed_total = int(cursor.get("claimed_total") or 0)
+    acked_total = acked + int(cursor.get("acked_compacted") or 0)
+    return {
+        "depth": max(0, total - int(cursor.get("position") or 0)),
+        "in_flight": max(0, claimed_total - acked_total),
+        "claimed_total": claimed_total,
+        "acked_total": acked_total,
+        "claim_latency_ms": dict(cursor.get("claim_latency_ms") or {}),
+        "updated_at": _safe_text(cursor.get("updated_at")),
+    }
 
 
 async def fail_inbound_event(event_id: str, error: str) -> None:
@@ -313,20 +451,23 @@ async def append_outbound_event(
     payload: dict[str, Any],
 ) -> dict[str, Any]:
     table = _outbox_table(owner_user_id)
-    async with table._inproc_lock:
-        async with FileLock(table.lock_path):
-            existing = table._read_all_unlocked()
-            seq = len(existing) + 1
-            event = {
-                "seq": seq,
-                "id": uuid.uuid4().hex,
-                "session_id": _safe_text(session_id),
-                "type": _safe_text(event_type),
-                "created_at": now_iso(),
-                "payload": dict(payload or {}),
-            }
-            existing.append(event)
-            table._write_all_unlocked(existing)
+    async with table.locked():
+        count = table._count_unlocked()
+        last = table._read_from_unlocked(count - 1) if count else []
+        try:
+            seq = int((last[-1] if last else {}).get("seq") or count) + 1
+        except Exception:
+            seq = count + 1
+        event = {
+            "seq": seq,
+            "id": uuid.uuid4().hex,
+            "session_id": _safe_text(session_id),
+            "type": _safe_text(event_type),
+            "created_at": now_iso(),
+            "payload": dict(payload or {}),
+        }
+        table._append_unlocked([event])
+    WEB_CHANNEL_OUTBOX_BUS.publish(table)
     return event
 
 
@@ -337,23 +478,17 @@ async def list_outbound_events(
     session_id: str = "",
     limit: int = 100,
 ) -> list[dict[str, Any]]:
-    table = _outbox_table(owner_user_id)
-    rows = await table.read_all()
-    target_session_id = _safe_text(session_id)
-    output: list[dict[str, Any]] = []
-    for row in rows:
-        try:
-            seq = int(row.get("seq") or 0)
-        except Exception:
-            seq = 0
-        if seq <= int(after_seq or 0):
-            continue
-        if target_session_id and _safe_text(row.get("session_id")) not in {"", target_session_id}:
-            continue
-        output.append(dict(row))
-        if len(output) >= max(1, int(limit)):
-            break
-    return output
+    feed = WEB_CHANNEL_OUTBOX_BUS.feed(_outbox_table(owner_user_id))
+    return await feed.read_after(
+        int(after_seq or 0),
+        session_id=_safe_text(session_id),
+        limit=limit,
+    )
+
+
+def subscribe_outbound_events(owner_user_id: str):
+    """Async context manager yielding an ``OutboxSubscription`` for the user."""
+    return WEB_CHANNEL_OUTBOX_BUS.subscribe(_outbox_table(owner_user_id))
 
 
 async def ensure_session_projection(
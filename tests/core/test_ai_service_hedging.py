@@ -0,0 +1,175 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("LLM_API_KEY", "test-key")
+
+from services.ai_service import AiService, _race_hedged
+import services.ai_service as ai_service_module
+
+
+def _chunk(text: str):
+    return SimpleNamespace(
+        choices=[
+            SimpleNamespace(
+                delta=SimpleNamespace(content=text, tool_calls=None),
+                finish_reason=None,
+            )
+        ]
+    )
+
+
+class _SlowStream:
+    def __init__(self, text: str, first_token_delay: float):
+        self._chunks = [_chunk(text)]
+        self._delay = first_token_delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._delay:
+            await asyncio.sleep(self._delay)
+            self._delay = 0.0
+        if not self._chunks:
+            raise StopAsyncIteration
+        return self._chunks.pop(0)
+
+    async def aclose(self):
+        self.closed = True
+
+
+class _StreamCompletions:
+    def __init__(self, text: str, first_token_delay: float):
+        self.text = text
+        self.first_token_delay = first_token_delay
+        self.streams: list[_SlowStream] = []
+
+    async def create(self, **kwargs):
+        stream = _SlowStream(self.text, self.first_token_delay)
+        self.streams.append(stream)
+        return stream
+
+
+class _StreamClient:
+    def __init__(self, text: str, first_token_delay: float = 0.0):
+        self.chat = SimpleNamespace(
+            completions=_StreamCompletions(text, first_token_delay)
+        )
+
+
+def _patch_models(monkeypatch, clients: dict, *, hedge_delay):
+    monkeypatch.setattr(ai_service_module, "openai_async_client", None)
+    monkeypatch.setattr(
+        ai_service_module,
+        "_resolve_async_client",
+        lambda model_name: clients.get(str(model_name)),
+    )
+    monkeypatch.setattr(
+        ai_service_module,
+        "get_model_for_input",
+        lambda input_type, pool_type="primary": "demo/slow",
+    )
+    monkeypatch.setattr(
+        ai_service_module,
+        "get_model_candidates_for_input",
+        lambda *args, **kwargs: list(clients),
+    )
+    monkeypatch.setattr(
+        ai_service_module,
+        "get_model_hedge_delay",
+        lambda model_key, pool_type="primary": hedge_delay,
+    )
+    monkeypatch.setattr(
+        ai_service_module, "record_model_first_token", lambda *args: None
+    )
+    monkeypatch.setattr(ai_service_module, "record_model_latency", lambda *args: None)
+    failed: list[str] = []
+    succeeded: list[str] = []
+    monkeypatch.setattr(ai_service_module, "mark_model_failed", failed.append)
+    monkeypatch.setattr(ai_service_module, "mark_model_success", succeeded.append)
+    return failed, succeeded
+
+
+async def _collect(service: AiService) -> list[str]:
+    chunks = []
+    async for chunk in service.generate_response_stream(
+        message_history=[{"role": "user", "parts": [{"text": "你好"}]}],
+        tools=[{"name": "read", "description": "", "parameters": {"type": "object"}}],
+        system_instruction="test",
+    ):
+        chunks.append(chunk)
+    return chunks
+
+
+@pytest.mark.asyncio
+async def test_hedge_starts_backup_after_deadline_and_cancels_slow_primary(
+    monkeypatch,
+):
+    slow = _StreamClient("来自慢模型", first_token_delay=5.0)
+    fast = _StreamClient("来自备用模型")
+    failed, succeeded = _patch_models(
+        monkeypatch,
+        {"demo/slow": slow, "demo/fast": fast},
+        hedge_delay=0.05,
+    )
+
+    chunks = await asyncio.wait_for(_collect(AiService()), timeout=3.0)
+
+    assert chunks == ["来自备用模型"]
+    assert failed == []
+    assert succeeded == ["demo/fast"]
+    assert slow.chat.completions.streams[0].closed is True
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_when_primary_answers_before_deadline(monkeypatch):
+    primary = _StreamClient("来自主模型")
+    backup = _StreamClient("来自备用模型")
+    _failed, succeeded = _patch_models(
+        monkeypatch,
+        {"demo/slow": primary, "demo/fast": backup},
+        hedge_delay=1.0,
+    )
+
+    chunks = await _collect(AiService())
+
+    assert chunks == ["来自主模型"]
+    assert succeeded == ["demo/slow"]
+    assert backup.chat.completions.streams == []
+
+
+@pytest.mark.asyncio
+async def test_race_hedged_returns_primary_error_only_when_both_fail():
+    async def _fail(message: str, delay: float):
+        await asyncio.sleep(delay)
+        raise RuntimeError(message)
+
+    with pytest.raises(RuntimeError, match="primary"):
+        await _race_hedged(
+            _fail("primary", 0.05),
+            lambda: _fail("hedge", 0.0),
+            delay_sec=0.01,
+        )
+
+
+@pytest.mark.asyncio
+async def test_race_hedged_reports_primary_error_when_hedge_wins():
+    async def _fail():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("primary down")
+
+    async def _ok():
+        await asyncio.sleep(0.05)
+        return "hedge"
+
+    hedge_won, response, primary_error = await _race_hedged(
+        _fail(), _ok, delay_sec=0.01
+    )
+
+    assert hedge_won is True
+    assert response == "hedge"
+    assert isinstance(primary_error, RuntimeError)
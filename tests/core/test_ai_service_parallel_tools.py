@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("LLM_API_KEY", "test-key")
+
+from services.ai_service import AiService
+import services.ai_service as ai_service_module
+
+
+def _tool_response(calls: list[tuple[str, dict]]):
+    tool_calls = [
+        SimpleNamespace(
+            id=f"call-{index}",
+            function=SimpleNamespace(
+                name=name,
+                arguments=json.dumps(args, ensure_ascii=False),
+            ),
+        )
+        for index, (name, args) in enumerate(calls, start=1)
+    ]
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="", tool_calls=tool_calls))]
+    )
+
+
+def _text_response(text: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text, tool_calls=[]))]
+    )
+
+
+class _ScriptedCompletions:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.seen_messages = []
+
+    async def create(self, **kwargs):
+        self.seen_messages.append(list(kwargs.get("messages") or []))
+        return self.responses.pop(0)
+
+
+_TOOLS = [
+    {"name": "read", "description": "", "parameters": {"type": "object"}, "read_only": True},
+    {"name": "lookup", "description": "", "parameters": {"type": "object"}, "read_only": True},
+    {"name": "write", "description": "", "parameters": {"type": "object"}},
+]
+
+
+def _patch_client(monkeypatch, completions):
+    monkeypatch.setattr(
+        ai_service_module,
+        "openai_async_client",
+        SimpleNamespace(chat=SimpleNamespace(completions=completions)),
+    )
+    monkeypatch.setattr(
+        ai_service_module,
+        "get_model_candidates_for_input",
+        lambda *args, **kwargs: ["demo/model"],
+    )
+
+
+@pytest.mark.asyncio
+async def test_read_only_tool_calls_run_concurrently_and_keep_call_order(
+    monkeypatch,
+):
+    completions = _ScriptedCompletions(
+        [
+            _tool_response(
+                [
+                    ("read", {"path": "slow.txt", "delay": 0.2}),
+                    ("lookup", {"q": "x", "delay": 0.2}),
+                    ("read", {"path": "fast.txt", "delay": 0.0}),
+                    ("write", {"path": "out.txt", "delay": 0.0}),
+                ]
+            ),
+            _text_response("完成"),
+        ]
+    )
+    _patch_client(monkeypatch, completions)
+
+    running = {"now": 0, "peak": 0}
+    finished: list[str] = []
+
+    async def tool_executor(name, args):
+        if name == "write":
+            # 写类工具必须等前面的只读批次全部结束后才执行。
+            assert running["now"] == 0
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(float(args.get("delay") or 0))
+        running["now"] -= 1
+        finished.append(name)
+        return {"ok": True, "summary": f"{name}:{args.get('path') or args.get('q')}"}
+
+    started = asyncio.get_running_loop().time()
+    chunks = []
+    async for chunk in AiService().generate_response_stream(
+        message_history=[{"role": "user", "parts": [{"text": "并发读取"}]}],
+        tools=_TOOLS,
+        tool_executor=tool_executor,
+        system_instruction="test",
+    ):
+        chunks.append(chunk)
+    elapsed = asyncio.get_running_loop().time() - started
+
+    assert chunks == ["完成"]
+    assert running["peak"] == 3
+    assert finished[-1] == "write"
+    assert elapsed < 0.35
+
+    tool_rows = [
+        row for row in completions.seen_messages[1] if row.get("role") == "tool"
+    ]
+    assert [row["tool_call_id"] for row in tool_rows] == [
+        "call-1",
+        "call-2",
+        "call-3",
+        "call-4",
+    ]
+    assert "slow.txt" in tool_rows[0]["content"]
+    assert "fast.txt" in tool_rows[2]["content"]
+
+
+@pytest.mark.asyncio
+async def test_parallel_limit_bounds_concurrent_read_only_calls(monkeypatch):
+    monkeypatch.setenv("AI_TOOL_PARALLEL_LIMIT", "2")
+    completions = _ScriptedCompletions(
+        [
+            _tool_response([("read", {"path": f"{index}.txt"}) for index in range(5)]),
+            _text_response("完成"),
+        ]
+    )
+    _patch_client(monkeypatch, completions)
+
+    running = {"now": 0, "peak": 0}
+
+    async def tool_executor(name, args):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+        return {"ok": True, "summary": args["path"]}
+
+    async for _chunk in AiService().generate_response_stream(
+        message_history=[{"role": "user", "parts": [{"text": "读取"}]}],
+        tools=_TOOLS,
+        tool_executor=tool_executor,
+        system_instruction="test",
+    ):
+        pass
+
+    assert running["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_terminal_stop_discards_remaining_parallel_results(monkeypatch):
+    completions = _ScriptedCompletions(
+        [
+            _tool_response(
+                [
+                    ("read", {"path": "a.txt"}),
+                    ("read", {"path": "b.txt"}),
+                ]
+            ),
+        ]
+    )
+    _patch_client(monkeypatch, completions)
+
+    async def tool_executor(name, args):
+        return {"ok": True, "summary": args["path"], "terminal": True, "text": args["path"]}
+
+    finished_events = []
+
+    async def event_callback(event, payload):
+        if event == "tool_call_finished":
+            finished_events.append(payload["summary"])
+            return {"stop": True, "final_text": "已结束"}
+        return None
+
+    chunks = []
+    async for chunk in AiService().generate_response_stream(
+        message_history=[{"role": "user", "parts": [{"text": "读取"}]}],
+        tools=_TOOLS,
+        tool_executor=tool_executor,
+        system_instruction="test",
+        event_callback=event_callback,
+    ):
+        chunks.append(chunk)
+
+    assert chunks == ["已结束"]
+    assert len(finished_events) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_turn_cancels_pending_parallel_calls(monkeypatch):
+    completions = _ScriptedCompletions(
+        [
+            _tool_response(
+                [
+                    ("read", {"path": "a.txt"}),
+                    ("read", {"path": "b.txt"}),
+                ]
+            ),
+        ]
+    )
+    _patch_client(monkeypatch, completions)
+    outcomes: dict[str, str] = {}
+
+    async def tool_executor(name, args):
+        try:
+            await asyncio.sleep(0.3)
+        except asyncio.CancelledError:
+            outcomes[args["path"]] = "cancelled"
+            raise
+        outcomes[args["path"]] = "finished"
+        return {"ok": True, "summary": args["path"]}
+
+    async def _consume():
+        async for _chunk in AiService().generate_response_stream(
+            message_history=[{"role": "user", "parts": [{"text": "读取"}]}],
+            tools=_TOOLS,
+            tool_executor=tool_executor,
+            system_instruction="test",
+        ):
+            pass
+
+    consumer = asyncio.create_task(_consume())
+    await asyncio.sleep(0.05)
+    consumer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await consumer
+    await asyncio.sleep(0.4)
+
+    # 本轮被取消时，还没轮到写回的 b.txt 也不能留在后台跑完。
+    assert outcomes == {"a.txt": "cancelled", "b.txt": "cancelled"}
+
+
+@pytest.mark.asyncio
+async def test_read_only_skill_bash_calls_run_concurrently(monkeypatch):
+    search = "cd skills/web_search && python scripts/execute.py"
+    completions = _ScriptedCompletions(
+        [
+            _tool_response(
+                [
+                    ("bash", {"command": f"{search} alpha"}),
+                    ("bash", {"command": f"{search} beta"}),
+                    ("bash", {"command": "rm -rf build"}),
+                ]
+            ),
+            _text_response("完成"),
+        ]
+    )
+    _patch_client(monkeypatch, completions)
+    monkeypatch.setattr(
+        ai_service_module.tool_registry,
+        "is_read_only_bash_command",
+        lambda command, cwd=None: command.startswith(search),
+    )
+
+    running = {"now": 0, "peak": 0}
+
+    async def tool_executor(name, args):
+        if not args["command"].startswith(search):
+            assert running["now"] == 0
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.05)
+        running["now"] -= 1
+        return {"ok": True, "summary": args["command"]}
+
+    async for _chunk in AiService().generate_response_stream(
+        message_history=[{"role": "user", "parts": [{"text": "搜索"}]}],
+        tools=[{"name": "bash", "description": "", "parameters": {"type": "object"}}],
+        tool_executor=tool_executor,
+        system_instruction="test",
+    ):
+        pass
+
+    assert running["peak"] == 2
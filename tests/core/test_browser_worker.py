@@ -0,0 +1,178 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+import services.browser_worker as browser_worker_module
+from services.browser_worker import BrowserWorker, BrowserWorkerClient
+
+
+class _FakeLocator:
+    def __init__(self, url: str):
+        self.url = url
+
+    async def aria_snapshot(self):
+        return f'- heading "{self.url}" [level=1]'
+
+
+class _FakePage:
+    def __init__(self, browser: "_FakeBrowser"):
+        self.browser = browser
+        self.url = ""
+
+    async def goto(self, url, **_kwargs):
+        self.url = url
+        self.browser.open_pages += 1
+        self.browser.peak_pages = max(self.browser.peak_pages, self.browser.open_pages)
+        await asyncio.sleep(0.01)
+        if "broken" in url:
+            raise RuntimeError("net::ERR_NAME_NOT_RESOLVED")
+
+    async def wait_for_load_state(self, *_args, **_kwargs):
+        return None
+
+    async def title(self):
+        return "标题"
+
+    def locator(self, _selector):
+        return _FakeLocator(self.url)
+
+    async def close(self):
+        if self.url:
+            self.browser.open_pages -= 1
+
+
+class _FakeContext:
+    def __init__(self, browser: "_FakeBrowser"):
+        self.browser = browser
+        self.closed = False
+
+    async def new_page(self):
+        return _FakePage(self.browser)
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.contexts: list[_FakeContext] = []
+        self.open_pages = 0
+        self.peak_pages = 0
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, **_kwargs):
+        context = _FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+def _worker_with_fake_browser(**kwargs) -> tuple[BrowserWorker, list[_FakeBrowser]]:
+    worker = BrowserWorker(**kwargs)
+    launched: list[_FakeBrowser] = []
+
+    async def _launch():
+        if worker._browser is None or not worker._browser.is_connected():
+            worker._browser = _FakeBrowser()
+            launched.append(worker._browser)
+        return worker._browser
+
+    worker._launch = _launch
+    return worker, launched
+
+
+@pytest.mark.asyncio
+async def test_worker_limits_pages_and_isolates_contexts():
+    worker, launched = _worker_with_fake_browser(max_pages=2)
+
+    results = await asyncio.gather(
+        *(worker.snapshot(f"https://e.com/{idx}", timeout_sec=5) for idx in range(6))
+    )
+
+    assert all(item["ok"] for item in results)
+    assert results[0]["content"] == '- heading "https://e.com/0" [level=1]'
+    assert set(results[0]["timings"]) == {
+        "queue_ms",
+        "launch_ms",
+        "goto_ms",
+        "snapshot_ms",
+        "total_ms",
+    }
+    assert len(launched) == 1
+    assert launched[0].peak_pages == 2
+    # 浏览器复用，但每个页面一个 context，用完即关，站点状态不会串到下一个 URL。
+    assert len(launched[0].contexts) == 6
+    assert all(context.closed for context in launched[0].contexts)
+
+
+@pytest.mark.asyncio
+async def test_worker_reaps_idle_browser():
+    worker, launched = _worker_with_fake_browser(
+        max_pages=2, browser_idle_sec=0, exit_idle_sec=3600
+    )
+    await worker.snapshot("https://e.com/a", timeout_sec=5)
+    await asyncio.sleep(0.01)
+
+    await worker.reap_idle()
+
+    assert launched[0].contexts[0].closed
+    assert launched[0].closed
+    assert worker._browser is None
+    assert not worker.stopped.is_set()
+
+
+@pytest.mark.asyncio
+async def test_client_round_trip_over_unix_socket(monkeypatch):
+    worker, _ = _worker_with_fake_browser(max_pages=2)
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="ikaros-bw-"), "w.sock")
+    server = await asyncio.start_unix_server(worker.handle, path=socket_path)
+    monkeypatch.setattr(browser_worker_module, "playwright_available", lambda: True)
+    client = BrowserWorkerClient(socket_path=socket_path, enabled=True)
+    try:
+        ok = await client.snapshot("https://e.com/page")
+        failed = await client.snapshot("https://broken.example/")
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    assert ok is not None and ok.ok and ok.title == "标题"
+    assert "https://e.com/page" in ok.content
+    assert failed is not None and not failed.ok
+    assert "ERR_NAME_NOT_RESOLVED" in failed.error
+    stats = client.stats()
+    assert stats["pages"] == 2 and stats["failures"] == 1
+    assert stats["total_ms_p50"] > 0
+
+
+@pytest.mark.asyncio
+async def test_failed_worker_snapshot_falls_back_to_playwright_cli(monkeypatch):
+    from services import web_summary_service
+    from services.browser_worker import PageSnapshot
+
+    class _FailingWorker:
+        available = True
+
+        async def snapshot(self, url):
+            return PageSnapshot(url=url, ok=False, error="Target crashed")
+
+    cli_calls: list[str] = []
+
+    async def _cli(url, command_prefix):
+        cli_calls.append(url)
+        return f"cli snapshot of {url} via {command_prefix[0]}"
+
+    monkeypatch.setattr(web_summary_service, "browser_worker", _FailingWorker())
+    monkeypatch.setattr(web_summary_service, "_playwright_cli_command", lambda: ["playwright-cli"])
+    monkeypatch.setattr(web_summary_service, "_snapshot_with_playwright_cli", _cli)
+
+    content = await web_summary_service.fetch_with_playwright_cli_snapshot("https://e.com/x")
+
+    assert content == "cli snapshot of https://e.com/x via playwright-cli"
+    assert cli_calls == ["https://e.com/x"]
@@ -0,0 +1,179 @@
+import sqlite3
+import threading
+
+import pytest
+
+import core.chat_search_index as chat_search_module
+import core.state_store as state_store_module
+from core import chat_session_log
+from core.chat_search_index import ChatSearchHits, ChatSearchIndex, ChatSearchUnavailable
+from core.state_store import (
+    replace_session_entries,
+    save_message,
+    search_messages,
+)
+
+
+@pytest.mark.asyncio
+async def test_search_messages_ranks_fts_hits_and_returns_snippets(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    await save_message("u-1", "user", "部署脚本又失败了", "sess-a")
+    await save_message(
+        "u-1", "model", "部署脚本失败的原因是部署脚本缺少权限", "sess-a"
+    )
+    await save_message("u-1", "user", "今天天气不错", "sess-b")
+    await save_message("u-1", "system", "部署脚本 隐藏提示", "sess-b")
+
+    hits = await search_messages("u-1", "部署脚本", limit=10)
+
+    assert sorted(item["content"] for item in hits) == sorted(
+        [
+            "部署脚本失败的原因是部署脚本缺少权限",
+            "部署脚本又失败了",
+        ]
+    )
+    assert [item["rank"] for item in hits] == sorted(item["rank"] for item in hits)
+    assert all("[部署脚本]" in item["snippet"] for item in hits)
+    assert {item["session_id"] for item in hits} == {"sess-a"}
+
+    only_user = await search_messages("u-1", "部署脚本", role="user")
+    assert [item["content"] for item in only_user] == ["部署脚本又失败了"]
+    assert await search_messages("u-1", "部署脚本", session_id="sess-b") == []
+    assert await search_messages("u-1", "部署脚本", day="1999-01-01") == []
+
+
+@pytest.mark.asyncio
+async def test_search_messages_handles_short_cjk_and_case_insensitive_terms(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    await save_message("u-1", "user", "切换模型到 GPT", "sess-a")
+    await save_message("u-1", "user", "Release the PR today", "sess-a")
+
+    assert [item["content"] for item in await search_messages("u-1", "模型")] == [
+        "切换模型到 GPT"
+    ]
+    assert [item["content"] for item in await search_messages("u-1", "pr")] == [
+        "Release the PR today"
+    ]
+    assert [item["content"] for item in await search_messages("u-1", "release")] == [
+        "Release the PR today"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_index_backfills_legacy_sessions_and_follows_replace(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    legacy = tmp_path / "user" / "chat_scoped" / "u-1" / "2026-02-01" / "old.md"
+    legacy.parent.mkdir(parents=True)
+    legacy.write_text(
+        chat_session_log.render_session(
+            "2026-02-01",
+            "old",
+            [{"role": "user", "content": "旧会话里的关键词 alpha"}],
+        ),
+        encoding="utf-8",
+    )
+
+    hits = await search_messages("u-1", "alpha")
+    assert [(item["session_id"], item["created_at"]) for item in hits] == [
+        ("old", "2026-02-01")
+    ]
+
+    await replace_session_entries(
+        "u-1",
+        "old",
+        [{"role": "user", "content": "压缩后只剩 beta"}],
+    )
+    assert await search_messages("u-1", "alpha") == []
+    assert [item["content"] for item in await search_messages("u-1", "beta")] == [
+        "压缩后只剩 beta"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_index_backfill_runs_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    backfill_threads: list[threading.Thread] = []
+    original = state_store_module.chat_search_index.ensure_synced
+
+    def _tracking_ensure_synced(*args, **kwargs):
+        backfill_threads.append(threading.current_thread())
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(
+        state_store_module.chat_search_index, "ensure_synced", _tracking_ensure_synced
+    )
+    await save_message("u-backfill", "user", "first gamma", "s-1")
+    await save_message("u-backfill", "model", "second gamma", "s-1")
+
+    # 只有首次访问回填一次，且在工作线程里跑。
+    assert len(backfill_threads) == 1
+    assert backfill_threads[0] is not threading.main_thread()
+    assert len(await search_messages("u-backfill", "gamma")) == 2
+
+
+@pytest.mark.asyncio
+async def test_search_falls_back_to_file_scan_when_budget_truncates(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    await save_message("u-1", "user", "预算超时也要找到 gamma", "sess-a")
+
+    def _interrupted(*_args, **_kwargs):
+        hits = ChatSearchHits()
+        hits.truncated = True
+        return hits
+
+    monkeypatch.setattr(state_store_module.chat_search_index, "search", _interrupted)
+    hits = await search_messages("u-1", "gamma")
+    assert [item["content"] for item in hits] == ["预算超时也要找到 gamma"]
+
+
+def test_missing_fts5_is_cached_instead_of_retried(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    index = ChatSearchIndex()
+    real_connect = sqlite3.connect
+    attempts: list[str] = []
+
+    class _NoFtsConnection:
+        def __init__(self, conn):
+            self._conn = conn
+
+        def execute(self, sql, *args):
+            if "fts5" in sql:
+                attempts.append(sql)
+                raise sqlite3.OperationalError("no such module: fts5")
+            return self._conn.execute(sql, *args)
+
+        def __getattr__(self, name):
+            return getattr(self._conn, name)
+
+        def __setattr__(self, name, value):
+            if name == "_conn":
+                object.__setattr__(self, name, value)
+            else:
+                setattr(self._conn, name, value)
+
+    monkeypatch.setattr(
+        chat_search_module.sqlite3,
+        "connect",
+        lambda *args, **kwargs: _NoFtsConnection(real_connect(*args, **kwargs)),
+    )
+    with caplog.at_level("WARNING"):
+        for _ in range(3):
+            with pytest.raises(ChatSearchUnavailable):
+                index.search("u-1", "alpha")
+            index.ensure_synced("u-1", list_sessions=list, read_rows=list)
+            index.forget("u-1", "sess-a")
+
+    assert not index.available
+    assert len(attempts) == 1
+    assert sum("FTS5" in record.getMessage() for record in caplog.records) == 1
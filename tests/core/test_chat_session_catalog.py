@@ -0,0 +1,120 @@
+import os
+import sqlite3
+
+import pytest
+
+from core import chat_session_log
+from core.state_store import (
+    chat_session_catalog,
+    create_chat_session,
+    get_latest_session_id,
+    get_session_messages,
+    list_chat_sessions,
+    replace_session_entries,
+    save_message,
+)
+
+
+@pytest.mark.asyncio
+async def test_catalog_tracks_title_preview_and_count_on_write_path(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    await save_message("u-1", "system", "内部提示", "sess-a")
+    await save_message("u-1", "user", "帮我查天气", "sess-a")
+    await save_message("u-1", "model", "今天晴", "sess-a")
+    await create_chat_session("u-1", "sess-b")
+
+    sessions = await list_chat_sessions("u-1")
+    by_id = {item["session_id"]: item for item in sessions}
+
+    assert by_id["sess-a"]["title"] == "帮我查天气"
+    assert by_id["sess-a"]["preview"] == "今天晴"
+    assert by_id["sess-a"]["message_count"] == 2
+    assert by_id["sess-b"]["title"] == "新对话"
+    assert by_id["sess-b"]["message_count"] == 0
+
+    await replace_session_entries(
+        "u-1",
+        "sess-a",
+        [{"role": "user", "content": "压缩后"}],
+    )
+    sessions = await list_chat_sessions("u-1")
+    by_id = {item["session_id"]: item for item in sessions}
+    assert by_id["sess-a"]["title"] == "压缩后"
+    assert by_id["sess-a"]["message_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_catalog_backfills_legacy_files_and_resolves_older_days(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    root = tmp_path / "user" / "chat_scoped" / "u-1"
+    for day, session_id, mtime in (
+        ("2026-01-01", "old", 1_700_000_000),
+        ("2026-01-02", "newer", 1_700_100_000),
+    ):
+        path = root / day / f"{session_id}.md"
+        path.parent.mkdir(parents=True)
+        path.write_text(
+            chat_session_log.render_session(
+                day,
+                session_id,
+                [{"role": "user", "content": f"hello {session_id}"}],
+            ),
+            encoding="utf-8",
+        )
+        os.utime(path, (mtime, mtime))
+
+    assert await get_latest_session_id("u-1") == "newer"
+    history = await get_session_messages("u-1", "old", limit=5)
+    assert history == [{"role": "user", "parts": [{"text": "hello old"}]}]
+
+    await save_message("u-1", "model", "reply", "old")
+    assert (root / "2026-01-01" / "old.md").read_text(encoding="utf-8").endswith(
+        chat_session_log.entry_block("model", "reply")
+    )
+    assert await get_latest_session_id("u-1") == "old"
+
+
+@pytest.mark.asyncio
+async def test_catalog_is_isolated_per_user_scope(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    await save_message("u-1", "user", "alpha", "sess-1")
+    await save_message("u-2", "user", "beta", "sess-2")
+
+    assert [item["session_id"] for item in await list_chat_sessions("u-1")] == [
+        "sess-1"
+    ]
+    assert chat_session_catalog.lookup("u-2", "sess-1") is None
+
+
+@pytest.mark.asyncio
+async def test_save_message_commits_catalog_and_search_index_together(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    await create_chat_session("u-txn", "sess-txn")
+    commits: list[str] = []
+    original = chat_session_catalog.write_transaction
+
+    def _tracking_transaction():
+        commits.append("begin")
+        return original()
+
+    monkeypatch.setattr(chat_session_catalog, "write_transaction", _tracking_transaction)
+    await save_message("u-txn", "user", "一次事务 delta", "sess-txn")
+
+    assert commits == ["begin"]
+    sessions = await list_chat_sessions("u-txn")
+    assert sessions[0]["message_count"] == 1
+    with sqlite3.connect(str(tmp_path / "bot_data.db")) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        fts_rows = conn.execute(
+            "SELECT content FROM chat_message_fts WHERE user_scope = 'u-txn'"
+        ).fetchall()
+    assert fts_rows == [("一次事务 delta",)]
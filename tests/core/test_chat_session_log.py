@@ -0,0 +1,103 @@
+import pytest
+
+from core import chat_session_log
+from core.state_store import (
+    get_session_entries,
+    get_session_messages,
+    replace_session_entries,
+    save_message,
+)
+
+
+async def _session_file(tmp_path, session_id: str):
+    root = tmp_path / "user" / "chat_scoped" / "u-1"
+    files = list(root.glob(f"*/{session_id}.md"))
+    assert len(files) == 1
+    return files[0]
+
+
+@pytest.mark.asyncio
+async def test_save_message_appends_without_rewriting_existing_blocks(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    await save_message("u-1", "user", "第一条", "sess-append")
+    path = await _session_file(tmp_path, "sess-append")
+    before = path.read_bytes()
+    inode = path.stat().st_ino
+
+    await save_message("u-1", "model", "第二条\n多行", "sess-append")
+
+    after = path.read_bytes()
+    assert after.startswith(before)
+    assert path.stat().st_ino == inode
+    assert after[len(before) :].decode("utf-8") == chat_session_log.entry_block(
+        "model", "第二条\n多行"
+    )
+    assert after.decode("utf-8").startswith("# Chat Session\n")
+
+
+@pytest.mark.asyncio
+async def test_session_tail_reads_legacy_file_and_external_appends(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    day_dir = tmp_path / "user" / "chat_scoped" / "u-1" / "2026-01-02"
+    day_dir.mkdir(parents=True)
+    legacy = day_dir / "sess-legacy.md"
+    rows = [
+        {"role": "system", "content": "【会话摘要】旧摘要"},
+        *[
+            {"role": "user" if i % 2 == 0 else "model", "content": f"msg-{i}"}
+            for i in range(200)
+        ],
+    ]
+    legacy.write_text(
+        chat_session_log.render_session("2026-01-02", "sess-legacy", rows),
+        encoding="utf-8",
+    )
+
+    tail = await get_session_messages("u-1", "sess-legacy", limit=2)
+    assert [item["parts"][0]["text"] for item in tail] == ["msg-198", "msg-199"]
+
+    with legacy.open("a", encoding="utf-8") as handle:
+        handle.write(chat_session_log.entry_block("user", "from-other-process"))
+    await save_message("u-1", "model", "reply", "sess-legacy")
+
+    tail = await get_session_messages(
+        "u-1",
+        "sess-legacy",
+        limit=2,
+        include_system=True,
+        preserve_system_prefixes=("【会话摘要】",),
+    )
+    assert [item["parts"][0]["text"] for item in tail] == [
+        "【会话摘要】旧摘要",
+        "from-other-process",
+        "reply",
+    ]
+    assert len(await get_session_entries("u-1", "sess-legacy")) == 203
+
+
+@pytest.mark.asyncio
+async def test_replace_session_entries_resets_offset_index(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    for index in range(5):
+        await save_message("u-1", "user", f"old-{index}", "sess-replace")
+    await get_session_messages("u-1", "sess-replace", limit=10)
+
+    await replace_session_entries(
+        "u-1",
+        "sess-replace",
+        [{"role": "user", "content": "kept"}],
+    )
+    await save_message("u-1", "model", "after", "sess-replace")
+
+    rows = await get_session_entries("u-1", "sess-replace")
+    assert rows == [
+        {"role": "user", "content": "kept"},
+        {"role": "model", "content": "after"},
+    ]
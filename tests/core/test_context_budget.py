@@ -0,0 +1,134 @@
+import json
+import math
+import types
+
+import pytest
+
+import core.context_budget as context_budget_module
+import core.token_estimator as token_estimator_module
+from core.context_budget import context_budget_stats, fit_chat_request
+from core.token_estimator import estimate_message_tokens, estimate_tokens
+
+
+@pytest.fixture(autouse=True)
+def _reset_stats():
+    context_budget_stats.reset()
+    yield
+    context_budget_stats.reset()
+
+
+def _use_model_limits(monkeypatch, *, context_window: int, max_tokens: int = 1000):
+    model = types.SimpleNamespace(contextWindow=context_window, maxTokens=max_tokens)
+    config = types.SimpleNamespace(get_model=lambda _key: model)
+    monkeypatch.setattr(context_budget_module, "get_models_config", lambda: config)
+    monkeypatch.setattr(
+        context_budget_module, "CONTEXT_BUDGET_TOOL_RESULT_MIN_TOKENS", 100
+    )
+
+
+def _tool_message(call_id: str, size: int) -> dict:
+    return {
+        "role": "tool",
+        "tool_call_id": call_id,
+        "content": json.dumps({"result": "x" * size}),
+    }
+
+
+def _assistant_call(call_id: str) -> dict:
+    return {
+        "role": "assistant",
+        "content": "",
+        "tool_calls": [
+            {
+                "id": call_id,
+                "type": "function",
+                "function": {"name": "read", "arguments": "{}"},
+            }
+        ],
+    }
+
+
+def test_estimate_tokens_matches_cjk_and_byte_rule():
+    text = "hello 世界 " * 50
+    non_cjk_bytes = len(text.strip().replace("世界", "").encode("utf-8"))
+    assert estimate_tokens(text) == 100 + math.ceil(non_cjk_bytes / 4)
+    assert estimate_tokens(text) == estimate_tokens(text)
+    assert estimate_tokens("é") == 1
+    assert estimate_tokens("  ") == 0
+    assert estimate_message_tokens(_assistant_call("c1")) == 4 + 1 + 1
+
+
+def test_estimate_tokens_cache_does_not_keep_the_text():
+    text = "缓存键 " + "y" * 10_000
+    first = estimate_tokens(text)
+
+    assert estimate_tokens(text) == first
+    with token_estimator_module._cache_lock:
+        keys = list(token_estimator_module._cache)
+    assert all(isinstance(key, tuple) and len(key[0]) == 20 for key in keys)
+    assert (keys[-1][1], token_estimator_module._cache[keys[-1]]) == (len(text), first)
+
+
+def test_fit_chat_request_keeps_small_requests_untouched(monkeypatch):
+    _use_model_limits(monkeypatch, context_window=100_000)
+    messages = [
+        {"role": "system", "content": "系统说明"},
+        {"role": "user", "content": "你好"},
+    ]
+
+    payload, report = fit_chat_request({"messages": messages}, model_key="p/m")
+
+    assert payload["messages"] is messages
+    assert report is not None and not report.changed
+    assert report.output_reserve == 1000
+    assert context_budget_stats.snapshot()["requests"] == 1
+
+
+def test_fit_chat_request_truncates_largest_tool_result_first(monkeypatch):
+    _use_model_limits(monkeypatch, context_window=3000)
+    messages = [
+        {"role": "system", "content": "系统说明"},
+        {"role": "user", "content": "读两个文件"},
+        _assistant_call("c1"),
+        _tool_message("c1", 2000),
+        _assistant_call("c2"),
+        _tool_message("c2", 8000),
+    ]
+
+    payload, report = fit_chat_request({"messages": messages}, model_key="p/m")
+
+    fitted = payload["messages"]
+    assert len(fitted) == len(messages)
+    assert fitted[3] is messages[3]
+    assert "已截断" in fitted[5]["content"]
+    assert report.truncated_tool_results == 1
+    assert report.dropped_messages == 0
+    assert report.input_tokens_after <= report.budget
+    assert "已截断" not in messages[5]["content"]
+
+
+def test_fit_chat_request_drops_oldest_history_groups(monkeypatch):
+    _use_model_limits(monkeypatch, context_window=2500)
+    old_turn = "旧消息" * 400
+    messages = [
+        {"role": "system", "content": "系统说明"},
+        {"role": "user", "content": old_turn},
+        _assistant_call("c1"),
+        _tool_message("c1", 200),
+        {"role": "assistant", "content": "旧回答"},
+        {"role": "user", "content": "新问题"},
+    ]
+
+    payload, report = fit_chat_request({"messages": messages}, model_key="p/m")
+
+    fitted = payload["messages"]
+    assert fitted[0]["role"] == "system"
+    assert fitted[-1] == {"role": "user", "content": "新问题"}
+    assert all(item.get("content") != old_turn for item in fitted)
+    assert not any(item.get("role") == "tool" for item in fitted) or any(
+        item.get("tool_calls") for item in fitted
+    )
+    assert report.dropped_messages >= 1
+    assert not report.over_budget
+    summary = context_budget_stats.render_summary()
+    assert "上下文预算" in summary and "丢弃=" in summary
@@ -1,5 +1,8 @@
+import asyncio
 import importlib.util
+import re
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
@@ -52,3 +55,106 @@ def test_deep_research_resolve_web_search_execute_raises_when_missing(tmp_path):
 
     with pytest.raises(RuntimeError, match="web_search execute module unavailable"):
         module._resolve_web_search_execute_path(tmp_path)
+
+
+def test_chunk_text_splits_on_paragraphs_within_budget():
+    from core.token_estimator import estimate_tokens
+    from extension.skills.learned.deep_research.scripts.synthesis import chunk_text
+
+    text = "\n\n".join(f"第{idx}段 " + "内容" * 200 for idx in range(10))
+    text += "\n\n" + "x" * 20000
+
+    chunks = chunk_text(text, 1000)
+
+    assert len(chunks) == 10
+    assert all(estimate_tokens(chunk) <= 1000 for chunk in chunks)
+    assert chunks[0].startswith("第0段") and "第1段" in chunks[0]
+    assert chunks[-1] == "x" * len(chunks[-1])
+
+
+@pytest.mark.asyncio
+async def test_reduce_notes_merges_hierarchically_within_target():
+    from core.token_estimator import estimate_tokens
+    from extension.skills.learned.deep_research.scripts.synthesis import (
+        SourceNotes,
+        reduce_notes,
+    )
+
+    notes = [
+        SourceNotes(index=idx, title=f"T{idx}", url=f"https://e.com/{idx}", notes="要点" * 300)
+        for idx in range(1, 31)
+    ]
+    prompts: list[str] = []
+
+    async def _llm(prompt: str) -> str:
+        prompts.append(prompt)
+        tags = sorted(set(re.findall(r"\[S\d+\]", prompt)))
+        return " ".join(tags) + " 合并" * 100
+
+    merged, levels = await reduce_notes(notes, topic="t", llm=_llm, target_tokens=2000)
+
+    assert levels >= 2
+    assert estimate_tokens(merged) <= 2000
+    assert max(estimate_tokens(prompt) for prompt in prompts) <= 2500
+    assert all(f"[S{idx}]" in merged for idx in range(1, 31))
+
+
+@pytest.mark.asyncio
+async def test_execute_streams_findings_and_fits_context_window(monkeypatch):
+    from core.token_estimator import estimate_tokens
+    from extension.skills.learned.deep_research.scripts import synthesis
+
+    module = _load_module()
+    results = [
+        {"title": f"Page {idx}", "url": f"https://e.com/{idx}"} for idx in range(50)
+    ]
+
+    class _Provider:
+        async def search(self, **_kwargs):
+            return results
+
+    monkeypatch.setattr(
+        module,
+        "_load_web_search_execute_module",
+        lambda: SimpleNamespace(
+            build_fallback_provider_chain=lambda queries: (_Provider(), None)
+        ),
+    )
+
+    async def _fetch(url: str):
+        idx = int(url.rsplit("/", 1)[-1])
+        if idx == 7:
+            return None
+        await asyncio.sleep((50 - idx) * 0.001)
+        return "\n\n".join(f"{url} 第{p}段 " + "研究内容" * 300 for p in range(8))
+
+    prompts: list[str] = []
+
+    async def _generate_text(*, async_client, model, contents):
+        prompts.append(contents)
+        if "consolidating" in contents:
+            tags = sorted(set(re.findall(r"\[S\d+\]", contents)))
+            return " ".join(tags) + " 合并要点" * 50
+        if "Deep Research Analyst" in contents:
+            return "```markdown\n# Deep Research: topic\n```"
+        return "- 关键发现 " + "细节" * 100
+
+    monkeypatch.setattr(module, "fetch_webpage_content", _fetch)
+    monkeypatch.setattr(module, "select_model_for_role", lambda _role: "p/m")
+    monkeypatch.setattr(module, "get_client_for_model", lambda *_a, **_k: object())
+    monkeypatch.setattr(module, "generate_text", _generate_text)
+    monkeypatch.setattr(synthesis, "resolve_model_limits", lambda _key: (16000, 2000))
+
+    outputs = [
+        item
+        async for item in module.execute(None, {"topic": "topic", "depth": 50}, None)
+    ]
+
+    progress = [item for item in outputs if isinstance(item, str) and item.startswith("📄")]
+    assert len(progress) == 49
+    assert "关键发现" in progress[0]
+    assert any("无法读取" in item for item in outputs if isinstance(item, str))
+    final = outputs[-1]
+    assert final["files"]["deep_research_report.md"] == b"# Deep Research: topic"
+    assert "49 sources" in final["text"]
+    assert max(estimate_tokens(prompt) for prompt in prompts) <= 16000 * 0.9 - 2000
@@ -0,0 +1,61 @@
+import os
+
+from core import file_line_index
+from core.file_line_index import read_line_window
+
+
+def _write_lines(path, count: int, *, trailing_newline: bool = True) -> None:
+    body = "\n".join(f"row-{index}" for index in range(1, count + 1))
+    path.write_text(body + ("\n" if trailing_newline else ""), encoding="utf-8")
+
+
+def test_window_deep_in_file_matches_full_read(tmp_path):
+    target = tmp_path / "big.log"
+    _write_lines(target, 5000, trailing_newline=False)
+
+    window = read_line_window(str(target), 4097, 3, max_bytes=10_000, stride=64)
+
+    assert window.total_lines == 5000
+    assert window.start_line == 4097
+    assert window.lines == [b"row-4097\n", b"row-4098\n", b"row-4099\n"]
+    assert window.truncated is False
+
+    tail = read_line_window(str(target), 1, 2, max_bytes=10_000, tail=True, stride=64)
+    assert tail.start_line == 4999
+    assert tail.lines == [b"row-4999\n", b"row-5000"]
+
+
+def test_index_is_reused_until_file_changes(tmp_path, monkeypatch):
+    target = tmp_path / "data.txt"
+    _write_lines(target, 300)
+    builds = []
+    original = file_line_index._build_index
+
+    def _counting_build(*args, **kwargs):
+        builds.append(args[1:])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(file_line_index, "_build_index", _counting_build)
+
+    read_line_window(str(target), 1, 5, max_bytes=1000, stride=16)
+    read_line_window(str(target), 250, 5, max_bytes=1000, stride=16)
+    assert len(builds) == 1
+
+    _write_lines(target, 310)
+    stat = target.stat()
+    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    window = read_line_window(str(target), 1, 1, max_bytes=1000, stride=16)
+
+    assert len(builds) == 2
+    assert window.total_lines == 310
+
+
+def test_byte_budget_cuts_huge_single_line(tmp_path):
+    target = tmp_path / "minified.json"
+    target.write_bytes(b"x" * 50_000)
+
+    window = read_line_window(str(target), 1, 200, max_bytes=1024)
+
+    assert window.total_lines == 1
+    assert window.lines == [b"x" * 1024]
+    assert window.truncated is True
@@ -453,6 +453,59 @@ async def test_wrap_openai_client_records_failures(tmp_path, monkeypatch):
     assert summary["models"][0]["model_key"] == "demo/router"
 
 
+@pytest.mark.asyncio
+async def test_wrap_openai_client_records_stream_closed_before_completion(
+    tmp_path, monkeypatch
+):
+    _reset_llm_usage_store(tmp_path, monkeypatch)
+    llm_usage_module.set_current_llm_usage_session_id("session-hedge")
+
+    class _FakeAsyncStream:
+        def __init__(self):
+            self.closed = False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            return SimpleNamespace(
+                choices=[
+                    SimpleNamespace(
+                        delta=SimpleNamespace(content="部分输出"),
+                        finish_reason=None,
+                    )
+                ]
+            )
+
+        async def aclose(self):
+            self.closed = True
+
+    upstream = _FakeAsyncStream()
+
+    class _FakeAsyncCompletions:
+        async def create(self, **kwargs):
+            _ = kwargs
+            return upstream
+
+    wrapped = llm_usage_module.wrap_openai_client(
+        SimpleNamespace(chat=SimpleNamespace(completions=_FakeAsyncCompletions())),
+        default_model_key="demo/loser",
+    )
+
+    stream = await wrapped.chat.completions.create(
+        model="loser", messages=[{"role": "user", "content": "你好"}], stream=True
+    )
+    await stream.__anext__()
+    await stream.aclose()
+    await stream.aclose()
+
+    assert upstream.closed is True
+    summary = llm_usage_module.llm_usage_store.summarize()
+    assert summary["requests"] == 1
+    assert summary["failed_requests"] == 1
+    assert summary["output_tokens"] > 0
+
+
 def test_summarize_supports_day_filter(tmp_path, monkeypatch):
     db_path = _reset_llm_usage_store(tmp_path, monkeypatch)
 
@@ -535,3 +588,149 @@ def test_reset_removes_usage_rows(tmp_path, monkeypatch):
 
     assert removed == 2
     assert llm_usage_module.llm_usage_store.summarize()["requests"] == 0
+
+
+def test_record_event_buffers_increments_until_flush(tmp_path, monkeypatch):
+    db_path = _reset_llm_usage_store(tmp_path, monkeypatch)
+    store = llm_usage_module.LlmUsageStore(flush_interval_ms=60_000, flush_max_events=1000)
+    monkeypatch.setattr(store, "db_path", db_path)
+    llm_usage_module.set_current_llm_usage_session_id("session-batch")
+    response = SimpleNamespace(
+        usage=SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+    )
+
+    for _ in range(5):
+        store.record_event(
+            operation="chat.completions.create",
+            default_model_key="demo/text",
+            request_kwargs={"model": "text"},
+            response=response,
+            success=True,
+        )
+    assert not db_path.exists()
+
+    assert store.flush() == 1
+    with sqlite3.connect(str(db_path)) as conn:
+        row = conn.execute(
+            f"SELECT requests, total_tokens FROM {llm_usage_module._USAGE_TABLE}"
+        ).fetchone()
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert tuple(row) == (5, 25)
+    assert journal_mode == "wal"
+
+    store.record_event(
+        operation="chat.completions.create",
+        default_model_key="demo/text",
+        request_kwargs={"model": "text"},
+        response=None,
+        success=False,
+    )
+    store.close()
+    assert store.summarize()["failed_requests"] == 1
+    assert store.summarize()["requests"] == 6
+
+
+def test_flush_keeps_buffered_increments_when_write_fails(tmp_path, monkeypatch):
+    db_path = _reset_llm_usage_store(tmp_path, monkeypatch)
+    store = llm_usage_module.LlmUsageStore(flush_interval_ms=60_000, flush_max_events=1000)
+    monkeypatch.setattr(store, "db_path", db_path)
+    llm_usage_module.set_current_llm_usage_session_id("session-retry")
+    response = SimpleNamespace(
+        usage=SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+    )
+
+    def _record():
+        store.record_event(
+            operation="chat.completions.create",
+            default_model_key="demo/text",
+            request_kwargs={"model": "text"},
+            response=response,
+            success=True,
+        )
+
+    for _ in range(2):
+        _record()
+    original_get_writer = store._get_writer
+
+    def _locked_writer(_db_path):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "_get_writer", _locked_writer)
+    assert store.flush() == 0
+    _record()
+
+    monkeypatch.setattr(store, "_get_writer", original_get_writer)
+    assert store.flush() == 1
+    with sqlite3.connect(str(db_path)) as conn:
+        row = conn.execute(
+            f"SELECT requests, total_tokens FROM {llm_usage_module._USAGE_TABLE}"
+        ).fetchone()
+    assert tuple(row) == (3, 15)
+    store.close()
+
+
+def test_today_model_totals_are_served_from_write_through_cache(tmp_path, monkeypatch):
+    db_path = _reset_llm_usage_store(tmp_path, monkeypatch)
+    store = llm_usage_module.LlmUsageStore(
+        flush_interval_ms=60_000,
+        flush_max_events=1000,
+        daily_refresh_sec=3600,
+    )
+    monkeypatch.setattr(store, "db_path", db_path)
+    monkeypatch.setattr(llm_usage_module, "_today_iso", lambda: "2026-03-01")
+    monkeypatch.setattr(llm_usage_module, "_now_iso", lambda: "2026-03-01T10:00:00+08:00")
+    queries: list[str] = []
+    original_query = store._query_model_totals
+
+    def _counting_query(day, model_keys=None):
+        queries.append(day)
+        return original_query(day, model_keys)
+
+    monkeypatch.setattr(store, "_query_model_totals", _counting_query)
+    response = SimpleNamespace(
+        usage=SimpleNamespace(prompt_tokens=8, completion_tokens=2, total_tokens=10)
+    )
+
+    def _record():
+        store.record_event(
+            operation="chat.completions.create",
+            default_model_key="demo/text",
+            request_kwargs={"model": "text"},
+            response=response,
+            success=True,
+        )
+
+    assert store.summarize_models(["demo/text"])["demo/text"]["total_tokens"] == 0
+    for _ in range(3):
+        _record()
+    assert store.summarize_models(["demo/text"])["demo/text"]["total_tokens"] == 30
+    assert queries == ["2026-03-01"]
+
+    _insert_usage_row(
+        db_path,
+        day="2026-03-01",
+        session_id="other-process",
+        model_key="demo/text",
+        requests=1,
+        success_requests=1,
+        failed_requests=0,
+        usage_requests=1,
+        missing_usage_requests=0,
+        estimated_token_requests=0,
+        input_tokens=90,
+        output_tokens=10,
+        total_tokens=100,
+    )
+    monkeypatch.setattr(store, "daily_refresh_sec", 0.0)
+    # 读路径只读缓存；重新汇总是 flusher 线程的活，这里手动跑一轮。
+    assert store.summarize_models(["demo/text"])["demo/text"]["total_tokens"] == 30
+    assert queries == ["2026-03-01"]
+    _record()
+    store._maybe_refresh_daily_cache()
+    assert store.summarize_models(["demo/text"])["demo/text"]["total_tokens"] == 140
+
+    monkeypatch.setattr(store, "daily_refresh_sec", 3600)
+    monkeypatch.setattr(llm_usage_module, "_today_iso", lambda: "2026-03-02")
+    assert store.summarize_models(["demo/text"])["demo/text"]["total_tokens"] == 0
+    assert queries[-1] == "2026-03-02"
+    store.close()
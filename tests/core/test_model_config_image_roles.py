@@ -140,7 +140,8 @@ def test_model_config_primary_pool_failover_skips_failed_models(monkeypatch):
         == "proxy/gpt-5.4"
     )
 
-    model_config_module.mark_model_failed("proxy/gpt-5.4")
+    for _ in range(manager.health.failure_threshold):
+        model_config_module.mark_model_failed("proxy/gpt-5.4")
 
     assert model_config_module.get_model_candidates_for_input("text") == [
         "proxy/bailian/qwen3.5-flash"
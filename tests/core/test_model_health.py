@@ -0,0 +1,245 @@
+from core.model_config import (
+    ModelConfig,
+    ModelManager,
+    ModelsConfig,
+    ProviderConfig,
+)
+from core.model_health import ModelHealthTracker, read_model_health_snapshot
+import core.model_health as model_health_module
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _tracker(clock: _Clock, **kwargs) -> ModelHealthTracker:
+    kwargs.setdefault("snapshot_path", None)
+    kwargs.setdefault("failure_threshold", 1)
+    return ModelHealthTracker(
+        base_cooldown_sec=30,
+        max_cooldown_sec=100,
+        trial_timeout_sec=60,
+        clock=clock,
+        **kwargs,
+    )
+
+
+def test_circuit_opens_then_half_open_allows_single_trial():
+    clock = _Clock()
+    tracker = _tracker(clock)
+
+    tracker.record_failure("demo/a", error="boom")
+    assert tracker.snapshot()["demo/a"]["state"] == "open"
+    assert not tracker.is_available("demo/a")
+    assert not tracker.try_acquire("demo/a")
+
+    clock.now += 30
+    assert tracker.is_available("demo/a")
+    assert tracker.try_acquire("demo/a")
+    assert tracker.snapshot()["demo/a"]["state"] == "half_open"
+    # 试探请求进行中，其它请求不得再试。
+    assert not tracker.is_available("demo/a")
+    assert not tracker.try_acquire("demo/a")
+
+    tracker.record_success("demo/a", latency_ms=200)
+    row = tracker.snapshot()["demo/a"]
+    assert row["state"] == "closed"
+    assert row["available"] is True
+    assert row["latency_ms"] == 200.0
+
+
+def test_failed_trial_reopens_with_doubled_cooldown_up_to_cap():
+    clock = _Clock()
+    tracker = _tracker(clock)
+
+    tracker.record_failure("demo/a")
+    for expected in (60, 100):
+        clock.now += 1000
+        assert tracker.try_acquire("demo/a")
+        tracker.record_failure("demo/a", error="still down")
+        row = tracker.snapshot()["demo/a"]
+        assert row["state"] == "open"
+        assert row["cooldown_sec"] == expected
+        assert row["cooldown_remaining_sec"] == expected
+        assert row["last_error"] == "still down"
+
+
+def test_stale_trial_is_released_after_timeout():
+    clock = _Clock()
+    tracker = _tracker(clock)
+    tracker.record_failure("demo/a")
+    clock.now += 30
+    assert tracker.try_acquire("demo/a")
+
+    clock.now += 61
+    assert tracker.try_acquire("demo/a")
+
+
+def test_failure_threshold_keeps_model_available_until_reached():
+    tracker = _tracker(_Clock(), failure_threshold=3)
+    for _ in range(2):
+        tracker.record_failure("demo/a")
+        assert tracker.is_available("demo/a")
+    tracker.record_failure("demo/a")
+    assert not tracker.is_available("demo/a")
+
+
+def test_snapshot_is_persisted_for_other_processes(tmp_path, monkeypatch):
+    path = tmp_path / "system" / "model_health.json"
+    monkeypatch.setattr(model_health_module, "model_health_snapshot_path", lambda: path)
+    tracker = _tracker(_Clock(), snapshot_path=lambda: path)
+    tracker.record_failure("demo/a", error="boom")
+
+    snapshot = read_model_health_snapshot()
+    assert snapshot["models"]["demo/a"]["state"] == "open"
+
+
+def _manager(selection: dict, tracker: ModelHealthTracker) -> ModelManager:
+    cfg = ModelsConfig(
+        model={"primary": "demo/a"},
+        models={"primary": {"demo/a": {}, "demo/b": {}, "demo/c": {}}},
+        selection={"primary": selection},
+        providers={
+            "demo": ProviderConfig(
+                baseUrl="https://example.invalid/v1",
+                apiKey="test-key",
+                models=[
+                    ModelConfig(id=model_id, name=model_id, input=["text"])
+                    for model_id in ("a", "b", "c")
+                ],
+            )
+        },
+    )
+    return ModelManager(cfg, "demo/a", health=tracker)
+
+
+def test_latency_weighted_selection_prefers_fast_reliable_models():
+    tracker = _tracker(_Clock(), failure_threshold=5)
+    manager = _manager({"strategy": "priority", "latency_weighted": True}, tracker)
+
+    tracker.record_success("demo/a", latency_ms=900)
+    tracker.record_success("demo/b", latency_ms=300)
+    tracker.record_success("demo/c", latency_ms=250)
+    tracker.record_failure("demo/c", latency_ms=250)
+
+    assert manager.get_candidate_models("text", pool_type="primary") == [
+        "demo/b",
+        "demo/c",
+        "demo/a",
+    ]
+
+
+def test_manager_skips_open_circuit_and_probes_after_cooldown():
+    clock = _Clock()
+    tracker = _tracker(clock)
+    manager = _manager({"strategy": "priority"}, tracker)
+
+    manager.mark_failed("demo/a", error="timeout")
+    assert manager.get_candidate_models("text", pool_type="primary") == [
+        "demo/b",
+        "demo/c",
+    ]
+
+    clock.now += 30
+    assert manager.get_candidate_models("text", pool_type="primary")[0] == "demo/a"
+    assert manager.begin_attempt("demo/a")
+    assert manager.get_candidate_models("text", pool_type="primary") == [
+        "demo/b",
+        "demo/c",
+    ]
+    manager.mark_success("demo/a", latency_ms=120)
+    assert manager.get_candidate_models("text", pool_type="primary")[0] == "demo/a"
+
+
+def test_hedge_delay_uses_first_token_percentile_within_bounds():
+    tracker = _tracker(_Clock())
+    manager = _manager(
+        {
+            "strategy": "priority",
+            "hedge": {
+                "percentile": 90,
+                "min_samples": 3,
+                "default_delay_ms": 2000,
+                "min_delay_ms": 500,
+                "max_delay_ms": 5000,
+            },
+        },
+        tracker,
+    )
+
+    # 样本不足时用默认截止时间。
+    assert manager.hedge_delay_sec("demo/a") == 2.0
+
+    for latency in (100, 900, 1200, 3000):
+        tracker.record_first_token("demo/a", latency)
+    assert manager.hedge_delay_sec("demo/a") == 3.0
+
+    tracker.record_first_token("demo/b", 50)
+    tracker.record_first_token("demo/b", 60)
+    tracker.record_first_token("demo/b", 70)
+    assert manager.hedge_delay_sec("demo/b") == 0.5
+
+
+def test_hedge_delay_is_none_unless_enabled():
+    tracker = _tracker(_Clock())
+    assert _manager({"strategy": "priority"}, tracker).hedge_delay_sec("demo/a") is None
+    assert (
+        _manager({"hedge": {"enabled": False}}, tracker).hedge_delay_sec("demo/a")
+        is None
+    )
+    assert _manager({"hedge": True}, tracker).hedge_delay_sec("demo/a") == 4.0
+
+
+def test_default_threshold_tolerates_a_single_failure():
+    tracker = ModelHealthTracker(snapshot_path=None, clock=_Clock())
+    tracker.record_failure("demo/a", error="timeout")
+    assert tracker.is_available("demo/a")
+
+
+def test_single_model_gets_early_probe_instead_of_no_candidates():
+    clock = _Clock()
+    tracker = _tracker(clock)
+    cfg = ModelsConfig(
+        model={"primary": "demo/a"},
+        models={"primary": {"demo/a": {}}},
+        providers={
+            "demo": ProviderConfig(
+                baseUrl="https://example.invalid/v1",
+                apiKey="test-key",
+                models=[ModelConfig(id="a", name="a", input=["text"])],
+            )
+        },
+    )
+    manager = ModelManager(cfg, "demo/a", health=tracker)
+
+    manager.mark_failed("demo/a", error="timeout")
+    assert not tracker.is_available("demo/a")
+    assert manager.get_candidate_models("text", pool_type="primary") == ["demo/a"]
+    assert manager.begin_attempt("demo/a")
+    # 试探进行中：其它请求不再放行。
+    assert manager.get_candidate_models("text", pool_type="primary") == []
+
+    manager.mark_failed("demo/a", error="still down")
+    row = tracker.snapshot()["demo/a"]
+    assert row["state"] == "open" and row["cooldown_sec"] == 60
+    assert manager.get_candidate_models("text", pool_type="primary") == ["demo/a"]
+    assert manager.begin_attempt("demo/a")
+    manager.mark_success("demo/a", latency_ms=100)
+    assert tracker.snapshot()["demo/a"]["state"] == "closed"
+
+
+def test_early_probe_picks_model_whose_cooldown_ends_first():
+    clock = _Clock()
+    tracker = _tracker(clock)
+    manager = _manager({"strategy": "priority"}, tracker)
+    for model_key in ("demo/b", "demo/a", "demo/c"):
+        tracker.record_failure(model_key)
+        clock.now += 5
+    assert not any(tracker.is_available(key) for key in ("demo/a", "demo/b", "demo/c"))
+
+    assert manager.get_candidate_models("text", pool_type="primary") == ["demo/b"]
+    assert tracker.snapshot()["demo/a"]["cooldown_remaining_sec"] == 20
@@ -0,0 +1,29 @@
+from core.output_capture import BoundedOutputCapture
+
+
+def test_small_output_is_kept_verbatim():
+    capture = BoundedOutputCapture(64)
+    capture.feed(b"hello\nwor")
+    capture.feed(b"ld\n")
+    capture.close()
+
+    assert capture.text() == "hello\nworld\n"
+    assert capture.truncated is False
+    assert capture.lines == 2
+    assert capture.last_line == "world"
+
+
+def test_marker_split_across_chunks_in_dropped_middle_is_kept():
+    capture = BoundedOutputCapture(20)
+    capture.feed(b"head-line\n" + b"x" * 500 + b"\n  tool_res")
+    capture.feed(b'ult={"ok": true}\n' + b"y" * 500)
+    capture.feed(b"\ntail-end")
+    capture.close()
+
+    text = capture.text()
+    assert text.startswith("head-line\n")
+    assert text.endswith("tail-end")
+    assert "...[truncated" in text
+    assert capture.marker_lines == ['tool_result={"ok": true}']
+    assert capture.lines == 5
+    assert capture.total_bytes > 1000
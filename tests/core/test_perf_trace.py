@@ -0,0 +1,108 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from core.perf_trace import LoopStallWatchdog, PerfRecorder, read_perf_snapshot
+import core.perf_trace as perf_trace_module
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_percentiles_follow_bucket_distribution():
+    recorder = PerfRecorder(clock=_Clock(), enabled=True)
+    for _ in range(90):
+        recorder.record("store.write", 3.0)
+    for _ in range(10):
+        recorder.record("store.write", 400.0, error=True)
+
+    stats = recorder.snapshot()["spans"]["store.write"]
+
+    assert stats["count"] == 100
+    assert stats["errors"] == 10
+    assert 2.0 <= stats["p50_ms"] <= 5.0
+    assert 250.0 <= stats["p99_ms"] <= 400.0
+    assert stats["max_ms"] == 400.0
+    assert stats["buckets"] == {"le_5": 90, "le_500": 10}
+
+
+def test_rolling_window_drops_expired_slots():
+    clock = _Clock()
+    recorder = PerfRecorder(window_sec=120, slot_sec=60, clock=clock, enabled=True)
+    recorder.record("llm.request", 10.0)
+    clock.now += 60
+    recorder.record("llm.request", 20.0)
+
+    assert recorder.snapshot()["spans"]["llm.request"]["count"] == 2
+
+    clock.now += 60
+    assert recorder.snapshot()["spans"]["llm.request"]["count"] == 1
+
+    clock.now += 120
+    assert recorder.snapshot()["spans"] == {}
+
+
+@pytest.mark.asyncio
+async def test_traced_decorator_records_async_calls_and_errors(monkeypatch):
+    recorder = PerfRecorder(clock=_Clock(), enabled=True)
+    monkeypatch.setattr(perf_trace_module, "perf_recorder", recorder)
+
+    @perf_trace_module.traced("handler.demo")
+    async def _handler(fail: bool) -> str:
+        await asyncio.sleep(0)
+        if fail:
+            raise RuntimeError("boom")
+        return "ok"
+
+    assert await _handler(False) == "ok"
+    with pytest.raises(RuntimeError):
+        await _handler(True)
+
+    stats = recorder.snapshot()["spans"]["handler.demo"]
+    assert stats["count"] == 2
+    assert stats["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_watchdog_samples_stack_of_blocking_call(tmp_path):
+    recorder = PerfRecorder(enabled=True)
+    snapshot_file = tmp_path / "perf_snapshot.json"
+    watchdog = LoopStallWatchdog(
+        recorder,
+        threshold_ms=50,
+        snapshot_path=lambda: snapshot_file,
+    )
+    watchdog.start()
+    await asyncio.sleep(0.05)
+
+    def _blocking_sync_io():
+        time.sleep(0.3)
+
+    _blocking_sync_io()
+    await asyncio.sleep(0.1)
+    await watchdog.stop()
+
+    snapshot = recorder.snapshot()
+    assert snapshot["spans"]["loop.stall"]["count"] >= 1
+    assert snapshot["stalls"]
+    sample = snapshot["stalls"][-1]
+    assert sample["duration_ms"] >= 200
+    assert any("_blocking_sync_io" in line for line in sample["stack"])
+
+    persisted = json.loads(snapshot_file.read_text(encoding="utf-8"))
+    assert persisted["stalls"]
+
+
+def test_read_perf_snapshot_tolerates_missing_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        perf_trace_module, "perf_snapshot_path", lambda: tmp_path / "missing.json"
+    )
+
+    assert read_perf_snapshot() == {"updated_at": "", "spans": {}, "stalls": []}
@@ -49,17 +49,22 @@ async def test_primitive_runtime_bash_timeout(tmp_path):
 async def test_primitive_runtime_bash_kills_subprocess_on_cancel(monkeypatch, tmp_path):
     runtime = PrimitiveRuntime(workspace_root=str(tmp_path))
 
+    class _FakeStream:
+        async def read(self, _size):
+            await asyncio.sleep(3600)
+            return b""
+
     class _FakeProcess:
         def __init__(self):
             self.returncode = None
             self.kill_called = False
-            self.communicate_calls = 0
+            self.wait_calls = 0
+            self.stdout = _FakeStream()
+            self.stderr = _FakeStream()
 
-        async def communicate(self):
-            self.communicate_calls += 1
-            if self.communicate_calls == 1:
-                await asyncio.sleep(3600)
-            return b"", b""
+        async def wait(self):
+            self.wait_calls += 1
+            return self.returncode
 
         def kill(self):
             self.kill_called = True
@@ -83,7 +88,7 @@ async def test_primitive_runtime_bash_kills_subprocess_on_cancel(monkeypatch, tm
         await task
 
     assert fake_process.kill_called is True
-    assert fake_process.communicate_calls >= 2
+    assert fake_process.wait_calls >= 1
 
 
 @pytest.mark.asyncio
@@ -123,7 +128,8 @@ async def test_primitive_runtime_bash_payload_text_is_truncated(tmp_path):
     assert result["ok"] is True
     assert len(result["data"]["output"]) < 40000
     assert result["payload"]["text"] == result["data"]["output"]
-    assert result["payload"]["text"].endswith("...[truncated]")
+    assert "...[truncated" in result["payload"]["text"]
+    assert result["payload"]["text"].endswith("[pass output_file to keep the full output]")
 
 
 @pytest.mark.asyncio
@@ -237,3 +243,73 @@ async def test_primitive_runtime_blocks_kernel_protected_bash_cwd(monkeypatch, t
 
     assert result["ok"] is False
     assert result["error_code"] == "policy_blocked"
+
+
+@pytest.mark.asyncio
+async def test_primitive_runtime_read_window_tail_and_byte_budget(tmp_path):
+    runtime = PrimitiveRuntime(workspace_root=str(tmp_path))
+    (tmp_path / "big.log").write_text(
+        "".join(f"第{index}行\r\n" for index in range(1, 3001)), encoding="utf-8"
+    )
+
+    middle = await runtime.read("big.log", start_line=2500, max_lines=2)
+    assert middle["ok"] is True
+    assert middle["data"]["content"] == " 2500: 第2500行\n 2501: 第2501行"
+    assert middle["data"]["end_line"] == 2501
+    assert middle["data"]["total_lines"] == 3000
+
+    tail = await runtime.read("big.log", max_lines=1, tail=True)
+    assert tail["data"]["start_line"] == 3000
+    assert tail["data"]["content"] == " 3000: 第3000行"
+
+    # 预算落在多字节字符中间时只保留完整字符。
+    cut = await runtime.read("big.log", start_line=10, max_lines=5, max_bytes=7)
+    assert cut["data"]["content"] == "   10: 第10"
+    assert cut["data"]["truncated"] is True
+    assert cut["data"]["end_line"] == 10
+
+    past_end = await runtime.read("big.log", start_line=5000)
+    assert past_end["ok"] is True
+    assert past_end["data"]["content"] == ""
+    assert past_end["data"]["end_line"] == 3000
+
+
+@pytest.mark.asyncio
+async def test_primitive_runtime_bash_keeps_head_tail_markers_and_spills(
+    monkeypatch, tmp_path
+):
+    monkeypatch.setattr("core.primitive_runtime.BASH_PROGRESS_INTERVAL_SEC", 0.0)
+    runtime = PrimitiveRuntime(workspace_root=str(tmp_path))
+    image_path = (tmp_path / "chart.png").resolve()
+    image_path.write_bytes(b"png")
+    script = tmp_path / "noisy.py"
+    script.write_text(
+        "for i in range(20000):\n"
+        "    print(f'line-{i}')\n"
+        "    if i == 10000:\n"
+        f"        print('saved_file={image_path}')\n",
+        encoding="utf-8",
+    )
+    progress = []
+
+    async def _on_progress(event):
+        progress.append(event)
+
+    result = await runtime.bash(
+        "python noisy.py",
+        output_file="logs/full.log",
+        progress_callback=_on_progress,
+    )
+
+    output = result["data"]["output"]
+    assert result["ok"] is True
+    assert output.startswith("line-0\n")
+    assert "line-19999" in output
+    assert "line-10000" not in output
+    assert "...[truncated" in output
+    assert result["payload"]["files"][0]["path"] == str(image_path)
+    full = (tmp_path / "logs" / "full.log").read_text(encoding="utf-8")
+    assert "line-10000\n" in full
+    assert result["data"]["output_file"] == str(tmp_path / "logs" / "full.log")
+    assert progress and progress[-1]["lines"] > 0
+    assert progress[-1]["last_line"].startswith("line-")
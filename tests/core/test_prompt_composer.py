@@ -1,9 +1,20 @@
 from pathlib import Path
 
+import pytest
+
 from core.prompt_composer import prompt_composer
+from core.prompt_layout import prompt_layout
 from core.soul_store import SoulPayload
 
 
+@pytest.fixture(autouse=True)
+def _reset_prompt_layout():
+    # 用例会 monkeypatch 段构建函数，清掉上一个用例留下的 memo。
+    prompt_layout.reset()
+    yield
+    prompt_layout.reset()
+
+
 def test_prompt_composer_minimal_shape():
     text = prompt_composer.compose_base(
         runtime_user_id="123",
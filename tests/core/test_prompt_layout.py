@@ -0,0 +1,154 @@
+import pytest
+
+from core.prompt_composer import prompt_composer
+from core.prompt_layout import (
+    TIER_AGENT,
+    TIER_STATIC,
+    TIER_TURN,
+    TIER_USER,
+    PromptLayout,
+    PromptSegment,
+    prompt_layout,
+)
+from core.soul_store import SoulPayload
+
+
+@pytest.fixture(autouse=True)
+def _reset_prompt_layout():
+    prompt_layout.reset()
+    yield
+    prompt_layout.reset()
+
+
+def test_render_orders_segments_by_stability_tier():
+    layout = PromptLayout()
+
+    text = layout.render(
+        [
+            PromptSegment("catalog", TIER_TURN, "catalog"),
+            PromptSegment("user", TIER_USER, "user"),
+            PromptSegment("default", TIER_STATIC, "default"),
+            PromptSegment("empty", TIER_AGENT, "  "),
+            PromptSegment("contract", TIER_STATIC, "contract"),
+        ],
+        scope="s",
+    )
+
+    assert text == "default\n\ncontract\n\nuser\n\ncatalog"
+
+
+def test_render_tracks_stable_prefix_and_segment_changes():
+    layout = PromptLayout()
+    tools = [{"name": "read", "parameters": {"type": "object"}}]
+
+    def _segments(turn_text: str):
+        return [
+            PromptSegment("default", TIER_STATIC, "静态说明" * 10),
+            PromptSegment("catalog", TIER_TURN, turn_text),
+        ]
+
+    layout.render(_segments("a"), scope="u1", tools=tools)
+    layout.render(_segments("b"), scope="u1", tools=tools)
+
+    snapshot = layout.snapshot()
+    segments = snapshot["segments"]
+    assert list(segments) == ["tools", "default", "catalog"]
+    assert segments["catalog"]["changes"] == 1
+    assert segments["default"]["changes"] == 0
+    assert segments["default"]["tokens"] == 40
+    assert snapshot["stable_prefix_tokens"] == (
+        segments["tools"]["tokens"] + segments["default"]["tokens"]
+    )
+
+
+def test_memoized_builds_once_per_fingerprint():
+    layout = PromptLayout()
+    calls: list[str] = []
+
+    def _build(value: str):
+        calls.append(value)
+        return value.upper()
+
+    assert layout.memoized("catalog", {"skills": "x"}, lambda: _build("a")) == "A"
+    assert layout.memoized("catalog", {"skills": "x"}, lambda: _build("b")) == "A"
+    assert layout.memoized("catalog", {"skills": "y"}, lambda: _build("c")) == "C"
+
+    assert calls == ["a", "c"]
+    stats = layout.snapshot()["segments"]["catalog"]
+    assert stats["memo_lookups"] == 3
+    assert stats["memo_hits"] == 1
+
+
+def test_compose_base_memoizes_catalog_and_keeps_volatile_segments_last(monkeypatch):
+    monkeypatch.setattr(prompt_composer, "_load_ikaros_agents_doc", lambda: "")
+    monkeypatch.setattr(
+        "core.prompt_composer.soul_store.resolve_for_runtime_user",
+        lambda _user_id: SoulPayload(
+            agent_kind="core-ikaros",
+            agent_id="core-ikaros",
+            path="/tmp/SOUL.MD",
+            content="# Ikaros Core SOUL",
+            updated_at="2026-03-13T00:00:00+08:00",
+            latest_version_id="",
+        ),
+    )
+    monkeypatch.setattr(
+        "core.prompt_composer.channel_user_store.load_user_md",
+        lambda **_kwargs: "# USER\n- 称呼偏好: 老板",
+    )
+    monkeypatch.setattr(
+        prompt_composer,
+        "_load_ikaros_memory_snapshot",
+        lambda **_kwargs: "- 经验一条",
+    )
+    monkeypatch.setattr(
+        prompt_composer,
+        "_build_ikaros_tool_guidance",
+        lambda **_kwargs: "- 用当前工具完成任务。",
+    )
+    catalog_calls: list[object] = []
+
+    def _catalog(**kwargs):
+        catalog_calls.append(kwargs["allowed_skill_names"])
+        return "【可用技能目录】\n- `" + "`, `".join(kwargs["allowed_skill_names"]) + "`"
+
+    monkeypatch.setattr(prompt_composer, "_build_skill_catalog", _catalog)
+
+    def _compose(skills):
+        return prompt_composer.compose_base(
+            runtime_user_id="u-1",
+            platform="telegram",
+            mode="ikaros",
+            allowed_skill_names=skills,
+        )
+
+    first = _compose(["web_search", "stock_watch"])
+    second = _compose(["stock_watch", "web_search"])
+    third = _compose(["web_search"])
+
+    assert first == second
+    assert catalog_calls == [
+        ["stock_watch", "web_search"],
+        ["web_search"],
+    ]
+    assert (
+        first.index("【SOUL】")
+        < first.index("【注意事项】")
+        < first.index("【USER】")
+        < first.index("【IKAROS 经验记忆】")
+        < first.index("【可用技能目录】")
+    )
+    assert first.split("【可用技能目录】")[0] == third.split("【可用技能目录】")[0]
+
+    # mode prompt 保持在 SOUL 之后、USER 之前。
+    subagent = prompt_composer.compose_base(
+        runtime_user_id="u-1",
+        platform="telegram",
+        mode="subagent",
+        allowed_skill_names=["web_search"],
+    )
+    assert (
+        subagent.index("【SOUL】")
+        < subagent.index("【Subagent 执行约束】")
+        < subagent.index("【USER】")
+    )
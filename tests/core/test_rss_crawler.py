@@ -0,0 +1,138 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import httpx
+import pytest
+
+from extension.skills.learned.rss_subscribe.scripts import crawler
+
+
+def _load_execute():
+    path = (
+        Path(__file__).resolve().parents[2]
+        / "extension"
+        / "skills"
+        / "learned"
+        / "rss_subscribe"
+        / "scripts"
+        / "execute.py"
+    )
+    spec = importlib.util.spec_from_file_location("rss_subscribe_execute_test", path)
+    assert spec and spec.loader
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _rss(title: str, items: list[str]) -> bytes:
+    body = "".join(
+        f"<item><title>{item}</title><link>https://example.com/{item}</link>"
+        f"<description>{item} 正文</description></item>"
+        for item in items
+    )
+    return (
+        '<?xml version="1.0"?><rss version="2.0"><channel>'
+        f"<title>{title}</title>{body}</channel></rss>"
+    ).encode("utf-8")
+
+
+class _FeedServer:
+    def __init__(self, feeds: dict[str, bytes]):
+        self.feeds = feeds
+        self.in_flight: dict[str, int] = {}
+        self.max_in_flight: dict[str, int] = {}
+        self.requests = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        host = request.url.host
+        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        self.max_in_flight[host] = max(
+            self.max_in_flight.get(host, 0), self.in_flight[host]
+        )
+        try:
+            await asyncio.sleep(0.01)
+            etag = f'"{request.url.path}"'
+            if request.headers.get("if-none-match") == etag:
+                return httpx.Response(304)
+            return httpx.Response(
+                200, content=self.feeds[str(request.url)], headers={"ETag": etag}
+            )
+        finally:
+            self.in_flight[host] -= 1
+
+
+@pytest.fixture
+def feed_server(monkeypatch):
+    server = _FeedServer({})
+    real_client = httpx.AsyncClient
+
+    def _client(**kwargs):
+        kwargs.pop("limits", None)
+        return real_client(transport=httpx.MockTransport(server.handler), **kwargs)
+
+    monkeypatch.setattr(crawler.httpx, "AsyncClient", _client)
+    monkeypatch.setattr(crawler, "RSS_FETCH_PER_HOST", 2)
+    return server
+
+
+@pytest.mark.asyncio
+async def test_crawl_feeds_limits_per_host_and_reuses_cache_on_304(feed_server):
+    module = _load_execute()
+    urls = [f"https://a.example.com/feed{idx}" for idx in range(6)]
+    urls.append("https://b.example.com/feed")
+    for url in urls:
+        feed_server.feeds[url] = _rss(url, ["one", "two"])
+
+    first_stats = crawler.CrawlStats()
+    first = await crawler.crawl_feeds(
+        urls, normalize_entry=module._normalize_entry, stats=first_stats
+    )
+    assert {result.status for result in first.values()} == {200}
+    assert feed_server.max_in_flight["a.example.com"] == 2
+    assert first[urls[0]].entries[0]["title"] == "one"
+    assert first[urls[0]].entries[0]["content"] == "one 正文"
+
+    second_stats = crawler.CrawlStats()
+    second = await crawler.crawl_feeds(
+        urls, normalize_entry=module._normalize_entry, stats=second_stats
+    )
+    assert {result.status for result in second.values()} == {304}
+    assert second[urls[0]].entries == first[urls[0]].entries
+    assert second_stats.to_dict()["not_modified_ratio"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_fetch_feed_updates_summarizes_new_entries_concurrently(
+    feed_server, monkeypatch
+):
+    module = _load_execute()
+    feed_server.feeds["https://c.example.com/feed"] = _rss("A", ["new", "old"])
+    feed_server.feeds["https://d.example.com/feed"] = _rss("B", ["b-new", "b-old"])
+    old_hash = module._get_entry_hash({"title": "old"}, "")
+    b_old_hash = module._get_entry_hash({"title": "b-old"}, "")
+    subscriptions = [
+        {"id": 1, "feed_url": "https://c.example.com/feed", "last_entry_hash": old_hash},
+        {"id": 2, "feed_url": "https://d.example.com/feed", "last_entry_hash": b_old_hash},
+    ]
+    running = 0
+    peak = 0
+
+    async def _summary(title, content, link):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return f"摘要:{title}"
+
+    monkeypatch.setattr(module, "generate_entry_summary", _summary)
+
+    _, pending, _ = await module._fetch_feed_updates(subscriptions=subscriptions)
+
+    assert sorted(item["title"] for item in pending) == ["b-new", "new"]
+    assert {item["summary"] for item in pending} == {"摘要:new", "摘要:b-new"}
+    assert peak == 2
+    assert crawler.last_crawl_stats["new_entries"] == 2
+    assert crawler.last_crawl_stats["summaries"] == 2
@@ -4,9 +4,11 @@ import pytest
 
 from core.state_store import (
     get_session_entries,
+    replace_session_entries,
     save_message,
     search_messages,
 )
+from core.token_estimator import estimate_tokens
 from handlers.service_handlers import compact_command
 from services.session_compaction_service import (
     SESSION_MEMORY_PREFIX,
@@ -76,10 +78,201 @@ async def test_session_compaction_rolls_older_dialog_into_single_summary(
     assert result["ok"] is True
     assert result["compacted"] is True
     assert result["compressed_count"] == 95
-    assert len(dialog_rows) == 10
-    assert rows[0]["content"].startswith(SESSION_MEMORY_PREFIX)
-    assert rows[1]["content"].startswith(SESSION_SUMMARY_PREFIX)
-    assert rows[2]["content"] == "第 95 条消息"
+    assert result["kept_recent"] == 10
+    # 会话文件只追加不重写，摘要与高水位单独持久化。
+    assert len(dialog_rows) == 105
+
+    history = await get_user_context(
+        _DummyContext(session_id),
+        "u-1",
+        auto_compact=False,
+    )
+    texts = [item["parts"][0]["text"] for item in history]
+    assert texts[0].startswith(SESSION_MEMORY_PREFIX)
+    assert texts[1].startswith(SESSION_SUMMARY_PREFIX)
+    assert texts[2] == "第 95 条消息"
+    assert len(texts) == 12
+
+
+@pytest.mark.asyncio
+async def test_session_compaction_only_summarizes_rows_after_watermark(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    session_id = "sess-incremental"
+    for index in range(30):
+        role = "user" if index % 2 == 0 else "model"
+        await save_message("u-1", role, f"消息 {index}", session_id)
+
+    calls: list[dict] = []
+
+    async def _fake_summary(**kwargs):
+        calls.append(kwargs)
+        return f"- 第 {len(calls)} 版摘要"
+
+    monkeypatch.setattr(session_compaction_service, "_summarize_history", _fake_summary)
+
+    first = await session_compaction_service.compact_session(
+        user_id="u-1", session_id=session_id, force=True
+    )
+    for index in range(30, 44):
+        role = "user" if index % 2 == 0 else "model"
+        await save_message("u-1", role, f"消息 {index}", session_id)
+    second = await session_compaction_service.compact_session(
+        user_id="u-1", session_id=session_id, force=True
+    )
+
+    assert first["compressed_count"] == 20
+    assert second["compressed_count"] == 14
+    assert [row["content"] for row in calls[1]["older_rows"]] == [
+        f"消息 {index}" for index in range(20, 34)
+    ]
+    assert calls[1]["previous_summary"] == f"{SESSION_SUMMARY_PREFIX}\n- 第 1 版摘要"
+    state = session_compaction_service.load_state("u-1", session_id)
+    assert state.summarized_rows == 34
+
+
+@pytest.mark.asyncio
+async def test_get_user_context_schedules_background_compaction_by_tokens(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        "services.session_compaction_service.SESSION_COMPACTION_TRIGGER_TOKENS", 1000
+    )
+
+    session_id = "sess-tokens"
+    for index in range(16):
+        role = "user" if index % 2 == 0 else "model"
+        await save_message("u-1", role, f"长消息 {index} " + "内容" * 60, session_id)
+
+    async def _fake_summary(**kwargs):
+        return "- 长对话摘要"
+
+    async def _fake_load_snapshot(*_args, **_kwargs):
+        return ""
+
+    monkeypatch.setattr(session_compaction_service, "_summarize_history", _fake_summary)
+    monkeypatch.setattr(
+        "user_context.long_term_memory.load_user_snapshot",
+        _fake_load_snapshot,
+    )
+
+    ctx = _DummyContext(session_id)
+    before = await get_user_context(ctx, "u-1")
+    assert len(before) == 16
+    await session_compaction_service.wait_idle()
+
+    after = await get_user_context(ctx, "u-1", auto_compact=False)
+    assert after[0]["parts"][0]["text"].startswith(SESSION_SUMMARY_PREFIX)
+    assert len(after) == 11
+    assert session_compaction_service.load_state("u-1", session_id).summarized_rows == 6
+
+
+@pytest.mark.asyncio
+async def test_get_user_context_resets_watermark_after_session_replace(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    session_id = "sess-replaced"
+    for index in range(30):
+        role = "user" if index % 2 == 0 else "model"
+        await save_message("u-1", role, f"旧消息 {index}", session_id)
+
+    async def _fake_summary(**kwargs):
+        return "- 旧摘要"
+
+    async def _fake_load_snapshot(*_args, **_kwargs):
+        return ""
+
+    monkeypatch.setattr(session_compaction_service, "_summarize_history", _fake_summary)
+    monkeypatch.setattr(
+        "user_context.long_term_memory.load_user_snapshot",
+        _fake_load_snapshot,
+    )
+    await session_compaction_service.compact_session(
+        user_id="u-1", session_id=session_id, force=True
+    )
+    assert session_compaction_service.load_state("u-1", session_id).summarized_rows == 20
+
+    # 整体替换后行数仍多于高水位，但边界行已经不是原来那条。
+    await replace_session_entries(
+        "u-1",
+        session_id,
+        [
+            {"role": "user" if index % 2 == 0 else "model", "content": f"新消息 {index}"}
+            for index in range(24)
+        ],
+    )
+    history = await get_user_context(
+        _DummyContext(session_id), "u-1", include_hidden_system=False, auto_compact=False
+    )
+
+    assert [item["parts"][0]["text"] for item in history] == [
+        f"新消息 {index}" for index in range(24)
+    ]
+    assert session_compaction_service.load_state("u-1", session_id).summarized_rows == 0
+
+
+@pytest.mark.asyncio
+async def test_get_user_context_loads_history_within_token_budget(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    session_id = "sess-budget"
+    for index in range(12):
+        role = "user" if index % 2 == 0 else "model"
+        await save_message("u-1", role, f"预算消息 {index} " + "内容" * 100, session_id)
+
+    async def _fake_load_snapshot(*_args, **_kwargs):
+        return ""
+
+    monkeypatch.setattr(
+        "user_context.long_term_memory.load_user_snapshot",
+        _fake_load_snapshot,
+    )
+    monkeypatch.setattr("user_context.history_token_budget", lambda _model: 700)
+    history = await get_user_context(
+        _DummyContext(session_id), "u-1", include_hidden_system=False, auto_compact=False
+    )
+
+    texts = [item["parts"][0]["text"] for item in history]
+    assert 1 <= len(texts) < 12
+    assert texts[-1].startswith("预算消息 11 ")
+    assert sum(estimate_tokens(text) for text in texts) <= 700
+
+
+@pytest.mark.asyncio
+async def test_get_user_context_compacts_when_history_exceeds_token_budget(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+
+    session_id = "sess-budget-compact"
+    for index in range(12):
+        role = "user" if index % 2 == 0 else "model"
+        await save_message("u-1", role, f"预算消息 {index} " + "内容" * 100, session_id)
+
+    async def _fake_summary(**kwargs):
+        return "- 预算摘要"
+
+    async def _fake_load_snapshot(*_args, **_kwargs):
+        return ""
+
+    monkeypatch.setattr(session_compaction_service, "_summarize_history", _fake_summary)
+    monkeypatch.setattr(
+        "user_context.long_term_memory.load_user_snapshot",
+        _fake_load_snapshot,
+    )
+    # 预算远低于全局阈值，截断后的历史本身永远不会超过 24000 token。
+    monkeypatch.setattr("user_context.history_token_budget", lambda _model: 700)
+    await get_user_context(_DummyContext(session_id), "u-1", include_hidden_system=False)
+    await session_compaction_service.wait_idle()
+
+    assert session_compaction_service.load_state("u-1", session_id).summarized_rows == 2
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,89 @@
+import json
+import types
+from pathlib import Path
+
+from extension.skills.registry import SkillRegistry
+
+
+def _write_skill(root: Path, source: str, name: str, description: str = "demo") -> Path:
+    skill_dir = root / source / name
+    skill_dir.mkdir(parents=True, exist_ok=True)
+    skill_file = skill_dir / "SKILL.md"
+    skill_file.write_text(
+        f"""---
+api_version: v3
+name: {name}
+description: {description}
+entrypoint: scripts/execute.py
+---
+
+| 参数名 | 类型 | 必填 | 说明 |
+| :--- | :--- | :--- | :--- |
+| `url` | string | 是 | 目标网页 URL |
+""",
+        encoding="utf-8",
+    )
+    return skill_file
+
+
+def test_persisted_index_reparses_only_changed_skills(tmp_path: Path):
+    root = tmp_path / "skills"
+    index_path = tmp_path / "skill_index.json"
+    _write_skill(root, "builtin", "alpha")
+    _write_skill(root, "learned", "beta")
+
+    first = SkillRegistry(skills_dir=str(root), index_path=index_path)
+    first.scan_skills()
+    assert first.last_scan_stats["reparsed"] == 2
+    persisted = json.loads(index_path.read_text(encoding="utf-8"))
+    assert len(persisted["entries"]) == 2
+
+    second = SkillRegistry(skills_dir=str(root), index_path=index_path)
+    indexed = second.scan_skills()
+    assert second.last_scan_stats["reparsed"] == 0
+    assert indexed["alpha"]["input_schema"]["required"] == ["url"]
+    assert indexed["beta"]["source"] == "learned"
+
+    _write_skill(root, "learned", "beta", description="beta changed")
+    third = SkillRegistry(skills_dir=str(root), index_path=index_path)
+    assert third.scan_skills()["beta"]["description"] == "beta changed"
+    assert third.last_scan_stats["reparsed"] == 1
+
+
+def test_refresh_detects_new_edited_and_removed_skill_files(tmp_path: Path):
+    root = tmp_path / "skills"
+    _write_skill(root, "builtin", "alpha")
+    (root / "learned" / "pending").mkdir(parents=True)
+
+    loader = SkillRegistry(skills_dir=str(root), index_path=tmp_path / "index.json")
+    assert set(loader.refresh_if_changed()) == {"alpha"}
+    assert loader.refresh_if_changed() is loader._skill_index
+    assert loader.last_scan_stats["reparsed"] == 1
+
+    _write_skill(root, "learned", "pending")
+    assert set(loader.refresh_if_changed()) == {"alpha", "pending"}
+    assert loader.last_scan_stats["reparsed"] == 1
+
+    _write_skill(root, "builtin", "alpha", description="alpha with a longer description")
+    assert loader.get_skill("alpha")["description"] == "alpha with a longer description"
+    assert loader.last_scan_stats["reparsed"] == 1
+
+    (root / "learned" / "pending" / "SKILL.md").unlink()
+    assert set(loader.refresh_if_changed()) == {"alpha"}
+    assert loader.last_scan_stats["removed"] == 1
+
+
+def test_register_extensions_defers_plain_script_imports(tmp_path: Path):
+    root = tmp_path / "skills"
+    _write_skill(root, "builtin", "plain")
+    scripts_dir = root / "builtin" / "plain" / "scripts"
+    scripts_dir.mkdir()
+    (scripts_dir / "execute.py").write_text("VALUE = 42\n", encoding="utf-8")
+
+    loader = SkillRegistry(skills_dir=str(root), index_path=tmp_path / "index.json")
+    loader._register_skill_management = lambda runtime: None
+    loader.register_extensions(types.SimpleNamespace())
+
+    assert loader._loaded_modules == {}
+    module = loader.import_skill_module("plain")
+    assert module is not None and module.VALUE == 42
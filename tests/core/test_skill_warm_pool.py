@@ -0,0 +1,165 @@
+import asyncio
+import os
+import sys
+import textwrap
+from types import SimpleNamespace
+
+import pytest
+
+from core.primitive_runtime import PrimitiveRuntime
+from core.skill_warm_pool import SKILL_WARM_POOL_ENABLED, SkillWarmPool, match_skill_command
+import core.primitive_runtime as primitive_runtime_module
+import core.skill_warm_pool as warm_pool_module
+
+_SCRIPT = textwrap.dedent(
+    """
+    import json, os, sys
+    # skill_cli contract: run_execute_cli
+    previous = os.environ.get("WARM_POOL_LEAK", "")
+    os.environ["WARM_POOL_LEAK"] = "leaked"
+    print("argv=" + json.dumps(sys.argv))
+    print("cwd=" + os.getcwd())
+    print("user=" + os.environ.get("X_BOT_RUNTIME_USER_ID", ""))
+    print("previous=" + previous)
+    print("tool_result=" + json.dumps({"ok": "--fail" not in sys.argv, "text": "done"}))
+    sys.exit(4 if "--fail" in sys.argv else 0)
+    """
+)
+
+
+def _make_skill(tmp_path, body: str = _SCRIPT):
+    scripts = tmp_path / "skills" / "demo" / "scripts"
+    scripts.mkdir(parents=True)
+    (scripts / "execute.py").write_text(body, encoding="utf-8")
+    return tmp_path / "skills" / "demo"
+
+
+def test_match_accepts_exports_cd_and_quoted_args(tmp_path):
+    skill_dir = _make_skill(tmp_path)
+    command = (
+        "export X_BOT_RUNTIME_USER_ID='u 1' X_BOT_RUNTIME_PLATFORM=web && "
+        f"cd skills/demo && {sys.executable} scripts/execute.py --params-json '{{\"a\": 1}}'"
+    )
+
+    route = match_skill_command(command, cwd=str(tmp_path))
+
+    assert route is not None
+    assert route.cwd == str(skill_dir)
+    assert route.script == str(skill_dir / "scripts" / "execute.py")
+    assert route.argv == ["scripts/execute.py", "--params-json", '{"a": 1}']
+    assert route.env == {"X_BOT_RUNTIME_USER_ID": "u 1", "X_BOT_RUNTIME_PLATFORM": "web"}
+
+
+@pytest.mark.parametrize(
+    "suffix",
+    [
+        " | head -n 5",
+        " > out.txt",
+        " --query $HOME",
+        ' --query "$(whoami)"',
+        " ; rm -rf build",
+        " *.py",
+    ],
+)
+def test_match_rejects_commands_that_need_a_shell(tmp_path, suffix):
+    _make_skill(tmp_path)
+    command = f"cd skills/demo && {sys.executable} scripts/execute.py{suffix}"
+
+    assert match_skill_command(command, cwd=str(tmp_path)) is None
+
+
+def test_match_rejects_scripts_without_skill_cli_contract(tmp_path):
+    _make_skill(tmp_path, body="print('plain script')\n")
+
+    command = f"cd skills/demo && {sys.executable} scripts/execute.py"
+
+    assert match_skill_command(command, cwd=str(tmp_path)) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not SKILL_WARM_POOL_ENABLED, reason="needs fork + SCM_RIGHTS")
+async def test_bash_routes_skill_cli_through_warm_pool(monkeypatch, tmp_path):
+    monkeypatch.setenv("SKILL_WARM_POOL_PRELOAD", "json")
+    _make_skill(tmp_path)
+    pool = SkillWarmPool(enabled=True)
+    monkeypatch.setattr(primitive_runtime_module, "skill_warm_pool", pool)
+    runtime = PrimitiveRuntime(workspace_root=str(tmp_path))
+    command = (
+        "export X_BOT_RUNTIME_USER_ID=42 && cd skills/demo && "
+        f"{sys.executable} scripts/execute.py --flag 'a b'"
+    )
+
+    try:
+        cold = await runtime.bash(command)
+        if pool._starting is not None:
+            await asyncio.wait_for(pool._starting, timeout=30)
+        assert pool.ready is True
+
+        spawned = []
+        original_spawn = pool.spawn
+
+        async def _tracking_spawn(route):
+            process = await original_spawn(route)
+            spawned.append(process.pid)
+            return process
+
+        monkeypatch.setattr(pool, "spawn", _tracking_spawn)
+        warm = await runtime.bash(command)
+        again = await runtime.bash(command)
+        failed = await runtime.bash(command + " --fail")
+    finally:
+        await pool.close()
+
+    assert len(spawned) == 3
+    assert warm["data"]["output"] == cold["data"]["output"]
+    assert warm["data"]["exit_code"] == cold["data"]["exit_code"] == 0
+    output = warm["data"]["output"]
+    assert 'argv=["scripts/execute.py", "--flag", "a b"]' in output
+    assert f"cwd={tmp_path / 'skills' / 'demo'}" in output
+    assert "user=42" in output
+    # 每次调用都在独立进程中运行，上一次修改的环境变量不会泄漏。
+    assert "previous=\n" in again["data"]["output"] + "\n"
+    assert warm["text"] == "done"
+    assert failed["ok"] is False
+    assert failed["data"]["exit_code"] == 4
+    assert "WARM_POOL_LEAK" not in os.environ
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not SKILL_WARM_POOL_ENABLED, reason="needs fork + SCM_RIGHTS")
+async def test_unacknowledged_warm_spawn_is_not_rerun_through_shell(monkeypatch, tmp_path):
+    _make_skill(tmp_path)
+    socket_path = str(tmp_path / "fs.sock")
+    received: list[bytes] = []
+
+    async def _silent_forkserver(reader, writer):
+        # 收下请求但永远不回 hello，模拟子进程已 fork 却没有确认。
+        received.append(await reader.read(65536))
+        await asyncio.sleep(5)
+        writer.close()
+
+    server = await asyncio.start_unix_server(_silent_forkserver, path=socket_path)
+    pool = SkillWarmPool(enabled=True)
+    pool._process = SimpleNamespace(returncode=None)
+    pool._env_signature = warm_pool_module._env_signature(dict(os.environ))
+    pool._socket_path = socket_path
+    monkeypatch.setattr(warm_pool_module, "_ACK_TIMEOUT_SEC", 0.2)
+    monkeypatch.setattr(primitive_runtime_module, "skill_warm_pool", pool)
+    shell_calls: list[str] = []
+
+    async def _shell(command, **_kwargs):
+        shell_calls.append(command)
+        raise AssertionError("must not fall back to the shell")
+
+    monkeypatch.setattr(primitive_runtime_module.asyncio, "create_subprocess_shell", _shell)
+    runtime = PrimitiveRuntime(workspace_root=str(tmp_path))
+    try:
+        result = await runtime.bash(f"cd skills/demo && {sys.executable} scripts/execute.py")
+    finally:
+        pool._process = None
+        server.close()
+        await server.wait_closed()
+
+    assert result["ok"] is False
+    assert result["error_code"] == "exec_failed"
+    assert received and shell_calls == []
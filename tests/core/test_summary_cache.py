@@ -0,0 +1,189 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+
+import core.summary_cache as summary_cache_module
+from core.summary_cache import SummaryCache, summary_cache_key
+
+
+def _content(label: str) -> str:
+    return f"{label}-{uuid.uuid4().hex}"
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_single_flight_and_persistent_hit():
+    cache = SummaryCache()
+    content = _content("正文")
+    calls = 0
+
+    async def _compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return "摘要"
+
+    results = await asyncio.gather(
+        *(
+            cache.get_or_compute(
+                "rss_entry", content, model="p/m", prompt_version="v1", compute=_compute
+            )
+            for _ in range(5)
+        )
+    )
+    assert results == ["摘要"] * 5
+    assert calls == 1
+
+    # 只差空白的内容命中同一个键；新实例模拟重启后的磁盘命中。
+    fresh = SummaryCache()
+    again = await fresh.get_or_compute(
+        "rss_entry",
+        f"  {content}\n",
+        model="p/m",
+        prompt_version="v1",
+        compute=_compute,
+    )
+    assert again == "摘要"
+    assert calls == 1
+
+    stats = cache.snapshot()["kinds"]["rss_entry"]
+    assert stats == {"hits": 0, "misses": 1, "joined": 4, "stores": 1, "errors": 0}
+    assert "命中率 `100.0%`" in fresh.render_summary()
+
+    other_version = await fresh.get_or_compute(
+        "rss_entry", content, model="p/m", prompt_version="v2", compute=_compute
+    )
+    assert other_version == "摘要"
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_get_or_compute_does_not_cache_failures_or_empty_results():
+    cache = SummaryCache()
+    content = _content("失败")
+
+    async def _boom():
+        raise RuntimeError("upstream down")
+
+    async def _empty():
+        return "  "
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute(
+            "web_page", content, model="p/m", prompt_version="v1", compute=_boom
+        )
+    await cache.get_or_compute(
+        "web_page", content, model="p/m", prompt_version="v1", compute=_empty
+    )
+    key = summary_cache_key("web_page", content, model="p/m", prompt_version="v1")
+    assert cache.get(key) is None
+    assert cache.snapshot()["kinds"]["web_page"]["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_joiners_recompute_when_owner_is_cancelled():
+    cache = SummaryCache()
+    content = _content("取消")
+    started = asyncio.Event()
+    calls = 0
+
+    async def _slow():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(10)
+        return "不会返回"
+
+    async def _fast():
+        nonlocal calls
+        calls += 1
+        return "接手后的摘要"
+
+    owner = asyncio.create_task(
+        cache.get_or_compute(
+            "web_page", content, model="p/m", prompt_version="v1", compute=_slow
+        )
+    )
+    await started.wait()
+    joiner = asyncio.create_task(
+        cache.get_or_compute(
+            "web_page", content, model="p/m", prompt_version="v1", compute=_fast
+        )
+    )
+    await asyncio.sleep(0.01)
+    owner.cancel()
+
+    assert await joiner == "接手后的摘要"
+    with pytest.raises(asyncio.CancelledError):
+        await owner
+    assert calls == 2
+
+
+def test_put_evicts_expired_and_least_recently_used(monkeypatch):
+    cache = SummaryCache()
+    cache.clear()
+    monkeypatch.setattr(summary_cache_module, "SUMMARY_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(summary_cache_module, "SUMMARY_CACHE_TTL_SEC", 60)
+
+    cache.put("k-old", "t", "old")
+    with cache._connect() as conn:
+        conn.execute(
+            "UPDATE summary_cache SET created_at = ? WHERE cache_key = 'k-old'",
+            (time.time() - 120,),
+        )
+    assert cache.get("k-old") is None
+
+    cache.put("k1", "t", "one")
+    time.sleep(0.01)
+    cache.put("k2", "t", "two")
+    time.sleep(0.01)
+    assert cache.get("k1") == "one"
+    cache.put("k3", "t", "three")
+
+    assert cache.get("k2") is None
+    assert cache.get("k1") == "one"
+    assert cache.get("k3") == "three"
+    assert cache.disk_usage()["entries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_web_summary_cache_ignores_fetcher_label_and_generates_off_loop(
+    monkeypatch,
+):
+    import threading
+
+    from services import web_summary_service
+
+    body = _content("页面正文")
+    pages = iter(
+        [
+            f"【HTTP 原始页面内容】\n\n{body}",
+            f"【通过 Jina Reader 获取的页面 Markdown 快照】\n\n{body}",
+        ]
+    )
+    threads: list[int] = []
+
+    async def _fetch(_url):
+        return next(pages)
+
+    def _generate_sync(**_kwargs):
+        threads.append(threading.get_ident())
+        return "网页摘要"
+
+    monkeypatch.setattr(web_summary_service, "fetch_webpage_content", _fetch)
+    monkeypatch.setattr(web_summary_service, "generate_text_sync", _generate_sync)
+    monkeypatch.setattr(
+        web_summary_service, "select_model_for_role", lambda _role: "p/m"
+    )
+    monkeypatch.setattr(
+        web_summary_service, "get_client_for_model", lambda *_a, **_k: object()
+    )
+    monkeypatch.setattr(web_summary_service, "summary_cache", SummaryCache())
+
+    first = await web_summary_service.summarize_webpage("https://e.com/a")
+    second = await web_summary_service.summarize_webpage("https://e.com/a")
+
+    assert "网页摘要" in first and first == second
+    assert len(threads) == 1
+    assert threads[0] != threading.get_ident()
@@ -0,0 +1,29 @@
+import pytest
+
+from core.tool_broker import ToolBroker
+
+
+class _RecordingRuntime:
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    async def read(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"ok": True}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [("false", False), ("0", False), (" TRUE ", True), ("yes", True), (True, True), (None, False)],
+)
+async def test_read_parses_string_tail_flags(raw, expected):
+    runtime = _RecordingRuntime()
+    broker = ToolBroker(runtime=runtime)
+    args = {"path": "/tmp/log.txt"}
+    if raw is not None:
+        args["tail"] = raw
+
+    await broker.execute_core_tool(name="read", args=args, execution_policy="")
+
+    assert runtime.calls[-1]["tail"] is expected
@@ -1,5 +1,10 @@
+import sys
+from pathlib import Path
+
 from core.tool_registry import ToolRegistry
 
+_BUILTIN_SKILLS = Path(__file__).resolve().parents[2] / "extension" / "skills" / "builtin"
+
 
 def test_tool_registry_exposes_only_primitives_by_default():
     registry = ToolRegistry()
@@ -17,3 +22,32 @@ def test_tool_registry_exposes_task_tracker_for_ikaros_runtime():
 
     assert "task_tracker" in names
     assert "analyze_video" not in names
+
+
+def test_tool_registry_marks_only_read_primitive_as_read_only():
+    registry = ToolRegistry()
+    read_only = {
+        tool["name"] for tool in registry.get_core_tools() if tool.get("read_only")
+    }
+
+    assert read_only == {"read"}
+
+
+def test_read_only_skill_cli_commands_are_recognised_through_bash():
+    registry = ToolRegistry()
+    cwd = str(_BUILTIN_SKILLS)
+    python = sys.executable
+
+    assert registry.is_read_only_bash_command(
+        f'cd web_search && {python} scripts/execute.py "Linux 常用命令"', cwd=cwd
+    )
+    assert registry.is_read_only_bash_command(
+        f"cd web_extractor && {python} scripts/execute.py https://example.com", cwd=cwd
+    )
+    # 未声明 read_only 的 skill、带管道的命令都不算只读。
+    assert not registry.is_read_only_bash_command(
+        f"cd web_browser && {python} scripts/execute.py https://example.com", cwd=cwd
+    )
+    assert not registry.is_read_only_bash_command(
+        f"cd web_search && {python} scripts/execute.py x | head -n 5", cwd=cwd
+    )
@@ -0,0 +1,152 @@
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+from services import web_fetch_service
+from services import web_summary_service as web_service
+from services.web_fetch_service import FetchStrategyMemory, WebFetcher, freshness_lifetime
+
+
+class _Origin:
+    def __init__(self):
+        self.requests: list[httpx.Request] = []
+        self.in_flight = 0
+        self.peak = 0
+        self.cache_control = "max-age=60"
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304, headers={"Cache-Control": "max-age=60"})
+            return httpx.Response(
+                200,
+                text=f"page {request.url.path}",
+                headers={"ETag": '"v1"', "Cache-Control": self.cache_control},
+            )
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def origin(monkeypatch):
+    server = _Origin()
+    real_client = httpx.AsyncClient
+
+    def _client(**kwargs):
+        kwargs.pop("http2", None)
+        return real_client(transport=httpx.MockTransport(server.handler), **kwargs)
+
+    monkeypatch.setattr(web_fetch_service.httpx, "AsyncClient", _client)
+    return server
+
+
+def _url(path: str = "page") -> str:
+    return f"https://{uuid.uuid4().hex[:8]}.example.com/{path}"
+
+
+def test_freshness_lifetime_follows_rfc_precedence():
+    now = 1_700_000_000.0
+    assert freshness_lifetime({"cache-control": "max-age=30", "expires": "0"}, now) == 30
+    assert freshness_lifetime({"expires": "garbage"}, now) == 0
+    assert (
+        freshness_lifetime(
+            {
+                "date": "Tue, 14 Nov 2023 22:13:20 GMT",
+                "last-modified": "Tue, 14 Nov 2023 21:13:20 GMT",
+            },
+            now,
+        )
+        == 360
+    )
+
+
+@pytest.mark.asyncio
+async def test_fetcher_serves_fresh_hits_and_revalidates_stale_entries(origin):
+    fetcher = WebFetcher()
+    url = _url()
+
+    first = await fetcher.get(url)
+    second = await fetcher.get(url)
+    assert first.text == second.text == "page /page"
+    assert second.extensions["web_fetch_cache"] == "hit"
+    assert len(origin.requests) == 1
+
+    # 已存的条目过期后发条件请求，304 复用缓存正文。
+    origin.cache_control = "no-cache"
+    stale_url = _url("stale")
+    await fetcher.get(stale_url)
+    revalidated = await fetcher.get(stale_url)
+    assert revalidated.status_code == 200
+    assert revalidated.text == "page /stale"
+    assert revalidated.extensions["web_fetch_cache"] == "revalidated"
+    assert origin.requests[-1].headers["if-none-match"] == '"v1"'
+
+    origin.cache_control = "no-store"
+    uncached = _url("nostore")
+    await fetcher.get(uncached)
+    await fetcher.get(uncached)
+    assert "if-none-match" not in origin.requests[-1].headers
+    assert fetcher.stats()["hits"] == 1
+    await fetcher.aclose()
+
+
+@pytest.mark.asyncio
+async def test_fetcher_limits_concurrency_per_host(origin, monkeypatch):
+    monkeypatch.setattr(web_fetch_service, "WEB_FETCH_PER_HOST", 2)
+    monkeypatch.setattr(web_fetch_service, "WEB_FETCH_CACHE_ENABLED", False)
+    fetcher = WebFetcher()
+    host = _url("")
+    await asyncio.gather(*(fetcher.get(f"{host}{idx}") for idx in range(6)))
+    assert origin.peak == 2
+    await fetcher.aclose()
+
+
+@pytest.mark.asyncio
+async def test_fetch_webpage_content_demotes_failing_strategy(monkeypatch):
+    memory = FetchStrategyMemory()
+    monkeypatch.setattr(web_service, "fetch_strategy_memory", memory)
+    monkeypatch.setenv("WEB_BROWSER_PREFER_PLAYWRIGHT_CLI", "true")
+    calls: list[str] = []
+
+    async def _cli(_url):
+        calls.append("playwright")
+        return None
+
+    async def _jina(_url):
+        calls.append("jina")
+        return "【通过 Jina Reader 获取的页面 Markdown 快照】\n\nok"
+
+    monkeypatch.setattr(web_service, "fetch_with_playwright_cli_snapshot", _cli)
+    monkeypatch.setattr(web_service, "fetch_with_jina_reader", _jina)
+    host = f"https://{uuid.uuid4().hex[:8]}.example.com"
+
+    for idx in range(3):
+        assert await web_service.fetch_webpage_content(f"{host}/{idx}")
+
+    assert calls == ["playwright", "jina", "playwright", "jina", "jina"]
+
+
+def test_fetcher_closes_client_left_on_a_finished_loop():
+    fetcher = WebFetcher(web_fetch_service.WebFetchCache())
+
+    async def _client():
+        return fetcher._client_for_loop()
+
+    async def _replace():
+        client = fetcher._client_for_loop()
+        await asyncio.sleep(0.01)
+        return client
+
+    old = asyncio.run(_client())
+    new = asyncio.run(_replace())
+
+    assert new is not old
+    assert old.is_closed
+    assert not new.is_closed
+    asyncio.run(fetcher.aclose())
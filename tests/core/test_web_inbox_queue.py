@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+
+from shared.queue.jsonl_queue import JsonlTable
+from web_channel import store
+from web_channel.outbox_bus import OutboxBus
+
+
+@pytest.fixture
+def inbox(tmp_path, monkeypatch):
+    root = tmp_path / "inbox"
+    events = JsonlTable(str(root / "events.jsonl"), segment_max_bytes=1024)
+    monkeypatch.setattr(store, "WEB_CHANNEL_INBOX_TABLE", events)
+    monkeypatch.setattr(
+        store, "WEB_CHANNEL_INBOX_ACKS_TABLE", JsonlTable(str(root / "acks.jsonl"))
+    )
+    monkeypatch.setattr(store, "WEB_CHANNEL_INBOX_CURSOR_PATH", root / "cursor.json")
+    bus = OutboxBus(root / ".notify")
+    monkeypatch.setattr(store, "WEB_CHANNEL_INBOX_BUS", bus)
+    yield events
+    bus.close()
+
+
+@pytest.mark.asyncio
+async def test_claim_advances_cursor_without_rewriting_events(inbox):
+    first = await store.enqueue_inbound_event({"type": "message_text", "n": 1})
+    second = await store.enqueue_inbound_event({"type": "message_text", "n": 2})
+    await store.enqueue_inbound_event({"type": "message_text", "n": 3})
+    before = inbox.path.read_bytes()
+
+    claimed = await store.claim_inbound_events(limit=2)
+    assert [row["id"] for row in claimed] == [first["id"], second["id"]]
+    assert all(row["status"] == "claimed" for row in claimed)
+    assert inbox.path.read_bytes() == before
+
+    await store.ack_inbound_event(first["id"])
+    await store.fail_inbound_event(second["id"], "boom")
+    metrics = await store.get_inbound_queue_metrics()
+    assert metrics["depth"] == 1
+    assert metrics["in_flight"] == 0
+    assert metrics["claimed_total"] == 2
+    assert metrics["claim_latency_ms"]["max"] >= metrics["claim_latency_ms"]["last"] >= 0
+
+    assert [row["n"] for row in await store.claim_inbound_events()] == [3]
+    assert await store.claim_inbound_events() == []
+
+
+@pytest.mark.asyncio
+async def test_claim_skips_legacy_rewritten_rows(inbox):
+    await inbox.append_many(
+        [
+            {"id": "old-done", "status": "done"},
+            {"id": "old-claimed", "status": "claimed"},
+            {"id": "old-pending", "status": "pending"},
+        ]
+    )
+    assert [row["id"] for row in await store.claim_inbound_events()] == ["old-pending"]
+
+
+@pytest.mark.asyncio
+async def test_settled_sealed_segments_are_dropped_and_cursor_rebased(inbox):
+    for n in range(40):
+        await store.enqueue_inbound_event({"type": "message_text", "text": "x" * 40, "n": n})
+    assert inbox._sealed_segments()
+
+    claimed = await store.claim_inbound_events(limit=100)
+    assert [row["n"] for row in claimed] == list(range(40))
+    for row in claimed:
+        await store.ack_inbound_event(row["id"])
+    await store.enqueue_inbound_event({"type": "message_text", "n": 40})
+    assert [row["n"] for row in await store.claim_inbound_events()] == [40]
+
+    assert inbox._sealed_segments() == []
+    cursor = json.loads(store.WEB_CHANNEL_INBOX_CURSOR_PATH.read_text(encoding="utf-8"))
+    assert cursor["position"] == await inbox.count()
+    metrics = await store.get_inbound_queue_metrics()
+    assert metrics["depth"] == 0
+    assert metrics["in_flight"] == 1
+    assert metrics["acked_total"] == 40
+
+
+@pytest.mark.asyncio
+async def test_watch_inbound_events_wakes_on_enqueue(inbox):
+    async with store.watch_inbound_events() as watcher:
+        watcher.clear()
+        assert await store.claim_inbound_events() == []
+
+        async def produce():
+            await asyncio.sleep(0.05)
+            await store.enqueue_inbound_event({"type": "command", "text": "/help"})
+
+        producer = asyncio.create_task(produce())
+        assert await watcher.wait(timeout=5.0)
+        await producer
+        assert [row["text"] for row in await store.claim_inbound_events()] == ["/help"]
+
+
+@pytest.mark.asyncio
+async def test_web_adapter_wakes_on_enqueue_instead_of_polling(inbox, monkeypatch):
+    from extension.channels.web import adapter as adapter_module
+
+    processed: list[str] = []
+    done = asyncio.Event()
+
+    async def _process(_self, event):
+        processed.append(event["text"])
+        await store.ack_inbound_event(event["id"])
+        done.set()
+
+    monkeypatch.setattr(adapter_module.WebAdapter, "_process_event", _process)
+    adapter = adapter_module.WebAdapter(poll_interval_sec=30)
+    await adapter.start()
+    try:
+        await asyncio.sleep(0.1)
+        await store.enqueue_inbound_event({"type": "command", "text": "/help"})
+        await asyncio.wait_for(done.wait(), timeout=2.0)
+    finally:
+        await adapter.stop()
+    assert processed == ["/help"]
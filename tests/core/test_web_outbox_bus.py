@@ -0,0 +1,109 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from shared.queue.jsonl_queue import JsonlTable
+from web_channel.outbox_bus import OutboxBus
+
+
+def _event(seq: int, session_id: str = "s1") -> dict:
+    return {"seq": seq, "session_id": session_id, "type": "delta", "payload": {"n": seq}}
+
+
+@pytest.mark.asyncio
+async def test_outbox_feed_resumes_after_seq_from_cache_and_disk(tmp_path):
+    table = JsonlTable(str(tmp_path / "u.jsonl"))
+    await table.append_many([_event(seq, "s1" if seq % 2 else "s2") for seq in range(1, 11)])
+    bus = OutboxBus(tmp_path / ".notify", recent_rows=3)
+    feed = bus.feed(table)
+
+    rows = await feed.read_after(7)
+    assert [row["seq"] for row in rows] == [8, 9, 10]
+
+    rows = await feed.read_after(2, session_id="s1", limit=2)
+    assert [row["seq"] for row in rows] == [3, 5]
+
+    await table.append(_event(11))
+    assert [row["seq"] for row in await feed.read_after(10)] == [11]
+    assert feed.seqs == list(range(1, 12))
+
+
+@pytest.mark.asyncio
+async def test_outbox_subscription_wakes_on_local_and_remote_publish(tmp_path):
+    table = JsonlTable(str(tmp_path / "u.jsonl"))
+    api_bus = OutboxBus(tmp_path / ".notify", name="api")
+    core_bus = OutboxBus(tmp_path / ".notify", name="core")
+    try:
+        async with api_bus.subscribe(table) as subscription:
+            assert api_bus.listening
+            assert await subscription.read_after(0) == []
+
+            async def produce(bus: OutboxBus, seq: int) -> None:
+                await asyncio.sleep(0.05)
+                await table.append(_event(seq))
+                bus.publish(table)
+
+            for bus, seq in ((api_bus, 1), (core_bus, 2)):
+                started = time.perf_counter()
+                producer = asyncio.create_task(produce(bus, seq))
+                assert await subscription.wait(timeout=5.0)
+                rows = await subscription.read_after(seq - 1)
+                await producer
+                assert [row["seq"] for row in rows] == [seq]
+                assert time.perf_counter() - started < 1.0
+    finally:
+        api_bus.close()
+        core_bus.close()
+    assert not (tmp_path / ".notify" / "api.sock").exists()
+
+
+@pytest.mark.asyncio
+async def test_outbox_buses_sharing_a_pid_keep_separate_sockets(tmp_path, monkeypatch):
+    # 两个容器都是 PID 1 且共享 notify 目录时，默认名也不能撞。
+    monkeypatch.setattr("web_channel.outbox_bus.os.getpid", lambda: 1)
+    table = JsonlTable(str(tmp_path / "u.jsonl"))
+    first = OutboxBus(tmp_path / ".notify")
+    second = OutboxBus(tmp_path / ".notify")
+    assert first.socket_path != second.socket_path
+    try:
+        async with first.subscribe(table) as subscription:
+            async with second.subscribe(table):
+                assert first.listening and second.listening
+                assert first.socket_path.exists() and second.socket_path.exists()
+
+                await table.append(_event(1))
+                second.publish(table)
+                assert await subscription.wait(timeout=5.0)
+                assert [row["seq"] for row in await subscription.read_after(0)] == [1]
+    finally:
+        first.close()
+        second.close()
+
+
+@pytest.mark.asyncio
+async def test_outbox_bus_does_not_steal_a_live_socket(tmp_path):
+    table = JsonlTable(str(tmp_path / "u.jsonl"))
+    owner = OutboxBus(tmp_path / ".notify", name="same")
+    intruder = OutboxBus(tmp_path / ".notify", name="same")
+    try:
+        async with owner.subscribe(table):
+            async with intruder.subscribe(table):
+                assert owner.listening
+                assert not intruder.listening
+                assert owner.socket_path.exists()
+    finally:
+        intruder.close()
+        owner.close()
+
+    # 监听方退出后留下的残留文件会被下一个监听者清掉。
+    leftover = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    leftover.bind(str(tmp_path / ".notify" / "stale.sock"))
+    leftover.close()
+    reused = OutboxBus(tmp_path / ".notify", name="stale")
+    try:
+        async with reused.subscribe(table):
+            assert reused.listening
+    finally:
+        reused.close()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+import handlers.perf_handlers as perf_handlers
+from core.perf_trace import PerfRecorder
+from handlers import perf_command as exported_perf_command
+from handlers.perf_handlers import perf_command
+
+
+class _FakeContext:
+    def __init__(self, text: str):
+        self.message = SimpleNamespace(id="m-perf", text=text, user=SimpleNamespace(id="u-perf"))
+        self.replies: list[str] = []
+
+    async def reply(self, text: str, **kwargs):
+        _ = kwargs
+        self.replies.append(str(text))
+        return SimpleNamespace(id="reply")
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    async def _allow(_ctx):
+        return True
+
+    recorder = PerfRecorder(enabled=True)
+    monkeypatch.setattr(perf_handlers, "perf_recorder", recorder)
+    monkeypatch.setattr(perf_handlers, "check_permission_unified", _allow)
+    return recorder
+
+
+def test_perf_command_is_exported():
+    assert exported_perf_command is perf_command
+
+
+@pytest.mark.asyncio
+async def test_perf_show_ranks_spans_by_p95_and_filters_prefix(recorder):
+    recorder.record("store.state.save_message", 2.0)
+    recorder.record("llm.request", 1800.0)
+    recorder.record("tool.read", 40.0, error=True)
+
+    ctx = _FakeContext("/perf")
+    await perf_command(ctx)
+
+    lines = ctx.replies[-1].splitlines()
+    ranked = [line for line in lines if line.startswith("`")]
+    assert ranked[0].startswith("`llm.request`")
+    assert ranked[-1].startswith("`store.state.save_message`")
+    assert "err=1" in ranked[1]
+
+    ctx = _FakeContext("/perf show tool.")
+    await perf_command(ctx)
+    assert "tool.read" in ctx.replies[-1]
+    assert "llm.request" not in ctx.replies[-1]
+
+
+@pytest.mark.asyncio
+async def test_perf_stalls_and_reset(recorder):
+    recorder.record_stall(
+        {
+            "token": 1,
+            "at": "2026-01-01T00:00:00+00:00",
+            "duration_ms": 512.0,
+            "stack": ['  File "store.py", line 10, in save', "    fh.write(data)"],
+        }
+    )
+
+    ctx = _FakeContext("/perf stalls")
+    await perf_command(ctx)
+    assert "512ms" in ctx.replies[-1]
+    assert "fh.write(data)" in ctx.replies[-1]
+
+    await perf_command(_FakeContext("/perf reset"))
+    ctx = _FakeContext("/perf stalls")
+    await perf_command(ctx)
+    assert ctx.replies[-1] == "没有记录到事件循环卡顿。"
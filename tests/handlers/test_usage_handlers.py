@@ -128,6 +128,7 @@ async def test_usage_command_renders_model_usage_summary(monkeypatch, tmp_path):
     assert "LLM Token 用量" in reply
     assert "demo/text" in reply
     assert "cache_hit=1" in reply
+    assert "占输入 `40.0%`" in reply
 
 
 @pytest.mark.asyncio
@@ -196,6 +197,33 @@ async def test_usage_command_reset_clears_store(monkeypatch, tmp_path):
     assert llm_usage_module.llm_usage_store.summarize()["requests"] == 0
 
 
+@pytest.mark.asyncio
+async def test_usage_command_prompt_renders_segment_layout(monkeypatch):
+    from core.prompt_layout import PromptLayout, PromptSegment, TIER_STATIC, TIER_TURN
+
+    async def _allow(_ctx):
+        return True
+
+    layout = PromptLayout()
+    layout.render(
+        [
+            PromptSegment("soul", TIER_STATIC, "【SOUL】\n- tone: warm"),
+            PromptSegment("skill_catalog", TIER_TURN, "【可用技能目录】\n- `a`"),
+        ],
+        scope="u-usage",
+    )
+    monkeypatch.setattr(usage_handlers, "check_permission_unified", _allow)
+    monkeypatch.setattr(usage_handlers, "prompt_layout", layout)
+
+    ctx = _FakeContext("/usage prompt")
+    await usage_command(ctx)
+
+    reply = ctx.replies[-1]
+    assert "System Prompt 布局" in reply
+    assert "`soul` [static]" in reply
+    assert "`skill_catalog` [turn]" in reply
+
+
 def test_usage_command_is_exported_from_handlers_package():
     assert exported_usage_command is usage_command
 
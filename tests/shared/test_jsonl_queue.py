@@ -1,10 +1,11 @@
+import asyncio
 import json
 import os
 import time
 
 import pytest
 
-from shared.queue.jsonl_queue import FileLock, JsonlTable
+from shared.queue.jsonl_queue import AdvisoryFileLock, FileLock, JsonlTable
 
 
 @pytest.mark.asyncio
@@ -19,6 +20,67 @@ async def test_file_lock_recovers_dead_pid_lock(tmp_path):
     assert not lock_path.exists()
 
 
+@pytest.mark.asyncio
+async def test_advisory_lock_waits_without_blocking_the_loop(tmp_path):
+    lock_path = tmp_path / "tasks.jsonl.lock"
+    ticks = 0
+
+    async def _ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(_ticker())
+    try:
+        async with AdvisoryFileLock(lock_path):
+            with pytest.raises(TimeoutError):
+                async with AdvisoryFileLock(lock_path, timeout_sec=0.3):
+                    pass
+            waiter = asyncio.create_task(AdvisoryFileLock(lock_path).__aenter__())
+            await asyncio.sleep(0.05)
+            assert not waiter.done()
+        second = await asyncio.wait_for(waiter, timeout=1.0)
+        await second.__aexit__(None, None, None)
+    finally:
+        ticker.cancel()
+    assert ticks >= 20
+
+
+@pytest.mark.asyncio
+async def test_advisory_lock_cancelled_waiter_does_not_keep_the_lock(tmp_path):
+    lock_path = tmp_path / "tasks.jsonl.lock"
+    holder = await AdvisoryFileLock(lock_path).__aenter__()
+    waiter = asyncio.create_task(AdvisoryFileLock(lock_path).__aenter__())
+    await asyncio.sleep(0.05)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    await holder.__aexit__(None, None, None)
+
+    # 被取消的 flock 晚一步拿到锁后随 fd 关闭释放，后来者不会一直等到超时。
+    started = time.monotonic()
+    async with AdvisoryFileLock(lock_path, timeout_sec=2.0):
+        pass
+    assert time.monotonic() - started < 1.0
+
+
+@pytest.mark.asyncio
+async def test_jsonl_table_reindexes_when_a_reused_inode_holds_new_rows(tmp_path):
+    table_path = tmp_path / "events.jsonl"
+    table = JsonlTable(str(table_path))
+    await table.append_many([{"n": 1}, {"n": 2}])
+    assert [row["n"] for row in await table.read_all()] == [1, 2]
+
+    # 同一个 inode 被改写成更长的新内容（等价于 inode 复用），旧偏移不可再用。
+    await table.flush()
+    table._close_append_fd()
+    with table_path.open("r+b") as handle:
+        handle.write(b"".join(json.dumps({"moved": idx}).encode() + b"\n" for idx in range(5)))
+    assert await table.count() == 5
+    assert [row["moved"] for row in await table.read_from(2)] == [2, 3, 4]
+
+
 @pytest.mark.asyncio
 async def test_jsonl_table_read_all_recovers_stale_legacy_lock(tmp_path):
     table_path = tmp_path / "tasks.jsonl"
@@ -33,3 +95,92 @@ async def test_jsonl_table_read_all_recovers_stale_legacy_lock(tmp_path):
     rows = await table.read_all()
 
     assert rows == [{"task_id": "tsk-1"}]
+
+
+@pytest.mark.asyncio
+async def test_jsonl_table_append_is_in_place_and_read_from_seeks(tmp_path):
+    table_path = tmp_path / "events.jsonl"
+    table_path.write_text(json.dumps({"seq": 1}) + "\n", encoding="utf-8")
+    table = JsonlTable(str(table_path))
+    inode = table_path.stat().st_ino
+
+    for seq in range(2, 6):
+        await table.append({"seq": seq})
+
+    assert table_path.stat().st_ino == inode
+    assert await table.count() == 5
+    assert [row["seq"] for row in await table.read_from(3)] == [4, 5]
+    assert [row["seq"] for row in await JsonlTable(str(table_path)).read_all()] == [
+        1,
+        2,
+        3,
+        4,
+        5,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_jsonl_table_rotates_segments_and_compacts_settled_rows(tmp_path):
+    table_path = tmp_path / "inbox.jsonl"
+    table = JsonlTable(
+        str(table_path),
+        segment_max_bytes=1024,
+        retain=lambda row: row.get("status") != "done",
+        compact_min_dead=40,
+    )
+    padding = "x" * 40
+
+    for index in range(60):
+        status = "pending" if index % 10 == 0 else "done"
+        await table.append({"id": index, "status": status, "pad": padding})
+
+    sealed = sorted(tmp_path.glob("inbox.jsonl.0*"))
+    assert sealed
+    rows = await table.read_all()
+    ids = [row["id"] for row in rows]
+    assert ids == sorted(ids)
+    assert {0, 10, 20, 30, 40, 50} <= set(ids)
+    assert len(ids) < 60
+    assert all(
+        row["status"] == "pending" for row in rows if row["id"] < 40
+    )
+
+    await table.write_all([{"id": "only"}])
+    assert not list(tmp_path.glob("inbox.jsonl.0*"))
+    assert await table.read_all() == [{"id": "only"}]
+
+
+def _append_worker(path: str, worker: int, rows: int) -> None:
+    import asyncio
+
+    async def _run() -> None:
+        table = JsonlTable(path, fsync_batch_rows=16)
+        for index in range(rows):
+            await table.append({"worker": worker, "index": index})
+        await table.flush()
+
+    asyncio.run(_run())
+
+
+def test_jsonl_table_concurrent_process_appends_do_not_lose_rows(tmp_path):
+    import multiprocessing
+
+    table_path = str(tmp_path / "shared.jsonl")
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=_append_worker, args=(table_path, worker, 50))
+        for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    lines = (tmp_path / "shared.jsonl").read_text(encoding="utf-8").splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert len(rows) == 200
+    for worker in range(4):
+        assert [row["index"] for row in rows if row["worker"] == worker] == list(
+            range(50)
+        )
@@ -297,28 +297,24 @@ class TestWebSummaryService:
 
     @pytest.mark.asyncio
     async def test_fetch_webpage_content_http_fallback(self, monkeypatch):
+        import httpx
+
+        from services import web_fetch_service
         from services import web_summary_service as web_service
 
         async def _fake_cli(_url: str):
             return None
 
-        class _FakeResponse:
-            text = "<html><body><h1>fallback</h1></body></html>"
-
-            def raise_for_status(self):
-                return None
-
-        class _FakeClient:
-            async def __aenter__(self):
-                return self
+        def _handler(_request):
+            return httpx.Response(
+                200, text="<html><body><h1>fallback</h1></body></html>"
+            )
 
-            async def __aexit__(self, exc_type, exc, tb):
-                _ = (exc_type, exc, tb)
-                return False
+        real_client = httpx.AsyncClient
 
-            async def get(self, _url: str, headers=None):
-                _ = headers
-                return _FakeResponse()
+        def _client(**kwargs):
+            kwargs.pop("http2", None)
+            return real_client(transport=httpx.MockTransport(_handler), **kwargs)
 
         monkeypatch.setenv("WEB_BROWSER_PREFER_PLAYWRIGHT_CLI", "false")
         monkeypatch.setattr(
@@ -326,9 +322,8 @@ class TestWebSummaryService:
             "fetch_with_playwright_cli_snapshot",
             _fake_cli,
         )
-        monkeypatch.setattr(
-            web_service.httpx, "AsyncClient", lambda **kwargs: _FakeClient()
-        )
+        monkeypatch.setattr(web_fetch_service.httpx, "AsyncClient", _client)
+        monkeypatch.setattr(web_service, "web_fetcher", web_fetch_service.WebFetcher())
 
         content = await web_service.fetch_webpage_content("https://example.com")
 